@@ -1,92 +1,102 @@
 """Bottleneck runner script for generating flow-density plots.
 
 Run density experiment to generate capacity diagram for the
-bottleneck experiment
+bottleneck experiment. The rollouts are cached in data/bottleneck_sweep, so
+that running the script again only simulates the new inflow rates or trials.
+
+With the --adaptive flag, the inflow rates and number of trials are not
+fixed, but chosen by flow.core.sweep.AdaptiveSampler to concentrate the
+rollouts around the capacity drop, until the mean outflows are known within
+the requested confidence interval width.
+
+Usage
+-----
+::
+    python bottleneck_density_sweep_capacity_diagram.py [--adaptive]
+    python flow/visualize/capacity_diagram_generator.py \
+        data/inflows_outflows.csv
 """
 
+import argparse
+from copy import deepcopy
 import multiprocessing
-import numpy as np
 import os
-import ray
 
-from examples.sumo.bottlenecks import bottleneck_example
+from flow.core.params import InFlows
+from flow.core.sweep import Sweep, GridSampler, AdaptiveSampler
+
+from examples.exp_configs.non_rl.bottleneck import flow_params
 
+# inflow rates of the sweep (in veh/hr)
+INFLOWS = list(range(400, 3000, 100))
+# number of rollouts per inflow rate
+NUM_TRIALS = 10
+# number of simulation steps per rollout
+NUM_STEPS = 2000
 
-@ray.remote
-def run_bottleneck(flow_rate, num_trials, num_steps, render=None):
-    """Run a rollout of the bottleneck environment.
+
+def make_flow_params(inflow, seed):
+    """Return the parameters of the bottleneck for an inflow rate.
 
     Parameters
     ----------
-    flow_rate : float
-        bottleneck inflow rate
-    num_trials : int
-        number of rollouts to perform
-    num_steps : int
-        number of simulation steps per rollout
-    render : bool
-        whether to render the environment
+    inflow : float
+        bottleneck inflow rate (in veh/hr)
+    seed : int
+        seed of the rollout
 
     Returns
     -------
-    float
-        average outflow rate across rollouts
-    float
-        average speed across rollouts
-    float
-        average rollout density outflow
-    list of float
-        per rollout outflows
-    float
-        inflow rate
+    dict
+        flow-specific parameters
     """
-    print('Running experiment for inflow rate: ', flow_rate, render)
-    exp = bottleneck_example(flow_rate, num_steps, restart_instance=True)
-    info_dict = exp.run(num_trials, num_steps)
+    params = deepcopy(flow_params)
+    params['env'].horizon = NUM_STEPS
+    params['sim'].restart_instance = True
 
-    return info_dict['average_outflow'], \
-        np.mean(info_dict['velocities']), \
-        np.mean(info_dict['average_rollout_density_outflow']), \
-        info_dict['per_rollout_outflows'], \
-        flow_rate
+    inflows = InFlows()
+    inflows.add(
+        veh_type="human",
+        edge="1",
+        vehs_per_hour=inflow,
+        depart_lane="random",
+        depart_speed=10)
+    params['net'].inflows = inflows
 
+    return params
 
-if __name__ == '__main__':
-    # import the experiment variable`
-    densities = list(range(400, 3000, 100))
-    outflows = []
-    velocities = []
-    bottleneckdensities = []
-
-    per_step_densities = []
-    per_step_avg_velocities = []
-    per_step_outflows = []
-
-    rollout_inflows = []
-    rollout_outflows = []
-
-    num_cpus = multiprocessing.cpu_count()
-    ray.init(num_cpus=max(num_cpus - 2, 1))
-    bottleneck_outputs = [run_bottleneck.remote(d, 10, 2000)
-                          for d in densities]
-    for output in ray.get(bottleneck_outputs):
-        outflow, velocity, bottleneckdensity, \
-            per_rollout_outflows, flow_rate = output
-        for i, _ in enumerate(per_rollout_outflows):
-            rollout_outflows.append(per_rollout_outflows[i])
-            rollout_inflows.append(flow_rate)
-        outflows.append(outflow)
-        velocities.append(velocity)
-        bottleneckdensities.append(bottleneckdensity)
 
+def create_parser():
+    """Create the parser to capture CLI arguments."""
+    parser = argparse.ArgumentParser(
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        description='Sweep the inflow rate of the bottleneck.')
+    parser.add_argument(
+        '--adaptive', action='store_true',
+        help='choose the inflow rates and trials adaptively')
+    parser.add_argument(
+        '--ci_width', type=float, default=100,
+        help='target width of the confidence intervals of the mean outflows '
+             '(in veh/hr), if --adaptive is set')
+    return parser
+
+
+if __name__ == '__main__':
+    args = create_parser().parse_args()
     path = os.path.dirname(os.path.abspath(__file__))
-    np.savetxt(path + '/../../data/rets.csv',
-               np.matrix([densities,
-                          outflows,
-                          velocities,
-                          bottleneckdensities]).T,
-               delimiter=',')
-    np.savetxt(path + '/../../data/inflows_outflows.csv',
-               np.matrix([rollout_inflows,
-                          rollout_outflows]).T,
-               delimiter=',')
+    data_path = os.path.join(path, '../../data')
+    num_cpus = max(multiprocessing.cpu_count() - 2, 1)
+
+    if args.adaptive:
+        sampler = AdaptiveSampler(
+            'inflow', INFLOWS[0], INFLOWS[-1], min_spacing=INFLOWS[1] - INFLOWS[0],
+            ci_width=args.ci_width, max_trials=NUM_TRIALS, batch_size=num_cpus)
+    else:
+        sampler = GridSampler({'inflow': INFLOWS}, num_trials=NUM_TRIALS)
+
+    sweep = Sweep(
+        make_flow_params,
+        sampler,
+        cache_dir=os.path.join(data_path, 'bottleneck_sweep'),
+        num_cpus=num_cpus)
+    sweep.run(os.path.join(data_path, 'inflows_outflows.csv'))
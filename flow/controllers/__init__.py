@@ -5,30 +5,47 @@ vehicles in the network.
 
 In addition, the RLController class can be used to add vehicles whose actions
 are specified by a learning (RL) agent.
+
+The controllers are imported when they are first accessed (see
+flow/utils/lazy_import.py).
 """
+from flow.utils.lazy_import import lazy_module
+
+# module containing every controller
+_CONTROLLERS = {
+    # RL controller
+    "RLController": "flow.controllers.rlcontroller",
+
+    # acceleration controllers
+    "BaseController": "flow.controllers.base_controller",
+    "CFMController": "flow.controllers.car_following_models",
+    "BCMController": "flow.controllers.car_following_models",
+    "OVMController": "flow.controllers.car_following_models",
+    "LinearOVM": "flow.controllers.car_following_models",
+    "IDMController": "flow.controllers.car_following_models",
+    "SimCarFollowingController": "flow.controllers.car_following_models",
+    "LACController": "flow.controllers.car_following_models",
+    "GippsController": "flow.controllers.car_following_models",
+    "BandoFTLController": "flow.controllers.car_following_models",
+    "FollowerStopper": "flow.controllers.velocity_controllers",
+    "PISaturation": "flow.controllers.velocity_controllers",
+    "NonLocalFollowerStopper": "flow.controllers.velocity_controllers",
+
+    # lane change controllers
+    "BaseLaneChangeController":
+        "flow.controllers.base_lane_changing_controller",
+    "StaticLaneChanger": "flow.controllers.lane_change_controllers",
+    "SimLaneChangeController": "flow.controllers.lane_change_controllers",
+
+    # routing controllers
+    "BaseRouter": "flow.controllers.base_routing_controller",
+    "ContinuousRouter": "flow.controllers.routing_controllers",
+    "GridRouter": "flow.controllers.routing_controllers",
+    "BayBridgeRouter": "flow.controllers.routing_controllers",
+    "I210Router": "flow.controllers.routing_controllers",
+}
 
-# RL controller
-from flow.controllers.rlcontroller import RLController
-
-# acceleration controllers
-from flow.controllers.base_controller import BaseController
-from flow.controllers.car_following_models import CFMController, \
-    BCMController, OVMController, LinearOVM, IDMController, \
-    SimCarFollowingController, LACController, GippsController, \
-    BandoFTLController
-from flow.controllers.velocity_controllers import FollowerStopper, \
-    PISaturation, NonLocalFollowerStopper
-
-# lane change controllers
-from flow.controllers.base_lane_changing_controller import \
-    BaseLaneChangeController
-from flow.controllers.lane_change_controllers import StaticLaneChanger, \
-    SimLaneChangeController
-
-# routing controllers
-from flow.controllers.base_routing_controller import BaseRouter
-from flow.controllers.routing_controllers import ContinuousRouter, \
-    GridRouter, BayBridgeRouter, I210Router
+__getattr__, __dir__ = lazy_module(__name__, _CONTROLLERS)
 
 __all__ = [
     "RLController", "BaseController", "BaseLaneChangeController", "BaseRouter",
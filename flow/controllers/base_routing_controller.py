@@ -2,6 +2,15 @@
 
 from abc import ABCMeta, abstractmethod
 
+# the router is called at every simulation step
+TRIGGER_STEP = "step"
+# the router is called when the edge of the vehicle or the last edge of its
+# route changes
+TRIGGER_EDGE = "edge"
+# the router is called when the edge or lane of the vehicle, or the last edge
+# of its route changes
+TRIGGER_LANE = "lane"
+
 
 class BaseRouter(metaclass=ABCMeta):
     """Base class for routing controllers.
@@ -9,6 +18,21 @@ class BaseRouter(metaclass=ABCMeta):
     These controllers are used to dynamically change the routes of vehicles
     after initialization.
 
+    Routers are only called when the state of the vehicle their choice
+    depends on changes, as specified by the `trigger` class attribute:
+
+    * TRIGGER_STEP: the router is called at every simulation step. This is the
+      default for custom routers.
+    * TRIGGER_EDGE: the router is called when the vehicle enters a new edge,
+      or when the last edge of its route changes (e.g. once its route has been
+      received from the simulator).
+    * TRIGGER_LANE: same as TRIGGER_EDGE, and the router is also called when
+      the vehicle changes lanes.
+
+    In addition, the `trigger_edges` class attribute may be set to a set of
+    edges, in which case the router is only called when the above state
+    changes while the vehicle is on one of these edges.
+
     Usage
     -----
     >>> from flow.core.params import VehicleParams
@@ -27,10 +51,50 @@ class BaseRouter(metaclass=ABCMeta):
         Dictionary of router params
     """
 
+    #: str : state of the vehicle that triggers a call to the router
+    trigger = TRIGGER_STEP
+    #: set of str or None : edges the router may be called on (all if None)
+    trigger_edges = None
+
     def __init__(self, veh_id, router_params):
         """Instantiate the base class for routing controllers."""
         self.veh_id = veh_id
         self.router_params = router_params
+        # state of the vehicle the last time the router was triggered
+        self.trigger_state = None
+
+    def is_triggered(self, edge, lane, route):
+        """Return whether the router should be called in the current step.
+
+        This also records the current state of the vehicle, so that the
+        router is not triggered again until this state changes.
+
+        Parameters
+        ----------
+        edge : str
+            current edge of the vehicle
+        lane : int
+            current lane of the vehicle
+        route : list of str
+            current route of the vehicle
+
+        Returns
+        -------
+        bool
+            True if the router should be called
+        """
+        if self.trigger == TRIGGER_STEP:
+            return True
+
+        state = (edge, route[-1] if len(route) > 0 else None)
+        if self.trigger == TRIGGER_LANE:
+            state += (lane,)
+
+        if state == self.trigger_state:
+            return False
+        self.trigger_state = state
+
+        return self.trigger_edges is None or edge in self.trigger_edges
 
     @abstractmethod
     def choose_route(self, env):
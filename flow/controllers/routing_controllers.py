@@ -1,8 +1,8 @@
 """Contains a list of custom routing controllers."""
 import random
-import numpy as np
 
-from flow.controllers.base_routing_controller import BaseRouter
+from flow.controllers.base_routing_controller import BaseRouter, \
+    TRIGGER_EDGE, TRIGGER_LANE
 
 
 class ContinuousRouter(BaseRouter):
@@ -16,6 +16,8 @@ class ContinuousRouter(BaseRouter):
     See base class for usage example.
     """
 
+    trigger = TRIGGER_EDGE
+
     def choose_route(self, env):
         """See parent class.
 
@@ -31,13 +33,7 @@ class ContinuousRouter(BaseRouter):
         elif edge == current_route[-1]:
             # choose one of the available routes based on the fraction of times
             # the given route can be chosen
-            num_routes = len(env.available_routes[edge])
-            frac = [val[1] for val in env.available_routes[edge]]
-            route_id = np.random.choice(
-                [i for i in range(num_routes)], size=1, p=frac)[0]
-
-            # pass the chosen route
-            return env.available_routes[edge][route_id][0]
+            return env.k.network.get_route_table(edge).sample_route()
         else:
             return None
 
@@ -52,26 +48,35 @@ class MinicityRouter(BaseRouter):
     See base class for usage example.
     """
 
+    trigger = TRIGGER_LANE
+
     def choose_route(self, env):
         """See parent class."""
         vehicles = env.k.vehicle
         veh_id = self.veh_id
         veh_edge = vehicles.get_edge(veh_id)
+        veh_lane = vehicles.get_lane(veh_id)
         veh_route = vehicles.get_route(veh_id)
-        veh_next_edge = env.k.network.next_edge(veh_edge,
-                                                vehicles.get_lane(veh_id))
+        veh_next_edge = env.k.network.next_edge(veh_edge, veh_lane)
         not_an_edge = ":"
         no_next = 0
 
         if len(veh_next_edge) == no_next:
             next_route = None
         elif veh_route[-1] == veh_edge:
-            random_route = random.randint(0, len(veh_next_edge) - 1)
-            while veh_next_edge[0][0][0] == not_an_edge:
-                veh_next_edge = env.k.network.next_edge(
-                    veh_next_edge[random_route][0],
-                    veh_next_edge[random_route][1])
-            next_route = [veh_edge, veh_next_edge[0][0]]
+            if veh_next_edge[0][0][0] == not_an_edge:
+                # edges reached through the junction, as precomputed by the
+                # network kernel, skipping connections that lead nowhere
+                next_edges = [
+                    nxt for nxt in env.k.network.get_next_edges(
+                        veh_edge, veh_lane) if nxt is not None]
+                if len(next_edges) == no_next:
+                    next_route = None
+                else:
+                    random_route = random.randint(0, len(next_edges) - 1)
+                    next_route = [veh_edge, next_edges[random_route]]
+            else:
+                next_route = [veh_edge, veh_next_edge[0][0]]
         else:
             next_route = None
 
@@ -89,6 +94,8 @@ class GridRouter(BaseRouter):
     See base class for usage example.
     """
 
+    trigger = TRIGGER_EDGE
+
     def choose_route(self, env):
         """See parent class."""
         if len(env.k.vehicle.get_route(self.veh_id)) == 0:
@@ -112,6 +119,8 @@ class BayBridgeRouter(ContinuousRouter):
     See base class for usage example.
     """
 
+    trigger = TRIGGER_LANE
+
     def choose_route(self, env):
         """See parent class."""
         edge = env.k.vehicle.get_edge(self.veh_id)
@@ -136,6 +145,8 @@ class I210Router(ContinuousRouter):
     See base class for usage example.
     """
 
+    trigger = TRIGGER_LANE
+
     def choose_route(self, env):
         """See parent class."""
         edge = env.k.vehicle.get_edge(self.veh_id)
@@ -6,6 +6,63 @@ import time
 import numpy as np
 
 
+class EnvSnapshot(object):
+    """View of an environment at a given step, used by the custom callables.
+
+    The kernel of the view is a snapshot of the kernel of the environment
+    (see flow.core.kernel.Kernel.snapshot), and its time counter is the one of
+    the step. The parameters and the network of the environment, which do not
+    change during a rollout, are shared with the environment. Reading any
+    other attribute raises an AttributeError, as it may have been modified by
+    the following steps.
+
+    Attributes
+    ----------
+    k : flow.core.kernel.KernelSnapshot
+        snapshot of the kernel of the environment
+    time_counter : int
+        number of steps taken by the environment
+    step_counter : int
+        number of steps taken by the environment since the simulator was
+        started
+    env_params : flow.core.params.EnvParams
+        see flow.envs.Env
+    sim_params : flow.core.params.SimParams
+        see flow.envs.Env
+    net_params : flow.core.params.NetParams
+        see flow.envs.Env
+    initial_config : flow.core.params.InitialConfig
+        see flow.envs.Env
+    network : flow.networks.Network
+        see flow.envs.Env
+    """
+
+    def __init__(self, env):
+        """Record the state of an environment.
+
+        Parameters
+        ----------
+        env : flow.envs.Env
+            the recorded environment
+        """
+        self.k = env.k.snapshot()
+        self.time_counter = env.time_counter
+        self.step_counter = env.step_counter
+        self.env_params = env.env_params
+        self.sim_params = env.sim_params
+        self.net_params = env.net_params
+        self.initial_config = env.initial_config
+        self.network = env.network
+
+    def __getattr__(self, name):
+        """Refuse the attributes that are not recorded by the snapshot."""
+        raise AttributeError(
+            "'{}' is not recorded by EnvSnapshot. The custom callables run on "
+            "the asynchronous pipeline can only read k, time_counter, "
+            "step_counter, env_params, sim_params, net_params, "
+            "initial_config and network".format(name))
+
+
 class Experiment:
     """
     Class for systematically running simulations in any supported simulator.
@@ -53,6 +110,16 @@ class Experiment:
         to extract from the environment. The lambda will be called at each step
         to extract information from the env and it will be stored in a dict
         keyed by the str.
+
+        If the async_pipeline simulation parameter is not set, the lambdas are
+        called with the environment itself, right after every step.
+        Otherwise, they are called with an EnvSnapshot of the environment at
+        the step, on the background thread of the pipeline of the kernel,
+        while the next steps are simulated. The lambdas are then called one
+        at a time, in the order of the steps, and in the order of the dict
+        within a step. They must only read the snapshot (they cannot interact
+        with the simulator), and must not modify objects shared with the main
+        thread. All their results for a run are available once the run ends.
     env : flow.envs.Env
         the environment object the simulator will run
     """
@@ -131,6 +198,13 @@ class Experiment:
             def rl_actions(*_):
                 return None
 
+        # the custom callables are computed on the pipeline of the kernel
+        pipeline = self.env.k.pipeline
+
+        def store_custom_vals(env, custom_vals):
+            for (key, lambda_func) in self.custom_callables.items():
+                custom_vals[key].append(lambda_func(env))
+
         # time profiling information
         t = time.time()
         times = []
@@ -152,13 +226,18 @@ class Experiment:
                 ret += reward
 
                 # Compute the results for the custom callables.
-                for (key, lambda_func) in self.custom_callables.items():
-                    custom_vals[key].append(lambda_func(self.env))
+                if pipeline.enabled and self.custom_callables:
+                    pipeline.submit(
+                        store_custom_vals, EnvSnapshot(self.env), custom_vals)
+                else:
+                    store_custom_vals(self.env, custom_vals)
 
                 if done:
                     break
 
-            # Store the information from the run in info_dict.
+            # Store the information from the run in info_dict, once all the
+            # custom callables were computed.
+            pipeline.flush()
             outflow = self.env.k.vehicle.get_outflow_rate(int(500))
             info_dict["returns"].append(ret)
             info_dict["velocities"].append(np.mean(vel))
@@ -6,9 +6,82 @@ from flow.core.kernel.network import TraCIKernelNetwork, AimsunKernelNetwork
 from flow.core.kernel.vehicle import TraCIVehicle, AimsunKernelVehicle
 from flow.core.kernel.traffic_light import TraCITrafficLight, \
     AimsunKernelTrafficLight
+from flow.core.util import AsyncPipeline
 from flow.utils.exceptions import FatalFlowError
 
 
+class SimulationSnapshot(object):
+    """Immutable view of the simulation kernel at a given simulation step.
+
+    Attributes
+    ----------
+    time : float
+        simulation time of the step
+    sim_step : float
+        duration of a simulation step, in seconds
+    """
+
+    def __init__(self, simulation):
+        """Record the state of a simulation kernel.
+
+        Parameters
+        ----------
+        simulation : flow.core.kernel.simulation.KernelSimulation
+            the recorded simulation kernel
+        """
+        self.time = simulation.time
+        self.sim_step = simulation.sim_step
+
+    def __getattr__(self, name):
+        """Refuse the attributes that are not recorded by the snapshot."""
+        raise AttributeError(
+            "'{}' is not recorded by the snapshots of the simulation kernel, "
+            "which only contain time and sim_step".format(name))
+
+
+class KernelSnapshot(object):
+    """Immutable view of the kernel at a given simulation step.
+
+    Snapshots are passed to the consumers run by the pipeline of the kernel,
+    so that they can read the state of a simulation step while the simulator
+    performs the next ones. Reading a kernel subclass that is not recorded
+    (e.g. traffic_light, or the kernel_api of the simulator) raises an
+    AttributeError.
+
+    Attributes
+    ----------
+    time : float
+        simulation time of the step
+    simulation : SimulationSnapshot
+        snapshot of the simulation kernel at the step
+    vehicle : flow.core.kernel.vehicle.KernelVehicle
+        copy of the vehicle kernel at the step. Only its getters can be used,
+        as it is not connected to the simulator
+    network : flow.core.kernel.network.BaseKernelNetwork
+        the network kernel, which is shared with the kernel as it is not
+        modified during a rollout
+    """
+
+    def __init__(self, kernel):
+        """Record the state of a kernel.
+
+        Parameters
+        ----------
+        kernel : flow.core.kernel.Kernel
+            the recorded kernel
+        """
+        self.time = kernel.simulation.time
+        self.simulation = SimulationSnapshot(kernel.simulation)
+        self.network = kernel.network
+        self.vehicle = kernel.vehicle.view(self)
+
+    def __getattr__(self, name):
+        """Refuse the attributes that are not recorded by the snapshot."""
+        raise AttributeError(
+            "'{}' is not recorded by the snapshots of the kernel, which only "
+            "contain time, simulation, network and vehicle".format(name))
+
+
 class Kernel(object):
     """Kernel for abstract function calling across traffic simulator APIs.
 
@@ -61,6 +134,10 @@ class Kernel(object):
             if the specified input simulator is not a valid type
         """
         self.kernel_api = None
+        self.pipeline = AsyncPipeline(
+            enabled=getattr(sim_params, 'async_pipeline', False))
+        # snapshot of the current simulation step, shared by its consumers
+        self._snapshot = None
 
         if simulator == "traci":
             self.simulation = TraCISimulation(self)
@@ -98,15 +175,71 @@ class Kernel(object):
             specifies whether the simulator was reset in the last simulation
             step
         """
+        self._snapshot = None
         self.vehicle.update(reset)
         self.traffic_light.update(reset)
         self.network.update(reset)
         self.simulation.update(reset)
 
+    def save_state(self, filename):
+        """Save the state of the simulator and of the kernel subclasses.
+
+        The state of the simulator is written to a file, while the state of
+        the kernel subclasses is returned, so that both can be restored with
+        load_state.
+
+        Parameters
+        ----------
+        filename : str
+            path to the file the state of the simulator is written to
+
+        Returns
+        -------
+        dict
+            the state of the kernel subclasses
+        """
+        self.simulation.save_state(filename)
+        return {
+            'time': self.simulation.time,
+            'vehicle': self.vehicle.snapshot(copy_objects=True),
+            'traffic_light': self.traffic_light.save_state(),
+        }
+
+    def load_state(self, filename, state):
+        """Restore the simulator and the kernel subclasses to a saved state.
+
+        Parameters
+        ----------
+        filename : str
+            path to the file the state of the simulator was written to
+        state : dict
+            the state of the kernel subclasses, as returned by save_state
+        """
+        self.simulation.load_state(filename)
+        self.simulation.time = state['time']
+        self.vehicle.load_state(state['vehicle'])
+        self.traffic_light.load_state(state['traffic_light'])
+
+    def snapshot(self):
+        """Return an immutable view of the current state of the kernel.
+
+        The snapshot is created once per simulation step, and shared by all
+        the consumers of the step.
+
+        Returns
+        -------
+        KernelSnapshot
+            the snapshot of the kernel
+        """
+        if self._snapshot is None:
+            self._snapshot = KernelSnapshot(self)
+        return self._snapshot
+
     def close(self):
         """Terminate all components within the simulation and network."""
         self.network.close()
         self.simulation.close()
+        self.pipeline.close()
 
     @property
     def scenario(self):
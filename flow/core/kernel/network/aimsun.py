@@ -53,30 +53,7 @@ class AimsunKernelNetwork(BaseKernelNetwork):
     def generate_network(self, network):
         """See parent class."""
         self.network = network
-
-        output = {
-            "edges": network.edges,
-            "nodes": network.nodes,
-            "types": network.types,
-            "connections": network.connections,
-            "inflows": None,
-            "vehicle_types": network.vehicles.types,
-            "osm_path": network.net_params.osm_path,
-            'render': self.sim_params.render,
-            "sim_step": self.sim_params.sim_step,
-            "traffic_lights": None,
-            "network_name": self.sim_params.network_name,
-            "experiment_name": self.sim_params.experiment_name,
-            "replication_name": self.sim_params.replication_name,
-            "centroid_config_name": self.sim_params.centroid_config_name,
-            "subnetwork_name": self.sim_params.subnetwork_name
-        }
-
-        if network.net_params.inflows is not None:
-            output["inflows"] = network.net_params.inflows.__dict__
-
-        if network.traffic_lights is not None:
-            output["traffic_lights"] = network.traffic_lights.__dict__
+        output = self._network_data(network)
 
         cur_dir = os.path.join(config.PROJECT_PATH,
                                'flow/core/kernel/network')
@@ -128,21 +105,7 @@ class AimsunKernelNetwork(BaseKernelNetwork):
         # merge types into edges
         if network.net_params.osm_path is None:
             if network.net_params.template is None:
-                for i in range(len(network.edges)):
-                    if 'type' in network.edges[i]:
-                        for typ in network.types:
-                            if typ['id'] == network.edges[i]['type']:
-                                new_dict = deepcopy(typ)
-                                new_dict.pop("id")
-                                network.edges[i].update(new_dict)
-                                break
-
-                self._edges = {}
-                for edge in deepcopy(network.edges):
-                    edge_name = edge['id']
-                    self._edges[edge_name] = {}
-                    del edge['id']
-                    self._edges[edge_name] = edge
+                self._edges = self._merge_types(network)
 
                 # list of edges and internal links (junctions)
                 self._edge_list = [
@@ -238,6 +201,79 @@ class AimsunKernelNetwork(BaseKernelNetwork):
         # specify routes vehicles can take  # TODO: move into a method
         self.rts = self.network.routes
 
+    def _network_data(self, network):
+        """Return the network data passed to the Aimsun generation script.
+
+        The nodes and edges of the network may be generated lazily (see
+        flow.networks.Network), but they are written to a json file and their
+        types are merged into them, so they are stored in lists first.
+
+        Parameters
+        ----------
+        network : flow.networks.Network
+            the network that is generated
+
+        Returns
+        -------
+        dict
+            the json-serializable network data
+        """
+        if network.nodes is not None:
+            network.nodes = list(network.nodes)
+        if network.edges is not None:
+            network.edges = list(network.edges)
+
+        output = {
+            "edges": network.edges,
+            "nodes": network.nodes,
+            "types": network.types,
+            "connections": network.connections,
+            "inflows": None,
+            "vehicle_types": network.vehicles.types,
+            "osm_path": network.net_params.osm_path,
+            'render': self.sim_params.render,
+            "sim_step": self.sim_params.sim_step,
+            "traffic_lights": None,
+            "network_name": self.sim_params.network_name,
+            "experiment_name": self.sim_params.experiment_name,
+            "replication_name": self.sim_params.replication_name,
+            "centroid_config_name": self.sim_params.centroid_config_name,
+            "subnetwork_name": self.sim_params.subnetwork_name
+        }
+
+        if network.net_params.inflows is not None:
+            output["inflows"] = network.net_params.inflows.__dict__
+
+        if network.traffic_lights is not None:
+            output["traffic_lights"] = network.traffic_lights.__dict__
+
+        return output
+
+    @staticmethod
+    def _merge_types(network):
+        """Return the attributes of the edges, with those of their types.
+
+        Parameters
+        ----------
+        network : flow.networks.Network
+            the network, whose edges are stored in a list
+
+        Returns
+        -------
+        dict < str, dict >
+            attributes of every edge (except for its id), keyed by its id
+        """
+        types = {typ['id']: typ for typ in network.types or []}
+        edges = {}
+        for edge in network.edges:
+            if edge.get('type') in types:
+                new_dict = deepcopy(types[edge['type']])
+                new_dict.pop("id")
+                edge.update(new_dict)
+            edge = deepcopy(edge)
+            edges[edge.pop('id')] = edge
+        return edges
+
     def pass_api(self, kernel_api):
         """See parent class."""
         self.kernel_api = kernel_api
@@ -317,29 +353,23 @@ class AimsunKernelNetwork(BaseKernelNetwork):
         """See parent class."""
         return self._junction_list
 
-    def get_edge(self, x):  # TODO: maybe remove
-        """See parent class."""
-        for (edge, start_pos) in reversed(self.total_edgestarts):
-            if x >= start_pos:
-                return edge, x - start_pos
-
-    def get_x(self, edge, position):  # TODO: maybe remove
+    def _resolve_edge_start(self, edge):
         """See parent class."""
         # if there was a collision which caused the vehicle to disappear,
         # return an x value of -1001
         if len(edge) == 0:
-            return -1001
+            return -1001, False
 
         if edge[0] == ":" or '_to_' in edge:
             try:
-                return self.internal_edgestarts_dict[edge] + position
+                return self.internal_edgestarts_dict[edge], True
             except KeyError:
                 # in case several internal links are being generalized for
                 # by a single element (for backwards compatibility)
                 edge_name = edge.rsplit("_", 1)[0]
-                return self.total_edgestarts_dict.get(edge_name, -1001)
+                return self.total_edgestarts_dict.get(edge_name, -1001), False
         else:
-            return self.total_edgestarts_dict[edge] + position
+            return self.total_edgestarts_dict[edge], True
 
     def next_edge(self, edge, lane):
         """See parent class."""
@@ -4,6 +4,7 @@ import logging
 import random
 import numpy as np
 from copy import deepcopy
+from flow.core.kernel.network.routing import RouteTable
 from flow.utils.exceptions import FatalFlowError
 
 # length of vehicles in the network, in meters
@@ -73,6 +74,22 @@ class BaseKernelNetwork(object):
         self.total_edgestarts = None
         self.total_edgestarts_dict = None
 
+        # cached array form of total_edgestarts, see _edgestarts_arrays
+        self._edgestarts_cache = None
+
+        # integer codes of the edges whose start position was resolved, and
+        # the start position of every code, see _edge_code
+        self._edge_codes = {}
+        self._edge_offsets = []
+        self._edge_use_position = []
+        self._edge_offset_cache = None
+
+        # cached routing data, which is cleared whenever the routes of the
+        # network (rts) are generated again, see _check_route_cache
+        self._route_tables = {}
+        self._next_edges = {}
+        self._route_cache_rts = None
+
     def generate_network(self, network):
         """Generate the necessary prerequisites for the simulating a network.
 
@@ -159,32 +176,75 @@ class BaseKernelNetwork(object):
 
         Parameters
         ----------
-        x : float
+        x : float or array_like
             absolute position in network
 
         Returns
         -------
-        tup
+        tup or list of tup
             1st element: edge name (such as bottom, right, etc.)
             2nd element: relative position on edge
         """
-        raise NotImplementedError
+        _, edges = self._edgestarts_arrays()
+        idx, pos = self._get_edges(x)
+        if isinstance(x, (list, np.ndarray)):
+            return [(edges[i], pos_i) if i >= 0 else None
+                    for i, pos_i in zip(idx.tolist(), pos.tolist())]
+        return (edges[idx], pos) if idx >= 0 else None
 
     def get_x(self, edge, position):  # TODO: maybe remove
         """Return the absolute position on the track.
 
+        The start positions of the edges are resolved once per edge (see
+        _resolve_edge_start) and cached, so that the positions of many
+        vehicles can be converted at once.
+
         Parameters
         ----------
-        edge : str
+        edge : str or list of str
             name of the edge
-        position : float
+        position : float or array_like
             relative position on the edge
 
         Returns
         -------
-        float
+        float or np.ndarray
             position with respect to some global reference
         """
+        self._edgestarts_arrays()
+
+        if isinstance(edge, (list, np.ndarray)):
+            codes = np.array([self._edge_code(e) for e in edge], dtype=int)
+            offsets, use_position = self._edge_offset_arrays()
+            return np.where(use_position[codes],
+                            offsets[codes] + np.asarray(position, dtype=float),
+                            offsets[codes])
+
+        code = self._edge_code(edge)
+        if self._edge_use_position[code]:
+            return self._edge_offsets[code] + position
+        return self._edge_offsets[code]
+
+    def _resolve_edge_start(self, edge):
+        """Return the absolute start position of an edge.
+
+        This is called by get_x once for every new edge name, and the result
+        is cached until the network is regenerated.
+
+        Parameters
+        ----------
+        edge : str
+            name of the edge
+
+        Returns
+        -------
+        float
+            absolute position of the start of the edge, or -1001 if the edge
+            is unknown
+        bool
+            whether the relative position on the edge should be added to the
+            start position
+        """
         raise NotImplementedError
 
     def next_edge(self, edge, lane):
@@ -203,6 +263,79 @@ class BaseKernelNetwork(object):
         """
         raise NotImplementedError
 
+    def get_route_table(self, edge):
+        """Return the routes starting on an edge and a sampler of their weights.
+
+        The tables are computed once per edge from the routes of the network
+        (see `rts`), and are recomputed if new routes are generated.
+
+        Parameters
+        ----------
+        edge : str
+            name of the edge
+
+        Returns
+        -------
+        flow.core.kernel.network.routing.RouteTable
+            the routes starting on the edge. A route can be drawn in constant
+            time with `sample_route`
+        """
+        self._check_route_cache()
+        try:
+            return self._route_tables[edge]
+        except KeyError:
+            routes = self.rts[edge]
+            table = RouteTable([route for route, _ in routes],
+                               [prob for _, prob in routes])
+            self._route_tables[edge] = table
+            return table
+
+    def get_next_edges(self, edge, lane):
+        """Return the edges reached through every connection of a lane.
+
+        Internal edges (junctions) are traversed through their first
+        connection, so that every element is the first non-internal edge
+        reached through the corresponding element of `next_edge(edge, lane)`.
+
+        Parameters
+        ----------
+        edge : str
+            name of the edge
+        lane : int
+            index of the lane
+
+        Returns
+        -------
+        list of str
+            the next non-internal edges, which may contain duplicates. An
+            element is None if no non-internal edge can be reached through the
+            connection
+        """
+        self._check_route_cache()
+        try:
+            return self._next_edges[edge, lane]
+        except KeyError:
+            next_edges = []
+            for nxt in self.next_edge(edge, lane):
+                visited = set()
+                while nxt[0].startswith(':') and nxt not in visited:
+                    visited.add(nxt)
+                    following = self.next_edge(*nxt)
+                    if len(following) == 0:
+                        break
+                    nxt = following[0]
+                next_edges.append(
+                    None if nxt[0].startswith(':') else nxt[0])
+            self._next_edges[edge, lane] = next_edges
+            return next_edges
+
+    def _check_route_cache(self):
+        """Clear the cached routing data if new routes were generated."""
+        if self._route_cache_rts is not self.rts:
+            self._route_tables = {}
+            self._next_edges = {}
+            self._route_cache_rts = self.rts
+
     ###########################################################################
     #            Methods for generating initial vehicle positions.            #
     ###########################################################################
@@ -306,79 +439,177 @@ class BaseKernelNetwork(object):
             return [], []
 
         increment = available_length / num_vehicles
+        length = self.non_internal_length()
 
         # when consecutive edges do not have the same number of lanes, vehicles
         # are not allowed to be in between edges (as a lane might not exist on
         # the other side)
-        flag = False
         lanes = [self.num_lanes(edge) for edge in self.get_edge_list()]
-        if any(lanes[0] != lanes[i] for i in range(1, len(lanes))):
-            flag = True
+        flag = any(lanes[0] != lanes[i] for i in range(1, len(lanes)))
+
+        # properties of every edge in total_edgestarts: whether it is an
+        # internal edge, and the number of vehicles placed side-by-side on it
+        # (zero for the edges vehicles may not be placed on)
+        starts, edges = self._edgestarts_arrays()
+        internal_edges = dict(self.internal_edgestarts)
+        available_edges = set(available_edges)
+        internal = np.array([edge in internal_edges for edge in edges],
+                            dtype=bool)
+        group_size = np.array(
+            [min(self.num_lanes(edge), lanes_distr)
+             if edge in available_edges else 0 for edge in edges], dtype=int)
 
         x = x0
         car_count = 0
-        startpositions, startlanes = [], []
-
-        # generate uniform starting positions
+        window = 64
+        pos_edges, pos_x, startlanes = [], [], []
+
+        # Vehicles are placed in groups (one vehicle per lane) every
+        # increment + VEHICLE_LENGTH + min_gap meters. Runs of groups are
+        # placed at once, and stop at the first group whose position needs to
+        # be corrected (internal edges, unavailable edges, and vehicles too
+        # close to the start of an edge when the number of lanes varies),
+        # which is then placed by _even_start_group.
         while car_count < num_vehicles:
-            # collect the position and lane number of each new vehicle
-            pos = self.get_edge(x)
-
-            # ensures that vehicles are not placed in an internal junction
-            while pos[0] in dict(self.internal_edgestarts).keys():
-                # find the location of the internal edge in total_edgestarts,
-                # which has the edges ordered by position
-                edges = [tup[0] for tup in self.total_edgestarts]
-                indx_edge = next(
-                    i for i, edge in enumerate(edges) if edge == pos[0])
-
-                # take the next edge in the list, and place the car at the
-                # beginning of this edge
-                if indx_edge == len(edges) - 1:
-                    next_edge_pos = self.total_edgestarts[0]
-                else:
-                    next_edge_pos = self.total_edgestarts[indx_edge + 1]
-
-                x = next_edge_pos[1]
-                pos = (next_edge_pos[0], 0)
-
-            # ensures that you are in an acceptable edge
-            while pos[0] not in available_edges:
-                x = (x + self.edge_length(pos[0])) % self.non_internal_length()
-                pos = self.get_edge(x)
-
-            # ensure that in variable lane settings vehicles always start a
-            # vehicle's length away from the start of the edge. This, however,
-            # prevents the spacing to be completely uniform.
-            if flag and pos[1] < VEHICLE_LENGTH:
-                pos0, pos1 = pos
-                pos = (pos0, VEHICLE_LENGTH)
-                x += VEHICLE_LENGTH
-                increment -= (VEHICLE_LENGTH * self.num_lanes(pos0)) / \
-                             (num_vehicles - car_count)
-
-            # place vehicles side-by-side in all available lanes on this edge
-            for lane in range(min([self.num_lanes(pos[0]), lanes_distr])):
-                car_count += 1
-                startpositions.append(pos)
-                startlanes.append(lane)
-
-                if car_count == num_vehicles:
-                    break
-
-            x = (x + increment + VEHICLE_LENGTH + min_gap) % self.non_internal_length()
+            m = min(window, num_vehicles - car_count)
+
+            # the positions of the next m + 1 groups, accumulated in the same
+            # order (and with the same rounding) as one group at a time
+            steps = np.tile([increment, VEHICLE_LENGTH, min_gap], m)
+            xs = np.add.accumulate(np.concatenate(([x], steps)))[::3]
+
+            # the modulo is only applied when the positions wrap around the
+            # network, after which the run is restarted
+            wrap = np.flatnonzero(xs[1:] >= length)
+            usable = m if len(wrap) == 0 else min(m, wrap[0] + 1)
+
+            idx, pos = self._get_edges(xs[:usable])
+            irregular = internal[idx] | (group_size[idx] == 0)
+            if flag:
+                irregular |= pos < VEHICLE_LENGTH
+            irregular = np.flatnonzero(irregular)
+            num_regular = usable if len(irregular) == 0 else irregular[0]
+
+            # number of groups needed to place the remaining vehicles
+            counts = group_size[idx[:num_regular]]
+            total = np.cumsum(counts)
+            num_groups = np.searchsorted(
+                total, num_vehicles - car_count) + 1
+            num_groups = min(num_groups, num_regular)
+            counts = counts[:num_groups]
+            if num_groups > 0:
+                counts[-1] -= max(
+                    0, car_count + total[num_groups - 1] - num_vehicles)
+
+            pos_edges.append(np.repeat(edges[idx[:num_groups]], counts))
+            pos_x.append(np.repeat(pos[:num_groups], counts))
+            startlanes.append(np.arange(counts.sum()) - np.repeat(
+                np.cumsum(counts) - counts, counts))
+            car_count += counts.sum()
+            if num_groups > 0:
+                x = xs[num_groups] % length
+
+            if car_count == num_vehicles:
+                break
+            elif num_groups == num_regular and num_regular < usable:
+                # the next group needs to be corrected
+                window = 64
+                x, increment, edge, pos, n_group = self._even_start_group(
+                    x, increment, num_vehicles - car_count, flag, min_gap,
+                    lanes_distr, internal, available_edges)
+                pos_edges.append(np.full(n_group, edge, dtype=object))
+                pos_x.append(np.repeat(float(pos), n_group))
+                startlanes.append(np.arange(n_group))
+                car_count += n_group
+            elif num_groups == m:
+                window *= 2
+
+        pos_edges = np.concatenate(pos_edges)
+        pos_x = np.concatenate(pos_x)
+        startlanes = np.concatenate(startlanes).tolist()
 
         # add a perturbation to each vehicle, while not letting the vehicle
         # leave its current edge
         if initial_config.perturbation > 0:
-            for i in range(num_vehicles):
-                perturb = np.random.normal(0, initial_config.perturbation)
-                edge, pos = startpositions[i]
-                pos = max(0, min(self.edge_length(edge), pos + perturb))
-                startpositions[i] = (edge, pos)
+            perturb = np.random.normal(
+                0, initial_config.perturbation, num_vehicles)
+            edge_length = np.array(
+                [self.edge_length(edge) for edge in pos_edges])
+            pos_x = np.maximum(0, np.minimum(edge_length, pos_x + perturb))
+
+        startpositions = list(zip(pos_edges.tolist(), pos_x.tolist()))
 
         return startpositions, startlanes
 
+    def _even_start_group(self, x, increment, num_vehicles, flag, min_gap,
+                          lanes_distr, internal, available_edges):
+        """Place the next group of uniformly spaced vehicles one at a time.
+
+        This is used by gen_even_start_pos for the groups whose position needs
+        to be corrected before the vehicles can be placed.
+
+        Parameters
+        ----------
+        x : float
+            absolute position of the group
+        increment : float
+            free space between consecutive groups
+        num_vehicles : int
+            number of vehicles that remain to be placed
+        flag : bool
+            whether the number of lanes varies between edges
+        min_gap : float
+            minimum gap between vehicles
+        lanes_distr : int
+            number of lanes the vehicles are distributed over
+        internal : array_like of bool
+            whether every edge in total_edgestarts is an internal edge
+        available_edges : set of str
+            edges vehicles may be placed on
+
+        Returns
+        -------
+        float
+            absolute position of the next group
+        float
+            updated free space between consecutive groups
+        str
+            edge of the group
+        float
+            relative position of the group on its edge
+        int
+            number of vehicles in the group
+        """
+        starts, edges = self._edgestarts_arrays()
+        length = self.non_internal_length()
+        i, pos = self._get_edges(x)
+
+        # ensures that vehicles are not placed in an internal junction, by
+        # placing the vehicles at the beginning of the next edge
+        while internal[i]:
+            i = (i + 1) % len(edges)
+            x, pos = starts[i], 0
+
+        # ensures that you are in an acceptable edge
+        while edges[i] not in available_edges:
+            x = (x + self.edge_length(edges[i])) % length
+            i, pos = self._get_edges(x)
+
+        # ensure that in variable lane settings vehicles always start a
+        # vehicle's length away from the start of the edge. This, however,
+        # prevents the spacing to be completely uniform.
+        if flag and pos < VEHICLE_LENGTH:
+            pos = VEHICLE_LENGTH
+            x += VEHICLE_LENGTH
+            increment -= (VEHICLE_LENGTH * self.num_lanes(edges[i])) / \
+                num_vehicles
+
+        # place vehicles side-by-side in all available lanes on this edge
+        n_group = min(self.num_lanes(edges[i]), lanes_distr, num_vehicles)
+        x = (x + increment + VEHICLE_LENGTH + min_gap) % length
+
+        return x, increment, edges[i], pos, n_group
+
     def gen_random_start_pos(self, initial_config, num_vehicles):
         """Generate random starting positions.
 
@@ -430,48 +661,37 @@ class BaseKernelNetwork(object):
         # that is smaller than min_gap
         efs = min_gap + VEHICLE_LENGTH  # extra front space
 
-        for edge in available_edges:
-            available_length -= efs * min([self.num_lanes(edge), lanes_distr])
+        edge_length, num_lanes = self._get_edge_arrays(available_edges)
+        num_lanes = np.minimum(num_lanes, lanes_distr)
+        for lanes in num_lanes.tolist():
+            available_length -= efs * lanes
 
         # choose random positions for each vehicle
-        init_absolute_pos = [random.random() * available_length
-                             for _ in range(num_vehicles)]
+        init_absolute_pos = np.array(
+            [random.random() * available_length for _ in range(num_vehicles)])
         init_absolute_pos.sort()
 
         # these positions do not include the length of the vehicle, which need
         # to be added
-        for i in range(num_vehicles):
-            init_absolute_pos[i] += (VEHICLE_LENGTH + min_gap) * i
-
-        decrement = 0
-        edge_indx = 0
-        startpositions = []
-        startlanes = []
-        for i in range(num_vehicles):
-            edge_i = available_edges[edge_indx]
-            pos_i = (init_absolute_pos[i] - decrement) % (
-                    self.edge_length(edge_i) - efs)
-            lane_i = int(((init_absolute_pos[i] - decrement) - pos_i) /
-                         (self.edge_length(edge_i) - efs))
-
-            pos_i += efs
-
-            while lane_i > min([self.num_lanes(edge_i), lanes_distr]) - 1:
-                decrement += min([self.num_lanes(edge_i), lanes_distr]) \
-                             * (self.edge_length(edge_i) - efs)
-                edge_indx += 1
-
-                edge_i = available_edges[edge_indx]
-                pos_i = (init_absolute_pos[i] - decrement) % (
-                        self.edge_length(edge_i) - efs)
-
-                lane_i = int(((init_absolute_pos[i] - decrement) - pos_i) /
-                             (self.edge_length(edge_i) - efs))
-
-                pos_i += efs
-
-            startpositions.append((edge_i, pos_i))
-            startlanes.append(lane_i)
+        init_absolute_pos += (VEHICLE_LENGTH + min_gap) * np.arange(
+            num_vehicles)
+
+        # the available space on every edge is split into one segment per
+        # lane, and the edges follow each other in the order of
+        # available_edges
+        segment = edge_length - efs
+        edge_end = np.add.accumulate(num_lanes * segment)
+        edge_indx = np.searchsorted(edge_end, init_absolute_pos, side='right')
+        decrement = np.concatenate(([0], edge_end))[edge_indx]
+
+        pos = init_absolute_pos - decrement
+        segment = segment[edge_indx]
+        pos_i = pos % segment
+        startlanes = ((pos - pos_i) / segment).astype(int).tolist()
+        pos_i += efs
+
+        startpositions = list(zip(
+            [available_edges[i] for i in edge_indx.tolist()], pos_i.tolist()))
 
         return startpositions, startlanes
 
@@ -547,13 +767,11 @@ class BaseKernelNetwork(object):
 
         # compute the lanes distribution (adjust of edge cases)
         if initial_config.edges_distribution == 'all':
-            max_lane = max(
-                [self.num_lanes(edge_id) for edge_id in self.get_edge_list()])
+            edges = self.get_edge_list()
         else:
-            max_lane = max([
-                self.num_lanes(edge_id)
-                for edge_id in initial_config.edges_distribution
-            ])
+            edges = initial_config.edges_distribution
+        edge_length, num_lanes = self._get_edge_arrays(edges)
+        max_lane = int(num_lanes.max())
 
         if initial_config.lanes_distribution > max_lane:
             lanes_distribution = max_lane
@@ -563,27 +781,12 @@ class BaseKernelNetwork(object):
         else:
             lanes_distribution = initial_config.lanes_distribution
 
-        if initial_config.edges_distribution == 'all':
-            distribution_length = \
-                sum(self.edge_length(edge_id) *
-                    min([self.num_lanes(edge_id), lanes_distribution])
-                    for edge_id in self.get_edge_list()
-                    if self.edge_length(edge_id) > min_gap + VEHICLE_LENGTH)
-        else:
-            distribution_length = \
-                sum(self.edge_length(edge_id) *
-                    min(self.num_lanes(edge_id), lanes_distribution)
-                    for edge_id in initial_config.edges_distribution
-                    if self.edge_length(edge_id) > min_gap + VEHICLE_LENGTH)
-
-        if initial_config.edges_distribution == 'all':
-            available_edges = [
-                edge for edge in self.get_edge_list()
-                if self.edge_length(edge) > min_gap + VEHICLE_LENGTH]
-        else:
-            available_edges = [
-                edge for edge in initial_config.edges_distribution
-                if self.edge_length(edge) > min_gap + VEHICLE_LENGTH]
+        available = edge_length > min_gap + VEHICLE_LENGTH
+        distribution_length = sum((
+            edge_length[available] *
+            np.minimum(num_lanes[available], lanes_distribution)).tolist())
+        available_edges = [
+            edge for edge, keep in zip(edges, available.tolist()) if keep]
 
         available_length = \
             distribution_length - lanes_distribution * bunching - \
@@ -595,3 +798,120 @@ class BaseKernelNetwork(object):
 
         return (initial_config.x0, min_gap, bunching, lanes_distribution,
                 available_length, available_edges, initial_config)
+
+    def _get_edge_arrays(self, edges):
+        """Return the lengths and number of lanes of a list of edges.
+
+        Parameters
+        ----------
+        edges : list of str
+            names of the edges
+
+        Returns
+        -------
+        np.ndarray
+            length of every edge, in meters
+        np.ndarray
+            number of lanes of every edge
+        """
+        edge_length = np.array(
+            [self.edge_length(edge) for edge in edges], dtype=float)
+        num_lanes = np.array(
+            [self.num_lanes(edge) for edge in edges], dtype=int)
+        return edge_length, num_lanes
+
+    def _edgestarts_arrays(self):
+        """Return the start positions and names of all edges as arrays.
+
+        The arrays are ordered by start position, similar to
+        ``total_edgestarts``, and are recomputed whenever a new list of edge
+        starts is generated for the network.
+
+        Returns
+        -------
+        np.ndarray
+            absolute start position of every edge, in meters
+        np.ndarray
+            name of every edge (of dtype object)
+        """
+        if self._edgestarts_cache is None or \
+                self._edgestarts_cache[0] is not self.total_edgestarts:
+            edges = np.empty(len(self.total_edgestarts), dtype=object)
+            edges[:] = [edge for edge, _ in self.total_edgestarts]
+            starts = np.array(
+                [start for _, start in self.total_edgestarts], dtype=float)
+            self._edgestarts_cache = (self.total_edgestarts, starts, edges)
+
+            # the start positions of the edges need to be resolved again
+            self._edge_codes = {}
+            self._edge_offsets = []
+            self._edge_use_position = []
+            self._edge_offset_cache = None
+
+        return self._edgestarts_cache[1:]
+
+    def _edge_code(self, edge):
+        """Return the integer code of an edge.
+
+        New edges are assigned the next code, and their start position is
+        resolved with _resolve_edge_start.
+
+        Parameters
+        ----------
+        edge : str
+            name of the edge
+
+        Returns
+        -------
+        int
+            index of the edge in the cached start positions
+        """
+        try:
+            return self._edge_codes[edge]
+        except KeyError:
+            offset, use_position = self._resolve_edge_start(edge)
+            code = len(self._edge_offsets)
+            self._edge_codes[edge] = code
+            self._edge_offsets.append(offset)
+            self._edge_use_position.append(use_position)
+            return code
+
+    def _edge_offset_arrays(self):
+        """Return the start positions of all edge codes as arrays.
+
+        Returns
+        -------
+        np.ndarray
+            absolute start position of every code
+        np.ndarray
+            whether the relative position is added to the start position
+        """
+        if self._edge_offset_cache is None or \
+                len(self._edge_offset_cache[0]) != len(self._edge_offsets):
+            self._edge_offset_cache = (
+                np.array(self._edge_offsets, dtype=float),
+                np.array(self._edge_use_position, dtype=bool))
+
+        return self._edge_offset_cache
+
+    def _get_edges(self, x):
+        """Compute the edges and relative positions of absolute positions.
+
+        This is a vectorized equivalent of get_edge, which uses a binary search
+        over the edge start positions.
+
+        Parameters
+        ----------
+        x : float or array_like
+            absolute positions in the network
+
+        Returns
+        -------
+        int or np.ndarray
+            index of the edge of every position in ``total_edgestarts``
+        float or np.ndarray
+            relative position on the edge
+        """
+        starts, _ = self._edgestarts_arrays()
+        idx = np.searchsorted(starts, x, side='right') - 1
+        return idx, x - starts[idx]
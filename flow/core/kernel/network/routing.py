@@ -0,0 +1,104 @@
+"""Data structures used by the network kernels to choose vehicle routes."""
+
+import numpy as np
+
+
+class AliasSampler(object):
+    """Sample indices from a discrete distribution in constant time.
+
+    The sampler is built with Vose's alias method: every index i is assigned
+    a probability prob[i] and an alternative index alias[i], such that an
+    index can be drawn with a single uniform sample u by picking
+    i = floor(n * u), and returning i with probability prob[i] and alias[i]
+    otherwise.
+
+    Parameters
+    ----------
+    weights : array_like
+        non-negative weights of the indices. They do not need to be
+        normalized.
+    """
+
+    def __init__(self, weights):
+        """Instantiate the sampler."""
+        weights = np.asarray(weights, dtype=float)
+        if weights.ndim != 1 or len(weights) == 0:
+            raise ValueError('weights must be a non-empty 1-D array')
+        if np.any(weights < 0) or weights.sum() <= 0:
+            raise ValueError('weights must be non-negative with a positive '
+                             'sum')
+
+        n = len(weights)
+        scaled = weights * n / weights.sum()
+        prob = np.ones(n)
+        alias = np.arange(n)
+
+        small = [i for i in range(n) if scaled[i] < 1]
+        large = [i for i in range(n) if scaled[i] >= 1]
+        while small and large:
+            i = small.pop()
+            j = large.pop()
+            prob[i] = scaled[i]
+            alias[i] = j
+            scaled[j] -= 1 - scaled[i]
+            if scaled[j] < 1:
+                small.append(j)
+            else:
+                large.append(j)
+        # the remaining indices are only left over due to round-off errors,
+        # and are always picked
+
+        self.num_choices = n
+        # python lists are faster to index than arrays for single samples
+        self._prob = prob.tolist()
+        self._alias = alias.tolist()
+
+    def sample(self):
+        """Return an index sampled from the distribution.
+
+        A single uniform sample is drawn from np.random, as is the case for
+        np.random.choice, so the state of the generator after a sample does
+        not depend on the number of choices.
+
+        Returns
+        -------
+        int
+            the sampled index
+        """
+        x = np.random.random_sample() * self.num_choices
+        i = int(x)
+        return i if x - i < self._prob[i] else self._alias[i]
+
+
+class RouteTable(object):
+    """Weighted routes starting on an edge.
+
+    Attributes
+    ----------
+    routes : list of list of str
+        the routes starting on the edge
+    weights : np.ndarray
+        probability of every route, normalized to sum to 1
+    """
+
+    def __init__(self, routes, weights):
+        """Instantiate the route table.
+
+        Parameters
+        ----------
+        routes : list of list of str
+            the routes starting on the edge
+        weights : array_like
+            weight of every route
+        """
+        self.routes = routes
+        self.weights = np.asarray(weights, dtype=float) / np.sum(weights)
+        self._sampler = AliasSampler(weights)
+
+    def sample(self):
+        """Return the index of a route sampled according to its weight."""
+        return self._sampler.sample()
+
+    def sample_route(self):
+        """Return a route sampled according to its weight."""
+        return self.routes[self._sampler.sample()]
@@ -1,8 +1,9 @@
 """Script containing the TraCI network kernel class."""
+import itertools
 import tempfile
 
 from flow.core.kernel.network import BaseKernelNetwork
-from flow.core.util import makexml, printxml, ensure_dir
+from flow.core.util import makexml, printxml, writexml, ensure_dir
 import time
 import os
 import subprocess
@@ -127,12 +128,11 @@ class TraCIKernelNetwork(BaseKernelNetwork):
         else:
             # combine all connections into a list
             if network.connections is not None:
-                if isinstance(network.connections, list):
-                    connections = network.connections
+                if isinstance(network.connections, dict):
+                    connections = itertools.chain.from_iterable(
+                        network.connections.values())
                 else:
-                    connections = []
-                    for key in network.connections.keys():
-                        connections.extend(network.connections[key])
+                    connections = network.connections
             else:
                 connections = None
 
@@ -243,29 +243,23 @@ class TraCIKernelNetwork(BaseKernelNetwork):
                 # neither is the type file
                 continue
 
-    def get_edge(self, x):
-        """See parent class."""
-        for (edge, start_pos) in reversed(self.total_edgestarts):
-            if x >= start_pos:
-                return edge, x - start_pos
-
-    def get_x(self, edge, position):
+    def _resolve_edge_start(self, edge):
         """See parent class."""
         # if there was a collision which caused the vehicle to disappear,
         # return an x value of -1001
         if len(edge) == 0:
-            return -1001
+            return -1001, False
 
         if edge[0] == ':':
             try:
-                return self.internal_edgestarts_dict[edge] + position
+                return self.internal_edgestarts_dict[edge], True
             except KeyError:
                 # in case several internal links are being generalized for
                 # by a single element (for backwards compatibility)
                 edge_name = edge.rsplit('_', 1)[0]
-                return self.total_edgestarts_dict.get(edge_name, -1001)
+                return self.total_edgestarts_dict.get(edge_name, -1001), False
         else:
-            return self.total_edgestarts_dict[edge] + position
+            return self.total_edgestarts_dict[edge], True
 
     def edge_length(self, edge_id):
         """See parent class."""
@@ -405,82 +399,88 @@ class TraCIKernelNetwork(BaseKernelNetwork):
                 from the arriving edge/lane pairs
         """
         # add traffic lights to the nodes
-        tl_ids = list(traffic_lights.get_properties().keys())
-        for n_id in tl_ids:
-            indx = next(i for i, nd in enumerate(nodes) if nd['id'] == n_id)
-            nodes[indx]['type'] = 'traffic_light'
-
-        # for nodes that have traffic lights that haven't been added
-        for node in nodes:
-            if node['id'] not in tl_ids \
-                    and node.get('type', None) == 'traffic_light':
-                traffic_lights.add(node['id'])
-
-            # modify the x and y values to be strings
-            node['x'] = str(node['x'])
-            node['y'] = str(node['y'])
-            if 'radius' in node:
-                node['radius'] = str(node['radius'])
+        tl_ids = set(traffic_lights.get_properties().keys())
+
+        def node_elements():
+            for node in nodes:
+                if node['id'] in tl_ids:
+                    node['type'] = 'traffic_light'
+                # for nodes that have traffic lights that haven't been added
+                elif node.get('type', None) == 'traffic_light':
+                    traffic_lights.add(node['id'])
+
+                # modify the x and y values to be strings
+                node['x'] = str(node['x'])
+                node['y'] = str(node['y'])
+                if 'radius' in node:
+                    node['radius'] = str(node['radius'])
+
+                yield E('node', **node)
 
         # xml file for nodes; contains nodes for the boundary points with
         # respect to the x and y axes
-        x = makexml('nodes', 'http://sumo.dlr.de/xsd/nodes_file.xsd')
-        for node_attributes in nodes:
-            x.append(E('node', **node_attributes))
-        printxml(x, self.net_path + self.nodfn)
-
-        # modify the length, shape, numLanes, and speed values
-        for edge in edges:
-            edge['length'] = str(edge['length'])
-            if 'priority' in edge:
-                edge['priority'] = str(edge['priority'])
-            if 'shape' in edge:
-                if not isinstance(edge['shape'], str):
-                    edge['shape'] = ' '.join('%.2f,%.2f' % (x, y)
-                                             for x, y in edge['shape'])
-            if 'numLanes' in edge:
-                edge['numLanes'] = str(edge['numLanes'])
-            if 'speed' in edge:
-                edge['speed'] = str(edge['speed'])
+        writexml(self.net_path + self.nodfn,
+                 'nodes', 'http://sumo.dlr.de/xsd/nodes_file.xsd',
+                 node_elements())
+
+        def edge_elements():
+            for edge in edges:
+                # modify the length, shape, numLanes, and speed values
+                edge['length'] = str(edge['length'])
+                if 'priority' in edge:
+                    edge['priority'] = str(edge['priority'])
+                if 'shape' in edge:
+                    if not isinstance(edge['shape'], str):
+                        edge['shape'] = ' '.join('%.2f,%.2f' % (x, y)
+                                                 for x, y in edge['shape'])
+                if 'numLanes' in edge:
+                    edge['numLanes'] = str(edge['numLanes'])
+                if 'speed' in edge:
+                    edge['speed'] = str(edge['speed'])
+
+                yield E('edge', attrib=edge)
 
         # xml file for edges
-        x = makexml('edges', 'http://sumo.dlr.de/xsd/edges_file.xsd')
-        for edge_attributes in edges:
-            x.append(E('edge', attrib=edge_attributes))
-        printxml(x, self.net_path + self.edgfn)
+        writexml(self.net_path + self.edgfn,
+                 'edges', 'http://sumo.dlr.de/xsd/edges_file.xsd',
+                 edge_elements())
 
         # xml file for types: contains the the number of lanes and the speed
         # limit for the lanes
         if types is not None:
-            # modify the numLanes and speed values
-            for typ in types:
-                if 'numLanes' in typ:
-                    typ['numLanes'] = str(typ['numLanes'])
-                if 'speed' in typ:
-                    typ['speed'] = str(typ['speed'])
-
-            x = makexml('types', 'http://sumo.dlr.de/xsd/types_file.xsd')
-            for type_attributes in types:
-                x.append(E('type', **type_attributes))
-            printxml(x, self.net_path + self.typfn)
+            def type_elements():
+                for typ in types:
+                    # modify the numLanes and speed values
+                    if 'numLanes' in typ:
+                        typ['numLanes'] = str(typ['numLanes'])
+                    if 'speed' in typ:
+                        typ['speed'] = str(typ['speed'])
+
+                    yield E('type', **typ)
+
+            writexml(self.net_path + self.typfn,
+                     'types', 'http://sumo.dlr.de/xsd/types_file.xsd',
+                     type_elements())
 
         # xml for connections: specifies which lanes connect to which in the
         # edges
         if connections is not None:
-            # modify the fromLane and toLane values
-            for connection in connections:
-                if 'fromLane' in connection:
-                    connection['fromLane'] = str(connection['fromLane'])
-                if 'toLane' in connection:
-                    connection['toLane'] = str(connection['toLane'])
-
-            x = makexml('connections',
-                        'http://sumo.dlr.de/xsd/connections_file.xsd')
-            for connection_attributes in connections:
-                if 'signal_group' in connection_attributes:
-                    del connection_attributes['signal_group']
-                x.append(E('connection', **connection_attributes))
-            printxml(x, self.net_path + self.confn)
+            def connection_elements():
+                for connection in connections:
+                    # modify the fromLane and toLane values
+                    if 'fromLane' in connection:
+                        connection['fromLane'] = str(connection['fromLane'])
+                    if 'toLane' in connection:
+                        connection['toLane'] = str(connection['toLane'])
+                    if 'signal_group' in connection:
+                        del connection['signal_group']
+
+                    yield E('connection', **connection)
+
+            writexml(self.net_path + self.confn,
+                     'connections',
+                     'http://sumo.dlr.de/xsd/connections_file.xsd',
+                     connection_elements())
 
         # xml file for configuration, which specifies:
         # - the location of all files of interest for sumo
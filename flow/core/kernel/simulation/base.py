@@ -56,6 +56,29 @@ class KernelSimulation(object):
         """
         raise NotImplementedError
 
+    def save_state(self, filename):
+        """Save the state of the simulation to a file.
+
+        Parameters
+        ----------
+        filename : str
+            path to the state file
+        """
+        raise NotImplementedError
+
+    def load_state(self, filename):
+        """Load the state of the simulation from a file.
+
+        The simulation must have been started with the same network as when
+        the state was saved.
+
+        Parameters
+        ----------
+        filename : str
+            path to the state file
+        """
+        raise NotImplementedError
+
     def update(self, reset):
         """Update the internal attributes of the simulation kernel.
 
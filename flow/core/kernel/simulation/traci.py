@@ -73,7 +73,10 @@ class TraCISimulation(KernelSimulation):
         Also initializes subscriptions.
         """
         KernelSimulation.pass_api(self, kernel_api)
+        self._subscribe()
 
+    def _subscribe(self):
+        """Subscribe to the simulation variables used by the kernels."""
         # subscribe some simulation parameters needed to check for entering,
         # exiting, and colliding vehicles
         self.kernel_api.simulation.subscribe([
@@ -91,6 +94,19 @@ class TraCISimulation(KernelSimulation):
         """See parent class."""
         self.kernel_api.simulationStep()
 
+    def save_state(self, filename):
+        """See parent class."""
+        self.kernel_api.simulation.saveState(filename)
+
+    def load_state(self, filename):
+        """See parent class.
+
+        Loading a state drops all subscriptions, so the simulation variables
+        are subscribed again.
+        """
+        self.kernel_api.simulation.loadState(filename)
+        self._subscribe()
+
     def update(self, reset):
         """See parent class."""
         if reset:
@@ -98,49 +114,67 @@ class TraCISimulation(KernelSimulation):
         else:
             self.time += self.sim_step
 
-        # Collect the additional data to store in the emission file.
+        # Collect the additional data to store in the emission file. With the
+        # asynchronous pipeline, this is done from a snapshot of the kernel
+        # while the next simulation steps are performed.
         if self.emission_path is not None:
-            kv = self.master_kernel.vehicle
-            for veh_id in self.master_kernel.vehicle.get_ids():
-                t = round(self.time, 2)
-
-                # some miscellaneous pre-processing
-                position = kv.get_2d_position(veh_id)
-
-                # Make sure dictionaries corresponding to the vehicle and
-                # time are available.
-                if veh_id not in self.stored_data.keys():
-                    self.stored_data[veh_id] = dict()
-                if t not in self.stored_data[veh_id].keys():
-                    self.stored_data[veh_id][t] = dict()
-
-                # Add the speed, position, and lane data.
-                self.stored_data[veh_id][t].update({
-                    "speed": kv.get_speed(veh_id),
-                    "lane_number": kv.get_lane(veh_id),
-                    "edge_id": kv.get_edge(veh_id),
-                    "relative_position": kv.get_position(veh_id),
-                    "x": position[0],
-                    "y": position[1],
-                    "headway": kv.get_headway(veh_id),
-                    "leader_id": kv.get_leader(veh_id),
-                    "follower_id": kv.get_follower(veh_id),
-                    "leader_rel_speed":
-                        kv.get_speed(kv.get_leader(veh_id))
-                        - kv.get_speed(veh_id),
-                    "target_accel_with_noise_with_failsafe":
-                        kv.get_accel(veh_id, noise=True, failsafe=True),
-                    "target_accel_no_noise_no_failsafe":
-                        kv.get_accel(veh_id, noise=False, failsafe=False),
-                    "target_accel_with_noise_no_failsafe":
-                        kv.get_accel(veh_id, noise=True, failsafe=False),
-                    "target_accel_no_noise_with_failsafe":
-                        kv.get_accel(veh_id, noise=False, failsafe=True),
-                    "realized_accel":
-                        kv.get_realized_accel(veh_id),
-                    "road_grade": kv.get_road_grade(veh_id),
-                    "distance": kv.get_distance(veh_id),
-                })
+            pipeline = self.master_kernel.pipeline
+            if pipeline.enabled:
+                pipeline.submit(self._store_data,
+                                self.master_kernel.snapshot().vehicle,
+                                self.time)
+            else:
+                self._store_data(self.master_kernel.vehicle, self.time)
+
+    def _store_data(self, kv, time):
+        """Store the emission data of the vehicles at a simulation step.
+
+        Parameters
+        ----------
+        kv : flow.core.kernel.vehicle.KernelVehicle
+            the vehicle kernel, or a snapshot of it, at the simulation step
+        time : float
+            simulation time of the step
+        """
+        t = round(time, 2)
+        for veh_id in kv.get_ids():
+            # some miscellaneous pre-processing
+            position = kv.get_2d_position(veh_id)
+
+            # Make sure dictionaries corresponding to the vehicle and
+            # time are available.
+            if veh_id not in self.stored_data.keys():
+                self.stored_data[veh_id] = dict()
+            if t not in self.stored_data[veh_id].keys():
+                self.stored_data[veh_id][t] = dict()
+
+            # Add the speed, position, and lane data.
+            self.stored_data[veh_id][t].update({
+                "speed": kv.get_speed(veh_id),
+                "lane_number": kv.get_lane(veh_id),
+                "edge_id": kv.get_edge(veh_id),
+                "relative_position": kv.get_position(veh_id),
+                "x": position[0],
+                "y": position[1],
+                "headway": kv.get_headway(veh_id),
+                "leader_id": kv.get_leader(veh_id),
+                "follower_id": kv.get_follower(veh_id),
+                "leader_rel_speed":
+                    kv.get_speed(kv.get_leader(veh_id))
+                    - kv.get_speed(veh_id),
+                "target_accel_with_noise_with_failsafe":
+                    kv.get_accel(veh_id, noise=True, failsafe=True),
+                "target_accel_no_noise_no_failsafe":
+                    kv.get_accel(veh_id, noise=False, failsafe=False),
+                "target_accel_with_noise_no_failsafe":
+                    kv.get_accel(veh_id, noise=True, failsafe=False),
+                "target_accel_no_noise_with_failsafe":
+                    kv.get_accel(veh_id, noise=False, failsafe=True),
+                "realized_accel":
+                    kv.get_realized_accel(veh_id),
+                "road_grade": kv.get_road_grade(veh_id),
+                "distance": kv.get_distance(veh_id),
+            })
 
     def close(self):
         """See parent class."""
@@ -277,6 +311,9 @@ class TraCISimulation(KernelSimulation):
             the rollout number, appended to the name of the emission file. Used
             to store emission files from multiple rollouts run sequentially.
         """
+        # Wait for the emission data of the last steps to be stored.
+        self.master_kernel.pipeline.flush()
+
         # If there is no stored data, ignore this operation. This is to ensure
         # that data isn't deleted if the operation is called twice.
         if len(self.stored_data) == 0:
@@ -64,6 +64,29 @@ class KernelTrafficLight(object):
         """
         raise NotImplementedError
 
+    def save_state(self):
+        """Return a snapshot of the current state of the kernel.
+
+        Returns
+        -------
+        dict
+            snapshot that can be passed to load_state
+        """
+        raise NotImplementedError
+
+    def load_state(self, state):
+        """Restore the kernel to a state saved with the simulator state.
+
+        This is called after the state of the simulator was loaded from a
+        file (see flow.core.kernel.Kernel.load_state).
+
+        Parameters
+        ----------
+        state : dict
+            snapshot returned by save_state
+        """
+        raise NotImplementedError
+
     def get_ids(self):
         """Return the names of all nodes with traffic lights."""
         raise NotImplementedError
@@ -83,6 +106,19 @@ class KernelTrafficLight(object):
         """
         raise NotImplementedError
 
+    def set_states(self, node_ids, states):
+        """Set the states of the traffic lights on several nodes.
+
+        Parameters
+        ----------
+        node_ids : list of str
+            names of the nodes with the controlled traffic lights
+        states : list of str
+            desired state of the traffic lights of every node
+        """
+        for node_id, state in zip(node_ids, states):
+            self.set_state(node_id, state)
+
     def get_state(self, node_id):
         """Return the state of the traffic light(s) at the specified node.
 
@@ -98,3 +134,15 @@ class KernelTrafficLight(object):
             Element = state of the traffic light at that node/lane
         """
         raise NotImplementedError
+
+    def get_states(self):
+        """Return the states of the traffic lights of all nodes.
+
+        Returns
+        -------
+        np.ndarray
+            matrix of states, with one row per node (in the order of
+            `get_ids()`) and one character per link. Nodes with fewer links are
+            padded with empty characters.
+        """
+        raise NotImplementedError
@@ -1,5 +1,7 @@
 """Script containing the TraCI traffic light kernel class."""
 
+import numpy as np
+
 from flow.core.kernel.traffic_light import KernelTrafficLight
 import traci.constants as tc
 
@@ -30,6 +32,17 @@ class TraCITrafficLight(KernelTrafficLight):
         # number of traffic light nodes
         self.num_traffic_lights = 0
 
+        # states of the lights of all nodes, one row per node (in the order of
+        # get_ids) and one character per link. This holds the last observed
+        # state of every node, or the last state that was set if it was
+        # changed since.
+        self._states = np.zeros((0, 0), dtype='<U1')
+        self._rows = {}
+        # whether the state of every node was set by the kernel. The states
+        # of these nodes are held by sumo until they are set again, so setting
+        # an unchanged state can be skipped.
+        self._controlled = np.zeros(0, dtype=bool)
+
     def pass_api(self, kernel_api):
         """See parent class.
 
@@ -43,34 +56,138 @@ class TraCITrafficLight(KernelTrafficLight):
         # number of traffic light nodes
         self.num_traffic_lights = len(self.__ids)
 
+        self.__tls = dict()
+        self._states = np.zeros((self.num_traffic_lights, 0), dtype='<U1')
+        self._rows = {node_id: i for i, node_id in enumerate(self.__ids)}
+        self._controlled = np.zeros(self.num_traffic_lights, dtype=bool)
+
+        self._subscribe()
+
+    def _subscribe(self):
+        """Subscribe to the states of all traffic lights."""
         # subscribe the traffic light signal data
         for node_id in self.__ids:
             self.kernel_api.trafficlight.subscribe(
                 node_id, [tc.TL_RED_YELLOW_GREEN_STATE])
 
+    def save_state(self):
+        """See parent class."""
+        return {
+            'tls': dict(self.__tls),
+            'states': self._states.copy(),
+        }
+
+    def load_state(self, state):
+        """See parent class.
+
+        The states set by the kernel are not assumed to be held by sumo
+        anymore, so they are sent again the next time they are set.
+        """
+        self.__tls = dict(state['tls'])
+        self._states = state['states'].copy()
+        self._controlled[:] = False
+        self._subscribe()
+
     def update(self, reset):
         """See parent class."""
-        tls_obs = {}
-        for tl_id in self.__ids:
-            tls_obs[tl_id] = \
-                self.kernel_api.trafficlight.getSubscriptionResults(tl_id)
-        self.__tls = tls_obs.copy()
+        # collect the subscription results of all nodes at once
+        tls_obs = self.kernel_api.trafficlight.getAllSubscriptionResults() \
+            or {}
+        prev_tls = self.__tls
+        self.__tls = {tl_id: tls_obs.get(tl_id) for tl_id in self.__ids}
+
+        # only the rows of the nodes whose state changed are updated
+        changed = [tl_id for tl_id in self.__ids
+                   if self.__tls[tl_id] != prev_tls.get(tl_id)
+                   and self.__tls[tl_id] is not None]
+        if changed:
+            self._set_rows(changed, [
+                self.__tls[tl_id][tc.TL_RED_YELLOW_GREEN_STATE]
+                for tl_id in changed])
 
     def get_ids(self):
         """See parent class."""
         return self.__ids
 
     def set_state(self, node_id, state, link_index="all"):
-        """See parent class."""
+        """See parent class.
+
+        The state is only sent to sumo if it differs from the current state of
+        the lights.
+        """
         if link_index == "all":
             # if lights on all lanes are changed
+            self.set_states([node_id], [state])
+            return
+
+        # if lights on a single lane is changed
+        row = self._rows.get(node_id)
+        if row is not None and self._controlled[row] \
+                and link_index < self._states.shape[1] \
+                and self._states[row, link_index] == state:
+            return
+
+        self.kernel_api.trafficlight.setLinkState(
+            tlsID=node_id, tlsLinkIndex=link_index, state=state)
+
+        if row is not None:
+            self._widen(link_index + 1)
+            self._states[row, link_index] = state
+            self._controlled[row] = True
+
+    def set_states(self, node_ids, states):
+        """See parent class.
+
+        The states are compared to the current states of the lights in bulk,
+        and only the nodes whose state changed are sent to sumo.
+        """
+        rows = [self._rows.get(node_id) for node_id in node_ids]
+        if any(row is None for row in rows):
+            # nodes that are not known to the kernel are always set
+            for node_id, state in zip(node_ids, states):
+                self.kernel_api.trafficlight.setRedYellowGreenState(
+                    tlsID=node_id, state=state)
+            return
+
+        self._widen(max([0] + [len(state) for state in states]))
+        new_states = self._to_matrix(states)
+        changed = ~self._controlled[rows] | \
+            np.any(self._states[rows] != new_states, axis=1)
+        for i in np.flatnonzero(changed):
             self.kernel_api.trafficlight.setRedYellowGreenState(
-                tlsID=node_id, state=state)
-        else:
-            # if lights on a single lane is changed
-            self.kernel_api.trafficlight.setLinkState(
-                tlsID=node_id, tlsLinkIndex=link_index, state=state)
+                tlsID=node_ids[i], state=states[i])
+
+        self._states[rows] = new_states
+        self._controlled[rows] = True
 
     def get_state(self, node_id):
         """See parent class."""
         return self.__tls[node_id][tc.TL_RED_YELLOW_GREEN_STATE]
+
+    def get_states(self):
+        """See parent class."""
+        return self._states.copy()
+
+    def _set_rows(self, node_ids, states):
+        """Store the states of some nodes in the matrix of states."""
+        self._widen(max(len(state) for state in states))
+        self._states[[self._rows[node_id] for node_id in node_ids]] = \
+            self._to_matrix(states)
+
+    def _widen(self, width):
+        """Add columns to the matrix of states to hold width links."""
+        if width > self._states.shape[1]:
+            states = np.zeros((self._states.shape[0], width), dtype='<U1')
+            states[:, :self._states.shape[1]] = self._states
+            self._states = states
+
+    def _to_matrix(self, states):
+        """Convert state strings to rows of the matrix of states.
+
+        States shorter than the width of the matrix are padded with empty
+        characters.
+        """
+        matrix = np.zeros((len(states), self._states.shape[1]), dtype='<U1')
+        for i, state in enumerate(states):
+            matrix[i, :len(state)] = list(state)
+        return matrix
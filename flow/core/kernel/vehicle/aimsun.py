@@ -2,10 +2,11 @@
 from flow.core.kernel.vehicle.base import KernelVehicle
 import collections
 import numpy as np
-from flow.utils.aimsun.struct import InfVeh
 from flow.controllers.car_following_models import SimCarFollowingController
 from flow.controllers.rlcontroller import RLController
 from flow.controllers.lane_change_controllers import SimLaneChangeController
+from flow.controllers.base_routing_controller import TRIGGER_STEP
+from flow.utils.aimsun.protocol import INFOS_ATTR_BY_INDEX
 
 # import time
 
@@ -14,15 +15,6 @@ WHITE = (255, 255, 255)
 CYAN = (0, 255, 255)
 RED = (255, 0, 0)
 
-# this is used when identifying if a specific object is tracked
-INFOS_ATTR_BY_INDEX = [
-    'CurrentPos', 'distance2End', 'xCurrentPos', 'yCurrentPos', 'zCurrentPos',
-    'xCurrentPosBack', 'yCurrentPosBack', 'zCurrentPosBack', 'CurrentSpeed',
-    'TotalDistance', 'SectionEntranceT', 'CurrentStopTime', 'stopped',
-    'idSection', 'segment', 'numberLane', 'idJunction', 'idSectionFrom',
-    'idLaneFrom', 'idSectionTo', 'idLaneTo'
-]
-
 
 class AimsunKernelVehicle(KernelVehicle):
     """Aimsun vehicle kernel.
@@ -42,6 +34,12 @@ class AimsunKernelVehicle(KernelVehicle):
         self.__controlled_lc_ids = []  # ids of flow lc-controlled vehicles
         self.__rl_ids = []  # ids of rl-controlled vehicles
         self.__observed_ids = []  # ids of the observed vehicles
+        self._routed_ids = []  # ids of the vehicles with a routing controller
+
+        # edge, lane and last edge of the route of the vehicles with a routing
+        # controller at the last update, used to find the routers that may be
+        # triggered
+        self._routing_states = {}
 
         # vehicles: Key = Vehicle ID, Value = Dictionary describing the vehicle
         # Ordered dictionary used to keep neural net inputs in order
@@ -98,6 +96,21 @@ class AimsunKernelVehicle(KernelVehicle):
         # FIXME lots of these used in simulation/aimsun.py, used when
         # we want to store the values in an emission file (necessary?)
 
+        # tracking info of the leaders of tracked vehicles, used to compute
+        # the headways when the leaders are not tracked themselves
+        self.leader_info_bitmap = self.make_bitmap_for_tracking({
+            'CurrentPos', 'distance2End',
+            'idSection', 'idJunction',
+            'idSectionFrom', 'idSectionTo'
+        })
+
+        # tracking info of the tracked vehicles, for every attribute in the
+        # bitmap, and the row of every vehicle in these arrays
+        self._tracking = {}
+        self._tracking_rows = {}
+        # headways of the tracked vehicles, in the same order
+        self._headways = np.zeros(0)
+
     def initialize(self, vehicles):
         """Initialize vehicle state information.
 
@@ -179,10 +192,19 @@ class AimsunKernelVehicle(KernelVehicle):
         arrived_rl_ids = []
 
         # add the new vehicles if they should be tracked
-        for aimsun_id in added_vehicles:
-            veh_type = self.kernel_api.get_vehicle_type_name(aimsun_id)
+        type_names = self.kernel_api.get_vehicles_type_name(added_vehicles) \
+            if len(added_vehicles) > 0 else []
+        departed_ids = [aimsun_id for aimsun_id, veh_type
+                        in zip(added_vehicles, type_names)
+                        if veh_type in self.tracked_vehicle_types]
+        if len(departed_ids) > 0:
+            static_infos = dict(zip(
+                departed_ids,
+                self.kernel_api.get_vehicles_static_info(departed_ids)))
+            self.kernel_api.set_vehicles_tracked(departed_ids)
+        for aimsun_id, veh_type in zip(added_vehicles, type_names):
             if veh_type in self.tracked_vehicle_types:
-                self._add_departed(aimsun_id)
+                self._add_departed(aimsun_id, veh_type, static_infos[aimsun_id])
             if aimsun_id in self.get_rl_ids():
                 arrived_rl_ids.append(aimsun_id)
         self._arrived_rl_ids.append(arrived_rl_ids)
@@ -193,113 +215,142 @@ class AimsunKernelVehicle(KernelVehicle):
                 if aimsun_id in self._id_aimsun2flow:
                     self.remove(aimsun_id)
 
-        # start = time.time()
+        self._update_tracking()
+
+        # record the vehicles whose router may be triggered, i.e. whose edge,
+        # lane or route changed (see get_routing_ids)
+        for veh_id in self._routed_ids:
+            route = self.get_route(veh_id)
+            state = (self.get_edge(veh_id), self.get_lane(veh_id),
+                     route[-1] if len(route) > 0 else None)
+            if self.__vehicles[veh_id]["router"].trigger == TRIGGER_STEP \
+                    or state != self._routing_states.get(veh_id):
+                self._routing_states[veh_id] = state
+                self._routing_candidates[veh_id] = None
+
+    def _update_tracking(self):
+        """Update the tracking info, leaders and headways of all vehicles.
+
+        The tracking info and leaders of all tracked vehicles, as well as the
+        tracking info of the leaders that are not tracked, are collected with a
+        single command, and stored as arrays.
+        """
+        veh_ids = list(self.__ids)
+        self._tracking_rows = {veh_id: i for i, veh_id in enumerate(veh_ids)}
+        if len(veh_ids) == 0:
+            self._tracking = {}
+            self._headways = np.zeros(0)
+            return
+
+        self._tracking, lead_ids_aimsun, next_sections, leader_info, \
+            leader_lengths = self.kernel_api.get_tracked_state(
+                [self._id_flow2aimsun[veh_id] for veh_id in veh_ids],
+                self.tracked_info_bitmap, self.leader_info_bitmap)
+        info = self._tracking
+
+        # use the tracking info of the leaders that are tracked themselves
+        lead_rows = np.array([
+            self._tracking_rows.get(self._id_aimsun2flow.get(lead_id), -1)
+            for lead_id in lead_ids_aimsun.tolist()])
+        lead_tracked = lead_rows >= 0
+        rows = np.where(lead_tracked, lead_rows, 0)
+        lengths = np.array([self.__vehicles[veh_id]['static_info'].length
+                            for veh_id in veh_ids], dtype=float)
+        lead_length = np.where(lead_tracked, lengths[rows], leader_lengths)
+        lead_pos, lead_section, lead_junction, lead_section_from = [
+            np.where(lead_tracked, info[attr][rows], leader_info[attr])
+            for attr in ['CurrentPos', 'idSection', 'idJunction',
+                         'idSectionFrom']]
+
+        veh_in_section = info['idSection'] != -1
+        lead_in_section = lead_section != -1
+        # gap when the leader is on the same section or junction
+        gap_same = lead_pos - info['CurrentPos'] - lead_length
+        # gap when the leader is on the next section or junction
+        gap_next = info['distance2End'] + lead_pos - lead_length
+
+        # TODO need to add junction length (we have turning id -> get its
+        # length), and the gaps when the leader is several sections or
+        # junctions ahead (1001 to 1004)
+        headways = np.select([
+            # veh in section and leader in same section
+            veh_in_section & lead_in_section &
+            (lead_section == info['idSection']),
+            # veh in section and leader in next section
+            veh_in_section & lead_in_section & (lead_section == next_sections),
+            veh_in_section & lead_in_section,
+            # veh in section and leader in next junction
+            veh_in_section & (lead_section_from == info['idSection']),
+            veh_in_section,
+            # veh in junction and leader in same junction
+            ~lead_in_section & (info['idJunction'] == lead_junction),
+            ~lead_in_section,
+            # veh in junction and leader in next section
+            lead_section == info['idSectionTo'],
+        ], [gap_same, gap_next, 1001, gap_next, 1002, gap_same, 1003,
+            gap_next], default=1004)
+
+        no_leader = lead_ids_aimsun < -1
+        headways[no_leader] = 1000
+        self._headways = headways
+
+        for i, veh_id in enumerate(veh_ids):
+            if no_leader[i]:
+                self.__vehicles[veh_id]['leader'] = None
+            elif lead_tracked[i]:
+                lead_id = veh_ids[lead_rows[i]]
+                self.__vehicles[veh_id]['leader'] = lead_id
+                self.__vehicles[lead_id]['follower'] = veh_id
+            else:
+                self.__vehicles[veh_id]['leader'] = -1
 
-        for veh_id in self.__ids:
-            aimsun_id = self._id_flow2aimsun[veh_id]
+    def _get_tracking_info(self, veh_id, attr, error):
+        """Return a tracking info attribute from the array-backed state.
 
-            # update the vehicle's tracking information
-            self.__vehicles[veh_id]['tracking_info'] = \
-                self.kernel_api.get_vehicle_tracking_info(
-                    aimsun_id, self.tracked_info_bitmap
-                )
+        Parameters
+        ----------
+        veh_id : str or list of str
+            vehicle id, or list of vehicle ids
+        attr : str
+            name of the attribute (see INFOS_ATTR_BY_INDEX)
+        error : any
+            value that is returned if the vehicle has not been tracked yet
 
-            # get the leader, follower, and headway for each tracked vehicle
-            lead_id_aimsun = self.kernel_api.get_vehicle_leader(aimsun_id)
-            if lead_id_aimsun < -1:
-                self.__vehicles[veh_id]['leader'] = None
-                self.__vehicles[veh_id]['headway'] = 1000
-            else:
-                inf_veh = self.__vehicles[veh_id]['tracking_info']
-
-                if lead_id_aimsun in self._id_aimsun2flow:
-                    lead_id = self._id_aimsun2flow[lead_id_aimsun]
-                    inf_veh_leader = self.__vehicles[lead_id]['tracking_info']
-                    leader_length = self.__vehicles[lead_id]['static_info'].\
-                        length
-                    self.__vehicles[veh_id]['leader'] = lead_id
-                    self.__vehicles[lead_id]['follower'] = veh_id
-                else:
-                    # TODO can be hardcoded when we won't change it anymore
-                    tracked_info_leader = self.make_bitmap_for_tracking({
-                        'CurrentPos', 'distance2End',
-                        'idSection', 'idJunction',
-                        'idSectionFrom', 'idSectionTo'
-                    })
-
-                    inf_veh_leader = self.kernel_api.get_vehicle_tracking_info(
-                        lead_id_aimsun, tracked_info_leader, tracked=False
-                    )
-                    leader_length = self.kernel_api.\
-                        get_vehicle_length(lead_id_aimsun)
-                    self.__vehicles[veh_id]['leader'] = -1
-
-                # FIXME can be simplified
-                if inf_veh.idSection != -1:  # vehicle is in a section
-                    next_section = self.kernel_api.get_next_section(
-                        aimsun_id, inf_veh.idSection)
-                    # leader is in a section
-                    if inf_veh_leader.idSection != -1:
-                        # veh in section and leader in same section
-                        if inf_veh.idSection == inf_veh_leader.idSection:
-                            gap = inf_veh_leader.CurrentPos\
-                                - inf_veh.CurrentPos - leader_length
-                        # veh in section and leader in next section
-                        elif inf_veh_leader.idSection == next_section:
-                            gap = inf_veh.distance2End\
-                                + inf_veh_leader.CurrentPos - leader_length
-                            # TODO need to add junction length (we have
-                            # turning id -> get its length)
-                        # veh in section and leader several sections ahead
-                        else:
-                            # TODO
-                            gap = 1001
-                    else:
-                        # veh in section and leader in next junction
-                        if inf_veh_leader.idSectionFrom == inf_veh.idSection:
-                            gap = inf_veh.distance2End\
-                                + inf_veh_leader.CurrentPos - leader_length
-                        # veh in section and leader several junctions ahead
-                        else:
-                            # TODO
-                            gap = 1002
-                else:
-                    if inf_veh_leader.idSection == -1:
-                        # veh in junction and leader in same junction
-                        if inf_veh.idJunction == inf_veh_leader.idJunction:
-                            gap = inf_veh_leader.CurrentPos\
-                                - inf_veh.CurrentPos - leader_length
-                        # veh in junction and leader in next junction
-                        # veh in junction and leader several junctions ahead
-                        else:
-                            # TODO
-                            gap = 1003
-                    else:
-                        # veh in junction and leader in next section
-                        if inf_veh_leader.idSection == inf_veh.idSectionTo:
-                            gap = inf_veh.distance2End\
-                                + inf_veh_leader.CurrentPos - leader_length
-                        # veh in junction and leader several sections ahead
-                        else:
-                            # TODO
-                            gap = 1004
-
-                self.__vehicles[veh_id]['headway'] = gap
-
-        # end = time.time()
-        # if len(self.__ids) > 0:
-        #     print("update time per tracked vehicle (ms):",
-        #           1000 * (end - start) / len(self.__ids))
-
-    def _add_departed(self, aimsun_id):
-        """See parent class."""
-        # get vehicle information from API
-        static_inf_veh = self.kernel_api.get_vehicle_static_info(aimsun_id)
-
-        # get the vehicle's type
-        type_id = self.kernel_api.get_vehicle_type_name(aimsun_id)
-
-        self.kernel_api.set_vehicle_tracked(aimsun_id)
+        Returns
+        -------
+        any or list of any
+            the value of the attribute, or None if it is not tracked
+        """
+        values = self._tracking.get(attr)
+        if isinstance(veh_id, (list, np.ndarray)):
+            rows = [self._tracking_rows.get(veh, -1) for veh in veh_id]
+            if values is None:
+                return [None if row >= 0 else error for row in rows]
+            result = values[rows].tolist() if len(rows) > 0 else []
+            return [val if row >= 0 else error
+                    for val, row in zip(result, rows)]
+
+        row = self._tracking_rows.get(veh_id)
+        if row is None:
+            return error
+        if values is None:
+            return None
+        return values[row]
+
+    def _add_departed(self, aimsun_id, type_id=None, static_inf_veh=None):
+        """See parent class.
+
+        The type and static info of the vehicle are collected from the API if
+        they are not specified, and the vehicle is set as tracked in that case.
+        """
+        if static_inf_veh is None:
+            # get vehicle information from API
+            static_inf_veh = self.kernel_api.get_vehicle_static_info(aimsun_id)
+            self.kernel_api.set_vehicle_tracked(aimsun_id)
+
+        if type_id is None:
+            # get the vehicle's type
+            type_id = self.kernel_api.get_vehicle_type_name(aimsun_id)
 
         # get the vehicle ID, or create a new vehicle ID if one doesn't exist
         # for the vehicle
@@ -323,9 +374,6 @@ class AimsunKernelVehicle(KernelVehicle):
         self.__vehicles[veh_id]["static_info"] = static_inf_veh
         self.__vehicles[veh_id]["type_name"] = type_id
 
-        # store an empty tracking info object
-        self.__vehicles[veh_id]['tracking_info'] = InfVeh()
-
         if type_id in self.type_parameters:
             # specify the acceleration controller class
             accel_controller = \
@@ -349,6 +397,7 @@ class AimsunKernelVehicle(KernelVehicle):
                 self.__vehicles[veh_id]["router"] = \
                     rt_controller[0](veh_id=veh_id,
                                      router_params=rt_controller[1])
+                self._routed_ids.append(veh_id)
             else:
                 self.__vehicles[veh_id]["router"] = None
 
@@ -394,7 +443,6 @@ class AimsunKernelVehicle(KernelVehicle):
 
         self.__vehicles[veh_id]['static_info'] =\
             self.kernel_api.get_vehicle_static_info(aimsun_id)
-        self.__vehicles[veh_id]['tracking_info'] = InfVeh()
 
         # set the Aimsun/Flow vehicle ID converters
         self._id_aimsun2flow[aimsun_id] = veh_id
@@ -427,6 +475,11 @@ class AimsunKernelVehicle(KernelVehicle):
         self.__ids.remove(veh_id)
         self.num_vehicles -= 1
 
+        if veh_id in self._routed_ids:
+            self._routed_ids.remove(veh_id)
+            self._routing_states.pop(veh_id, None)
+        self._routing_candidates.pop(veh_id, None)
+
         # remove it from all other ids (if it is there)
         if veh_id in self.__human_ids:
             self.__human_ids.remove(veh_id)
@@ -681,8 +734,10 @@ class AimsunKernelVehicle(KernelVehicle):
     def get_speed(self, veh_id, error=-1001):
         """See parent class."""
         if isinstance(veh_id, (list, np.ndarray)):
-            return [self.get_speed(veh, error) for veh in veh_id]
-        return self.__vehicles[veh_id]['tracking_info'].CurrentSpeed / 3.6
+            return [error if speed == error else speed / 3.6 for speed in
+                    self._get_tracking_info(veh_id, 'CurrentSpeed', error)]
+        speed = self._get_tracking_info(veh_id, 'CurrentSpeed', error)
+        return error if speed == error else speed / 3.6
 
     def get_default_speed(self, veh_id, error=-1001):
         """See parent class."""
@@ -690,9 +745,7 @@ class AimsunKernelVehicle(KernelVehicle):
 
     def get_position(self, veh_id, error=-1001):
         """See parent class."""
-        if isinstance(veh_id, (list, np.ndarray)):
-            return [self.get_position(veh, error) for veh in veh_id]
-        return self.__vehicles[veh_id]['tracking_info'].CurrentPos
+        return self._get_tracking_info(veh_id, 'CurrentPos', error)
 
     def get_position_world(self, veh_id, error=-1001):
         """Return the position of the vehicle relative to its current edge.
@@ -715,22 +768,24 @@ class AimsunKernelVehicle(KernelVehicle):
         """
         if isinstance(veh_id, (list, np.ndarray)):
             return [self.get_position_world(veh, error) for veh in veh_id]
-        x_pos = self.__vehicles[veh_id]['tracking_info'].xCurrentPos
-        y_pos = self.__vehicles[veh_id]['tracking_info'].yCurrentPos
-        z_pos = self.__vehicles[veh_id]['tracking_info'].zCurrentPos
-        return [x_pos, y_pos, z_pos]
+        if veh_id not in self._tracking_rows:
+            return error
+        return [self._get_tracking_info(veh_id, attr, error) for attr in
+                ['xCurrentPos', 'yCurrentPos', 'zCurrentPos']]
 
     def get_edge(self, veh_id, error=""):
         """See parent class."""
         if isinstance(veh_id, (list, np.ndarray)):
             return [self.get_edge(veh, error) for veh in veh_id]
-        edge_aimsun_id = self.__vehicles[veh_id]['tracking_info'].idSection
+        if veh_id not in self._tracking_rows:
+            return error
+        edge_aimsun_id = self._get_tracking_info(veh_id, 'idSection', error)
         if edge_aimsun_id < 0:
             # TODO: add from and to lanes in junctions
             from_edge = self.master_kernel.network.flow_edge_name(
-                self.__vehicles[veh_id]['tracking_info'].idSectionFrom)
+                self._get_tracking_info(veh_id, 'idSectionFrom', error))
             to_edge = self.master_kernel.network.flow_edge_name(
-                self.__vehicles[veh_id]['tracking_info'].idSectionTo)
+                self._get_tracking_info(veh_id, 'idSectionTo', error))
             return '{}_to_{}'.format(from_edge, to_edge)
         else:
             return self.master_kernel.network.flow_edge_name(edge_aimsun_id)
@@ -753,20 +808,18 @@ class AimsunKernelVehicle(KernelVehicle):
         if isinstance(veh_id, (list, np.ndarray)):
             return [self.get_angle(veh, error) for veh in veh_id]
 
-        if veh_id not in self.__vehicles:
+        if veh_id not in self._tracking_rows:
             return error
         else:
-            x2 = self.__vehicles[veh_id]['tracking_info'].xCurrentPos
-            y2 = self.__vehicles[veh_id]['tracking_info'].yCurrentPos
-            x1 = self.__vehicles[veh_id]['tracking_info'].xCurrentPosBack
-            y1 = self.__vehicles[veh_id]['tracking_info'].yCurrentPosBack
+            x2, y2, x1, y1 = [
+                self._get_tracking_info(veh_id, attr, error) for attr in
+                ['xCurrentPos', 'yCurrentPos', 'xCurrentPosBack',
+                 'yCurrentPosBack']]
             return np.arctan2(y2-y1, x2-x1)
 
     def get_lane(self, veh_id, error=-1001):
         """See parent class."""
-        if isinstance(veh_id, (list, np.ndarray)):
-            return [self.get_lane(veh, error) for veh in veh_id]
-        return self.__vehicles[veh_id]['tracking_info'].numberLane
+        return self._get_tracking_info(veh_id, 'numberLane', error)
 
     def get_route(self, veh_id, error=None):
         """See parent class."""
@@ -801,7 +854,8 @@ class AimsunKernelVehicle(KernelVehicle):
         """See parent class."""
         if isinstance(veh_id, (list, np.ndarray)):
             return [self.get_headway(veh, error) for veh in veh_id]
-        return self.__vehicles[veh_id]['headway']
+        row = self._tracking_rows.get(veh_id)
+        return error if row is None else self._headways[row]
 
     def get_last_lc(self, veh_id, error=-1001):
         """See parent class."""
@@ -825,8 +879,11 @@ class AimsunKernelVehicle(KernelVehicle):
 
     def get_x_by_id(self, veh_id):
         """See parent class."""
-        return self.master_kernel.network.get_x(self.get_edge(veh_id),
-                                                self.get_position(veh_id))
+        x = self.master_kernel.network.get_x(self.get_edge(veh_id),
+                                             self.get_position(veh_id))
+        if isinstance(veh_id, (list, np.ndarray)):
+            return x.tolist()
+        return x
 
     def set_lane_headways(self, veh_id, lane_headways):
         """See parent class."""
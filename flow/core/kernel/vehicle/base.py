@@ -1,6 +1,156 @@
 """Script containing the base vehicle kernel class."""
 
 from abc import ABCMeta, abstractmethod
+import collections
+from copy import deepcopy
+
+import numpy as np
+
+from flow.controllers.car_following_models import SimCarFollowingController
+from flow.utils.exceptions import FatalFlowError
+
+# fields of the state of the vehicles that are always collected from the
+# simulator, as the kernels use them to update their state
+BASE_FIELDS = ('speed', 'lane', 'position', 'edge')
+
+# fields of the state of the vehicles that are only collected from the
+# simulator if they are needed (see KernelVehicle.set_subscribed_fields)
+#
+# * leader: leader, follower and headway of the vehicles
+# * route: route of the vehicles
+# * 2d_position: (x, y) position of the vehicles
+# * orientation: position and angle of the vehicles, used by the renderers
+# * default_speed: speed of the vehicles without the flow commands
+# * fuel_consumption: fuel consumption of the vehicles
+# * distance: distance traveled by the vehicles
+OPTIONAL_FIELDS = ('leader', 'route', '2d_position', 'orientation',
+                   'default_speed', 'fuel_consumption', 'distance')
+
+# attributes of the vehicle kernels that refer to other objects of the
+# simulation, and are therefore not part of the state of the kernel
+_EXCLUDED_ATTRIBUTES = ('master_kernel', 'kernel_api')
+
+
+def _copy_state(value):
+    """Copy the mutable containers of a kernel attribute.
+
+    Dictionaries and lists are copied recursively, sets, deques and arrays are
+    copied, and all other objects (numbers, strings, parameter objects,
+    controllers) are shared with the original attribute.
+    """
+    if isinstance(value, dict):
+        copied = value.copy()
+        for key, val in copied.items():
+            copied[key] = _copy_state(val)
+        return copied
+    elif isinstance(value, list):
+        return [_copy_state(val) for val in value]
+    elif isinstance(value, (set, collections.deque)):
+        return value.copy()
+    elif isinstance(value, np.ndarray):
+        return value.copy()
+    return value
+
+
+def _view_state(value):
+    """Copy a kernel attribute for a read-only view of the kernel.
+
+    The kernels update the states of the vehicles in place, i.e. the items of
+    dictionaries of dictionaries (such as the state of every vehicle), so
+    dictionaries are copied up to two levels. All other containers are copied
+    shallowly, as their items are replaced rather than modified by the
+    kernels. In particular, this avoids copying every item of the histories
+    the kernels append to at every step.
+    """
+    if isinstance(value, dict):
+        copied = value.copy()
+        for key, val in copied.items():
+            if isinstance(val, dict):
+                copied[key] = val.copy()
+        return copied
+    elif isinstance(value, (list, set, collections.deque, np.ndarray)):
+        return value.copy()
+    return value
+
+
+class KernelVehicleState(object):
+    """Snapshot of the state of a vehicle kernel.
+
+    This is used by the environments to restore the vehicle kernel to its
+    initial state when the simulation is restarted. Only the containers of the
+    kernel (lists, dictionaries, sets and arrays) are copied, while the
+    objects they contain that are not modified by the kernel (vehicle type
+    parameters, controllers) are shared, which is much cheaper than
+    deep-copying the kernel.
+
+    If copy_objects is set, the objects contained by the kernel are copied as
+    well (except for the vehicle type parameters), so that the controllers of
+    the vehicles, which may have an internal state, are restored too. This is
+    needed to restore a kernel in the middle of a rollout.
+
+    The attributes of the kernel are available as attributes of the snapshot,
+    e.g. `snapshot.num_rl_vehicles`.
+    """
+
+    def __init__(self, kernel, copy_objects=False):
+        """Instantiate the snapshot.
+
+        Parameters
+        ----------
+        kernel : flow.core.kernel.vehicle.KernelVehicle
+            the vehicle kernel whose state is recorded
+        copy_objects : bool, optional
+            whether to copy the objects contained by the kernel
+        """
+        self._cls = type(kernel)
+        self._copy_objects = copy_objects
+        self._state = self._copy({
+            key: value for key, value in kernel.__dict__.items()
+            if key not in _EXCLUDED_ATTRIBUTES})
+
+    def _copy(self, state):
+        """Copy the recorded attributes of a kernel."""
+        if not self._copy_objects:
+            return {key: _copy_state(value) for key, value in state.items()}
+
+        # the vehicle type parameters are shared with the original kernel
+        type_parameters = state.get('type_parameters', {})
+        shared = [type_parameters] + [
+            value for params in type_parameters.values()
+            for value in params.values()]
+        return deepcopy(state, {id(obj): obj for obj in shared})
+
+    def __getattr__(self, name):
+        """Return the value of an attribute of the recorded kernel."""
+        state = self.__dict__.get('_state', {})
+        if name in state:
+            return state[name]
+        raise AttributeError(
+            "'{}' object has no attribute '{}'".format(
+                type(self).__name__, name))
+
+    def restore(self, master_kernel=None):
+        """Create a vehicle kernel in the recorded state.
+
+        The snapshot can be restored any number of times, and the restored
+        kernels do not share any state with the snapshot.
+
+        Parameters
+        ----------
+        master_kernel : flow.core.kernel.Kernel, optional
+            the higher level kernel of the restored kernel
+
+        Returns
+        -------
+        flow.core.kernel.vehicle.KernelVehicle
+            the restored vehicle kernel. The kernel api must be passed to it
+            before it is used to interact with the simulator
+        """
+        kernel = self._cls.__new__(self._cls)
+        kernel.__dict__.update(self._copy(self._state))
+        kernel.master_kernel = master_kernel
+        kernel.kernel_api = None
+        return kernel
 
 
 class KernelVehicle(object, metaclass=ABCMeta):
@@ -53,6 +203,13 @@ class KernelVehicle(object, metaclass=ABCMeta):
         self.master_kernel = master_kernel
         self.kernel_api = None
         self.sim_step = sim_params.sim_step
+        # fields collected from the simulator, None if all fields are
+        self.subscribed_fields = None
+        # ids of the vehicles whose router may be triggered at the next call
+        # to get_routing_ids, i.e. whose edge, lane or route changed during
+        # an update. This is an insertion-ordered dict used as a set, so that
+        # routers are called in a deterministic order
+        self._routing_candidates = {}
 
     def pass_api(self, kernel_api):
         """Acquire the kernel api that was generated by the simulation kernel.
@@ -64,6 +221,117 @@ class KernelVehicle(object, metaclass=ABCMeta):
         """
         self.kernel_api = kernel_api
 
+    def set_subscribed_fields(self, fields):
+        """Set the fields of the state of the vehicles to collect.
+
+        Collecting fewer fields from the simulator reduces the amount of data
+        it sends after every step. The fields of BASE_FIELDS are always
+        collected, as well as the fields needed by the controllers of the
+        vehicle types of the kernel (see initialize): the leaders of the
+        vehicles with an acceleration controller, and the routes of the
+        vehicles with a routing controller. Reading a field that is not
+        collected raises an error.
+
+        This must be called before the vehicles are added to the simulation.
+
+        Parameters
+        ----------
+        fields : iterable of str or None
+            the fields of BASE_FIELDS and OPTIONAL_FIELDS to collect. If set
+            to None, all fields are collected
+
+        Raises
+        ------
+        ValueError
+            if a field is not valid
+        """
+        if fields is None:
+            self.subscribed_fields = None
+            return
+
+        fields = set(fields)
+        invalid = fields.difference(BASE_FIELDS + OPTIONAL_FIELDS)
+        if invalid:
+            raise ValueError('Invalid vehicle fields: {}. The valid fields '
+                             'are: {}'.format(sorted(invalid),
+                                              BASE_FIELDS + OPTIONAL_FIELDS))
+
+        fields.update(BASE_FIELDS)
+        for params in self.type_parameters.values():
+            if params['acceleration_controller'][0] != \
+                    SimCarFollowingController:
+                fields.add('leader')
+            if params['routing_controller'] is not None:
+                fields.add('route')
+        self.subscribed_fields = fields
+
+    def _check_subscribed(self, field):
+        """Raise an error if a field is not collected from the simulator."""
+        if self.subscribed_fields is not None \
+                and field not in self.subscribed_fields:
+            raise FatalFlowError(
+                'The "{}" field of the vehicles is not collected from the '
+                'simulator. Add it to the vehicle_fields of the environment '
+                'to read it.'.format(field))
+
+    def snapshot(self, copy_objects=False):
+        """Return a snapshot of the current state of the kernel.
+
+        Parameters
+        ----------
+        copy_objects : bool, optional
+            whether to copy the objects contained by the kernel, such as the
+            controllers of the vehicles, see KernelVehicleState
+
+        Returns
+        -------
+        flow.core.kernel.vehicle.base.KernelVehicleState
+            snapshot that can be used to restore the kernel to this state
+        """
+        return KernelVehicleState(self, copy_objects)
+
+    def view(self, master_kernel=None):
+        """Return a read-only copy of the current state of the kernel.
+
+        The view is not connected to the simulator, and is not modified when
+        the kernel is updated, so its getters can be called while the
+        simulation is advanced (see flow.core.kernel.Kernel.snapshot). It is
+        cheaper to create than a snapshot, but must not be modified.
+
+        Parameters
+        ----------
+        master_kernel : flow.core.kernel.Kernel or \
+                flow.core.kernel.KernelSnapshot, optional
+            the higher level kernel of the view
+
+        Returns
+        -------
+        flow.core.kernel.vehicle.KernelVehicle
+            the view of the kernel
+        """
+        cls = type(self)
+        kernel = cls.__new__(cls)
+        kernel.__dict__.update({
+            key: _view_state(value) for key, value in self.__dict__.items()
+            if key not in _EXCLUDED_ATTRIBUTES})
+        kernel.master_kernel = master_kernel
+        kernel.kernel_api = None
+        return kernel
+
+    def load_state(self, state):
+        """Restore the kernel to a state saved with the simulator state.
+
+        This is called after the state of the simulator was loaded from a
+        file (see flow.core.kernel.Kernel.load_state).
+
+        Parameters
+        ----------
+        state : flow.core.kernel.vehicle.base.KernelVehicleState
+            snapshot of the kernel, taken with copy_objects set to True when
+            the state of the simulator was saved
+        """
+        raise NotImplementedError
+
     ###########################################################################
     #               Methods for interacting with the simulator                #
     ###########################################################################
@@ -184,6 +452,35 @@ class KernelVehicle(object, metaclass=ABCMeta):
         """
         pass
 
+    def get_routing_ids(self):
+        """Return the ids of the vehicles whose router should be called.
+
+        Routers are only called when the state of the vehicle their trigger
+        depends on changed since they were last called (see
+        flow.controllers.base_routing_controller.BaseRouter), so that the
+        number of calls scales with the number of edge transitions instead of
+        the number of vehicles. Only the vehicles whose edge, lane or route
+        changed since the last call, as recorded by the update method, and the
+        vehicles whose router is called at every step are checked.
+
+        Returns
+        -------
+        list of str
+            ids of the vehicles with a triggered routing controller
+        """
+        candidates = self._routing_candidates
+        self._routing_candidates = {}
+
+        routing_ids = []
+        for veh_id in candidates:
+            router = self.get_routing_controller(veh_id)
+            if router is not None and router.is_triggered(
+                    self.get_edge(veh_id),
+                    self.get_lane(veh_id),
+                    self.get_route(veh_id)):
+                routing_ids.append(veh_id)
+        return routing_ids
+
     @abstractmethod
     def set_max_speed(self, veh_id, max_speed):
         """Update the maximum allowable speed by a vehicles in the network.
@@ -720,12 +1017,12 @@ class KernelVehicle(object, metaclass=ABCMeta):
 
         Parameters
         ----------
-        veh_id : str
-            vehicle identifier
+        veh_id : str or list of str
+            vehicle id, or list of vehicle ids
 
         Returns
         -------
-        float
+        float or list of float
         """
         pass
 
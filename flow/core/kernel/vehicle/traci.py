@@ -10,10 +10,29 @@ import warnings
 from flow.controllers.car_following_models import SimCarFollowingController
 from flow.controllers.rlcontroller import RLController
 from flow.controllers.lane_change_controllers import SimLaneChangeController
+from flow.controllers.base_routing_controller import TRIGGER_STEP
 from bisect import bisect_left
 import itertools
 from copy import deepcopy
 
+# variables of the vehicles sumo is subscribed to, and the fields of the
+# vehicles that need them (see flow.core.kernel.vehicle.base.OPTIONAL_FIELDS)
+_SUBSCRIPTION_VARIABLES = [
+    (tc.VAR_LANE_INDEX, ('lane',)),
+    (tc.VAR_LANEPOSITION, ('position',)),
+    (tc.VAR_ROAD_ID, ('edge',)),
+    (tc.VAR_SPEED, ('speed',)),
+    (tc.VAR_EDGES, ('route',)),
+    (tc.VAR_POSITION, ('2d_position', 'orientation')),
+    (tc.VAR_ANGLE, ('orientation',)),
+    (tc.VAR_SPEED_WITHOUT_TRACI, ('default_speed',)),
+    (tc.VAR_FUELCONSUMPTION, ('fuel_consumption',)),
+    (tc.VAR_DISTANCE, ('distance',)),
+]
+
+# variables of the vehicles whose change may trigger their router
+_ROUTING_VARIABLES = [tc.VAR_ROAD_ID, tc.VAR_LANE_INDEX, tc.VAR_EDGES]
+
 # colors for vehicles
 WHITE = (255, 255, 255)
 CYAN = (0, 255, 255)
@@ -44,6 +63,7 @@ class TraCIVehicle(KernelVehicle):
         self.__controlled_lc_ids = []  # ids of flow lc-controlled vehicles
         self.__rl_ids = []  # ids of rl-controlled vehicles
         self.__observed_ids = []  # ids of the observed vehicles
+        self._routed_ids = []  # ids of the vehicles with a routing controller
 
         # vehicles: Key = Vehicle ID, Value = Dictionary describing the vehicle
         # Ordered dictionary used to keep neural net inputs in order
@@ -220,20 +240,29 @@ class TraCIVehicle(KernelVehicle):
             self.num_not_departed += sim_obs[tc.VAR_LOADED_VEHICLES_NUMBER] - \
                 sim_obs[tc.VAR_DEPARTED_VEHICLES_NUMBER]
 
+        # the optional fields of the vehicles that are collected
+        fields = self.subscribed_fields
+        collect_orientation = fields is None or 'orientation' in fields
+        collect_leader = fields is None or 'leader' in fields
+
         # update the "headway", "leader", and "follower" variables
         for veh_id in self.__ids:
             try:
-                _position = vehicle_obs.get(veh_id, {}).get(
-                    tc.VAR_POSITION, -1001)
-                _angle = vehicle_obs.get(veh_id, {}).get(tc.VAR_ANGLE, -1001)
                 _time_step = sim_obs[tc.VAR_TIME_STEP]
                 _time_delta = sim_obs[tc.VAR_DELTA_T]
-                self.__vehicles[veh_id]["orientation"] = \
-                    list(_position) + [_angle]
+                if collect_orientation:
+                    _position = vehicle_obs.get(veh_id, {}).get(
+                        tc.VAR_POSITION, -1001)
+                    _angle = vehicle_obs.get(veh_id, {}).get(
+                        tc.VAR_ANGLE, -1001)
+                    self.__vehicles[veh_id]["orientation"] = \
+                        list(_position) + [_angle]
                 self.__vehicles[veh_id]["timestep"] = _time_step
                 self.__vehicles[veh_id]["timedelta"] = _time_delta
             except TypeError:
                 print(traceback.format_exc())
+            if not collect_leader:
+                continue
             headway = vehicle_obs.get(veh_id, {}).get(tc.VAR_LEADER, None)
             # check for a collided vehicle or a vehicle with no leader
             if headway is None:
@@ -254,6 +283,16 @@ class TraCIVehicle(KernelVehicle):
                         leader["follower"] = veh_id
                         leader["follower_headway"] = headway[1] + min_gap
 
+        # record the vehicles whose router may be triggered, i.e. whose edge,
+        # lane or route changed (see get_routing_ids)
+        for veh_id in self._routed_ids:
+            obs = vehicle_obs.get(veh_id) or {}
+            prev_obs = self.__sumo_obs.get(veh_id) or {}
+            if self.__vehicles[veh_id]["router"].trigger == TRIGGER_STEP \
+                    or any(obs.get(var) != prev_obs.get(var)
+                           for var in _ROUTING_VARIABLES):
+                self._routing_candidates[veh_id] = None
+
         # update the sumo observations variable
         self.__sumo_obs = vehicle_obs.copy()
 
@@ -312,6 +351,8 @@ class TraCIVehicle(KernelVehicle):
         if rt_controller is not None:
             self.__vehicles[veh_id]["router"] = \
                 rt_controller[0](veh_id=veh_id, router_params=rt_controller[1])
+            if veh_id not in self._routed_ids:
+                self._routed_ids.append(veh_id)
         else:
             self.__vehicles[veh_id]["router"] = None
 
@@ -328,18 +369,7 @@ class TraCIVehicle(KernelVehicle):
                     self.__controlled_lc_ids.append(veh_id)
 
         # subscribe the new vehicle
-        self.kernel_api.vehicle.subscribe(veh_id, [
-            tc.VAR_LANE_INDEX, tc.VAR_LANEPOSITION,
-            tc.VAR_ROAD_ID,
-            tc.VAR_SPEED,
-            tc.VAR_EDGES,
-            tc.VAR_POSITION,
-            tc.VAR_ANGLE,
-            tc.VAR_SPEED_WITHOUT_TRACI,
-            tc.VAR_FUELCONSUMPTION,
-            tc.VAR_DISTANCE
-        ])
-        self.kernel_api.vehicle.subscribeLeader(veh_id, 2000)
+        self._subscribe(veh_id)
 
         # some constant vehicle parameters to the vehicles class
         self.__vehicles[veh_id]["length"] = self.kernel_api.vehicle.getLength(
@@ -352,15 +382,8 @@ class TraCIVehicle(KernelVehicle):
         self.__vehicles[veh_id]["initial_speed"] = \
             self.type_parameters[veh_type]["initial_speed"]
 
-        # set the speed mode for the vehicle
-        speed_mode = self.type_parameters[veh_type][
-            "car_following_params"].speed_mode
-        self.kernel_api.vehicle.setSpeedMode(veh_id, speed_mode)
-
-        # set the lane changing mode for the vehicle
-        lc_mode = self.type_parameters[veh_type][
-            "lane_change_params"].lane_change_mode
-        self.kernel_api.vehicle.setLaneChangeMode(veh_id, lc_mode)
+        # set the speed and lane changing modes for the vehicle
+        self._set_modes(veh_id, veh_type)
 
         # get initial state info
         self.__sumo_obs[veh_id] = dict()
@@ -384,6 +407,39 @@ class TraCIVehicle(KernelVehicle):
 
         return new_obs
 
+    def _subscribe(self, veh_id):
+        """Subscribe to the state of a vehicle in sumo."""
+        fields = self.subscribed_fields
+        self.kernel_api.vehicle.subscribe(veh_id, [
+            var for var, var_fields in _SUBSCRIPTION_VARIABLES
+            if fields is None or not fields.isdisjoint(var_fields)])
+        if fields is None or 'leader' in fields:
+            self.kernel_api.vehicle.subscribeLeader(veh_id, 2000)
+
+    def _set_modes(self, veh_id, veh_type):
+        """Set the speed and lane changing modes of a vehicle in sumo."""
+        speed_mode = self.type_parameters[veh_type][
+            "car_following_params"].speed_mode
+        self.kernel_api.vehicle.setSpeedMode(veh_id, speed_mode)
+
+        lc_mode = self.type_parameters[veh_type][
+            "lane_change_params"].lane_change_mode
+        self.kernel_api.vehicle.setLaneChangeMode(veh_id, lc_mode)
+
+    def load_state(self, state):
+        """See parent class.
+
+        Loading a state in sumo drops all subscriptions, so the vehicles in
+        the network are subscribed again.
+        """
+        kernel_api = self.kernel_api
+        self.__dict__.update(state.restore(self.master_kernel).__dict__)
+        self.kernel_api = kernel_api
+
+        for veh_id in self.__ids:
+            self._subscribe(veh_id)
+            self._set_modes(veh_id, self.get_type(veh_id))
+
     def reset(self):
         """See parent class."""
         self.previous_speeds = {}
@@ -405,6 +461,10 @@ class TraCIVehicle(KernelVehicle):
         if veh_id in self.__sumo_obs:
             del self.__sumo_obs[veh_id]
 
+        if veh_id in self._routed_ids:
+            self._routed_ids.remove(veh_id)
+        self._routing_candidates.pop(veh_id, None)
+
         # remove it from all other id lists (if it is there)
         if veh_id in self.__human_ids:
             self.__human_ids.remove(veh_id)
@@ -439,6 +499,7 @@ class TraCIVehicle(KernelVehicle):
 
     def get_orientation(self, veh_id):
         """See parent class."""
+        self._check_subscribed('orientation')
         return self.__vehicles[veh_id]["orientation"]
 
     def get_timestep(self, veh_id):
@@ -542,6 +603,7 @@ class TraCIVehicle(KernelVehicle):
 
     def get_fuel_consumption(self, veh_id, error=-1001):
         """Return fuel consumption in gallons/s."""
+        self._check_subscribed('fuel_consumption')
         ml_to_gallons = 0.000264172
         if isinstance(veh_id, (list, np.ndarray)):
             return [self.get_fuel_consumption(vehID, error) for vehID in veh_id]
@@ -561,6 +623,7 @@ class TraCIVehicle(KernelVehicle):
 
     def get_default_speed(self, veh_id, error=-1001):
         """See parent class."""
+        self._check_subscribed('default_speed')
         if isinstance(veh_id, (list, np.ndarray)):
             return [self.get_default_speed(vehID, error) for vehID in veh_id]
         return self.__sumo_obs.get(veh_id, {}).get(tc.VAR_SPEED_WITHOUT_TRACI,
@@ -586,6 +649,7 @@ class TraCIVehicle(KernelVehicle):
 
     def get_route(self, veh_id, error=None):
         """See parent class."""
+        self._check_subscribed('route')
         if error is None:
             error = list()
         if isinstance(veh_id, (list, np.ndarray)):
@@ -600,18 +664,21 @@ class TraCIVehicle(KernelVehicle):
 
     def get_leader(self, veh_id, error=""):
         """See parent class."""
+        self._check_subscribed('leader')
         if isinstance(veh_id, (list, np.ndarray)):
             return [self.get_leader(vehID, error) for vehID in veh_id]
         return self.__vehicles.get(veh_id, {}).get("leader", error)
 
     def get_follower(self, veh_id, error=""):
         """See parent class."""
+        self._check_subscribed('leader')
         if isinstance(veh_id, (list, np.ndarray)):
             return [self.get_follower(vehID, error) for vehID in veh_id]
         return self.__vehicles.get(veh_id, {}).get("follower", error)
 
     def get_headway(self, veh_id, error=-1001):
         """See parent class."""
+        self._check_subscribed('leader')
         if isinstance(veh_id, (list, np.ndarray)):
             return [self.get_headway(vehID, error) for vehID in veh_id]
         return self.__vehicles.get(veh_id, {}).get("headway", error)
@@ -665,12 +732,18 @@ class TraCIVehicle(KernelVehicle):
 
     def get_lane_leaders_speed(self, veh_id, error=None):
         """See parent class."""
+        if isinstance(veh_id, (list, np.ndarray)):
+            return [self.get_lane_leaders_speed(vehID, error)
+                    for vehID in veh_id]
         lane_leaders = self.get_lane_leaders(veh_id)
         return [0 if lane_leader == '' else self.get_speed(lane_leader)
                 for lane_leader in lane_leaders]
 
     def get_lane_followers_speed(self, veh_id, error=None):
         """See parent class."""
+        if isinstance(veh_id, (list, np.ndarray)):
+            return [self.get_lane_followers_speed(vehID, error)
+                    for vehID in veh_id]
         lane_followers = self.get_lane_followers(veh_id)
         return [0 if lane_follower == '' else self.get_speed(lane_follower)
                 for lane_follower in lane_followers]
@@ -1019,7 +1092,11 @@ class TraCIVehicle(KernelVehicle):
     def get_x_by_id(self, veh_id):
         """See parent class."""
         if isinstance(veh_id, (list, np.ndarray)):
-            return [self.get_x_by_id(vehID) for vehID in veh_id]
+            edges = self.get_edge(veh_id)
+            x = self.master_kernel.network.get_x(
+                edges, self.get_position(veh_id))
+            # vehicles that crashed or were teleported are placed at 0
+            return np.where([edge == '' for edge in edges], 0., x).tolist()
         if self.get_edge(veh_id) == '':
             # occurs when a vehicle crashes is teleported for some other reason
             return 0.
@@ -1106,10 +1183,8 @@ class TraCIVehicle(KernelVehicle):
             # the case of network templates.
             route_id = 'route{}_0'.format(veh_id)
         else:
-            num_routes = len(self.master_kernel.network.rts[edge])
-            frac = [val[1] for val in self.master_kernel.network.rts[edge]]
-            route_id = 'route{}_{}'.format(edge, np.random.choice(
-                [i for i in range(num_routes)], size=1, p=frac)[0])
+            route_table = self.master_kernel.network.get_route_table(edge)
+            route_id = 'route{}_{}'.format(edge, route_table.sample())
 
         self.kernel_api.vehicle.addFull(
             veh_id,
@@ -1167,10 +1242,12 @@ class TraCIVehicle(KernelVehicle):
 
     def get_2d_position(self, veh_id, error=-1001):
         """See parent class."""
+        self._check_subscribed('2d_position')
         return self.__sumo_obs.get(veh_id, {}).get(tc.VAR_POSITION, error)
 
     def get_distance(self, veh_id, error=-1001):
         """See parent class."""
+        self._check_subscribed('distance')
         return self.__sumo_obs.get(veh_id, {}).get(tc.VAR_DISTANCE, error)
 
     def get_road_grade(self, veh_id):
@@ -2,6 +2,7 @@
 
 import logging
 import collections
+import copy
 
 from flow.utils.flow_warnings import deprecated_attribute
 from flow.controllers.car_following_models import SimCarFollowingController
@@ -373,6 +374,31 @@ class VehicleParams:
         """
         return self.__vehicles[veh_id]["type"]
 
+    def copy(self):
+        """Return a copy of the vehicle parameters.
+
+        The containers describing the vehicles and their types are copied, so
+        that vehicles added to either object are not added to the other one.
+        The parameters of every type (controller tuples, car following and
+        lane change parameters) are not modified once a type is added, and
+        are therefore shared by the two objects instead of being deep-copied.
+
+        Returns
+        -------
+        flow.core.params.VehicleParams
+            a copy of this object
+        """
+        vehicles = copy.copy(self)
+        vehicles.ids = list(self.ids)
+        vehicles.__vehicles = collections.OrderedDict(
+            (veh_id, dict(veh)) for veh_id, veh in self.__vehicles.items())
+        vehicles.types = [dict(typ) for typ in self.types]
+        vehicles.type_parameters = {
+            typ: dict(params) for typ, params in self.type_parameters.items()}
+        vehicles.minGap = dict(self.minGap)
+        vehicles.initial = [dict(typ) for typ in self.initial]
+        return vehicles
+
 
 class SimParams(object):
     """Simulation-specific parameters.
@@ -411,6 +437,16 @@ class SimParams(object):
         specifies rendering resolution (pixel / meter)
     force_color_update : bool, optional
         whether or not to automatically color vehicles according to their types
+    render_backend : str, optional
+        renderer used for the "gray", "dgray", "rgb" and "drgb" render modes
+
+        * "pyglet": render with OpenGL, which requires a display
+        * "numpy": rasterize frames in software, which can run on headless
+          machines
+    async_pipeline : bool, optional
+        whether to process the data of every simulation step (e.g. to record
+        emission data) on a background thread while the next simulation step
+        is performed. See flow.core.util.AsyncPipeline. Defaults to False
     """
 
     def __init__(self,
@@ -422,7 +458,9 @@ class SimParams(object):
                  sight_radius=25,
                  show_radius=False,
                  pxpm=2,
-                 force_color_update=False):
+                 force_color_update=False,
+                 render_backend="pyglet",
+                 async_pipeline=False):
         """Instantiate SimParams."""
         self.sim_step = sim_step
         self.render = render
@@ -433,6 +471,22 @@ class SimParams(object):
         self.pxpm = pxpm
         self.show_radius = show_radius
         self.force_color_update = force_color_update
+        self.render_backend = render_backend
+        self.async_pipeline = async_pipeline
+
+    def copy(self):
+        """Return a copy of the simulation parameters.
+
+        All attributes are scalars or strings, so a shallow copy is enough for
+        the copy to be modified (e.g. its port or seed) without modifying this
+        object.
+
+        Returns
+        -------
+        flow.core.params.SimParams
+            a copy of this object, of the same class
+        """
+        return copy.copy(self)
 
 
 class AimsunParams(SimParams):
@@ -588,6 +642,16 @@ class SumoParams(SimParams):
         current time step
     use_ballistic: bool, optional
         If true, use a ballistic integration step instead of an euler step
+    render_backend : str, optional
+        renderer used for the "gray", "dgray", "rgb" and "drgb" render modes
+
+        * "pyglet": render with OpenGL, which requires a display
+        * "numpy": rasterize frames in software, which can run on headless
+          machines
+    async_pipeline : bool, optional
+        whether to process the data of every simulation step (e.g. to record
+        emission data) on a background thread while the next simulation step
+        is performed. See flow.core.util.AsyncPipeline. Defaults to False
     """
 
     def __init__(self,
@@ -609,11 +673,14 @@ class SumoParams(SimParams):
                  teleport_time=-1,
                  num_clients=1,
                  color_by_speed=False,
-                 use_ballistic=False):
+                 use_ballistic=False,
+                 render_backend="pyglet",
+                 async_pipeline=False):
         """Instantiate SumoParams."""
         super(SumoParams, self).__init__(
             sim_step, render, restart_instance, emission_path, save_render,
-            sight_radius, show_radius, pxpm, force_color_update)
+            sight_radius, show_radius, pxpm, force_color_update,
+            render_backend, async_pipeline)
         self.port = port
         self.lateral_resolution = lateral_resolution
         self.no_step_log = no_step_log
@@ -645,6 +712,16 @@ class EnvParams:
         during a rollout. These warmup steps are not added as steps
         into training, and the actions of rl agents during these steps
         are dictated by sumo. Defaults to zero
+    warmup_cache_size : int, optional
+        number of warmed-up states cached by the environment. If positive,
+        the state of the simulation after the warmup steps is saved, and
+        later resets restore one of these states (chosen at random) instead
+        of simulating the warmup steps again. Only supported by sumo.
+        Defaults to zero (no caching)
+    warmup_refresh : int, optional
+        number of times a cached warmed-up state is restored before it is
+        replaced by a newly simulated one, to keep the rollouts diverse. If
+        not specified, the cached states are never replaced
     sims_per_step : int, optional
         number of sumo simulation steps performed in any given rollout
         step. RL agents perform the same action for the duration of
@@ -657,6 +734,13 @@ class EnvParams:
         specifies whether to clip actions from the policy by their range when
         they are inputted to the reward function. Note that the actions are
         still clipped before they are provided to `apply_rl_actions`.
+    vehicle_fields : list of str, optional
+        fields of the state of the vehicles read by the environment, which
+        replace the vehicle_fields declared by the environment class. Only
+        these fields (and those needed by the kernel, the controllers, the
+        renderer and the emission files) are collected from the simulator.
+        See flow.core.kernel.vehicle.base.OPTIONAL_FIELDS for the available
+        fields
     """
 
     def __init__(self,
@@ -665,7 +749,10 @@ class EnvParams:
                  warmup_steps=0,
                  sims_per_step=1,
                  evaluate=False,
-                 clip_actions=True):
+                 clip_actions=True,
+                 warmup_cache_size=0,
+                 warmup_refresh=None,
+                 vehicle_fields=None):
         """Instantiate EnvParams."""
         self.additional_params = \
             additional_params if additional_params is not None else {}
@@ -674,6 +761,9 @@ class EnvParams:
         self.sims_per_step = sims_per_step
         self.evaluate = evaluate
         self.clip_actions = clip_actions
+        self.warmup_cache_size = warmup_cache_size
+        self.warmup_refresh = warmup_refresh
+        self.vehicle_fields = vehicle_fields
 
     def get_additional_param(self, key):
         """Return a variable from additional_params."""
@@ -41,22 +41,9 @@ def desired_velocity(env, fail=False, edge_list=None):
         veh_ids = env.k.vehicle.get_ids_by_edge(edge_list)
 
     vel = np.array(env.k.vehicle.get_speed(veh_ids))
-    num_vehicles = len(veh_ids)
-
-    if any(vel < -100) or fail or num_vehicles == 0:
-        return 0.
-
     target_vel = env.env_params.additional_params['target_velocity']
-    max_cost = np.array([target_vel] * num_vehicles)
-    max_cost = np.linalg.norm(max_cost)
-
-    cost = vel - target_vel
-    cost = np.linalg.norm(cost)
-
-    # epsilon term (to deal with ZeroDivisionError exceptions)
-    eps = np.finfo(np.float32).eps
 
-    return max(max_cost - cost, 0) / (max_cost + eps)
+    return desired_velocity_array(vel, target_vel, fail=fail)
 
 
 def average_velocity(env, fail=False):
@@ -80,12 +67,7 @@ def average_velocity(env, fail=False):
     """
     vel = np.array(env.k.vehicle.get_speed(env.k.vehicle.get_ids()))
 
-    if any(vel < -100) or fail:
-        return 0.
-    if len(vel) == 0:
-        return 0.
-
-    return np.mean(vel)
+    return average_velocity_array(vel, fail=fail)
 
 
 def rl_forward_progress(env, gain=0.1):
@@ -227,9 +209,7 @@ def penalize_standstill(env, gain=1):
     """
     veh_ids = env.k.vehicle.get_ids()
     vel = np.array(env.k.vehicle.get_speed(veh_ids))
-    num_standstill = len(vel[vel == 0])
-    penalty = gain * num_standstill
-    return -penalty
+    return penalize_standstill_array(vel, gain=gain)
 
 
 def penalize_near_standstill(env, thresh=0.3, gain=1):
@@ -251,9 +231,7 @@ def penalize_near_standstill(env, thresh=0.3, gain=1):
     """
     veh_ids = env.k.vehicle.get_ids()
     vel = np.array(env.k.vehicle.get_speed(veh_ids))
-    penalize = len(vel[vel < thresh])
-    penalty = gain * penalize
-    return -penalty
+    return penalize_near_standstill_array(vel, thresh=thresh, gain=gain)
 
 
 def penalize_headway_variance(vehicles,
@@ -298,12 +276,12 @@ def punish_rl_lane_changes(env, penalty=1):
     penalty : float, optional
         penalty imposed on the reward function for any rl lane change action
     """
-    total_lane_change_penalty = 0
-    for veh_id in env.k.vehicle.get_rl_ids():
-        if env.k.vehicle.get_last_lc(veh_id) == env.timer:
-            total_lane_change_penalty -= penalty
+    rl_ids = env.k.vehicle.get_rl_ids()
+    if len(rl_ids) == 0:
+        return 0
 
-    return total_lane_change_penalty
+    last_lc = [env.k.vehicle.get_last_lc(veh_id) for veh_id in rl_ids]
+    return punish_rl_lane_changes_array(last_lc, env.timer, penalty=penalty)
 
 
 def energy_consumption(env, gain=.001):
@@ -313,23 +291,10 @@ def energy_consumption(env, gain=.001):
     The power calculated here is the lower bound of the actual power consumed
     by a vehicle.
     """
-    power = 0
-
-    M = 1200  # mass of average sized vehicle (kg)
-    g = 9.81  # gravitational acceleration (m/s^2)
-    Cr = 0.005  # rolling resistance coefficient
-    Ca = 0.3  # aerodynamic drag coefficient
-    rho = 1.225  # air density (kg/m^3)
-    A = 2.6  # vehicle cross sectional area (m^2)
-    for veh_id in env.k.vehicle.get_ids():
-        speed = env.k.vehicle.get_speed(veh_id)
-        prev_speed = env.k.vehicle.get_previous_speed(veh_id)
-
-        accel = abs(speed - prev_speed) / env.sim_step
+    columns = VehicleColumns(env)
+    power = power_demand(columns.speed, columns.accel, columns.grade)
 
-        power += M * speed * accel + M * g * Cr * speed + 0.5 * rho * A * Ca * speed ** 3
-
-    return -gain * power
+    return -gain * np.sum(power)
 
 
 def veh_energy_consumption(env, veh_id, gain=.001):
@@ -339,22 +304,10 @@ def veh_energy_consumption(env, veh_id, gain=.001):
     The power calculated here is the lower bound of the actual power consumed
     by a vehicle.
     """
-    power = 0
-
-    M = 1200  # mass of average sized vehicle (kg)
-    g = 9.81  # gravitational acceleration (m/s^2)
-    Cr = 0.005  # rolling resistance coefficient
-    Ca = 0.3  # aerodynamic drag coefficient
-    rho = 1.225  # air density (kg/m^3)
-    A = 2.6  # vehicle cross sectional area (m^2)
-    speed = env.k.vehicle.get_speed(veh_id)
-    prev_speed = env.k.vehicle.get_previous_speed(veh_id)
-
-    accel = abs(speed - prev_speed) / env.sim_step
+    columns = VehicleColumns(env, [veh_id])
+    power = power_demand(columns.speed, columns.accel, columns.grade)
 
-    power += M * speed * accel + M * g * Cr * speed + 0.5 * rho * A * Ca * speed ** 3
-
-    return -gain * power
+    return -gain * power[0]
 
 
 def miles_per_megajoule(env, veh_ids=None, gain=.001):
@@ -374,29 +327,12 @@ def miles_per_megajoule(env, veh_ids=None, gain=.001):
     gain : float
         scaling factor for the reward
     """
-    mpj = 0
-    counter = 0
-    if veh_ids is None:
-        veh_ids = env.k.vehicle.get_ids()
-    elif not isinstance(veh_ids, list):
+    if veh_ids is not None and not isinstance(veh_ids, list):
         veh_ids = [veh_ids]
-    for veh_id in veh_ids:
-        speed = env.k.vehicle.get_speed(veh_id)
-        # convert to be positive since the function called is a penalty
-        power = -veh_energy_consumption(env, veh_id, gain=1.0)
-        if power > 0 and speed >= 0.0:
-            counter += 1
-            # meters / joule is (v * \delta t) / (power * \delta t)
-            mpj += speed / power
-    if counter > 0:
-        mpj /= counter
-
-    # convert from meters per joule to miles per joule
-    mpj /= 1609.0
-    # convert from miles per joule to miles per megajoule
-    mpj *= 10**6
+    columns = VehicleColumns(env, veh_ids)
 
-    return mpj * gain
+    return miles_per_megajoule_array(
+        columns.speed, columns.accel, columns.grade, gain=gain)
 
 
 def miles_per_gallon(env, veh_ids=None, gain=.001):
@@ -416,23 +352,550 @@ def miles_per_gallon(env, veh_ids=None, gain=.001):
     gain : float
         scaling factor for the reward
     """
-    mpg = 0
-    counter = 0
-    if veh_ids is None:
-        veh_ids = env.k.vehicle.get_ids()
-    elif not isinstance(veh_ids, list):
+    if veh_ids is not None and not isinstance(veh_ids, list):
         veh_ids = [veh_ids]
-    for veh_id in veh_ids:
-        speed = env.k.vehicle.get_speed(veh_id)
-        gallons_per_s = env.k.vehicle.get_fuel_consumption(veh_id)
-        if gallons_per_s > 0 and speed >= 0.0:
-            counter += 1
-            # meters / gallon is (v * \delta t) / (gallons_per_s * \delta t)
-            mpg += speed / gallons_per_s
-    if counter > 0:
-        mpg /= counter
+    columns = VehicleColumns(env, veh_ids)
+
+    return miles_per_gallon_array(columns.speed, columns.fuel, gain=gain)
+
+
+###############################################################################
+#                  Array-native versions of the reward functions              #
+###############################################################################
+
+# constants of the power demand model (average sized vehicle)
+VEHICLE_MASS = 1200  # mass of average sized vehicle (kg)
+GRAVITY = 9.81  # gravitational acceleration (m/s^2)
+ROLLING_RESISTANCE = 0.005  # rolling resistance coefficient
+AERODYNAMIC_DRAG = 0.3  # aerodynamic drag coefficient
+AIR_DENSITY = 1.225  # air density (kg/m^3)
+CROSS_SECTION = 2.6  # vehicle cross sectional area (m^2)
+
+
+def desired_velocity_array(speed, target_velocity, fail=False):
+    """Compute the desired_velocity reward from an array of speeds.
+
+    Parameters
+    ----------
+    speed : array_like
+        speeds of the vehicles the reward is computed over (m/s)
+    target_velocity : float
+        desired velocity of the vehicles (m/s)
+    fail : bool, optional
+        specifies if any crash or other failure occurred in the system
+
+    Returns
+    -------
+    float
+        reward value
+    """
+    vel = np.asarray(speed, dtype=float)
+    num_vehicles = vel.shape[0]
+
+    if fail or num_vehicles == 0 or np.any(vel < -100):
+        return 0.
+
+    max_cost = np.linalg.norm(np.full(num_vehicles, target_velocity))
+    cost = np.linalg.norm(vel - target_velocity)
+
+    # epsilon term (to deal with ZeroDivisionError exceptions)
+    eps = np.finfo(np.float32).eps
+
+    return max(max_cost - cost, 0) / (max_cost + eps)
+
+
+def average_velocity_array(speed, fail=False):
+    """Compute the average_velocity reward from an array of speeds.
+
+    Parameters
+    ----------
+    speed : array_like
+        speeds of the vehicles the reward is computed over (m/s)
+    fail : bool, optional
+        specifies if any crash or other failure occurred in the system
+
+    Returns
+    -------
+    float
+        reward value
+    """
+    vel = np.asarray(speed, dtype=float)
+
+    if fail or vel.shape[0] == 0 or np.any(vel < -100):
+        return 0.
+
+    return np.mean(vel)
+
+
+def penalize_standstill_array(speed, gain=1):
+    """Compute the penalize_standstill reward from an array of speeds.
+
+    Parameters
+    ----------
+    speed : array_like
+        speeds of the vehicles the reward is computed over (m/s)
+    gain : float
+        multiplicative factor on the action penalty
+
+    Returns
+    -------
+    float
+        reward value
+    """
+    return -gain * np.count_nonzero(np.asarray(speed) == 0)
+
+
+def penalize_near_standstill_array(speed, thresh=0.3, gain=1):
+    """Compute the penalize_near_standstill reward from an array of speeds.
+
+    Parameters
+    ----------
+    speed : array_like
+        speeds of the vehicles the reward is computed over (m/s)
+    thresh : float
+        the velocity threshold below which penalties are applied
+    gain : float
+        multiplicative factor on the action penalty
+
+    Returns
+    -------
+    float
+        reward value
+    """
+    return -gain * np.count_nonzero(np.asarray(speed) < thresh)
+
+
+def punish_rl_lane_changes_array(last_lc, time, penalty=1):
+    """Compute the punish_rl_lane_changes reward from an array of lane changes.
+
+    Parameters
+    ----------
+    last_lc : array_like
+        time of the last lane change of every RL vehicle
+    time : float
+        the current time, compared against the times of the last lane changes
+    penalty : float, optional
+        penalty imposed on the reward function for any rl lane change action
+
+    Returns
+    -------
+    float
+        reward value
+    """
+    return -penalty * np.count_nonzero(np.asarray(last_lc) == time)
+
+
+def time_headway_penalty_array(speed, headway, leader_ids, t_min=1):
+    """Penalize the vehicles whose time headway is below a threshold.
+
+    Parameters
+    ----------
+    speed : array_like
+        speeds of the vehicles (m/s)
+    headway : array_like
+        headways of the vehicles (m)
+    leader_ids : list of str
+        ids of the leaders of the vehicles. Vehicles without a leader (whose
+        leader is "" or None) are not penalized.
+    t_min : float, optional
+        smallest acceptable time headway (s)
+
+    Returns
+    -------
+    np.ndarray
+        penalty (a non-positive value) of every vehicle
+    """
+    speed = np.asarray(speed, dtype=float)
+    has_leader = np.array([lead_id not in ["", None] for lead_id in
+                           leader_ids], dtype=bool)
+    valid = has_leader & (speed > 0)
+    t_headway = np.maximum(np.divide(
+        np.asarray(headway, dtype=float), speed,
+        out=np.zeros_like(speed), where=valid), 0)
+    return np.where(valid, np.minimum((t_headway - t_min) / t_min, 0), 0)
+
+
+def power_demand(speed, accel, grade=0):
+    """Compute the power demand of a set of vehicles in one expression.
+
+    Assumes every vehicle is an average sized vehicle. The power calculated
+    here is the lower bound of the actual power consumed by a vehicle.
+
+    Parameters
+    ----------
+    speed : array_like
+        speeds of the vehicles (m/s)
+    accel : array_like
+        accelerations of the vehicles (m/s^2). Only the magnitude of the
+        acceleration contributes to the power demand.
+    grade : array_like or float, optional
+        road grade under each vehicle (rad)
+
+    Returns
+    -------
+    np.ndarray
+        power demand of every vehicle (W)
+    """
+    speed = np.asarray(speed, dtype=float)
+    accel = np.abs(np.asarray(accel, dtype=float))
+
+    return VEHICLE_MASS * speed * accel \
+        + VEHICLE_MASS * GRAVITY * ROLLING_RESISTANCE * speed \
+        + 0.5 * AIR_DENSITY * CROSS_SECTION * AERODYNAMIC_DRAG * speed ** 3 \
+        + VEHICLE_MASS * GRAVITY * np.sin(grade) * speed
+
+
+def energy_consumption_array(speed, accel, grade=0, gain=.001):
+    """Compute the energy_consumption reward from arrays of vehicle states.
+
+    Parameters
+    ----------
+    speed : array_like
+        speeds of the vehicles (m/s)
+    accel : array_like
+        accelerations of the vehicles (m/s^2)
+    grade : array_like or float, optional
+        road grade under each vehicle (rad)
+    gain : float
+        scaling factor for the reward
+
+    Returns
+    -------
+    float
+        reward value
+    """
+    return -gain * np.sum(power_demand(speed, accel, grade))
+
+
+def miles_per_megajoule_array(speed, accel, grade=0, gain=.001):
+    """Compute the miles_per_megajoule reward from arrays of vehicle states.
+
+    Vehicles with a non-positive power demand or a negative (i.e. missing)
+    speed are excluded from the average.
+
+    Parameters
+    ----------
+    speed : array_like
+        speeds of the vehicles (m/s)
+    accel : array_like
+        accelerations of the vehicles (m/s^2)
+    grade : array_like or float, optional
+        road grade under each vehicle (rad)
+    gain : float
+        scaling factor for the reward
+
+    Returns
+    -------
+    float
+        reward value
+    """
+    speed = np.asarray(speed, dtype=float)
+    power = power_demand(speed, accel, grade)
+    valid = (power > 0) & (speed >= 0)
+
+    # meters / joule is (v * \delta t) / (power * \delta t)
+    mpj = np.mean(speed[valid] / power[valid]) if np.any(valid) else 0
+
+    # convert from meters per joule to miles per megajoule
+    return mpj / 1609.0 * 10**6 * gain
+
+
+def miles_per_gallon_array(speed, fuel, gain=.001):
+    """Compute the miles_per_gallon reward from arrays of vehicle states.
+
+    Vehicles with a non-positive fuel consumption or a negative (i.e. missing)
+    speed are excluded from the average.
+
+    Parameters
+    ----------
+    speed : array_like
+        speeds of the vehicles (m/s)
+    fuel : array_like
+        fuel consumption of the vehicles (gallons/s)
+    gain : float
+        scaling factor for the reward
+
+    Returns
+    -------
+    float
+        reward value
+    """
+    speed = np.asarray(speed, dtype=float)
+    fuel = np.asarray(fuel, dtype=float)
+    valid = (fuel > 0) & (speed >= 0)
+
+    # meters / gallon is (v * \delta t) / (gallons_per_s * \delta t)
+    mpg = np.mean(speed[valid] / fuel[valid]) if np.any(valid) else 0
 
     # convert from meters per gallon to miles per gallon
-    mpg /= 1609.0
+    return mpg / 1609.0 * gain
+
+
+###############################################################################
+#                         Composable reward specifications                    #
+###############################################################################
+
+class VehicleColumns(object):
+    """Per-vehicle state columns, fetched from the kernel at most once.
+
+    Every column is collected lazily the first time it is accessed and cached
+    afterwards, so that several reward terms evaluated within the same step
+    share a single fetch of the vehicle kernel.
+
+    Attributes
+    ----------
+    ids : list of str
+        ids of the vehicles the columns are collected for
+    speed : np.ndarray
+        current speed of every vehicle (m/s)
+    prev_speed : np.ndarray
+        speed of every vehicle in the previous step (m/s)
+    accel : np.ndarray
+        acceleration of every vehicle, computed from the difference in speeds
+        over the last simulation step (m/s^2)
+    grade : np.ndarray
+        road grade under every vehicle (rad)
+    fuel : np.ndarray
+        fuel consumption of every vehicle (gallons/s)
+    """
+
+    def __init__(self, env, veh_ids=None):
+        """Instantiate the columns.
+
+        Parameters
+        ----------
+        env : flow.envs.Env
+            the environment variable, which contains information on the
+            current state of the system.
+        veh_ids : list of str, optional
+            vehicles to collect the columns for. Defaults to all vehicles in
+            the network.
+        """
+        self.env = env
+        self.ids = list(env.k.vehicle.get_ids() if veh_ids is None
+                        else veh_ids)
+        self._cache = {}
+
+    def _column(self, name, fetch):
+        if name not in self._cache:
+            self._cache[name] = np.array(fetch(), dtype=float)
+        return self._cache[name]
+
+    @property
+    def speed(self):
+        """See class definition."""
+        return self._column(
+            'speed', lambda: self.env.k.vehicle.get_speed(self.ids))
+
+    @property
+    def prev_speed(self):
+        """See class definition."""
+        return self._column(
+            'prev_speed',
+            lambda: self.env.k.vehicle.get_previous_speed(self.ids))
+
+    @property
+    def accel(self):
+        """See class definition."""
+        return self._column(
+            'accel',
+            lambda: (self.speed - self.prev_speed) / self.env.sim_step)
+
+    @property
+    def grade(self):
+        """See class definition."""
+        return self._column(
+            'grade',
+            lambda: [self.env.k.vehicle.get_road_grade(veh_id)
+                     for veh_id in self.ids])
+
+    @property
+    def fuel(self):
+        """See class definition."""
+        return self._column(
+            'fuel',
+            lambda: self.env.k.vehicle.get_fuel_consumption(self.ids))
+
+
+class RewardTerm(object):
+    """A single weighted term of a reward specification.
+
+    Attributes
+    ----------
+    name : str
+        name of the term, used as key when reporting per-term values
+    func : callable
+        array-native reward function
+    columns : list of str
+        names of the VehicleColumns attributes passed, in order, as the
+        leading positional arguments of `func`
+    weight : float
+        multiplicative factor of the term in the total reward
+    fail_value : float or None
+        value returned by the term if a failure occurred in the system. If set
+        to None, failures are ignored by the term.
+    kwargs : dict
+        additional keyword arguments passed to `func`
+    """
+
+    def __init__(self,
+                 func,
+                 columns=None,
+                 weight=1.,
+                 name=None,
+                 fail_value=None,
+                 **kwargs):
+        """Instantiate a reward term.
+
+        Parameters
+        ----------
+        func : callable or str
+            array-native reward function, or the name of one of the functions
+            in ARRAY_REWARDS, in which case the columns and fail value default
+            to the ones specified there
+        columns : list of str, optional
+            see class definition
+        weight : float, optional
+            see class definition
+        name : str, optional
+            see class definition. Defaults to the name of the function.
+        fail_value : float, optional
+            see class definition
+        kwargs : dict
+            see class definition
+
+        Raises
+        ------
+        KeyError
+            if `func` is a string that is not in ARRAY_REWARDS
+        ValueError
+            if no columns are specified for a custom function
+        """
+        if isinstance(func, str):
+            name = name or func
+            func, default_columns, default_fail_value = ARRAY_REWARDS[func]
+            columns = default_columns if columns is None else columns
+            if fail_value is None:
+                fail_value = default_fail_value
+        elif columns is None:
+            raise ValueError('The columns of custom reward terms must be '
+                             'specified.')
+
+        self.name = name or func.__name__
+        self.func = func
+        self.columns = list(columns)
+        self.weight = weight
+        self.fail_value = fail_value
+        self.kwargs = kwargs
+
+    def __call__(self, columns, fail=False):
+        """Compute the unweighted value of the term.
+
+        Parameters
+        ----------
+        columns : VehicleColumns
+            vehicle state columns of the current step
+        fail : bool, optional
+            specifies if any crash or other failure occurred in the system
+
+        Returns
+        -------
+        float
+            value of the term
+        """
+        if fail and self.fail_value is not None:
+            return self.fail_value
+        args = [getattr(columns, col) for col in self.columns]
+        return self.func(*args, **self.kwargs)
+
+
+class RewardSpec(object):
+    """A reward composed of several weighted array-native terms.
+
+    All terms are evaluated on the same VehicleColumns object, so every
+    vehicle state column is fetched from the kernel at most once per call,
+    regardless of the number of terms that need it.
+
+    Usage
+    -----
+    >>> from flow.core.rewards import RewardSpec, RewardTerm
+    >>> spec = RewardSpec([
+    >>>     RewardTerm('desired_velocity', target_velocity=25),
+    >>>     RewardTerm('energy_consumption', weight=0.1),
+    >>>     RewardTerm('penalize_near_standstill', thresh=0.5, gain=0.2),
+    >>> ])
+    >>> reward = spec(env, fail=kwargs['fail'])
+    """
 
-    return mpg * gain
+    def __init__(self, terms):
+        """Instantiate the reward specification.
+
+        Parameters
+        ----------
+        terms : list of RewardTerm or str
+            terms of the reward. Strings are converted to unit-weight terms of
+            the matching function in ARRAY_REWARDS.
+
+        Raises
+        ------
+        ValueError
+            if two terms share the same name
+        """
+        self.terms = [RewardTerm(term) if isinstance(term, str) else term
+                      for term in terms]
+        names = [term.name for term in self.terms]
+        if len(set(names)) != len(names):
+            raise ValueError('Reward terms must have unique names, got: '
+                             '{}'.format(names))
+
+    def compute(self, env, fail=False, veh_ids=None):
+        """Compute the weighted value of every term.
+
+        Parameters
+        ----------
+        env : flow.envs.Env
+            the environment variable, which contains information on the
+            current state of the system.
+        fail : bool, optional
+            specifies if any crash or other failure occurred in the system
+        veh_ids : list of str, optional
+            vehicles the reward is computed over. Defaults to all vehicles in
+            the network.
+
+        Returns
+        -------
+        dict < str, float >
+            weighted value of each term, keyed by the name of the term
+        """
+        columns = VehicleColumns(env, veh_ids)
+        return {term.name: term.weight * term(columns, fail=fail)
+                for term in self.terms}
+
+    def __call__(self, env, fail=False, veh_ids=None):
+        """Compute the total reward.
+
+        See compute for a description of the parameters.
+
+        Returns
+        -------
+        float
+            sum of the weighted values of all terms
+        """
+        return sum(self.compute(env, fail, veh_ids).values())
+
+
+# Key = name of the reward function
+# Element = (array-native function, VehicleColumns attributes passed to the
+#            function, value of the reward in case of a failure)
+ARRAY_REWARDS = {
+    'desired_velocity': (desired_velocity_array, ['speed'], 0.),
+    'average_velocity': (average_velocity_array, ['speed'], 0.),
+    'penalize_standstill': (penalize_standstill_array, ['speed'], None),
+    'penalize_near_standstill':
+        (penalize_near_standstill_array, ['speed'], None),
+    'energy_consumption':
+        (energy_consumption_array, ['speed', 'accel', 'grade'], None),
+    'miles_per_megajoule':
+        (miles_per_megajoule_array, ['speed', 'accel', 'grade'], None),
+    'miles_per_gallon': (miles_per_gallon_array, ['speed', 'fuel'], None),
+}
@@ -0,0 +1,641 @@
+"""Contains a class for running parameter sweeps over Flow experiments.
+
+A sweep runs one rollout for every point of a parameter space, e.g. the
+inflow rate of a bottleneck, the penetration rate of automated vehicles or
+the length of a ring road. The points are proposed by a sampler, and the
+rollouts are distributed over a pool of processes:
+
+    >>> def make_flow_params(inflow, seed):
+    >>>     ...  # return the flow_params of the experiment
+    >>> sweep = Sweep(make_flow_params,
+    >>>               GridSampler({'inflow': range(400, 3000, 100)},
+    >>>                           num_trials=10),
+    >>>               cache_dir='./sweep_cache', num_cpus=8)
+    >>> results = sweep.run()
+    >>> results.save_csv('./data/inflows_outflows.csv')
+
+The results can then be plotted with
+flow/visualize/capacity_diagram_generator.py.
+
+The metrics of every point are cached on disk, keyed by a hash of the
+parameters of the point, so that running a sweep again only performs the
+rollouts of the points that were not already simulated.
+"""
+import csv
+import hashlib
+import itertools
+import json
+import logging
+import multiprocessing
+import os
+import random
+import tempfile
+from copy import deepcopy
+
+import numpy as np
+
+from flow.core.util import RunningStats
+from flow.utils.registry import make_create_env
+
+# names of the metrics computed for every point
+METRICS = ['return', 'speed', 'inflow_rate', 'outflow_rate']
+
+
+class GridSampler(object):
+    """Sampler proposing all the points of a grid at once.
+
+    Parameters
+    ----------
+    grid : dict < str, list >
+        values of every parameter. The points are the cartesian product of
+        these values.
+    num_trials : int, optional
+        number of rollouts performed for every point, each with a different
+        seed. The seed is passed to the flow_params factory as the parameter
+        "seed".
+    """
+
+    def __init__(self, grid, num_trials=1):
+        """Instantiate the sampler."""
+        # numpy scalars are converted so that the points can be cached
+        self.grid = {key: [getattr(value, 'item', lambda: value)()
+                           for value in values]
+                     for key, values in grid.items()}
+        self.num_trials = num_trials
+        self._done = False
+
+    def propose(self, results):
+        """Return the next points to simulate.
+
+        Parameters
+        ----------
+        results : flow.core.sweep.SweepResults
+            the results of the points simulated so far
+
+        Returns
+        -------
+        list of dict
+            the parameters of the points, or an empty list once the sweep is
+            complete
+        """
+        if self._done:
+            return []
+        self._done = True
+
+        keys = sorted(self.grid)
+        return [dict(zip(keys, values), seed=seed)
+                for values in itertools.product(
+                    *(self.grid[key] for key in keys))
+                for seed in range(self.num_trials)]
+
+
+class RandomSampler(object):
+    """Sampler proposing random points of a parameter space at once.
+
+    Parameters
+    ----------
+    space : dict < str, tuple or list >
+        range of every parameter. A tuple (low, high) is sampled uniformly
+        within [low, high), while a list is sampled uniformly among its
+        elements.
+    num_samples : int
+        number of points
+    num_trials : int, optional
+        number of rollouts performed for every point, see GridSampler
+    seed : int, optional
+        seed of the sampled points
+    """
+
+    def __init__(self, space, num_samples, num_trials=1, seed=None):
+        """Instantiate the sampler."""
+        self.space = space
+        self.num_samples = num_samples
+        self.num_trials = num_trials
+        self.seed = seed
+        self._done = False
+
+    def propose(self, results):
+        """Return the next points to simulate, see GridSampler.propose."""
+        if self._done:
+            return []
+        self._done = True
+
+        rng = np.random.RandomState(self.seed)
+        points = []
+        for _ in range(self.num_samples):
+            point = {}
+            for key in sorted(self.space):
+                if isinstance(self.space[key], tuple):
+                    point[key] = float(rng.uniform(*self.space[key]))
+                else:
+                    values = self.space[key]
+                    point[key] = values[rng.randint(len(values))]
+            points.extend(dict(point, seed=seed)
+                          for seed in range(self.num_trials))
+        return points
+
+
+class AdaptiveSampler(object):
+    """Sampler refining a one-dimensional sweep where it is most uncertain.
+
+    This sampler is meant for capacity diagrams, where a metric (e.g. the
+    outflow) is estimated as a function of a single parameter (e.g. the
+    inflow rate). The parameter is restricted to a grid of resolution
+    min_spacing between low and high. The sweep starts with num_points
+    evenly spaced values, each simulated num_trials times. Then, at every
+    round, the sampler proposes up to batch_size new rollouts, chosen by
+    decreasing score among the following refinements:
+
+    * an extra trial of a value, whose score is the width of the confidence
+      interval of the mean metric at this value
+    * a new value in the middle of two consecutive values, whose score is
+      the difference between the mean metrics of these values. The new
+      value is simulated num_trials times.
+
+    Only the refinements whose score exceeds ci_width are considered, so
+    that the sweep is complete once the mean metric is known with the target
+    confidence at every value, and varies by less than ci_width between
+    consecutive values (or these values are min_spacing apart). Rollouts
+    are thus concentrated around the steep and noisy regions of the curve,
+    e.g. the capacity drop.
+
+    Parameters
+    ----------
+    param : str
+        name of the parameter
+    low : float
+        lowest value of the parameter
+    high : float
+        highest value of the parameter
+    min_spacing : float
+        resolution of the grid of values
+    metric : str, optional
+        name of the metric
+    ci_width : float, optional
+        target width of the confidence intervals, and maximum difference
+        between the mean metrics of consecutive values
+    confidence : float, optional
+        confidence level of the intervals
+    num_points : int, optional
+        number of values of the initial sweep
+    num_trials : int, optional
+        number of trials of every new value. Must be at least 2 to estimate
+        confidence intervals.
+    max_trials : int, optional
+        maximum number of trials of a value
+    batch_size : int, optional
+        maximum number of rollouts proposed at every round, e.g. the number
+        of processes of the sweep. Must be at least num_trials, so that new
+        values can be proposed.
+    max_rollouts : int, optional
+        maximum total number of rollouts
+    params : dict, optional
+        additional parameters, identical for all points
+
+    Raises
+    ------
+    ValueError
+        if num_trials is greater than batch_size
+    """
+
+    def __init__(self,
+                 param,
+                 low,
+                 high,
+                 min_spacing,
+                 metric='outflow_rate',
+                 ci_width=100,
+                 confidence=0.95,
+                 num_points=5,
+                 num_trials=3,
+                 max_trials=20,
+                 batch_size=8,
+                 max_rollouts=float('inf'),
+                 params=None):
+        """Instantiate the sampler."""
+        if num_trials > batch_size:
+            raise ValueError(
+                'num_trials ({}) cannot be greater than batch_size ({}), '
+                'since all the trials of a new value are proposed in the same '
+                'round.'.format(num_trials, batch_size))
+
+        self.param = param
+        self.low = low
+        self.min_spacing = min_spacing
+        self.metric = metric
+        self.ci_width = ci_width
+        self.confidence = confidence
+        self.num_trials = num_trials
+        self.max_trials = max_trials
+        self.batch_size = batch_size
+        self.max_rollouts = max_rollouts
+        self.params = params or {}
+
+        # values of the parameter are low + index * min_spacing
+        self._max_index = int(round((high - low) / min_spacing))
+        self._initial_indices = sorted(set(
+            int(index) for index in
+            np.linspace(0, self._max_index, num_points).round()))
+        self._num_proposed = 0
+
+    def propose(self, results):
+        """Return the next points to simulate, see GridSampler.propose."""
+        if self._num_proposed == 0:
+            return self._points(
+                [(index, seed) for index in self._initial_indices
+                 for seed in range(self.num_trials)])
+
+        stats = self.get_stats(results)
+        indices = sorted(stats)
+        refinements = []
+
+        # extra trials at the values with the widest confidence intervals
+        for index in indices:
+            lower, upper = stats[index].confidence_interval(self.confidence)
+            if upper - lower > self.ci_width and \
+                    stats[index].count < self.max_trials:
+                refinements.append((upper - lower, index))
+
+        # new values between the consecutive values with the largest changes
+        for index, next_index in zip(indices[:-1], indices[1:]):
+            change = abs(stats[next_index].mean - stats[index].mean)
+            if change > self.ci_width and next_index - index > 1:
+                refinements.append((change, (index + next_index) // 2))
+
+        refinements.sort(key=lambda refinement: -refinement[0])
+        budget = min(self.batch_size,
+                     self.max_rollouts - self._num_proposed)
+        runs = []
+        for _, index in refinements:
+            count = stats[index].count if index in stats else 0
+            num_runs = 1 if index in stats else self.num_trials
+            if len(runs) + num_runs > budget:
+                continue
+            runs.extend((index, seed) for seed in range(count, count + num_runs))
+
+        return self._points(runs)
+
+    def get_stats(self, results):
+        """Return the statistics of the metric at every simulated value.
+
+        Parameters
+        ----------
+        results : flow.core.sweep.SweepResults
+            the results of the points simulated so far
+
+        Returns
+        -------
+        dict < int, flow.core.util.RunningStats >
+            statistics of the metric, keyed by the index of the value
+        """
+        stats = {}
+        for row in results.rows():
+            if any(row.get(key) != value for key, value in
+                   self.params.items()):
+                continue
+            index = int(round((row[self.param] - self.low) / self.min_spacing))
+            stats.setdefault(index, RunningStats()).push(row[self.metric])
+        return stats
+
+    def _points(self, runs):
+        """Return the points of a list of (value index, seed) pairs."""
+        self._num_proposed += len(runs)
+        return [dict(self.params, seed=seed, **{
+            self.param: self.low + index * self.min_spacing})
+            for index, seed in runs]
+
+
+class SweepResults(object):
+    """Columnar table of the results of a sweep.
+
+    Every row contains the parameters and the metrics of a point. Columns
+    are added as new parameters or metrics are encountered, and are filled
+    with None for the rows that do not contain them.
+
+    Attributes
+    ----------
+    columns : dict < str, list >
+        values of every column
+    num_rows : int
+        number of rows in the table
+    """
+
+    def __init__(self):
+        """Instantiate an empty table."""
+        self.columns = {}
+        self.num_rows = 0
+
+    def add(self, row):
+        """Append a row to the table.
+
+        Parameters
+        ----------
+        row : dict
+            value of every column of the row
+        """
+        for key in row:
+            if key not in self.columns:
+                self.columns[key] = [None] * self.num_rows
+        for key, values in self.columns.items():
+            values.append(row.get(key))
+        self.num_rows += 1
+
+    def column(self, key):
+        """Return the values of a column as a numpy array."""
+        return np.asarray(self.columns[key])
+
+    def rows(self):
+        """Return the rows of the table, as a list of dict."""
+        return [{key: values[i] for key, values in self.columns.items()}
+                for i in range(self.num_rows)]
+
+    def save_csv(self, path):
+        """Write the table to a csv file, with the column names as header.
+
+        This file can be read by
+        flow.visualize.capacity_diagram_generator.import_data_from_csv.
+        """
+        keys = list(self.columns)
+        with open(path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(keys)
+            writer.writerows(zip(*(self.columns[key] for key in keys)))
+
+    @classmethod
+    def load_csv(cls, path):
+        """Read a table written by save_csv.
+
+        The values are converted to floats where possible.
+        """
+        results = cls()
+        with open(path, newline='') as f:
+            for row in csv.DictReader(f):
+                results.add({key: _parse_value(value)
+                             for key, value in row.items()})
+        return results
+
+
+def _parse_value(value):
+    """Convert a value read from a csv file to a float, if possible."""
+    try:
+        return float(value)
+    except ValueError:
+        return value if value != '' else None
+
+
+def point_key(point, version=None):
+    """Return the key under which the metrics of a point are cached.
+
+    Parameters
+    ----------
+    point : dict
+        parameters of the point. The values must be serializable to json.
+    version : str, optional
+        version of the experiment. Changing it invalidates the cached
+        metrics of all points.
+
+    Returns
+    -------
+    str
+        hexadecimal hash of the parameters
+    """
+    data = json.dumps({'point': point, 'version': version}, sort_keys=True)
+    return hashlib.sha1(data.encode()).hexdigest()
+
+
+class Sweep(object):
+    """Parallel parameter sweep with cached results.
+
+    The sweep repeatedly asks its sampler for points to simulate, performs
+    the rollouts of the points whose metrics are not cached yet in a pool of
+    processes, and hands the results back to the sampler, until the sampler
+    does not propose any new point.
+
+    Every rollout creates its own environment, from the flow_params returned
+    by make_flow_params for the parameters of the point. The network is
+    named after the process that runs it, so that the network files of
+    parallel rollouts do not collide. If the point has a "seed" parameter,
+    it is used to seed the simulator as well as the python and numpy random
+    number generators.
+
+    Attributes
+    ----------
+    make_flow_params : function
+        returns the flow_params of the experiment, given the parameters of a
+        point as keyword arguments. Must be picklable (e.g. defined at the
+        top level of a module) if num_cpus is greater than one.
+    sampler : object
+        proposes the points to simulate, see GridSampler
+    metrics : dict < str, function >
+        additional metrics computed at the end of every rollout, as a
+        function of the environment. Must be picklable if num_cpus is greater
+        than one.
+    cache_dir : str or None
+        directory where the metrics of every point are cached
+    num_cpus : int
+        number of processes performing rollouts
+    version : str or None
+        version of the experiment, see point_key
+    """
+
+    def __init__(self,
+                 make_flow_params,
+                 sampler,
+                 metrics=None,
+                 cache_dir=None,
+                 num_cpus=1,
+                 version=None):
+        """Instantiate the sweep.
+
+        Parameters
+        ----------
+        make_flow_params : function
+            see the attributes of the class
+        sampler : object
+            see the attributes of the class
+        metrics : dict < str, function >, optional
+            see the attributes of the class
+        cache_dir : str, optional
+            see the attributes of the class. If not specified, the metrics
+            are not cached.
+        num_cpus : int, optional
+            see the attributes of the class
+        version : str, optional
+            see the attributes of the class
+        """
+        self.make_flow_params = make_flow_params
+        self.sampler = sampler
+        self.metrics = metrics or {}
+        self.cache_dir = cache_dir
+        self.num_cpus = num_cpus
+        self.version = version
+
+        if cache_dir is not None:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def run(self, results_path=None):
+        """Run the sweep.
+
+        Parameters
+        ----------
+        results_path : str, optional
+            path to the csv file the results are written to
+
+        Returns
+        -------
+        flow.core.sweep.SweepResults
+            the parameters and metrics of every simulated point, in the order
+            in which they were proposed. The metrics are:
+
+            * return: the return of the rollout
+            * speed: the average speed of the vehicles (in m/s)
+            * inflow_rate: the inflow rate in the last 500 seconds (in
+              veh/hr)
+            * outflow_rate: the outflow rate in the last 500 seconds (in
+              veh/hr)
+            * the additional metrics of the sweep
+
+        Raises
+        ------
+        ValueError
+            if a parameter has the same name as a metric
+        """
+        results = SweepResults()
+        pool = None
+        if self.num_cpus > 1:
+            pool = multiprocessing.Pool(self.num_cpus)
+
+        try:
+            points = self.sampler.propose(results)
+            while points:
+                for key in points[0]:
+                    if key in METRICS or key in self.metrics:
+                        raise ValueError(
+                            'The parameter "{}" has the same name as a '
+                            'metric.'.format(key))
+                for point, metrics in zip(points, self._run_points(
+                        points, pool)):
+                    row = dict(point)
+                    row.update(metrics)
+                    results.add(row)
+                points = self.sampler.propose(results)
+        finally:
+            if pool is not None:
+                pool.close()
+                pool.join()
+
+        if results_path is not None:
+            results.save_csv(results_path)
+
+        return results
+
+    def _run_points(self, points, pool):
+        """Return the metrics of a batch of points.
+
+        The cached metrics are loaded, and the remaining points simulated.
+        The metrics of every simulated point are cached as soon as they are
+        available, so that an interrupted sweep can be resumed.
+        """
+        metrics = [self._load(point) for point in points]
+        missing = [i for i, m in enumerate(metrics) if m is None]
+        logging.info('Sweep: simulating {} points ({} cached)'.format(
+            len(missing), len(points) - len(missing)))
+
+        args = [(self.make_flow_params, points[i], self.metrics)
+                for i in missing]
+        if pool is not None:
+            outputs = pool.imap(_run_point, args)
+        else:
+            outputs = map(_run_point, args)
+
+        for i, output in zip(missing, outputs):
+            metrics[i] = output
+            self._save(points[i], output)
+
+        return metrics
+
+    def _cache_path(self, point):
+        """Return the path of the cache file of a point."""
+        return os.path.join(
+            self.cache_dir, point_key(point, self.version) + '.json')
+
+    def _load(self, point):
+        """Return the cached metrics of a point, or None."""
+        if self.cache_dir is None:
+            return None
+        try:
+            with open(self._cache_path(point)) as f:
+                return json.load(f)['metrics']
+        except (IOError, ValueError, KeyError):
+            return None
+
+    def _save(self, point, metrics):
+        """Cache the metrics of a point."""
+        if self.cache_dir is None:
+            return
+        # write to a temporary file first, so that an interrupted write does
+        # not leave a corrupted cache entry
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            json.dump({'point': point, 'metrics': metrics}, f)
+        os.replace(tmp_path, self._cache_path(point))
+
+
+def _run_point(args):
+    """Perform the rollout of a point and return its metrics.
+
+    Parameters
+    ----------
+    args : tuple
+        the flow_params factory, the parameters of the point, and the
+        additional metrics (see Sweep)
+
+    Returns
+    -------
+    dict < str, float >
+        the metrics of the rollout, see Sweep.run
+    """
+    make_flow_params, point, custom_metrics = args
+
+    # the flow_params are copied since they are modified below, and the
+    # factory may return the same objects for every point
+    flow_params = deepcopy(make_flow_params(**point))
+    flow_params['exp_tag'] = '{}_{}'.format(
+        flow_params['exp_tag'], os.getpid())
+    if point.get('seed') is not None:
+        flow_params['sim'].seed = point['seed']
+        random.seed(point['seed'])
+        np.random.seed(point['seed'])
+
+    create_env, _ = make_create_env(flow_params)
+    env = create_env()
+
+    try:
+        ret = 0
+        vel = []
+        env.reset()
+        for _ in range(env.env_params.horizon):
+            _, reward, done, _ = env.step(None)
+            # the rewards of multi-agent environments are summed over agents
+            if isinstance(reward, dict):
+                reward = sum(reward.values())
+                done = done['__all__']
+            ret += reward
+            veh_ids = env.k.vehicle.get_ids()
+            if veh_ids:
+                vel.append(np.mean(env.k.vehicle.get_speed(veh_ids)))
+            if done:
+                break
+
+        metrics = {
+            'return': float(ret),
+            'speed': float(np.mean(vel)) if vel else 0.,
+            'inflow_rate': float(env.k.vehicle.get_inflow_rate(500)),
+            'outflow_rate': float(env.k.vehicle.get_outflow_rate(500)),
+        }
+        for key, metric in custom_metrics.items():
+            metrics[key] = float(metric(env))
+    finally:
+        env.terminate()
+
+    return metrics
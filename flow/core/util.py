@@ -2,7 +2,15 @@
 
 import csv
 import errno
+import heapq
 import os
+import queue
+import random
+import shutil
+import tempfile
+import threading
+from collections import OrderedDict
+import numpy as np
 from lxml import etree
 from xml.etree import ElementTree
 
@@ -22,6 +30,71 @@ def printxml(t, fn):
         fn, pretty_print=True, encoding='UTF-8', xml_declaration=True)
 
 
+def writexml(fn, name, nsl, elements):
+    """Stream xml elements into a file.
+
+    Unlike printxml, which serializes a complete tree, the elements are
+    written one at a time as they are produced, so that generators of
+    elements are written in constant memory.
+
+    Parameters
+    ----------
+    fn : str
+        path to the xml file
+    name : str
+        name of the root element (see makexml)
+    nsl : str
+        location of the schema of the file (see makexml)
+    elements : iterable of lxml.etree.Element
+        the children of the root element
+    """
+    xsi = "http://www.w3.org/2001/XMLSchema-instance"
+    ns = {"xsi": xsi}
+    attr = {"{%s}noNamespaceSchemaLocation" % xsi: nsl}
+    with etree.xmlfile(fn, encoding='UTF-8') as xf:
+        xf.write_declaration()
+        with xf.element(name, attrib=attr, nsmap=ns):
+            xf.write('\n')
+            for element in elements:
+                xf.write(element, pretty_print=True)
+
+
+class LazyList(object):
+    """A sequence whose elements are generated again on every iteration.
+
+    This is used to store the output of generator-based hooks (e.g. the
+    specify_nodes method of networks) without storing all of their elements
+    in memory, while still allowing them to be iterated over several times.
+    Indexing and computing the length of the sequence require generating all
+    of its elements.
+    """
+
+    def __init__(self, fn, *args):
+        """Instantiate the sequence.
+
+        Parameters
+        ----------
+        fn : function
+            function returning a new iterator over the elements
+        args : Any
+            arguments passed to the function
+        """
+        self.fn = fn
+        self.args = args
+
+    def __iter__(self):
+        """Return a new iterator over the elements."""
+        return iter(self.fn(*self.args))
+
+    def __len__(self):
+        """Return the number of elements."""
+        return sum(1 for _ in self)
+
+    def __getitem__(self, index):
+        """Return the element(s) at some index or slice."""
+        return list(self)[index]
+
+
 def ensure_dir(path):
     """Ensure that the directory specified exists, and if not, create it."""
     try:
@@ -97,3 +170,562 @@ def emission_to_csv(emission_path, output_path=None):
         dict_writer = csv.DictWriter(output_file, keys)
         dict_writer.writeheader()
         dict_writer.writerows(out_data)
+
+
+def stack_padded(rows, width, fill_value=0, dtype=float):
+    """Stack sequences of varying lengths into a padded 2D array.
+
+    This is used to convert per-vehicle lane data (e.g. lane headways, whose
+    length is the number of lanes on the current edge of each vehicle) into a
+    dense matrix in a single pass.
+
+    Parameters
+    ----------
+    rows : list of array_like
+        sequences to stack. Elements past `width` are dropped
+    width : int
+        number of columns in the output array
+    fill_value : float, optional
+        value of the elements that are not covered by a sequence
+    dtype : type, optional
+        data type of the output array
+
+    Returns
+    -------
+    np.ndarray
+        array of shape (len(rows), width), whose i-th row starts with the
+        elements of rows[i] and is padded with `fill_value`
+    """
+    out = np.full((len(rows), width), fill_value, dtype=dtype)
+    rows = [np.asarray(row, dtype=dtype).ravel()[:width] for row in rows]
+    lengths = np.array([len(row) for row in rows], dtype=int)
+    if lengths.sum() > 0:
+        mask = np.arange(width) < lengths[:, None]
+        out[mask] = np.concatenate(rows)
+    return out
+
+
+class RingBuffer(object):
+    """Fixed-size history of equally shaped arrays.
+
+    The arrays are copied into a preallocated block of memory, and the oldest
+    array is overwritten once the buffer is full. This is used, for instance,
+    to store the last rendered frames of an environment without reallocating
+    them at every step.
+
+    Attributes
+    ----------
+    capacity : int
+        maximum number of arrays stored in the buffer
+    """
+
+    def __init__(self, capacity):
+        """Instantiate the buffer.
+
+        Parameters
+        ----------
+        capacity : int
+            maximum number of arrays stored in the buffer
+        """
+        self.capacity = capacity
+        self._data = None
+        self._start = 0
+        self._size = 0
+
+    def append(self, item):
+        """Copy an array to the end of the buffer.
+
+        Parameters
+        ----------
+        item : array_like
+            the array to store. All arrays must have the same shape.
+        """
+        item = np.asarray(item)
+        if self._data is None:
+            self._data = np.empty((self.capacity,) + item.shape, item.dtype)
+        if self._size < self.capacity:
+            self._data[(self._start + self._size) % self.capacity] = item
+            self._size += 1
+        else:
+            self._data[self._start] = item
+            self._start = (self._start + 1) % self.capacity
+
+    def get(self):
+        """Return all arrays in the buffer, from the oldest to the newest.
+
+        Returns
+        -------
+        np.ndarray
+            an array of shape (len(self), *item_shape)
+        """
+        if self._data is None:
+            return np.empty(0)
+        index = (self._start + np.arange(self._size)) % self.capacity
+        return self._data[index]
+
+    def __len__(self):
+        """Return the number of arrays in the buffer."""
+        return self._size
+
+    def __getitem__(self, i):
+        """Return the i-th oldest array in the buffer (without copying it)."""
+        if not -self._size <= i < self._size:
+            raise IndexError('buffer index out of range')
+        return self._data[(self._start + i % self._size) % self.capacity]
+
+
+class SlotManager(object):
+    """Assign vehicles to a fixed number of observation/action slots.
+
+    Environments with a fixed-size observation and action space, but a
+    varying number of controlled vehicles, give every vehicle a slot when it
+    enters the network, and keep this slot until it leaves. Vehicles that
+    enter while all slots are taken wait in a FIFO queue, and the head of the
+    queue takes the slot of the next vehicle that leaves.
+
+    The manager is updated from the departure and arrival events of the
+    vehicle kernel, so that every step costs O(1) per event, independently
+    of the number of vehicles in the network.
+
+    Attributes
+    ----------
+    num_slots : int
+        number of slots
+    ids : np.ndarray
+        id of the vehicle in every slot, or None if the slot is empty
+    """
+
+    def __init__(self, num_slots, reclaim_slots=False):
+        """Instantiate the manager.
+
+        Parameters
+        ----------
+        num_slots : int
+            number of slots
+        reclaim_slots : bool, optional
+            whether a vehicle that leaves and enters the network again (with
+            the same id) takes back its previous slot, if it is empty.
+            Otherwise, vehicles take the empty slot with the lowest index.
+        """
+        self.num_slots = num_slots
+        self.reclaim_slots = reclaim_slots
+        self.ids = np.full(num_slots, None, dtype=object)
+        self._slots = {}
+        self._queue = OrderedDict()
+        self._free = set()
+        self._free_heap = []
+        self._last_slots = {}
+        self.reset()
+
+    def reset(self, veh_ids=()):
+        """Empty all slots and the queue.
+
+        Parameters
+        ----------
+        veh_ids : list of str, optional
+            vehicles to add after emptying the slots, in order. The first
+            num_slots vehicles are assigned the slots 0, 1, ... and the others
+            are queued.
+        """
+        self.ids[:] = None
+        self._slots.clear()
+        self._queue.clear()
+        self._free = set(range(self.num_slots))
+        self._free_heap = list(range(self.num_slots))
+        self._last_slots.clear()
+        for veh_id in veh_ids:
+            self.add(veh_id)
+
+    def add(self, veh_id):
+        """Add a vehicle that entered the network.
+
+        The vehicle is assigned an empty slot, or added to the end of the
+        queue if all slots are taken. Vehicles that are already tracked are
+        ignored.
+        """
+        if veh_id in self._slots or veh_id in self._queue:
+            return
+        slot = self._last_slots.get(veh_id)
+        if slot in self._free:
+            self._free.remove(slot)
+            self._assign(veh_id, slot)
+            return
+        while self._free_heap:
+            slot = heapq.heappop(self._free_heap)
+            # the heap may contain slots that were reclaimed since they were
+            # pushed
+            if slot in self._free:
+                self._free.remove(slot)
+                self._assign(veh_id, slot)
+                return
+        self._queue[veh_id] = None
+
+    def remove(self, veh_id):
+        """Remove a vehicle that left the network.
+
+        If the vehicle had a slot, this slot is given to the first vehicle in
+        the queue. Vehicles that are not tracked are ignored.
+        """
+        slot = self._slots.pop(veh_id, None)
+        if slot is None:
+            self._queue.pop(veh_id, None)
+            return
+        self.ids[slot] = None
+        if self._queue:
+            next_id, _ = self._queue.popitem(last=False)
+            self._assign(next_id, slot)
+        else:
+            self._free.add(slot)
+            heapq.heappush(self._free_heap, slot)
+
+    def update(self, departed_ids, arrived_ids):
+        """Update the slots from the vehicles that departed and arrived.
+
+        Arrivals are processed first, so that a vehicle that is removed and
+        added back during the same step remains tracked.
+
+        Parameters
+        ----------
+        departed_ids : list of str
+            ids of the vehicles that entered the network. These should only
+            include the vehicles that are meant to be assigned a slot.
+        arrived_ids : list of str
+            ids of the vehicles that left the network. Vehicles that are not
+            tracked are ignored, so this may include all arrived vehicles.
+        """
+        for veh_id in arrived_ids or []:
+            self.remove(veh_id)
+        for veh_id in departed_ids or []:
+            self.add(veh_id)
+
+    def sync(self, veh_ids):
+        """Match the tracked vehicles with a complete list of vehicles.
+
+        This is meant to be used when departure and arrival events are not
+        available (for instance after a reset), and runs in O(len(veh_ids)).
+
+        Parameters
+        ----------
+        veh_ids : list of str
+            ids of all vehicles that should be tracked. Vehicles that are not
+            tracked yet are added in order.
+        """
+        veh_ids = list(veh_ids)
+        self.remove_missing(veh_ids)
+        for veh_id in veh_ids:
+            self.add(veh_id)
+
+    def remove_missing(self, veh_ids):
+        """Remove the tracked vehicles that are not in a list of vehicles.
+
+        This catches the vehicles that left the network without an arrival
+        event (for instance if they were removed by the environment), and
+        runs in O(len(veh_ids)) plus the number of tracked vehicles.
+
+        Parameters
+        ----------
+        veh_ids : list of str
+            ids of all vehicles that may be tracked
+        """
+        current = set(veh_ids)
+        for veh_id in list(self._slots) + list(self._queue):
+            if veh_id not in current:
+                self.remove(veh_id)
+
+    def get_slot(self, veh_id):
+        """Return the slot of a vehicle, or None if it does not have one."""
+        return self._slots.get(veh_id)
+
+    def get_ids(self):
+        """Return the ids of the vehicles with a slot, sorted by slot."""
+        return [veh_id for veh_id in self.ids if veh_id is not None]
+
+    def get_queue(self):
+        """Return the ids of the queued vehicles, from first to last."""
+        return list(self._queue)
+
+    def __len__(self):
+        """Return the number of vehicles with a slot."""
+        return len(self._slots)
+
+    def __contains__(self, veh_id):
+        """Return whether a vehicle has a slot or is queued."""
+        return veh_id in self._slots or veh_id in self._queue
+
+    def _assign(self, veh_id, slot):
+        self.ids[slot] = veh_id
+        self._slots[veh_id] = slot
+        if self.reclaim_slots:
+            self._last_slots[veh_id] = slot
+
+
+class RunningStats(object):
+    """Streaming mean, standard deviation, and confidence interval.
+
+    Samples are added one at a time, and the statistics are updated with
+    Welford's algorithm, so that they can be reported while the samples are
+    still being collected (e.g. to stop collecting once the confidence
+    interval is narrow enough).
+
+    Attributes
+    ----------
+    count : int
+        number of samples
+    mean : float
+        mean of the samples
+    """
+
+    def __init__(self):
+        """Instantiate the statistics, without any sample."""
+        self.count = 0
+        self.mean = 0.
+        self._m2 = 0.
+
+    def push(self, value):
+        """Add a sample."""
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (value - self.mean)
+
+    def std(self, ddof=0):
+        """Return the standard deviation of the samples.
+
+        Parameters
+        ----------
+        ddof : int, optional
+            delta degrees of freedom, as in np.std
+
+        Returns
+        -------
+        float
+            the standard deviation, or NaN if there are not enough samples
+        """
+        if self.count - ddof <= 0:
+            return float('nan')
+        return np.sqrt(self._m2 / (self.count - ddof))
+
+    def confidence_interval(self, confidence=0.95):
+        """Return the confidence interval of the mean of the samples.
+
+        The interval is computed from the Student's t-distribution.
+
+        Parameters
+        ----------
+        confidence : float, optional
+            confidence level of the interval
+
+        Returns
+        -------
+        (float, float)
+            lower and upper bounds of the interval, or (-inf, inf) if there
+            are less than two samples
+        """
+        if self.count < 2:
+            return -float('inf'), float('inf')
+        # scipy is only imported when an interval is needed
+        from scipy.stats import t
+        half_width = t.ppf((1 + confidence) / 2, self.count - 1) \
+            * self.std(ddof=1) / np.sqrt(self.count)
+        return self.mean - half_width, self.mean + half_width
+
+
+class WarmupCache(object):
+    """Cache of warmed-up simulation states.
+
+    The cache holds up to num_states states, each stored in a slot (or seed
+    bucket). A slot is chosen at random for every reset. If the slot is
+    empty, its state was used refresh_after times already, or its state was
+    generated for another configuration of the network (see the key of
+    choose), the state must be generated by simulating the warmup steps, and
+    is then stored in the slot. Otherwise, the stored state is restored
+    instead.
+
+    Every state consists of a file, to which the simulator writes its state,
+    and of arbitrary python objects (e.g. the state of the kernel and of the
+    environment).
+
+    Attributes
+    ----------
+    name : str
+        name of the cached configuration (e.g. the name of the network), used
+        to name the state files
+    num_states : int
+        number of slots
+    refresh_after : int or None
+        number of times a state is used before it is generated again. If None,
+        the states are never generated again.
+    path : str
+        directory of the state files
+    """
+
+    def __init__(self, name, num_states, refresh_after=None, path=None):
+        """Instantiate the cache.
+
+        Parameters
+        ----------
+        name : str
+            see the attributes of the class
+        num_states : int
+            see the attributes of the class
+        refresh_after : int, optional
+            see the attributes of the class
+        path : str, optional
+            directory of the state files. If not specified, a temporary
+            directory is created, and deleted when the cache is closed.
+        """
+        self.name = name
+        self.num_states = num_states
+        self.refresh_after = refresh_after
+        self._tmp_path = tempfile.mkdtemp(prefix='flow_warmup_') \
+            if path is None else None
+        self.path = path or self._tmp_path
+        self._states = [None] * num_states
+        self._uses = [0] * num_states
+        self._keys = [None] * num_states
+
+    def choose(self, key=None):
+        """Choose the slot of the next reset at random.
+
+        Parameters
+        ----------
+        key : object, optional
+            configuration of the network the state must match. A state
+            stored with another key is discarded.
+
+        Returns
+        -------
+        int
+            index of the slot
+        object or None
+            the state stored in the slot, or None if the state must be
+            generated (and stored with store)
+        """
+        index = random.randrange(self.num_states)
+        if self._keys[index] != key or (
+                self.refresh_after is not None and
+                self._uses[index] >= self.refresh_after):
+            self._states[index] = None
+
+        if self._states[index] is not None:
+            self._uses[index] += 1
+        return index, self._states[index]
+
+    def store(self, index, state, key=None):
+        """Store the state generated for a slot, and its key (see choose)."""
+        self._states[index] = state
+        self._uses[index] = 0
+        self._keys[index] = key
+
+    def filename(self, index):
+        """Return the path of the state file of a slot."""
+        return os.path.join(self.path, '{}_{}.xml'.format(self.name, index))
+
+    def __len__(self):
+        """Return the number of states stored in the cache."""
+        return sum(state is not None for state in self._states)
+
+    def close(self):
+        """Delete the states, and the temporary directory (if any)."""
+        self._states = [None] * self.num_states
+        if self._tmp_path is not None:
+            shutil.rmtree(self._tmp_path, ignore_errors=True)
+
+
+class AsyncPipeline(object):
+    """Run the consumers of simulation steps on a background thread.
+
+    Consumers are functions that process the data of a simulation step
+    without affecting the simulation, e.g. to record emission data or
+    compute statistics. Submitting them to the pipeline lets them run while
+    the simulator performs the next simulation step (the python thread
+    waiting for the simulator releases the GIL).
+
+    The pipeline provides the following ordering guarantees:
+
+    * the consumers are run one at a time, in the order in which they were
+      submitted. They do not need to be thread-safe with respect to each
+      other.
+    * flush returns once all the consumers submitted before it completed.
+      Synchronous code that reads data written by consumers must call flush
+      first.
+    * an exception raised by a consumer is raised again in the submitting
+      thread by the next call to submit or flush, and the consumers submitted
+      after it are not run.
+
+    Consumers must only read data that is not modified after they are
+    submitted, i.e. immutable snapshots of the simulation (see
+    flow.core.kernel.Kernel.snapshot), and not the live kernel.
+
+    If the pipeline is disabled, consumers are run synchronously by submit.
+
+    Attributes
+    ----------
+    enabled : bool
+        whether the consumers are run on a background thread
+    """
+
+    def __init__(self, enabled=True, max_pending=8):
+        """Instantiate the pipeline.
+
+        Parameters
+        ----------
+        enabled : bool, optional
+            see the attributes of the class
+        max_pending : int, optional
+            maximum number of consumers waiting to be run. Submitting a
+            consumer blocks while this number is reached, which bounds the
+            memory held by the pending snapshots.
+        """
+        self.enabled = enabled
+        self._queue = queue.Queue(max_pending)
+        self._thread = None
+        self._error = None
+
+    def submit(self, fn, *args):
+        """Run fn(*args) after all previously submitted consumers."""
+        self._raise_error()
+        if not self.enabled:
+            fn(*args)
+            return
+
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+        self._queue.put((fn, args))
+
+    def flush(self):
+        """Wait until all submitted consumers completed."""
+        if self._thread is not None:
+            self._queue.join()
+        self._raise_error()
+
+    def close(self):
+        """Run the pending consumers, and stop the background thread."""
+        if self._thread is not None:
+            self._queue.join()
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+        self._raise_error()
+
+    def _raise_error(self):
+        """Raise the exception of a consumer, if any."""
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise error
+
+    def _run(self):
+        """Run the submitted consumers until the pipeline is closed."""
+        while True:
+            item = self._queue.get()
+            try:
+                if item is None:
+                    return
+                if self._error is None:
+                    fn, args = item
+                    fn(*args)
+            except Exception as e:
+                self._error = e
+            finally:
+                self._queue.task_done()
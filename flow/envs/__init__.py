@@ -1,24 +1,38 @@
-"""Contains all callable environments in Flow."""
-from flow.envs.base import Env
-from flow.envs.bay_bridge import BayBridgeEnv
-from flow.envs.bottleneck import BottleneckAccelEnv, BottleneckEnv, \
-    BottleneckDesiredVelocityEnv
-from flow.envs.traffic_light_grid import TrafficLightGridEnv, \
-    TrafficLightGridPOEnv, TrafficLightGridTestEnv, TrafficLightGridBenchmarkEnv
-from flow.envs.ring.lane_change_accel import LaneChangeAccelEnv, \
-    LaneChangeAccelPOEnv
-from flow.envs.ring.accel import AccelEnv
-from flow.envs.ring.wave_attenuation import WaveAttenuationEnv, \
-    WaveAttenuationPOEnv
-from flow.envs.merge import MergePOEnv
-from flow.envs.test import TestEnv
+"""Contains all callable environments in Flow.
 
-# deprecated classes whose names have changed
-from flow.envs.bottleneck_env import BottleNeckAccelEnv
-from flow.envs.bottleneck_env import DesiredVelocityEnv
-from flow.envs.green_wave_env import PO_TrafficLightGridEnv
-from flow.envs.green_wave_env import GreenWaveTestEnv
+The environments are imported when they are first accessed (see
+flow/utils/lazy_import.py), so that importing this package does not import
+every environment and their dependencies.
+"""
+from flow.utils.lazy_import import lazy_module
 
+# module containing every environment
+_ENVS = {
+    'Env': 'flow.envs.base',
+    'BayBridgeEnv': 'flow.envs.bay_bridge',
+    'BottleneckAccelEnv': 'flow.envs.bottleneck',
+    'BottleneckEnv': 'flow.envs.bottleneck',
+    'BottleneckDesiredVelocityEnv': 'flow.envs.bottleneck',
+    'TrafficLightGridEnv': 'flow.envs.traffic_light_grid',
+    'TrafficLightGridPOEnv': 'flow.envs.traffic_light_grid',
+    'TrafficLightGridTestEnv': 'flow.envs.traffic_light_grid',
+    'TrafficLightGridBenchmarkEnv': 'flow.envs.traffic_light_grid',
+    'LaneChangeAccelEnv': 'flow.envs.ring.lane_change_accel',
+    'LaneChangeAccelPOEnv': 'flow.envs.ring.lane_change_accel',
+    'AccelEnv': 'flow.envs.ring.accel',
+    'WaveAttenuationEnv': 'flow.envs.ring.wave_attenuation',
+    'WaveAttenuationPOEnv': 'flow.envs.ring.wave_attenuation',
+    'MergePOEnv': 'flow.envs.merge',
+    'TestEnv': 'flow.envs.test',
+
+    # deprecated classes whose names have changed
+    'BottleNeckAccelEnv': 'flow.envs.bottleneck_env',
+    'DesiredVelocityEnv': 'flow.envs.bottleneck_env',
+    'PO_TrafficLightGridEnv': 'flow.envs.green_wave_env',
+    'GreenWaveTestEnv': 'flow.envs.green_wave_env',
+}
+
+__getattr__, __dir__ = lazy_module(__name__, _ENVS)
 
 __all__ = [
     'Env',
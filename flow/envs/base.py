@@ -1,6 +1,7 @@
 """Base environment class. This is the parent of all other environments."""
 
 from abc import ABCMeta, abstractmethod
+from collections import deque
 from copy import deepcopy
 import os
 import atexit
@@ -10,7 +11,6 @@ import numpy as np
 import random
 import shutil
 import subprocess
-from flow.renderer.pyglet_renderer import PygletRenderer as Renderer
 from flow.utils.flow_warnings import deprecated_attribute
 
 import gym
@@ -22,7 +22,7 @@ from traci.exceptions import TraCIException
 import sumolib
 
 
-from flow.core.util import ensure_dir
+from flow.core.util import ensure_dir, RingBuffer, WarmupCache
 from flow.core.kernel import Kernel
 from flow.utils.exceptions import FatalFlowError
 
@@ -94,12 +94,27 @@ class Env(gym.Env, metaclass=ABCMeta):
         the available_routes variable contains a dictionary of routes vehicles
         can traverse; to be used when routes need to be chosen dynamically.
         Equivalent to `network.rts`.
-    renderer : flow.renderer.pyglet_renderer.PygletRenderer or None
+    renderer : flow.renderer.pyglet_renderer.PygletRenderer or
+               flow.renderer.numpy_renderer.NumpyRenderer or None
         renderer class, used to collect image-based representations of the
         traffic network. This attribute is set to None if `sim_params.render`
         is set to True or False.
+    vehicle_fields : tuple of str or None
+        fields of the state of the vehicles read by the environment (see
+        flow.core.kernel.vehicle.base.OPTIONAL_FIELDS), in addition to those
+        always collected from the simulator. Reading another field raises an
+        error. Environments that do not declare their fields (None) collect
+        all of them. This can be replaced with `env_params.vehicle_fields`.
+    warmup_attributes : tuple of str
+        attributes of the environment that vary during a rollout. These are
+        saved and restored along with the warmed-up states of the simulation
+        (see `env_params.warmup_cache_size`), and must be extended by the
+        environments that add such attributes.
     """
 
+    vehicle_fields = None
+    warmup_attributes = ('time_counter', 'state')
+
     def __init__(self,
                  env_params,
                  sim_params,
@@ -130,10 +145,13 @@ class Env(gym.Env, metaclass=ABCMeta):
         self.network = scenario if scenario is not None else network
         self.net_params = self.network.net_params
         self.initial_config = self.network.initial_config
-        self.sim_params = deepcopy(sim_params)
-        # check whether we should be rendering
-        self.should_render = self.sim_params.render
-        self.sim_params.render = False
+        self.sim_params = sim_params.copy()
+        # check whether we should be rendering. The sumo-gui is only started
+        # once the environment is reset, while the pyglet and numpy renderers
+        # run alongside sumo from the start.
+        self.should_render = self.sim_params.render is True
+        if self.should_render:
+            self.sim_params.render = False
         time_stamp = ''.join(str(time.time()).split('.'))
         if os.environ.get("TEST_FLAG", 0):
             # 1.0 works with stress_test_start 10k times
@@ -164,7 +182,8 @@ class Env(gym.Env, metaclass=ABCMeta):
         self.k.network.generate_network(self.network)
 
         # initial the vehicles kernel using the VehicleParams object
-        self.k.vehicle.initialize(deepcopy(self.network.vehicles))
+        self.k.vehicle.initialize(self.network.vehicles.copy())
+        self.k.vehicle.set_subscribed_fields(self.get_vehicle_fields())
 
         # initialize the simulation using the simulation kernel. This will use
         # the network kernel as an input in order to determine what network
@@ -181,15 +200,19 @@ class Env(gym.Env, metaclass=ABCMeta):
         self.available_routes = self.k.network.rts
 
         # store the initial vehicle ids
-        self.initial_ids = deepcopy(self.network.vehicles.ids)
+        self.initial_ids = list(self.network.vehicles.ids)
 
         # store the initial state of the vehicles kernel (needed for restarting
         # the simulation)
-        self.k.vehicle.kernel_api = None
-        self.k.vehicle.master_kernel = None
-        self.initial_vehicles = deepcopy(self.k.vehicle)
-        self.k.vehicle.kernel_api = self.k.kernel_api
-        self.k.vehicle.master_kernel = self.k
+        self.initial_vehicles = self.k.vehicle.snapshot()
+
+        # cache of the warmed-up states of the simulation (see EnvParams)
+        self.warmup_cache = None
+        if getattr(env_params, 'warmup_cache_size', 0) > 0 \
+                and env_params.warmup_steps > 0:
+            self.warmup_cache = WarmupCache(
+                self.network.name, env_params.warmup_cache_size,
+                env_params.warmup_refresh)
 
         self.setup_initial_state()
 
@@ -208,8 +231,21 @@ class Env(gym.Env, metaclass=ABCMeta):
                 lane_poly = [i for pt in _lane_poly for i in pt]
                 network.append(lane_poly)
 
-            # instantiate a pyglet renderer
-            self.renderer = Renderer(
+            # instantiate a pyglet or a headless numpy renderer (parameters
+            # loaded from older configs may not specify a backend). The
+            # renderers are only imported when needed, as they depend on
+            # pyglet and opencv
+            backend = getattr(self.sim_params, 'render_backend', 'pyglet')
+            if backend == 'pyglet':
+                from flow.renderer.pyglet_renderer import \
+                    PygletRenderer as renderer_cls
+            elif backend == 'numpy':
+                from flow.renderer.numpy_renderer import \
+                    NumpyRenderer as renderer_cls
+            else:
+                raise FatalFlowError(
+                    'Render backend %s is not supported!' % backend)
+            self.renderer = renderer_cls(
                 network,
                 self.sim_params.render,
                 save_render,
@@ -259,13 +295,38 @@ class Env(gym.Env, metaclass=ABCMeta):
             self.sim_params.emission_path = sim_params.emission_path
 
         self.k.network.generate_network(self.network)
-        self.k.vehicle.initialize(deepcopy(self.network.vehicles))
+        self.k.vehicle.initialize(self.network.vehicles.copy())
+        self.k.vehicle.set_subscribed_fields(self.get_vehicle_fields())
         kernel_api = self.k.simulation.start_simulation(
             network=self.k.network, sim_params=self.sim_params)
         self.k.pass_api(kernel_api)
 
         self.setup_initial_state()
 
+    def get_vehicle_fields(self):
+        """Return the fields of the state of the vehicles to collect.
+
+        These are the fields declared by the environment, and the fields
+        needed by the renderer and to write emission files.
+
+        Returns
+        -------
+        set of str or None
+            the fields of the vehicles, or None if all fields are collected
+        """
+        fields = getattr(self.env_params, 'vehicle_fields', None)
+        if fields is None:
+            fields = self.vehicle_fields
+        if fields is None:
+            return None
+
+        fields = set(fields)
+        if self.sim_params.render in ['gray', 'dgray', 'rgb', 'drgb']:
+            fields.add('orientation')
+        if self.sim_params.emission_path is not None:
+            fields.update(['leader', '2d_position', 'distance'])
+        return fields
+
     def setup_initial_state(self):
         """Store information on the initial state of vehicles in the network.
 
@@ -347,17 +408,14 @@ class Env(gym.Env, metaclass=ABCMeta):
                     self.k.vehicle.get_controlled_lc_ids(),
                     direction=direction)
 
-            # perform (optionally) routing actions for all vehicles in the
-            # network, including RL and SUMO-controlled vehicles
-            routing_ids = []
+            # perform (optionally) routing actions for the vehicles whose
+            # routing controller was triggered, including RL and
+            # SUMO-controlled vehicles
+            routing_ids = self.k.vehicle.get_routing_ids()
             routing_actions = []
-            for veh_id in self.k.vehicle.get_ids():
-                if self.k.vehicle.get_routing_controller(veh_id) \
-                        is not None:
-                    routing_ids.append(veh_id)
-                    route_contr = self.k.vehicle.get_routing_controller(
-                        veh_id)
-                    routing_actions.append(route_contr.choose_route(self))
+            for veh_id in routing_ids:
+                route_contr = self.k.vehicle.get_routing_controller(veh_id)
+                routing_actions.append(route_contr.choose_route(self))
 
             self.k.vehicle.choose_routes(routing_ids, routing_actions)
 
@@ -453,14 +511,24 @@ class Env(gym.Env, metaclass=ABCMeta):
                 "**********************************************************"
             )
 
+        # restore a cached warmed-up state, if available
+        warmup_slot = None
+        if self.warmup_cache is not None:
+            warmup_slot, warmup_state = self.warmup_cache.choose(
+                self._warmup_key())
+            if warmup_state is not None:
+                observation = self._load_warmup_state(
+                    warmup_slot, warmup_state)
+                self.render(reset=True)
+                return observation
+
         if self.sim_params.restart_instance or \
                 (self.step_counter > 2e6 and self.simulator != 'aimsun'):
             self.step_counter = 0
             # issue a random seed to induce randomness into the next rollout
             self.sim_params.seed = random.randint(0, 1e5)
 
-            self.k.vehicle = deepcopy(self.initial_vehicles)
-            self.k.vehicle.master_kernel = self.k
+            self.k.vehicle = self.initial_vehicles.restore(self.k)
             # restart the sumo instance
             self.restart_simulation(self.sim_params)
 
@@ -555,11 +623,88 @@ class Env(gym.Env, metaclass=ABCMeta):
         for _ in range(self.env_params.warmup_steps):
             observation, _, _, _ = self.step(rl_actions=None)
 
+        # cache the warmed-up state of the simulation
+        if warmup_slot is not None:
+            self._save_warmup_state(warmup_slot, observation)
+
         # render a frame
         self.render(reset=True)
 
         return observation
 
+    def _save_warmup_state(self, index, observation):
+        """Store the current (warmed-up) state in the warmup cache.
+
+        The state of the simulator is saved to a file, and the state of the
+        kernel and of the environment are copied, along with the observation
+        returned by reset.
+
+        Parameters
+        ----------
+        index : int
+            slot of the state in the cache
+        observation : object
+            the observation returned by reset
+        """
+        self.warmup_cache.store(index, {
+            'kernel': self.k.save_state(self.warmup_cache.filename(index)),
+            'env': self._copy_env_state(vars(self)),
+            'observation': deepcopy(observation),
+        }, self._warmup_key())
+
+    def _load_warmup_state(self, index, state):
+        """Restore a state of the warmup cache.
+
+        Parameters
+        ----------
+        index : int
+            slot of the state in the cache
+        state : dict
+            the stored state, see _save_warmup_state
+
+        Returns
+        -------
+        object
+            the observation after the warmup steps
+        """
+        self.k.load_state(self.warmup_cache.filename(index), state['kernel'])
+        self.__dict__.update(self._copy_env_state(state['env']))
+
+        # update the colors of vehicles
+        if self.sim_params.render:
+            self.k.vehicle.update_vehicle_colors()
+
+        return deepcopy(state['observation'])
+
+    def _copy_env_state(self, attributes):
+        """Copy the attributes of the environment that vary during a rollout.
+
+        Only the attributes listed in `warmup_attributes` are copied. The
+        references to the environment and its kernel from these attributes
+        are kept as they are.
+        """
+        shared = [self, self.k, self.k.kernel_api, self.k.simulation,
+                  self.k.network, self.k.vehicle, self.k.traffic_light]
+        return deepcopy(
+            {key: attributes[key] for key in self.warmup_attributes
+             if key in attributes},
+            {id(obj): obj for obj in shared})
+
+    def _warmup_key(self):
+        """Return the configuration of the network the warmed-up states match.
+
+        Environments that generate a new network during reset (e.g. a ring
+        of a different length) only restore the states of the current
+        network.
+        """
+        net_params = self.network.net_params
+        return repr((self.network.orig_name,
+                     sorted(net_params.additional_params.items()),
+                     net_params.inflows.get(),
+                     net_params.osm_path,
+                     net_params.template,
+                     sorted(vars(self.network.initial_config).items())))
+
     def additional_command(self):
         """Additional commands that may be performed by the step method."""
         pass
@@ -689,6 +834,9 @@ class Env(gym.Env, metaclass=ABCMeta):
         environment opens the TraCI connection.
         """
         try:
+            # delete the cached warmed-up states
+            if self.warmup_cache is not None:
+                self.warmup_cache.close()
             # close everything within the kernel
             self.k.close()
             # close pyglet renderer
@@ -721,17 +869,17 @@ class Env(gym.Env, metaclass=ABCMeta):
             # render a frame
             self.pyglet_render()
 
-            # cache rendering
+            # cache rendering. Frames are copied into a ring buffer, while the
+            # number of sights varies with the number of observed vehicles.
             if reset:
-                self.frame_buffer = [self.frame.copy() for _ in range(5)]
-                self.sights_buffer = [self.sights.copy() for _ in range(5)]
-            else:
-                if self.step_counter % int(1/self.sim_step) == 0:
-                    self.frame_buffer.append(self.frame.copy())
+                self.frame_buffer = RingBuffer(buffer_length)
+                self.sights_buffer = deque(maxlen=buffer_length)
+                for _ in range(buffer_length):
+                    self.frame_buffer.append(self.frame)
                     self.sights_buffer.append(self.sights.copy())
-                if len(self.frame_buffer) > buffer_length:
-                    self.frame_buffer.pop(0)
-                    self.sights_buffer.pop(0)
+            elif self.step_counter % int(1/self.sim_step) == 0:
+                self.frame_buffer.append(self.frame)
+                self.sights_buffer.append(self.sights.copy())
         elif (self.sim_params.render is True) and self.sim_params.save_render:
             # sumo-gui render
             self.k.kernel_api.gui.screenshot("View #0", self.path+"/frame_%06d.png" % self.time_counter)
@@ -788,17 +936,8 @@ class Env(gym.Env, metaclass=ABCMeta):
                                           machine_logs)
 
         # get local observation of RL vehicles
-        self.sights = []
-        for id in human_idlist:
-            # Force tracking human vehicles by adding "track" in vehicle id.
-            # The tracked human vehicles will be treated as machine vehicles.
-            if "track" in id:
-                orientation = self.k.vehicle.get_orientation(id)
-                sight = self.renderer.get_sight(
-                    orientation, id)
-                self.sights.append(sight)
-        for id in machine_idlist:
-            orientation = self.k.vehicle.get_orientation(id)
-            sight = self.renderer.get_sight(
-                orientation, id)
-            self.sights.append(sight)
+        sight_ids = [id for id in human_idlist if "track" in id] + \
+            list(machine_idlist)
+        self.sights = self.renderer.get_sights(
+            [self.k.vehicle.get_orientation(id) for id in sight_ids],
+            sight_ids)
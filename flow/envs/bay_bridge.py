@@ -61,6 +61,10 @@ class BayBridgeEnv(Env):
         vehicles collide into one another.
     """
 
+    warmup_attributes = Env.warmup_attributes + (
+        'edge_dict', 'cars_waiting_for_toll', 'cars_before_ramp',
+        'toll_wait_time', 'tl_state')
+
     def __init__(self, env_params, sim_params, network, simulator='traci'):
         super().__init__(env_params, sim_params, network, simulator)
         self.edge_dict = defaultdict(list)
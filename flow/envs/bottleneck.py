@@ -21,6 +21,7 @@ import numpy as np
 from gym.spaces.box import Box
 
 from flow.core import rewards
+from flow.core.util import stack_padded, SlotManager
 from flow.envs.base import Env
 
 MAX_LANES = 4  # base number of largest number of lanes in the network
@@ -191,6 +192,11 @@ class BottleneckEnv(Env):
         array.
     """
 
+    warmup_attributes = Env.warmup_attributes + (
+        'edge_dict', 'cars_waiting_for_toll', 'cars_before_ramp',
+        'toll_wait_time', 'tl_state', 'q', 'feedback_timer', 'cycle_time',
+        'ramp_state', 'smoothed_num', 'outflow_index')
+
     def __init__(self, env_params, sim_params, network, simulator='traci'):
         """Initialize the BottleneckEnv class."""
         for p in ADDITIONAL_ENV_PARAMS.keys():
@@ -520,6 +526,8 @@ class BottleneckAccelEnv(BottleneckEnv):
         A rollout is terminated once the time horizon is reached.
     """
 
+    warmup_attributes = BottleneckEnv.warmup_attributes + ('rl_slots',)
+
     def __init__(self, env_params, sim_params, network, simulator='traci'):
         """Initialize BottleneckAccelEnv."""
         for p in ADDITIONAL_RL_ENV_PARAMS.keys():
@@ -530,9 +538,33 @@ class BottleneckAccelEnv(BottleneckEnv):
         super().__init__(env_params, sim_params, network, simulator)
         self.add_rl_if_exit = env_params.get_additional_param("add_rl_if_exit")
         self.num_rl = deepcopy(self.initial_vehicles.num_rl_vehicles)
-        self.rl_id_list = deepcopy(self.initial_vehicles.get_rl_ids())
+        # ids of the initial RL vehicles, sorted in the same order as the
+        # vehicle kernel sorts its RL ids
+        vehicles = self.network.vehicles
+        self.rl_id_list = sorted(
+            veh_id for veh_id in vehicles.ids if vehicles.type_parameters[
+                vehicles.get_type(veh_id)]["acceleration_controller"][0]
+            == RLController)
         self.max_speed = self.k.network.max_speed()
 
+        # slot of every RL vehicle in the observation and action. The initial
+        # RL vehicles are assigned the slots of their order, and take them
+        # back when they are reintroduced in the network.
+        self.rl_slots = SlotManager(self.num_rl, reclaim_slots=True)
+        self.rl_slots.reset(self.rl_id_list)
+
+        # preallocated observation buffer, and views of its three components
+        # (rl data, relative data, and per edge data)
+        num_lanes = MAX_LANES * self.scaling
+        num_edges = len(self.k.network.get_edge_list())
+        self._obs = np.zeros(self.observation_space.shape[0])
+        rl_end = 4 * self.num_rl
+        rel_end = rl_end + 4 * num_lanes * self.num_rl
+        self._rl_obs = self._obs[:rl_end].reshape(self.num_rl, 4)
+        self._relative_obs = self._obs[rl_end:rel_end].reshape(
+            self.num_rl, 4, num_lanes)
+        self._edge_obs = self._obs[rel_end:].reshape(num_edges, 2)
+
     @property
     def observation_space(self):
         """See class definition."""
@@ -544,100 +576,58 @@ class BottleneckAccelEnv(BottleneckEnv):
         return Box(low=0, high=1, shape=(num_obs, ), dtype=np.float32)
 
     def get_state(self):
-        """See class definition."""
+        """See class definition.
+
+        The observation is written in place into a preallocated buffer, in
+        which every RL vehicle is assigned a fixed slot. The slots of vehicles
+        that are not currently in the network are padded with zeros.
+        """
         headway_scale = 1000
 
-        rl_ids = self.k.vehicle.get_rl_ids()
-
-        # rl vehicle data (absolute position, speed, and lane index)
-        rl_obs = np.empty(0)
-        id_counter = 0
-        for veh_id in rl_ids:
-            # check if we have skipped a vehicle, if not, pad
-            rl_id_num = self.rl_id_list.index(veh_id)
-            if rl_id_num != id_counter:
-                rl_obs = np.concatenate(
-                    (rl_obs, np.zeros(4 * (rl_id_num - id_counter))))
-                id_counter = rl_id_num + 1
-            else:
-                id_counter += 1
+        rl_ids, slots = self._get_rl_slots()
 
-            # get the edge and convert it to a number
-            edge_num = self.k.vehicle.get_edge(veh_id)
-            if edge_num is None or edge_num == '' or edge_num[0] == ':':
-                edge_num = -1
-            else:
-                edge_num = int(edge_num) / 6
-            rl_obs = np.concatenate((rl_obs, [
-                self.k.vehicle.get_x_by_id(veh_id) / 1000,
-                (self.k.vehicle.get_speed(veh_id) / self.max_speed),
-                (self.k.vehicle.get_lane(veh_id) / MAX_LANES), edge_num
-            ]))
-
-        # if all the missing vehicles are at the end, pad
-        diff = self.num_rl - int(rl_obs.shape[0] / 4)
-        if diff > 0:
-            rl_obs = np.concatenate((rl_obs, np.zeros(4 * diff)))
+        self._obs.fill(0)
+
+        # rl vehicle data (absolute position, speed, lane index, and edge
+        # number)
+        edges = self.k.vehicle.get_edge(rl_ids)
+        edge_nums = [-1 if edge is None or edge == '' or edge[0] == ':'
+                     else int(edge) / 6 for edge in edges]
+        self._rl_obs[slots, 0] = \
+            np.array(self.k.vehicle.get_x_by_id(rl_ids)) / 1000
+        self._rl_obs[slots, 1] = \
+            np.array(self.k.vehicle.get_speed(rl_ids)) / self.max_speed
+        self._rl_obs[slots, 2] = \
+            np.array(self.k.vehicle.get_lane(rl_ids)) / MAX_LANES
+        self._rl_obs[slots, 3] = edge_nums
 
         # relative vehicles data (lane headways, tailways, vel_ahead, and
-        # vel_behind)
-        relative_obs = np.empty(0)
-        id_counter = 0
-        for veh_id in rl_ids:
-            # check if we have skipped a vehicle, if not, pad
-            rl_id_num = self.rl_id_list.index(veh_id)
-            if rl_id_num != id_counter:
-                pad_mat = np.zeros(
-                    4 * MAX_LANES * self.scaling * (rl_id_num - id_counter))
-                relative_obs = np.concatenate((relative_obs, pad_mat))
-                id_counter = rl_id_num + 1
-            else:
-                id_counter += 1
-            num_lanes = MAX_LANES * self.scaling
-            headway = np.asarray([1000] * num_lanes) / headway_scale
-            tailway = np.asarray([1000] * num_lanes) / headway_scale
-            vel_in_front = np.asarray([0] * num_lanes) / self.max_speed
-            vel_behind = np.asarray([0] * num_lanes) / self.max_speed
-
-            lane_leaders = self.k.vehicle.get_lane_leaders(veh_id)
-            lane_followers = self.k.vehicle.get_lane_followers(veh_id)
-            lane_headways = self.k.vehicle.get_lane_headways(veh_id)
-            lane_tailways = self.k.vehicle.get_lane_tailways(veh_id)
-            headway[0:len(lane_headways)] = (
-                np.asarray(lane_headways) / headway_scale)
-            tailway[0:len(lane_tailways)] = (
-                np.asarray(lane_tailways) / headway_scale)
-            for i, lane_leader in enumerate(lane_leaders):
-                if lane_leader != '':
-                    vel_in_front[i] = (
-                        self.k.vehicle.get_speed(lane_leader) / self.max_speed)
-            for i, lane_follower in enumerate(lane_followers):
-                if lane_followers != '':
-                    vel_behind[i] = (self.k.vehicle.get_speed(lane_follower) /
-                                     self.max_speed)
-
-            relative_obs = np.concatenate((relative_obs, headway, tailway,
-                                           vel_in_front, vel_behind))
-
-        # if all the missing vehicles are at the end, pad
-        diff = self.num_rl - int(relative_obs.shape[0] / (4 * MAX_LANES))
-        if diff > 0:
-            relative_obs = np.concatenate((relative_obs,
-                                           np.zeros(4 * MAX_LANES * diff)))
-
-        # per edge data (average speed, density
-        edge_obs = []
-        for edge in self.k.network.get_edge_list():
+        # vel_behind). Lanes that do not exist in the current edge of a
+        # vehicle default to a headway/tailway of 1000 and a speed of 0.
+        num_lanes = MAX_LANES * self.scaling
+        self._relative_obs[slots, 0] = stack_padded(
+            self.k.vehicle.get_lane_headways(rl_ids), num_lanes,
+            1000) / headway_scale
+        self._relative_obs[slots, 1] = stack_padded(
+            self.k.vehicle.get_lane_tailways(rl_ids), num_lanes,
+            1000) / headway_scale
+        self._relative_obs[slots, 2] = stack_padded(
+            self.k.vehicle.get_lane_leaders_speed(rl_ids),
+            num_lanes) / self.max_speed
+        self._relative_obs[slots, 3] = stack_padded(
+            self.k.vehicle.get_lane_followers_speed(rl_ids),
+            num_lanes) / self.max_speed
+
+        # per edge data (average speed, density)
+        for i, edge in enumerate(self.k.network.get_edge_list()):
             veh_ids = self.k.vehicle.get_ids_by_edge(edge)
             if len(veh_ids) > 0:
-                avg_speed = (sum(self.k.vehicle.get_speed(veh_ids)) /
-                             len(veh_ids)) / self.max_speed
-                density = len(veh_ids) / self.k.network.edge_length(edge)
-                edge_obs += [avg_speed, density]
-            else:
-                edge_obs += [0, 0]
+                self._edge_obs[i, 0] = np.mean(
+                    self.k.vehicle.get_speed(veh_ids)) / self.max_speed
+                self._edge_obs[i, 1] = \
+                    len(veh_ids) / self.k.network.edge_length(edge)
 
-        return np.concatenate((rl_obs, relative_obs, edge_obs))
+        return self._obs.copy()
 
     def compute_reward(self, rl_actions, **kwargs):
         """See class definition."""
@@ -668,26 +658,42 @@ class BottleneckAccelEnv(BottleneckEnv):
         for actions during that lane change. if a lane change isn't applied,
         and sufficient time has passed, issue an acceleration like normal.
         """
-        num_rl = self.k.vehicle.num_rl_vehicles
-        acceleration = actions[::2][:num_rl]
-        direction = np.round(actions[1::2])[:num_rl]
-
-        # re-arrange actions according to mapping in observation space
-        sorted_rl_ids = sorted(self.k.vehicle.get_rl_ids(),
-                               key=self.k.vehicle.get_x_by_id)
+        # pick the actions of every vehicle from its slot, as in the
+        # observation space
+        rl_ids, slots = self._get_rl_slots()
+        acceleration = np.asarray(actions[::2])[slots]
+        direction = np.round(actions[1::2])[slots]
 
         # represents vehicles that are allowed to change lanes
         non_lane_changing_veh = [
             self.time_counter <= self.env_params.additional_params[
                 'lane_change_duration'] + self.k.vehicle.get_last_lc(veh_id)
-            for veh_id in sorted_rl_ids]
+            for veh_id in rl_ids]
 
         # vehicle that are not allowed to change have their directions set to 0
-        direction[non_lane_changing_veh] = \
-            np.array([0] * sum(non_lane_changing_veh))
+        direction[non_lane_changing_veh] = 0
 
-        self.k.vehicle.apply_acceleration(sorted_rl_ids, acc=acceleration)
-        self.k.vehicle.apply_lane_change(sorted_rl_ids, direction=direction)
+        self.k.vehicle.apply_acceleration(rl_ids, acc=acceleration)
+        self.k.vehicle.apply_lane_change(rl_ids, direction=direction)
+
+    def _get_rl_slots(self):
+        """Return the RL vehicles in the network that have a slot.
+
+        Returns
+        -------
+        list of str
+            ids of the RL vehicles
+        np.ndarray
+            slot of every vehicle
+        """
+        rl_ids = []
+        slots = []
+        for veh_id in self.k.vehicle.get_rl_ids():
+            slot = self.rl_slots.get_slot(veh_id)
+            if slot is not None:
+                rl_ids.append(veh_id)
+                slots.append(slot)
+        return rl_ids, np.array(slots, dtype=int)
 
     def additional_command(self):
         """Reintroduce any RL vehicle that may have exited in the last step.
@@ -697,16 +703,29 @@ class BottleneckAccelEnv(BottleneckEnv):
         action space.
         """
         super().additional_command()
+
+        # update the slots of the RL vehicles that entered or left the network
+        if self.simulator == 'traci':
+            # no events are reported by the kernel right after a reset
+            departed_ids = [
+                veh_id for veh_id in self.k.vehicle.get_departed_ids() or []
+                if isinstance(self.k.vehicle.get_acc_controller(veh_id),
+                              RLController)]
+            self.rl_slots.update(departed_ids,
+                                 self.k.vehicle.get_arrived_ids())
+        else:
+            self.rl_slots.sync(self.k.vehicle.get_rl_ids())
+
         # if the number of rl vehicles has decreased introduce it back in
         num_rl = self.k.vehicle.num_rl_vehicles
         if num_rl != len(self.rl_id_list) and self.add_rl_if_exit:
-            # find the vehicles that have exited
-            diff_list = list(
-                set(self.rl_id_list).difference(self.k.vehicle.get_rl_ids()))
-            for rl_id in diff_list:
+            rl_ids = set(self.k.vehicle.get_rl_ids())
+            for i, rl_id in enumerate(self.rl_id_list):
+                # only reintroduce the vehicles that have exited
+                if rl_id in rl_ids:
+                    continue
                 # distribute rl cars evenly over lanes
-                lane_num = self.rl_id_list.index(rl_id) % \
-                           MAX_LANES * self.scaling
+                lane_num = i % MAX_LANES * self.scaling
                 # reintroduce it at the start of the network
                 try:
                     self.k.vehicle.add(
@@ -719,6 +738,15 @@ class BottleneckAccelEnv(BottleneckEnv):
                 except Exception:
                     pass
 
+    def reset(self):
+        """See parent class.
+
+        In addition, the initial RL vehicles are assigned the slots of their
+        order before the new rollout starts.
+        """
+        self.rl_slots.reset(self.rl_id_list)
+        return super().reset()
+
 
 class BottleneckDesiredVelocityEnv(BottleneckEnv):
     """BottleneckDesiredVelocityEnv.
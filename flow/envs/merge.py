@@ -5,13 +5,14 @@ This environment was used in:
 TODO(ak): add paper after it has been published.
 """
 
+from flow.controllers.rlcontroller import RLController
 from flow.envs.base import Env
 from flow.core import rewards
+from flow.core.util import SlotManager
 
 from gym.spaces.box import Box
 
 import numpy as np
-import collections
 
 ADDITIONAL_ENV_PARAMS = {
     # maximum acceleration for autonomous vehicles, in m/s^2
@@ -70,6 +71,10 @@ class MergePOEnv(Env):
         vehicles collide into one another.
     """
 
+    vehicle_fields = ('leader',)
+    warmup_attributes = Env.warmup_attributes + (
+        'rl_slots', '_sync_rl_slots', 'leader', 'follower')
+
     def __init__(self, env_params, sim_params, network, simulator='traci'):
         for p in ADDITIONAL_ENV_PARAMS.keys():
             if p not in env_params.additional_params:
@@ -79,11 +84,13 @@ class MergePOEnv(Env):
         # maximum number of controlled vehicles
         self.num_rl = env_params.additional_params["num_rl"]
 
-        # queue of rl vehicles waiting to be controlled
-        self.rl_queue = collections.deque()
+        # slots of the rl vehicles controlled at any step, and queue of rl
+        # vehicles waiting to be controlled
+        self.rl_slots = SlotManager(self.num_rl)
 
-        # names of the rl vehicles controlled at any step
-        self.rl_veh = []
+        # whether the slots need to be rebuilt from the ids of the rl
+        # vehicles, as opposed to the departure/arrival events of the kernel
+        self._sync_rl_slots = True
 
         # used for visualization: the vehicles behind and after RL vehicles
         # (ie the observed vehicles) will have a different color
@@ -108,9 +115,10 @@ class MergePOEnv(Env):
 
     def _apply_rl_actions(self, rl_actions):
         """See class definition."""
-        for i, rl_id in enumerate(self.rl_veh):
-            # ignore rl vehicles outside the network
-            if rl_id not in self.k.vehicle.get_rl_ids():
+        rl_ids = set(self.k.vehicle.get_rl_ids())
+        for i, rl_id in enumerate(self.rl_slots.ids):
+            # ignore empty slots and rl vehicles outside the network
+            if rl_id not in rl_ids:
                 continue
             self.k.vehicle.apply_acceleration(rl_id, rl_actions[i])
 
@@ -124,7 +132,9 @@ class MergePOEnv(Env):
         max_length = self.k.network.length()
 
         observation = [0 for _ in range(5 * self.num_rl)]
-        for i, rl_id in enumerate(self.rl_veh):
+        for i, rl_id in enumerate(self.rl_slots.ids):
+            if rl_id is None:
+                continue
             this_speed = self.k.vehicle.get_speed(rl_id)
             lead_id = self.k.vehicle.get_leader(rl_id)
             follower = self.k.vehicle.get_follower(rl_id)
@@ -172,7 +182,7 @@ class MergePOEnv(Env):
             # penalize small time headways
             cost2 = 0
             t_min = 1  # smallest acceptable time headway
-            for rl_id in self.rl_veh:
+            for rl_id in self.rl_slots.get_ids():
                 lead_id = self.k.vehicle.get_leader(rl_id)
                 if lead_id not in ["", None] \
                         and self.k.vehicle.get_speed(rl_id) > 0:
@@ -192,29 +202,27 @@ class MergePOEnv(Env):
         This method performs to auxiliary tasks:
 
         * Define which vehicles are observed for visualization purposes.
-        * Maintains the "rl_veh" and "rl_queue" variables to ensure the RL
-          vehicles that are represented in the state space does not change
-          until one of the vehicles in the state space leaves the network.
-          Then, the next vehicle in the queue is added to the state space and
+        * Maintains the "rl_slots" variable to ensure the RL vehicles that are
+          represented in the state space, and their position in it, do not
+          change until one of the vehicles in the state space leaves the
+          network. Then, the next vehicle in the queue takes its slot and is
           provided with actions from the policy.
         """
-        # add rl vehicles that just entered the network into the rl queue
-        for veh_id in self.k.vehicle.get_rl_ids():
-            if veh_id not in list(self.rl_queue) + self.rl_veh:
-                self.rl_queue.append(veh_id)
-
-        # remove rl vehicles that exited the network
-        for veh_id in list(self.rl_queue):
-            if veh_id not in self.k.vehicle.get_rl_ids():
-                self.rl_queue.remove(veh_id)
-        for veh_id in self.rl_veh:
-            if veh_id not in self.k.vehicle.get_rl_ids():
-                self.rl_veh.remove(veh_id)
-
-        # fil up rl_veh until they are enough controlled vehicles
-        while len(self.rl_queue) > 0 and len(self.rl_veh) < self.num_rl:
-            rl_id = self.rl_queue.popleft()
-            self.rl_veh.append(rl_id)
+        if self._sync_rl_slots or self.simulator != 'traci':
+            # the vehicles placed in the network during a reset are not
+            # reported as departed by the kernel
+            self.rl_slots.sync(self.k.vehicle.get_rl_ids())
+            self._sync_rl_slots = False
+        else:
+            departed_ids = [
+                veh_id for veh_id in self.k.vehicle.get_departed_ids() or []
+                if isinstance(self.k.vehicle.get_acc_controller(veh_id),
+                              RLController)]
+            self.rl_slots.update(departed_ids,
+                                 self.k.vehicle.get_arrived_ids())
+            # vehicles may leave the network without being reported as
+            # arrived, e.g. when they are removed after a collision
+            self.rl_slots.remove_missing(self.k.vehicle.get_rl_ids())
 
         # specify observed vehicles
         for veh_id in self.leader + self.follower:
@@ -228,4 +236,6 @@ class MergePOEnv(Env):
         """
         self.leader = []
         self.follower = []
+        self.rl_slots.reset()
+        self._sync_rl_slots = True
         return super().reset()
@@ -1,16 +1,25 @@
-"""Empty init file to ensure documentation for multi-agent envs is created."""
+"""Empty init file to ensure documentation for multi-agent envs is created.
 
-from flow.envs.multiagent.base import MultiEnv
-from flow.envs.multiagent.ring.wave_attenuation import \
-    MultiWaveAttenuationPOEnv
-from flow.envs.multiagent.ring.wave_attenuation import \
-    MultiAgentWaveAttenuationPOEnv
-from flow.envs.multiagent.ring.accel import AdversarialAccelEnv
-from flow.envs.multiagent.ring.accel import MultiAgentAccelPOEnv
-from flow.envs.multiagent.traffic_light_grid import MultiTrafficLightGridPOEnv
-from flow.envs.multiagent.highway import MultiAgentHighwayPOEnv
-from flow.envs.multiagent.merge import MultiAgentMergePOEnv
-from flow.envs.multiagent.i210 import I210MultiEnv
+The environments are imported when they are first accessed (see
+flow/utils/lazy_import.py).
+"""
+from flow.utils.lazy_import import lazy_module
+
+# module containing every environment
+_ENVS = {
+    'MultiEnv': 'flow.envs.multiagent.base',
+    'MultiWaveAttenuationPOEnv': 'flow.envs.multiagent.ring.wave_attenuation',
+    'MultiAgentWaveAttenuationPOEnv':
+        'flow.envs.multiagent.ring.wave_attenuation',
+    'AdversarialAccelEnv': 'flow.envs.multiagent.ring.accel',
+    'MultiAgentAccelPOEnv': 'flow.envs.multiagent.ring.accel',
+    'MultiTrafficLightGridPOEnv': 'flow.envs.multiagent.traffic_light_grid',
+    'MultiAgentHighwayPOEnv': 'flow.envs.multiagent.highway',
+    'MultiAgentMergePOEnv': 'flow.envs.multiagent.merge',
+    'I210MultiEnv': 'flow.envs.multiagent.i210',
+}
+
+__getattr__, __dir__ = lazy_module(__name__, _ENVS)
 
 __all__ = [
     'MultiEnv',
@@ -1,6 +1,5 @@
 """Environment for training multi-agent experiments."""
 
-from copy import deepcopy
 import numpy as np
 import random
 import traceback
@@ -73,15 +72,14 @@ class MultiEnv(MultiAgentEnv, Env):
                     self.k.vehicle.get_controlled_lc_ids(),
                     direction=direction)
 
-            # perform (optionally) routing actions for all vehicle in the
-            # network, including rl and sumo-controlled vehicles
-            routing_ids = []
+            # perform (optionally) routing actions for the vehicles whose
+            # routing controller was triggered, including RL and
+            # SUMO-controlled vehicles
+            routing_ids = self.k.vehicle.get_routing_ids()
             routing_actions = []
-            for veh_id in self.k.vehicle.get_ids():
-                if self.k.vehicle.get_routing_controller(veh_id) is not None:
-                    routing_ids.append(veh_id)
-                    route_contr = self.k.vehicle.get_routing_controller(veh_id)
-                    routing_actions.append(route_contr.choose_route(self))
+            for veh_id in routing_ids:
+                route_contr = self.k.vehicle.get_routing_controller(veh_id)
+                routing_actions.append(route_contr.choose_route(self))
             self.k.vehicle.choose_routes(routing_ids, routing_actions)
 
             self.apply_rl_actions(rl_actions)
@@ -106,8 +104,8 @@ class MultiEnv(MultiAgentEnv, Env):
                 break
 
         states = self.get_state()
-        done = {key: key in self.k.vehicle.get_arrived_ids()
-                for key in states.keys()}
+        arrived_ids = set(self.k.vehicle.get_arrived_ids() or [])
+        done = {key: key in arrived_ids for key in states.keys()}
         if crash or (self.time_counter >= self.env_params.sims_per_step *
                      (self.env_params.warmup_steps + self.env_params.horizon)):
             done['__all__'] = True
@@ -170,14 +168,24 @@ class MultiEnv(MultiAgentEnv, Env):
                 "**********************************************************"
             )
 
+        # restore a cached warmed-up state, if available
+        warmup_slot = None
+        if self.warmup_cache is not None:
+            warmup_slot, warmup_state = self.warmup_cache.choose(
+                self._warmup_key())
+            if warmup_state is not None:
+                observation = self._load_warmup_state(
+                    warmup_slot, warmup_state)
+                self.render(reset=True)
+                return observation
+
         if self.sim_params.restart_instance or \
                 (self.step_counter > 2e6 and self.simulator != 'aimsun'):
             self.step_counter = 0
             # issue a random seed to induce randomness into the next rollout
             self.sim_params.seed = random.randint(0, 1e5)
 
-            self.k.vehicle = deepcopy(self.initial_vehicles)
-            self.k.vehicle.master_kernel = self.k
+            self.k.vehicle = self.initial_vehicles.restore(self.k)
             # restart the sumo instance
             self.restart_simulation(self.sim_params)
 
@@ -262,7 +270,71 @@ class MultiEnv(MultiAgentEnv, Env):
         # render a frame
         self.render(reset=True)
 
-        return self.get_state()
+        observation = self.get_state()
+
+        # cache the warmed-up state of the simulation
+        if warmup_slot is not None:
+            self._save_warmup_state(warmup_slot, observation)
+
+        return observation
+
+    def get_dense_state(self):
+        """Return the observations of all agents as a single dense array.
+
+        Environments whose observations can be computed for all agents in one
+        vectorized pass should implement this method, and build the
+        per-agent dictionary expected by RLlib in `get_state` through
+        `agent_dict`.
+
+        Returns
+        -------
+        list of str
+            ids of the agents, in the order of the rows of the observations
+        np.ndarray
+            observations of all agents, of shape (n_agents, obs_dim)
+        """
+        raise NotImplementedError
+
+    def compute_dense_reward(self, agent_ids, rl_actions, **kwargs):
+        """Return the rewards of a set of agents as a dense vector.
+
+        See `get_dense_state` and `compute_reward`.
+
+        Parameters
+        ----------
+        agent_ids : list of str
+            ids of the agents to compute the reward for
+        rl_actions : dict of array_like
+            actions performed by the agents
+        kwargs : dict
+            other parameters of interest. Contains a "fail" element, which
+            is True if a vehicle crashed, and False otherwise
+
+        Returns
+        -------
+        np.ndarray
+            rewards of the agents, in the order of `agent_ids`
+        """
+        raise NotImplementedError
+
+    @staticmethod
+    def agent_dict(agent_ids, values):
+        """Return a per-agent view of dense per-agent values.
+
+        Parameters
+        ----------
+        agent_ids : list of str
+            ids of the agents
+        values : array_like
+            value of every agent, with the leading dimension matching the
+            order of `agent_ids`
+
+        Returns
+        -------
+        dict
+            Key = agent id, Element = value of the agent
+        """
+        return dict(zip(agent_ids, values))
 
     def clip_actions(self, rl_actions=None):
         """Clip the actions passed from the RL agent.
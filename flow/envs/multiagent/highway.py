@@ -1,7 +1,7 @@
 """Environment used to train vehicles to improve traffic on a highway."""
 import numpy as np
 from gym.spaces.box import Box
-from flow.core.rewards import desired_velocity
+from flow.core.rewards import desired_velocity, time_headway_penalty_array
 from flow.envs.multiagent.base import MultiEnv
 
 
@@ -57,6 +57,8 @@ class MultiAgentHighwayPOEnv(MultiEnv):
         vehicles collide into one another.
     """
 
+    vehicle_fields = ('leader',)
+
     def __init__(self, env_params, sim_params, network, simulator='traci'):
         for p in ADDITIONAL_ENV_PARAMS.keys():
             if p not in env_params.additional_params:
@@ -96,44 +98,47 @@ class MultiAgentHighwayPOEnv(MultiEnv):
 
     def get_state(self):
         """See class definition."""
-        obs = {}
+        return self.agent_dict(*self.get_dense_state())
+
+    def get_dense_state(self):
+        """See parent class."""
+        veh = self.k.vehicle
+        rl_ids = list(veh.get_rl_ids())
 
         # normalizing constants
         max_speed = self.k.network.max_speed()
         max_length = self.k.network.length()
 
-        for rl_id in self.k.vehicle.get_rl_ids():
-            this_speed = self.k.vehicle.get_speed(rl_id)
-            lead_id = self.k.vehicle.get_leader(rl_id)
-            follower = self.k.vehicle.get_follower(rl_id)
-
-            if lead_id in ["", None]:
-                # in case leader is not visible
-                lead_speed = max_speed
-                lead_head = max_length
-            else:
-                lead_speed = self.k.vehicle.get_speed(lead_id)
-                lead_head = self.k.vehicle.get_headway(lead_id)
-
-            if follower in ["", None]:
-                # in case follower is not visible
-                follow_speed = 0
-                follow_head = max_length
-            else:
-                follow_speed = self.k.vehicle.get_speed(follower)
-                follow_head = self.k.vehicle.get_headway(follower)
-
-            observation = np.array([
-                this_speed / max_speed,
-                (lead_speed - this_speed) / max_speed,
-                lead_head / max_length,
-                (this_speed - follow_speed) / max_speed,
-                follow_head / max_length
-            ])
-
-            obs.update({rl_id: observation})
-
-        return obs
+        this_speed = np.array(veh.get_speed(rl_ids), dtype=float)
+
+        # in case the leader is not visible, use the max speed and length
+        lead_ids = veh.get_leader(rl_ids)
+        no_leader = np.array([lead_id in ["", None] for lead_id in lead_ids],
+                             dtype=bool)
+        lead_speed = np.array(veh.get_speed(lead_ids), dtype=float)
+        lead_head = np.array(veh.get_headway(lead_ids), dtype=float)
+        lead_speed[no_leader] = max_speed
+        lead_head[no_leader] = max_length
+
+        # in case the follower is not visible, use a zero speed and the max
+        # length
+        follower_ids = veh.get_follower(rl_ids)
+        no_follower = np.array([f_id in ["", None] for f_id in follower_ids],
+                               dtype=bool)
+        follow_speed = np.array(veh.get_speed(follower_ids), dtype=float)
+        follow_head = np.array(veh.get_headway(follower_ids), dtype=float)
+        follow_speed[no_follower] = 0
+        follow_head[no_follower] = max_length
+
+        obs = np.stack([
+            this_speed / max_speed,
+            (lead_speed - this_speed) / max_speed,
+            lead_head / max_length,
+            (this_speed - follow_speed) / max_speed,
+            follow_head / max_length
+        ], axis=1)
+
+        return rl_ids, obs.reshape(len(rl_ids), self.observation_space.shape[0])
 
     def compute_reward(self, rl_actions, **kwargs):
         """See class definition."""
@@ -141,37 +146,33 @@ class MultiAgentHighwayPOEnv(MultiEnv):
         if rl_actions is None:
             return {}
 
-        rewards = {}
-        for rl_id in self.k.vehicle.get_rl_ids():
-            if self.env_params.evaluate:
-                # reward is speed of vehicle if we are in evaluation mode
-                reward = self.k.vehicle.get_speed(rl_id)
-            elif kwargs['fail']:
-                # reward is 0 if a collision occurred
-                reward = 0
-            else:
-                # reward high system-level velocities
-                cost1 = desired_velocity(self, fail=kwargs['fail'])
-
-                # penalize small time headways
-                cost2 = 0
-                t_min = 1  # smallest acceptable time headway
-
-                lead_id = self.k.vehicle.get_leader(rl_id)
-                if lead_id not in ["", None] \
-                        and self.k.vehicle.get_speed(rl_id) > 0:
-                    t_headway = max(
-                        self.k.vehicle.get_headway(rl_id) /
-                        self.k.vehicle.get_speed(rl_id), 0)
-                    cost2 += min((t_headway - t_min) / t_min, 0)
-
-                # weights for cost1, cost2, and cost3, respectively
-                eta1, eta2 = 1.00, 0.10
-
-                reward = max(eta1 * cost1 + eta2 * cost2, 0)
-
-            rewards[rl_id] = reward
-        return rewards
+        rl_ids = list(self.k.vehicle.get_rl_ids())
+        return self.agent_dict(
+            rl_ids, self.compute_dense_reward(rl_ids, rl_actions, **kwargs))
+
+    def compute_dense_reward(self, agent_ids, rl_actions, **kwargs):
+        """See parent class."""
+        veh = self.k.vehicle
+        speed = np.array(veh.get_speed(agent_ids), dtype=float)
+
+        if self.env_params.evaluate:
+            # reward is speed of vehicle if we are in evaluation mode
+            return speed
+        elif kwargs['fail']:
+            # reward is 0 if a collision occurred
+            return np.zeros(len(agent_ids))
+
+        # reward high system-level velocities (shared by all agents)
+        cost1 = desired_velocity(self, fail=kwargs['fail'])
+
+        # penalize small time headways
+        cost2 = time_headway_penalty_array(
+            speed, veh.get_headway(agent_ids), veh.get_leader(agent_ids))
+
+        # weights for cost1, cost2, and cost3, respectively
+        eta1, eta2 = 1.00, 0.10
+
+        return np.maximum(eta1 * cost1 + eta2 * cost2, 0)
 
     def additional_command(self):
         """See parent class.
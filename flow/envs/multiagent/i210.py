@@ -3,7 +3,8 @@
 from gym.spaces import Box
 import numpy as np
 
-from flow.core.rewards import average_velocity
+from flow.core.rewards import average_velocity, time_headway_penalty_array
+from flow.core.util import stack_padded
 from flow.envs.multiagent.base import MultiEnv
 
 # largest number of lanes on any given edge in the network
@@ -56,6 +57,8 @@ class I210MultiEnv(MultiEnv):
         vehicles collide into one another.
     """
 
+    vehicle_fields = ('leader',)
+
     def __init__(self, env_params, sim_params, network, simulator='traci'):
         super().__init__(env_params, sim_params, network, simulator)
         self.lead_obs = env_params.additional_params.get("lead_obs")
@@ -113,60 +116,60 @@ class I210MultiEnv(MultiEnv):
 
     def get_state(self):
         """See class definition."""
+        return self.agent_dict(*self.get_dense_state())
+
+    def get_dense_state(self):
+        """See parent class."""
+        veh = self.k.vehicle
+        rl_ids = list(veh.get_rl_ids())
+
         if self.lead_obs:
-            veh_info = {}
-            for rl_id in self.k.vehicle.get_rl_ids():
-                speed = self.k.vehicle.get_speed(rl_id)
-                headway = self.k.vehicle.get_headway(rl_id)
-                lead_speed = self.k.vehicle.get_speed(self.k.vehicle.get_leader(rl_id))
-                if lead_speed == -1001:
-                    lead_speed = 0
-                veh_info.update({rl_id: np.array([speed / 50.0, headway / 1000.0, lead_speed / 50.0])})
+            speed = np.array(veh.get_speed(rl_ids), dtype=float)
+            headway = np.array(veh.get_headway(rl_ids), dtype=float)
+            lead_speed = np.array(
+                veh.get_speed(veh.get_leader(rl_ids)), dtype=float)
+            lead_speed[lead_speed == -1001] = 0
+            obs = np.stack(
+                [speed / 50.0, headway / 1000.0, lead_speed / 50.0], axis=1)
         else:
-            veh_info = {rl_id: np.concatenate((self.state_util(rl_id),
-                                               self.veh_statistics(rl_id)))
-                        for rl_id in self.k.vehicle.get_rl_ids()}
-        return veh_info
+            obs = np.concatenate((self.state_util(rl_ids),
+                                  self.veh_statistics(rl_ids)), axis=1)
+
+        return rl_ids, obs.reshape(len(rl_ids), self.observation_space.shape[0])
 
     def compute_reward(self, rl_actions, **kwargs):
-        # TODO(@evinitsky) we need something way better than this. Something that adds
-        # in notions of local reward
         """See class definition."""
         # in the warmup steps
         if rl_actions is None:
             return {}
 
-        rewards = {}
-        for rl_id in self.k.vehicle.get_rl_ids():
-            if self.env_params.evaluate:
-                # reward is speed of vehicle if we are in evaluation mode
-                reward = self.k.vehicle.get_speed(rl_id)
-            elif kwargs['fail']:
-                # reward is 0 if a collision occurred
-                reward = 0
-            else:
-                # reward high system-level velocities
-                cost1 = average_velocity(self, fail=kwargs['fail'])
-
-                # penalize small time headways
-                cost2 = 0
-                t_min = 1  # smallest acceptable time headway
-
-                lead_id = self.k.vehicle.get_leader(rl_id)
-                if lead_id not in ["", None] \
-                        and self.k.vehicle.get_speed(rl_id) > 0:
-                    t_headway = max(
-                        self.k.vehicle.get_headway(rl_id) /
-                        self.k.vehicle.get_speed(rl_id), 0)
-                    cost2 += min((t_headway - t_min) / t_min, 0)
-
-                # weights for cost1, cost2, and cost3, respectively
-                eta1, eta2 = 1.00, 0.10
-
-                reward = max(eta1 * cost1 + eta2 * cost2, 0)
-
-            rewards[rl_id] = reward
-        return rewards
+        rl_ids = list(self.k.vehicle.get_rl_ids())
+        return self.agent_dict(
+            rl_ids, self.compute_dense_reward(rl_ids, rl_actions, **kwargs))
+
+    def compute_dense_reward(self, agent_ids, rl_actions, **kwargs):
+        """See parent class."""
+        veh = self.k.vehicle
+        speed = np.array(veh.get_speed(agent_ids), dtype=float)
+
+        if self.env_params.evaluate:
+            # reward is speed of vehicle if we are in evaluation mode
+            return speed
+        elif kwargs['fail']:
+            # reward is 0 if a collision occurred
+            return np.zeros(len(agent_ids))
+
+        # reward high system-level velocities (shared by all agents)
+        cost1 = average_velocity(self, fail=kwargs['fail'])
+
+        # penalize small time headways
+        cost2 = time_headway_penalty_array(
+            speed, veh.get_headway(agent_ids), veh.get_leader(agent_ids))
+
+        # weights for cost1, cost2, and cost3, respectively
+        eta1, eta2 = 1.00, 0.10
+
+        return np.maximum(eta1 * cost1 + eta2 * cost2, 0)
 
     def additional_command(self):
         """See parent class.
@@ -184,42 +187,66 @@ class I210MultiEnv(MultiEnv):
             if follow_id:
                 self.k.vehicle.set_observed(follow_id)
 
-    def state_util(self, rl_id):
+    def state_util(self, rl_ids):
         """Return an array of headway, tailway, leader speed, follower speed.
 
         Also return a 1 if leader is rl 0 otherwise, a 1 if follower is rl 0 otherwise.
         If there are fewer than MAX_LANES the extra
         entries are filled with -1 to disambiguate from zeros.
+
+        Parameters
+        ----------
+        rl_ids : str or list of str
+            id of the agent, or list of agent ids
+
+        Returns
+        -------
+        np.ndarray
+            the above values, of shape (6 * MAX_LANES,) for a single agent,
+            or (len(rl_ids), 6 * MAX_LANES) for a list of agents
         """
+        if isinstance(rl_ids, str):
+            return self.state_util([rl_ids])[0]
+
         veh = self.k.vehicle
-        lane_headways = veh.get_lane_headways(rl_id).copy()
-        lane_tailways = veh.get_lane_tailways(rl_id).copy()
-        lane_leader_speed = veh.get_lane_leaders_speed(rl_id).copy()
-        lane_follower_speed = veh.get_lane_followers_speed(rl_id).copy()
-        leader_ids = veh.get_lane_leaders(rl_id).copy()
-        follower_ids = veh.get_lane_followers(rl_id).copy()
-        rl_ids = self.k.vehicle.get_rl_ids()
-        is_leader_rl = [1 if l_id in rl_ids else 0 for l_id in leader_ids]
-        is_follow_rl = [1 if f_id in rl_ids else 0 for f_id in follower_ids]
-        diff = MAX_LANES - len(is_leader_rl)
-        if diff > 0:
-            # the minus 1 disambiguates missing cars from missing lanes
-            lane_headways += diff * [-1]
-            lane_tailways += diff * [-1]
-            lane_leader_speed += diff * [-1]
-            lane_follower_speed += diff * [-1]
-            is_leader_rl += diff * [-1]
-            is_follow_rl += diff * [-1]
-        lane_headways = np.asarray(lane_headways) / 1000
-        lane_tailways = np.asarray(lane_tailways) / 1000
-        lane_leader_speed = np.asarray(lane_leader_speed) / 100
-        lane_follower_speed = np.asarray(lane_follower_speed) / 100
-        return np.concatenate((lane_headways, lane_tailways, lane_leader_speed,
-                               lane_follower_speed, is_leader_rl,
-                               is_follow_rl))
-
-    def veh_statistics(self, rl_id):
-        """Return speed, edge information, and x, y about the vehicle itself."""
-        speed = self.k.vehicle.get_speed(rl_id) / 100.0
-        lane = (self.k.vehicle.get_lane(rl_id) + 1) / 10.0
-        return np.array([speed, lane])
+        all_rl_ids = set(veh.get_rl_ids())
+        leader_ids = veh.get_lane_leaders(rl_ids)
+        follower_ids = veh.get_lane_followers(rl_ids)
+        is_leader_rl = [[1 if l_id in all_rl_ids else 0 for l_id in leaders]
+                        for leaders in leader_ids]
+        is_follow_rl = [[1 if f_id in all_rl_ids else 0 for f_id in followers]
+                        for followers in follower_ids]
+
+        # the minus 1 disambiguates missing cars from missing lanes
+        return np.concatenate((
+            stack_padded(veh.get_lane_headways(rl_ids), MAX_LANES, -1) / 1000,
+            stack_padded(veh.get_lane_tailways(rl_ids), MAX_LANES, -1) / 1000,
+            stack_padded(veh.get_lane_leaders_speed(rl_ids), MAX_LANES, -1)
+            / 100,
+            stack_padded(veh.get_lane_followers_speed(rl_ids), MAX_LANES, -1)
+            / 100,
+            stack_padded(is_leader_rl, MAX_LANES, -1),
+            stack_padded(is_follow_rl, MAX_LANES, -1),
+        ), axis=1)
+
+    def veh_statistics(self, rl_ids):
+        """Return speed, edge information, and x, y about the vehicle itself.
+
+        Parameters
+        ----------
+        rl_ids : str or list of str
+            id of the agent, or list of agent ids
+
+        Returns
+        -------
+        np.ndarray
+            the above values, of shape (2,) for a single agent, or
+            (len(rl_ids), 2) for a list of agents
+        """
+        if isinstance(rl_ids, str):
+            return self.veh_statistics([rl_ids])[0]
+
+        speed = np.array(self.k.vehicle.get_speed(rl_ids), dtype=float) / 100.0
+        lane = (np.array(self.k.vehicle.get_lane(rl_ids), dtype=float) + 1) \
+            / 10.0
+        return np.stack([speed, lane], axis=1)
@@ -75,13 +75,15 @@ class AdversarialAccelEnv(AccelEnv, MultiEnv):
     def get_state(self, **kwargs):
         """See class definition for the state.
 
-        The adversary state and the agent state are identical.
+        The adversary state and the agent state are identical. As both agents
+        share this single global observation, there are no per-agent rows to
+        assemble, and this environment does not implement get_dense_state.
         """
-        state = np.array([[
-            self.k.vehicle.get_speed(veh_id) / self.k.network.max_speed(),
-            self.k.vehicle.get_x_by_id(veh_id) / self.k.network.length()
-        ] for veh_id in self.sorted_ids])
-        state = np.ndarray.flatten(state)
+        speed = [self.k.vehicle.get_speed(veh_id) / self.k.network.max_speed()
+                 for veh_id in self.sorted_ids]
+        pos = np.array(self.k.vehicle.get_x_by_id(self.sorted_ids)) \
+            / self.k.network.length()
+        state = np.ndarray.flatten(np.column_stack((speed, pos)))
         return {'av': state, 'adversary': state}
 
 
@@ -122,6 +124,8 @@ class MultiAgentAccelPOEnv(MultiEnv):
         vehicles collide into one another.
     """
 
+    warmup_attributes = MultiEnv.warmup_attributes + ('leader', 'follower')
+
     def __init__(self, env_params, sim_params, network, simulator='traci'):
         for p in ADDITIONAL_ENV_PARAMS.keys():
             if p not in env_params.additional_params:
@@ -154,59 +158,69 @@ class MultiAgentAccelPOEnv(MultiEnv):
 
     def compute_reward(self, rl_actions, **kwargs):
         """See class definition."""
+        rl_ids = list(self.k.vehicle.get_rl_ids())
+        return self.agent_dict(
+            rl_ids, self.compute_dense_reward(rl_ids, rl_actions, **kwargs))
+
+    def compute_dense_reward(self, agent_ids, rl_actions, **kwargs):
+        """See parent class."""
         # Compute the common reward.
         reward = rewards.desired_velocity(self, fail=kwargs['fail'])
 
         # Reward is shared by all agents.
-        return {key: reward for key in self.k.vehicle.get_rl_ids()}
+        return np.full(len(agent_ids), reward, dtype=float)
 
-    def get_state(self, **kwargs):  # FIXME
+    def get_state(self, **kwargs):
         """See class definition."""
-        self.leader = []
-        self.follower = []
-        obs = {}
+        return self.agent_dict(*self.get_dense_state())
+
+    def get_dense_state(self):
+        """See parent class."""
+        veh = self.k.vehicle
+        rl_ids = list(veh.get_rl_ids())
 
         # normalizing constants
         max_speed = self.k.network.max_speed()
         max_length = self.k.network.length()
 
-        for rl_id in self.k.vehicle.get_rl_ids():
-            this_pos = self.k.vehicle.get_x_by_id(rl_id)
-            this_speed = self.k.vehicle.get_speed(rl_id)
-            lead_id = self.k.vehicle.get_leader(rl_id)
-            follower = self.k.vehicle.get_follower(rl_id)
-
-            if lead_id in ["", None]:
-                # in case leader is not visible
-                lead_speed = max_speed
-                lead_head = max_length
-            else:
-                self.leader.append(lead_id)
-                lead_speed = self.k.vehicle.get_speed(lead_id)
-                lead_head = self.k.vehicle.get_x_by_id(lead_id) \
-                    - self.k.vehicle.get_x_by_id(rl_id) \
-                    - self.k.vehicle.get_length(rl_id)
-
-            if follower in ["", None]:
-                # in case follower is not visible
-                follow_speed = 0
-                follow_head = max_length
-            else:
-                self.follower.append(follower)
-                follow_speed = self.k.vehicle.get_speed(follower)
-                follow_head = self.k.vehicle.get_headway(follower)
-
-            # Add the next observation.
-            obs[rl_id] = np.array([
-                this_pos / max_length,
-                this_speed / max_speed,
-                (lead_speed - this_speed) / max_speed,
-                lead_head / max_length,
-                (this_speed - follow_speed) / max_speed,
-                follow_head / max_length
-            ])
-
-        return obs
+        this_pos = np.array(veh.get_x_by_id(rl_ids), dtype=float)
+        this_speed = np.array(veh.get_speed(rl_ids), dtype=float)
+
+        # in case the leader is not visible, use the max speed and length
+        lead_ids = veh.get_leader(rl_ids)
+        no_leader = np.array([lead_id in ["", None] for lead_id in lead_ids],
+                             dtype=bool)
+        lead_speed = np.array(veh.get_speed(lead_ids), dtype=float)
+        lead_head = np.array(veh.get_x_by_id(lead_ids), dtype=float) \
+            - this_pos - np.array(veh.get_length(rl_ids), dtype=float)
+        lead_speed[no_leader] = max_speed
+        lead_head[no_leader] = max_length
+
+        # in case the follower is not visible, use a zero speed and the max
+        # length
+        follower_ids = veh.get_follower(rl_ids)
+        no_follower = np.array([f_id in ["", None] for f_id in follower_ids],
+                               dtype=bool)
+        follow_speed = np.array(veh.get_speed(follower_ids), dtype=float)
+        follow_head = np.array(veh.get_headway(follower_ids), dtype=float)
+        follow_speed[no_follower] = 0
+        follow_head[no_follower] = max_length
+
+        self.leader = [lead_id for lead_id, missing in
+                       zip(lead_ids, no_leader) if not missing]
+        self.follower = [f_id for f_id, missing in
+                         zip(follower_ids, no_follower) if not missing]
+
+        obs = np.stack([
+            this_pos / max_length,
+            this_speed / max_speed,
+            (lead_speed - this_speed) / max_speed,
+            lead_head / max_length,
+            (this_speed - follow_speed) / max_speed,
+            follow_head / max_length
+        ], axis=1)
+
+        return rl_ids, obs.reshape(len(rl_ids), self.observation_space.shape[0])
 
     def additional_command(self):
         """See parent class.
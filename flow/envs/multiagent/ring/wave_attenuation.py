@@ -12,7 +12,6 @@ import numpy as np
 from gym.spaces.box import Box
 import random
 from scipy.optimize import fsolve
-from copy import deepcopy
 
 from flow.core.params import InitialConfig
 from flow.core.params import NetParams
@@ -72,24 +71,30 @@ class MultiWaveAttenuationPOEnv(MultiEnv):
 
     def get_state(self):
         """See class definition."""
-        obs = {}
-        for rl_id in self.k.vehicle.get_rl_ids():
-            lead_id = self.k.vehicle.get_leader(rl_id) or rl_id
+        return self.agent_dict(*self.get_dense_state())
+
+    def get_dense_state(self):
+        """See parent class."""
+        veh = self.k.vehicle
+        rl_ids = list(veh.get_rl_ids())
+        lead_ids = [lead_id or rl_id for rl_id, lead_id in
+                    zip(rl_ids, veh.get_leader(rl_ids))]
 
-            # normalizers
-            max_speed = 15.
-            max_length = self.env_params.additional_params['ring_length'][1]
+        # normalizers
+        max_speed = 15.
+        max_length = self.env_params.additional_params['ring_length'][1]
 
-            observation = np.array([
-                self.k.vehicle.get_speed(rl_id) / max_speed,
-                (self.k.vehicle.get_speed(lead_id) -
-                 self.k.vehicle.get_speed(rl_id))
-                / max_speed,
-                self.k.vehicle.get_headway(rl_id) / max_length
-            ])
-            obs.update({rl_id: observation})
+        this_speed = np.array(veh.get_speed(rl_ids), dtype=float)
+        lead_speed = np.array(veh.get_speed(lead_ids), dtype=float)
+        headway = np.array(veh.get_headway(rl_ids), dtype=float)
 
-        return obs
+        obs = np.stack([
+            this_speed / max_speed,
+            (lead_speed - this_speed) / max_speed,
+            headway / max_length
+        ], axis=1)
+
+        return rl_ids, obs.reshape(len(rl_ids), self.observation_space.shape[0])
 
     def _apply_rl_actions(self, rl_actions):
         """Split the accelerations by ring."""
@@ -104,26 +109,30 @@ class MultiWaveAttenuationPOEnv(MultiEnv):
         if rl_actions is None:
             return {}
 
-        rew = {}
-        for rl_id in rl_actions.keys():
-            edge_id = rl_id.split('_')[1]
-            edges = self.gen_edges(edge_id)
-            vehs_on_edge = self.k.vehicle.get_ids_by_edge(edges)
-            vel = np.array([
-                self.k.vehicle.get_speed(veh_id)
-                for veh_id in vehs_on_edge
-            ])
-            if any(vel < -100) or kwargs['fail']:
-                return 0.
-
-            target_vel = self.env_params.additional_params['target_velocity']
-            max_cost = np.array([target_vel] * len(vehs_on_edge))
-            max_cost = np.linalg.norm(max_cost)
-
-            cost = vel - target_vel
-            cost = np.linalg.norm(cost)
-
-            rew[rl_id] = max(max_cost - cost, 0) / max_cost
+        rl_ids = list(rl_actions.keys())
+        return self.agent_dict(
+            rl_ids, self.compute_dense_reward(rl_ids, rl_actions, **kwargs))
+
+    def compute_dense_reward(self, agent_ids, rl_actions, **kwargs):
+        """See parent class.
+
+        Every agent is rewarded for the speeds of the vehicles on its ring.
+        """
+        if kwargs['fail']:
+            return np.zeros(len(agent_ids))
+
+        target_vel = self.env_params.additional_params['target_velocity']
+        rew = np.zeros(len(agent_ids))
+        for i, rl_id in enumerate(agent_ids):
+            edges = self.gen_edges(rl_id.split('_')[1])
+            vel = np.array(self.k.vehicle.get_speed(
+                self.k.vehicle.get_ids_by_edge(edges)), dtype=float)
+            if any(vel < -100):
+                return np.zeros(len(agent_ids))
+
+            max_cost = target_vel * np.sqrt(len(vel))
+            cost = np.linalg.norm(vel - target_vel)
+            rew[i] = max(max_cost - cost, 0) / max_cost
         return rew
 
     def additional_command(self):
@@ -195,24 +204,30 @@ class MultiAgentWaveAttenuationPOEnv(MultiEnv):
 
     def get_state(self):
         """See class definition."""
-        obs = {}
-        for rl_id in self.k.vehicle.get_rl_ids():
-            lead_id = self.k.vehicle.get_leader(rl_id) or rl_id
+        return self.agent_dict(*self.get_dense_state())
+
+    def get_dense_state(self):
+        """See parent class."""
+        veh = self.k.vehicle
+        rl_ids = list(veh.get_rl_ids())
+        lead_ids = [lead_id or rl_id for rl_id, lead_id in
+                    zip(rl_ids, veh.get_leader(rl_ids))]
 
-            # normalizers
-            max_speed = 15.
-            max_length = self.env_params.additional_params['ring_length'][1]
+        # normalizers
+        max_speed = 15.
+        max_length = self.env_params.additional_params['ring_length'][1]
 
-            observation = np.array([
-                self.k.vehicle.get_speed(rl_id) / max_speed,
-                (self.k.vehicle.get_speed(lead_id) -
-                 self.k.vehicle.get_speed(rl_id))
-                / max_speed,
-                self.k.vehicle.get_headway(rl_id) / max_length
-            ])
-            obs.update({rl_id: observation})
+        this_speed = np.array(veh.get_speed(rl_ids), dtype=float)
+        lead_speed = np.array(veh.get_speed(lead_ids), dtype=float)
+        headway = np.array(veh.get_headway(rl_ids), dtype=float)
 
-        return obs
+        obs = np.stack([
+            this_speed / max_speed,
+            (lead_speed - this_speed) / max_speed,
+            headway / max_length
+        ], axis=1)
+
+        return rl_ids, obs.reshape(len(rl_ids), self.observation_space.shape[0])
 
     def _apply_rl_actions(self, rl_actions):
         """Split the accelerations by ring."""
@@ -225,15 +240,22 @@ class MultiAgentWaveAttenuationPOEnv(MultiEnv):
         """See class definition."""
         # in the warmup steps
         if rl_actions is None:
-            return 0
+            return {}
 
-        vel = np.array([
-            self.k.vehicle.get_speed(veh_id)
-            for veh_id in self.k.vehicle.get_ids()
-        ])
+        rl_ids = list(self.k.vehicle.get_rl_ids())
+        return self.agent_dict(
+            rl_ids, self.compute_dense_reward(rl_ids, rl_actions, **kwargs))
+
+    def compute_dense_reward(self, agent_ids, rl_actions, **kwargs):
+        """See parent class.
+
+        The reward is shared by all agents.
+        """
+        vel = np.array(self.k.vehicle.get_speed(self.k.vehicle.get_ids()),
+                       dtype=float)
 
         if any(vel < -100) or kwargs['fail']:
-            return 0.
+            return np.zeros(len(agent_ids))
 
         # reward average velocity
         eta_2 = 4.
@@ -247,7 +269,7 @@ class MultiAgentWaveAttenuationPOEnv(MultiEnv):
         if mean_actions > accel_threshold:
             reward += eta * (accel_threshold - mean_actions)
 
-        return {key: reward for key in self.k.vehicle.get_rl_ids()}
+        return np.full(len(agent_ids), reward, dtype=float)
 
     def additional_command(self):
         """Define which vehicles are observed for visualization purposes."""
@@ -289,9 +311,8 @@ class MultiAgentWaveAttenuationPOEnv(MultiEnv):
         self.network = self.network.__class__(
             self.network.orig_name, self.network.vehicles,
             net_params, initial_config)
-        self.k.vehicle = deepcopy(self.initial_vehicles)
+        self.k.vehicle = self.initial_vehicles.restore(self.k)
         self.k.vehicle.kernel_api = self.k.kernel_api
-        self.k.vehicle.master_kernel = self.k
 
         # solve for the velocity upper bound of the ring
         v_guess = 4
@@ -88,9 +88,14 @@ class MultiTrafficLightGridPOEnv(TrafficLightGridPOEnv, MultiEnv):
                 dtype=np.float32)
 
     def get_state(self):
+        """See class definition."""
+        return self.agent_dict(*self.get_dense_state())
+
+    def get_dense_state(self):
         """Observations for each traffic light agent.
 
-        :return: dictionary which contains agent-wise observations as follows:
+        :return: ids of the traffic light agents, and an array whose rows
+        contain the agent-wise observations as follows:
         - For the self.num_observed number of vehicles closest and incoming
         towards traffic light agent, gives the vehicle velocity, distance to
         intersection, edge number.
@@ -176,28 +181,30 @@ class MultiTrafficLightGridPOEnv(TrafficLightGridPOEnv, MultiEnv):
         direction = np.append(direction, [0])
         currently_yellow = np.append(currently_yellow, [1])
 
-        obs = {}
         # TODO(cathywu) allow differentiation between rl and non-rl lights
         node_to_edges = self.network.node_mapping
-        for rl_id in self.k.traffic_light.get_ids():
-            rl_id_num = int(rl_id.split("center")[ID_IDX])
-            local_edges = node_to_edges[rl_id_num][1]
-            local_edge_numbers = [self.k.network.get_edge_list().index(e)
-                                  for e in local_edges]
-            local_id_nums = [rl_id_num, self._get_relative_node(rl_id, "top"),
-                             self._get_relative_node(rl_id, "bottom"),
-                             self._get_relative_node(rl_id, "left"),
-                             self._get_relative_node(rl_id, "right")]
-
-            observation = np.array(np.concatenate(
-                [speeds[rl_id_num], dist_to_intersec[rl_id_num],
-                 edge_number[rl_id_num], density[local_edge_numbers],
-                 velocity_avg[local_edge_numbers],
-                 direction[local_id_nums], currently_yellow[local_id_nums]
-                 ]))
-            obs.update({rl_id: observation})
-
-        return obs
+        edge_index = {edge: i for i, edge in
+                      enumerate(self.k.network.get_edge_list())}
+        rl_ids = list(self.k.traffic_light.get_ids())
+        rl_id_nums = [int(rl_id.split("center")[ID_IDX]) for rl_id in rl_ids]
+        local_edge_numbers = np.array(
+            [[edge_index[e] for e in node_to_edges[rl_id_num][1]]
+             for rl_id_num in rl_id_nums], dtype=int)
+        local_id_nums = np.array(
+            [[rl_id_num] + [self._get_relative_node(rl_id, direction)
+                            for direction in ["top", "bottom", "left", "right"]]
+             for rl_id, rl_id_num in zip(rl_ids, rl_id_nums)], dtype=int)
+
+        obs = np.concatenate(
+            [np.asarray(speeds, dtype=float)[rl_id_nums],
+             np.asarray(dist_to_intersec, dtype=float)[rl_id_nums],
+             np.asarray(edge_number, dtype=float)[rl_id_nums],
+             density[local_edge_numbers],
+             velocity_avg[local_edge_numbers],
+             direction[local_id_nums], currently_yellow[local_id_nums]],
+            axis=1)
+
+        return rl_ids, obs
 
     def _apply_rl_actions(self, rl_actions):
         """
@@ -205,44 +212,30 @@ class MultiTrafficLightGridPOEnv(TrafficLightGridPOEnv, MultiEnv):
 
         Issues action for each traffic light agent.
         """
+        node_nums = []
+        switch = []
         for rl_id, rl_action in rl_actions.items():
-            i = int(rl_id.split("center")[ID_IDX])
+            node_nums.append(int(rl_id.split("center")[ID_IDX]))
             if self.discrete:
                 raise NotImplementedError
             else:
                 # convert values less than 0.0 to zero and above to 1. 0's
                 # indicate that we should not switch the direction
-                action = rl_action > 0.0
-
-            if self.currently_yellow[i] == 1:  # currently yellow
-                self.last_change[i] += self.sim_step
-                # Check if our timer has exceeded the yellow phase, meaning it
-                # should switch to red
-                if self.last_change[i] >= self.min_switch_time:
-                    if self.direction[i] == 0:
-                        self.k.traffic_light.set_state(
-                            node_id='center{}'.format(i), state="GrGr")
-                    else:
-                        self.k.traffic_light.set_state(
-                            node_id='center{}'.format(i), state='rGrG')
-                    self.currently_yellow[i] = 0
-            else:
-                if action:
-                    if self.direction[i] == 0:
-                        self.k.traffic_light.set_state(
-                            node_id='center{}'.format(i), state='yryr')
-                    else:
-                        self.k.traffic_light.set_state(
-                            node_id='center{}'.format(i), state='ryry')
-                    self.last_change[i] = 0.0
-                    self.direction[i] = not self.direction[i]
-                    self.currently_yellow[i] = 1
+                switch.append(bool(rl_action > 0.0))
+
+        self._switch_phases(node_nums, switch)
 
     def compute_reward(self, rl_actions, **kwargs):
         """See class definition."""
         if rl_actions is None:
             return {}
 
+        rl_ids = list(rl_actions.keys())
+        return self.agent_dict(
+            rl_ids, self.compute_dense_reward(rl_ids, rl_actions, **kwargs))
+
+    def compute_dense_reward(self, agent_ids, rl_actions, **kwargs):
+        """See parent class."""
         if self.env_params.evaluate:
             rew = -rewards.min_delay_unscaled(self)
         else:
@@ -252,10 +245,7 @@ class MultiTrafficLightGridPOEnv(TrafficLightGridPOEnv, MultiEnv):
         # each agent receives reward normalized by number of lights
         rew /= self.num_traffic_lights
 
-        rews = {}
-        for rl_id in rl_actions.keys():
-            rews[rl_id] = rew
-        return rews
+        return np.full(len(agent_ids), rew, dtype=float)
 
     def additional_command(self):
         """See class definition."""
@@ -122,12 +122,11 @@ class LaneChangeAccelEnv(AccelEnv):
 
         speed = [self.k.vehicle.get_speed(veh_id) / max_speed
                  for veh_id in self.sorted_ids]
-        pos = [self.k.vehicle.get_x_by_id(veh_id) / length
-               for veh_id in self.sorted_ids]
+        pos = np.array(self.k.vehicle.get_x_by_id(self.sorted_ids)) / length
         lane = [self.k.vehicle.get_lane(veh_id) / max_lanes
                 for veh_id in self.sorted_ids]
 
-        return np.array(speed + pos + lane)
+        return np.concatenate((speed, pos, lane))
 
     def _apply_rl_actions(self, actions):
         """See class definition."""
@@ -195,6 +194,8 @@ class LaneChangeAccelPOEnv(LaneChangeAccelEnv):
         lists of visible vehicles, used for visualization purposes
     """
 
+    warmup_attributes = LaneChangeAccelEnv.warmup_attributes + ('visible',)
+
     def __init__(self, env_params, sim_params, network, simulator='traci'):
         super().__init__(env_params, sim_params, network, simulator)
 
@@ -14,10 +14,8 @@ from flow.envs.base import Env
 
 from gym.spaces.box import Box
 
-from copy import deepcopy
 import numpy as np
 import random
-from scipy.optimize import fsolve
 
 ADDITIONAL_ENV_PARAMS = {
     # maximum acceleration of autonomous vehicles
@@ -78,6 +76,8 @@ class WaveAttenuationEnv(Env):
         vehicles collide into one another.
     """
 
+    vehicle_fields = ('leader',)
+
     def __init__(self, env_params, sim_params, network, simulator='traci'):
         for p in ADDITIONAL_ENV_PARAMS.keys():
             if p not in env_params.additional_params:
@@ -142,10 +142,10 @@ class WaveAttenuationEnv(Env):
         """See class definition."""
         speed = [self.k.vehicle.get_speed(veh_id) / self.k.network.max_speed()
                  for veh_id in self.k.vehicle.get_ids()]
-        pos = [self.k.vehicle.get_x_by_id(veh_id) / self.k.network.length()
-               for veh_id in self.k.vehicle.get_ids()]
+        pos = np.array(self.k.vehicle.get_x_by_id(self.k.vehicle.get_ids())) \
+            / self.k.network.length()
 
-        return np.array(speed + pos)
+        return np.concatenate((speed, pos))
 
     def additional_command(self):
         """Define which vehicles are observed for visualization purposes."""
@@ -187,11 +187,12 @@ class WaveAttenuationEnv(Env):
         self.network = self.network.__class__(
             self.network.orig_name, self.network.vehicles,
             net_params, initial_config)
-        self.k.vehicle = deepcopy(self.initial_vehicles)
+        self.k.vehicle = self.initial_vehicles.restore(self.k)
         self.k.vehicle.kernel_api = self.k.kernel_api
-        self.k.vehicle.master_kernel = self.k
 
-        # solve for the velocity upper bound of the ring
+        # solve for the velocity upper bound of the ring (scipy is only
+        # imported when needed, as it is slow to import)
+        from scipy.optimize import fsolve
         v_guess = 4
         v_eq_max = fsolve(v_eq_max_function, np.array(v_guess),
                           args=(len(self.initial_ids), length))[0]
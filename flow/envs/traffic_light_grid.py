@@ -24,6 +24,11 @@ ADDITIONAL_ENV_PARAMS = {
     "discrete": False,
 }
 
+# states of the traffic lights of an intersection. The first index is 1 if
+# the lights are yellow, and the second index is the direction of the flow (0
+# from top to bottom, 1 from left to right).
+PHASE_STATES = np.array([["GrGr", "rGrG"], ["yryr", "ryry"]])
+
 ADDITIONAL_PO_ENV_PARAMS = {
     # num of vehicles the agent can observe on each incoming edge
     "num_observed": 2,
@@ -109,6 +114,10 @@ class TrafficLightGridEnv(Env):
         https://github.com/openai/gym/blob/master/gym/spaces/discrete.py
     """
 
+    vehicle_fields = ()
+    warmup_attributes = Env.warmup_attributes + (
+        'last_change', 'direction', 'currently_yellow')
+
     def __init__(self, env_params, sim_params, network, simulator='traci'):
 
         for p in ADDITIONAL_ENV_PARAMS.keys():
@@ -152,10 +161,10 @@ class TrafficLightGridEnv(Env):
         self.min_switch_time = env_params.additional_params["switch_time"]
 
         if self.tl_type != "actuated":
-            for i in range(self.rows * self.cols):
-                self.k.traffic_light.set_state(
-                    node_id='center' + str(i), state="GrGr")
-                self.currently_yellow[i] = 0
+            self.k.traffic_light.set_states(
+                ['center' + str(i) for i in range(self.rows * self.cols)],
+                ["GrGr"] * (self.rows * self.cols))
+            self.currently_yellow[:] = 0
 
         # # Additional Information for Plotting
         # self.edge_mapping = {"top": [], "bot": [], "right": [], "left": []}
@@ -250,34 +259,50 @@ class TrafficLightGridEnv(Env):
             # should happen
             rl_mask = rl_actions > 0.0
 
-        for i, action in enumerate(rl_mask):
-            if self.currently_yellow[i] == 1:  # currently yellow
-                self.last_change[i] += self.sim_step
-                # Check if our timer has exceeded the yellow phase, meaning it
-                # should switch to red
-                if self.last_change[i] >= self.min_switch_time:
-                    if self.direction[i] == 0:
-                        self.k.traffic_light.set_state(
-                            node_id='center{}'.format(i),
-                            state="GrGr")
-                    else:
-                        self.k.traffic_light.set_state(
-                            node_id='center{}'.format(i),
-                            state='rGrG')
-                    self.currently_yellow[i] = 0
-            else:
-                if action:
-                    if self.direction[i] == 0:
-                        self.k.traffic_light.set_state(
-                            node_id='center{}'.format(i),
-                            state='yryr')
-                    else:
-                        self.k.traffic_light.set_state(
-                            node_id='center{}'.format(i),
-                            state='ryry')
-                    self.last_change[i] = 0.0
-                    self.direction[i] = not self.direction[i]
-                    self.currently_yellow[i] = 1
+        self._switch_phases(np.arange(len(rl_mask)), rl_mask)
+
+    def _switch_phases(self, node_nums, switch):
+        """Update the phases of the traffic lights of some intersections.
+
+        Yellow lights switch to red once they were yellow for at least
+        `min_switch_time`, and the other lights switch to yellow if requested.
+        The new states of all intersections are then set at once.
+
+        Parameters
+        ----------
+        node_nums : array_like of int
+            indices of the intersections
+        switch : array_like of bool
+            whether each intersection should switch the direction of its flow.
+            This is ignored for intersections whose lights are yellow
+        """
+        node_nums = np.asarray(node_nums, dtype=int)
+        switch = np.asarray(switch, dtype=bool)
+        yellow = self.currently_yellow[node_nums, 0] == 1
+
+        # yellow lights switch to red (in the new direction) once the yellow
+        # phase is over
+        yellow_nums = node_nums[yellow]
+        self.last_change[yellow_nums, 0] += self.sim_step
+        to_red = yellow_nums[
+            self.last_change[yellow_nums, 0] >= self.min_switch_time]
+
+        # the other lights switch to yellow if the action requests it
+        to_yellow = node_nums[~yellow & switch]
+
+        nums = np.concatenate([to_red, to_yellow])
+        states = PHASE_STATES[
+            np.repeat([0, 1], [len(to_red), len(to_yellow)]),
+            self.direction[nums, 0].astype(int)]
+
+        self.currently_yellow[to_red] = 0
+        self.last_change[to_yellow] = 0.0
+        self.direction[to_yellow] = 1 - self.direction[to_yellow]
+        self.currently_yellow[to_yellow] = 1
+
+        if len(nums) > 0:
+            self.k.traffic_light.set_states(
+                ['center{}'.format(i) for i in nums], states.tolist())
 
     def compute_reward(self, rl_actions, **kwargs):
         """See class definition."""
@@ -614,6 +639,9 @@ class TrafficLightGridPOEnv(TrafficLightGridEnv):
 
     """
 
+    warmup_attributes = TrafficLightGridEnv.warmup_attributes + (
+        'observed_ids',)
+
     def __init__(self, env_params, sim_params, network, simulator='traci'):
         super().__init__(env_params, sim_params, network, simulator)
 
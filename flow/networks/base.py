@@ -4,6 +4,8 @@ from flow.core.params import InitialConfig
 from flow.core.params import TrafficLightParams
 from flow.core.params import SumoCarFollowingParams
 from flow.core.params import SumoLaneChangeParams
+from flow.core.util import LazyList
+import inspect
 import time
 import xml.etree.ElementTree as ElementTree
 from lxml import etree
@@ -89,7 +91,7 @@ class Network(object):
     traffic_lights : flow.core.params.TrafficLightParams
         used to describe the positions and types of traffic lights in the
         network. For more, see flow/core/params.py
-    nodes : list of dict or None
+    nodes : list of dict or flow.core.util.LazyList or None
         list of nodes that are assigned to the network via the `specify_nodes`
         method. All nodes in this variable are expected to have the following
         properties:
@@ -100,7 +102,7 @@ class Network(object):
 
         If the network is meant to generate the network from an OpenStreetMap
         or template file, this variable is set to None
-    edges : list of dict or None
+    edges : list of dict or flow.core.util.LazyList or None
         edges that are assigned to the network via the `specify_edges` method.
         This include the shape, position, and properties of all edges in the
         network. These properties include the following mandatory properties:
@@ -340,9 +342,9 @@ class Network(object):
 
         if net_params.template is None and net_params.osm_path is None:
             # specify the attributes of the nodes
-            self.nodes = self.specify_nodes(net_params)
+            self.nodes = self._specify_lazily(self.specify_nodes, net_params)
             # collect the attributes of each edge
-            self.edges = self.specify_edges(net_params)
+            self.edges = self._specify_lazily(self.specify_edges, net_params)
             # specify the types attributes (default is None)
             self.types = self.specify_types(net_params)
             # specify the connection attributes (default is None)
@@ -388,6 +390,21 @@ class Network(object):
         self.internal_edge_starts = self.specify_internal_edge_starts()
         self.intersection_edge_starts = []  # this will be deprecated
 
+    @staticmethod
+    def _specify_lazily(specify, net_params):
+        """Return the output of a specify_* method.
+
+        Methods that are generators are not evaluated, but wrapped in a
+        LazyList, which calls them again every time their output is iterated
+        over. This allows large networks to be generated and written to files
+        in constant memory.
+        """
+        output = specify(net_params)
+        if inspect.isgenerator(output):
+            output.close()
+            return LazyList(specify, net_params)
+        return output
+
     # TODO: convert to property
     def specify_edge_starts(self):
         """Define edge starts for road sections in the network.
@@ -453,6 +470,10 @@ class Network(object):
 
         Other attributes may also be specified. See:
         http://sumo.dlr.de/wiki/Networks/Building_Networks_from_own_XML-descriptions#Node_Descriptions
+
+        This method may also be a generator yielding the node attributes one
+        at a time, in which case the nodes are generated on demand instead of
+        being stored in memory (see flow.core.util.LazyList).
         """
         raise NotImplementedError
 
@@ -487,6 +508,8 @@ class Network(object):
 
         Other attributes may also be specified. See:
         http://sumo.dlr.de/wiki/Networks/Building_Networks_from_own_XML-descriptions#Edge_Descriptions
+
+        As with specify_nodes, this method may also be a generator.
         """
         raise NotImplementedError
 
@@ -164,12 +164,21 @@ class TrafficLightGridNetwork(Network):
                          traffic_lights)
 
     def specify_nodes(self, net_params):
-        """See parent class."""
-        return self._inner_nodes + self._outer_nodes
+        """See parent class.
+
+        The nodes are generated lazily, so that large grids can be written to
+        the network files without storing all of their nodes in memory.
+        """
+        yield from self._inner_nodes
+        yield from self._outer_nodes
 
     def specify_edges(self, net_params):
-        """See parent class."""
-        return self._inner_edges + self._outer_edges
+        """See parent class.
+
+        The edges are generated lazily (see specify_nodes).
+        """
+        yield from self._inner_edges
+        yield from self._outer_edges
 
     def specify_routes(self, net_params):
         """See parent class."""
@@ -231,25 +240,22 @@ class TrafficLightGridNetwork(Network):
         The id of a node is then "center{index}", for instance "center0" for
         node 0, "center1" for node 1 etc.
 
-        Returns
-        -------
-        list <dict>
-            List of inner nodes
+        Yields
+        ------
+        dict
+            attributes of the next inner node
         """
         node_type = "traffic_light" if self.use_traffic_lights else "priority"
 
-        nodes = []
         for row in range(self.row_num):
             for col in range(self.col_num):
-                nodes.append({
+                yield {
                     "id": "center{}".format(row * self.col_num + col),
                     "x": col * self.inner_length,
                     "y": row * self.inner_length,
                     "type": node_type,
                     "radius": self.inner_nodes_radius
-                })
-
-        return nodes
+                }
 
     @property
     def _outer_nodes(self):
@@ -287,35 +293,31 @@ class TrafficLightGridNetwork(Network):
         - the id of the input node is "right_row_short1"
         - the id of the output node is "right_row_long1"
 
-        Returns
-        -------
-        list <dict>
-            List of outer nodes
+        Yields
+        ------
+        dict
+            attributes of the next outer node
         """
-        nodes = []
-
         def new_node(x, y, name, i):
-            return [{"id": name + str(i), "x": x, "y": y, "type": "priority"}]
+            return {"id": name + str(i), "x": x, "y": y, "type": "priority"}
 
         # build nodes at the extremities of columns
         for col in range(self.col_num):
             x = col * self.inner_length
             y = (self.row_num - 1) * self.inner_length
-            nodes += new_node(x, - self.short_length, "bot_col_short", col)
-            nodes += new_node(x, - self.long_length, "bot_col_long", col)
-            nodes += new_node(x, y + self.short_length, "top_col_short", col)
-            nodes += new_node(x, y + self.long_length, "top_col_long", col)
+            yield new_node(x, - self.short_length, "bot_col_short", col)
+            yield new_node(x, - self.long_length, "bot_col_long", col)
+            yield new_node(x, y + self.short_length, "top_col_short", col)
+            yield new_node(x, y + self.long_length, "top_col_long", col)
 
         # build nodes at the extremities of rows
         for row in range(self.row_num):
             x = (self.col_num - 1) * self.inner_length
             y = row * self.inner_length
-            nodes += new_node(- self.short_length, y, "left_row_short", row)
-            nodes += new_node(- self.long_length, y, "left_row_long", row)
-            nodes += new_node(x + self.short_length, y, "right_row_short", row)
-            nodes += new_node(x + self.long_length, y, "right_row_long", row)
-
-        return nodes
+            yield new_node(- self.short_length, y, "left_row_short", row)
+            yield new_node(- self.long_length, y, "left_row_long", row)
+            yield new_node(x + self.short_length, y, "right_row_short", row)
+            yield new_node(x + self.long_length, y, "right_row_long", row)
 
     @property
     def _inner_edges(self):
@@ -350,44 +352,40 @@ class TrafficLightGridNetwork(Network):
         going from left to right) is "bot0_2" and the id of the top road
         (traffic going from right to left) is "top0_2".
 
-        Returns
-        -------
-        list <dict>
-            List of inner edges
+        Yields
+        ------
+        dict
+            attributes of the next inner edge
         """
-        edges = []
-
         def new_edge(index, from_node, to_node, orientation, lane):
-            return [{
+            return {
                 "id": lane + index,
                 "type": orientation,
                 "priority": 78,
                 "from": "center" + str(from_node),
                 "to": "center" + str(to_node),
                 "length": self.inner_length
-            }]
+            }
 
         # Build the horizontal inner edges
         for i in range(self.row_num):
             for j in range(self.col_num - 1):
                 node_index = i * self.col_num + j
                 index = "{}_{}".format(i, j + 1)
-                edges += new_edge(index, node_index + 1, node_index,
-                                  "horizontal", "top")
-                edges += new_edge(index, node_index, node_index + 1,
-                                  "horizontal", "bot")
+                yield new_edge(index, node_index + 1, node_index,
+                               "horizontal", "top")
+                yield new_edge(index, node_index, node_index + 1,
+                               "horizontal", "bot")
 
         # Build the vertical inner edges
         for i in range(self.row_num - 1):
             for j in range(self.col_num):
                 node_index = i * self.col_num + j
                 index = "{}_{}".format(i + 1, j)
-                edges += new_edge(index, node_index, node_index + self.col_num,
-                                  "vertical", "right")
-                edges += new_edge(index, node_index + self.col_num, node_index,
-                                  "vertical", "left")
-
-        return edges
+                yield new_edge(index, node_index, node_index + self.col_num,
+                               "vertical", "right")
+                yield new_edge(index, node_index + self.col_num, node_index,
+                               "vertical", "left")
 
     @property
     def _outer_edges(self):
@@ -427,22 +425,20 @@ class TrafficLightGridNetwork(Network):
         Edges labeled by "in" are edges where vehicles enter the network while
         edges labeled by "out" are edges where vehicles exit the network.
 
-        Returns
-        -------
-        list <dict>
-            List of outer edges
+        Yields
+        ------
+        dict
+            attributes of the next outer edge
         """
-        edges = []
-
         def new_edge(index, from_node, to_node, orientation, length):
-            return [{
+            return {
                 "id": index,
                 "type": {"v": "vertical", "h": "horizontal"}[orientation],
                 "priority": 78,
                 "from": from_node,
                 "to": to_node,
                 "length": length
-            }]
+            }
 
         for i in range(self.col_num):
             # bottom edges
@@ -451,8 +447,8 @@ class TrafficLightGridNetwork(Network):
             node1 = "bot_col_short{}".format(i)
             node2 = "center{}".format(i)
             node3 = "bot_col_long{}".format(i)
-            edges += new_edge(id1, node1, node2, "v", self.short_length)
-            edges += new_edge(id2, node2, node3, "v", self.long_length)
+            yield new_edge(id1, node1, node2, "v", self.short_length)
+            yield new_edge(id2, node2, node3, "v", self.long_length)
 
             # top edges
             id1 = "left{}_{}".format(self.row_num, i)
@@ -460,8 +456,8 @@ class TrafficLightGridNetwork(Network):
             node1 = "top_col_short{}".format(i)
             node2 = "center{}".format((self.row_num - 1) * self.col_num + i)
             node3 = "top_col_long{}".format(i)
-            edges += new_edge(id1, node1, node2, "v", self.short_length)
-            edges += new_edge(id2, node2, node3, "v", self.long_length)
+            yield new_edge(id1, node1, node2, "v", self.short_length)
+            yield new_edge(id2, node2, node3, "v", self.long_length)
 
         for j in range(self.row_num):
             # left edges
@@ -470,8 +466,8 @@ class TrafficLightGridNetwork(Network):
             node1 = "left_row_short{}".format(j)
             node2 = "center{}".format(j * self.col_num)
             node3 = "left_row_long{}".format(j)
-            edges += new_edge(id1, node1, node2, "h", self.short_length)
-            edges += new_edge(id2, node2, node3, "h", self.long_length)
+            yield new_edge(id1, node1, node2, "h", self.short_length)
+            yield new_edge(id2, node2, node3, "h", self.long_length)
 
             # right edges
             id1 = "top{}_{}".format(j, self.col_num)
@@ -479,10 +475,8 @@ class TrafficLightGridNetwork(Network):
             node1 = "right_row_short{}".format(j)
             node2 = "center{}".format((j + 1) * self.col_num - 1)
             node3 = "right_row_long{}".format(j)
-            edges += new_edge(id1, node1, node2, "h", self.short_length)
-            edges += new_edge(id2, node2, node3, "h", self.long_length)
-
-        return edges
+            yield new_edge(id1, node1, node2, "h", self.short_length)
+            yield new_edge(id2, node2, node3, "h", self.long_length)
 
     def specify_connections(self, net_params):
         """Build out connections at each inner node.
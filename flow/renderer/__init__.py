@@ -1,5 +1,17 @@
-"""Empty init file to ensure documentation for the renderer is created."""
+"""Contains the renderers of Flow.
 
-from flow.renderer.pyglet_renderer import PygletRenderer
+The renderers are imported when they are first accessed (see
+flow/utils/lazy_import.py), so that the headless NumpyRenderer can be used
+without importing pyglet.
+"""
+from flow.utils.lazy_import import lazy_module
 
-__all__ = ['PygletRenderer']
+# module containing every renderer
+_RENDERERS = {
+    "PygletRenderer": "flow.renderer.pyglet_renderer",
+    "NumpyRenderer": "flow.renderer.numpy_renderer",
+}
+
+__getattr__, __dir__ = lazy_module(__name__, _RENDERERS)
+
+__all__ = ['PygletRenderer', 'NumpyRenderer']
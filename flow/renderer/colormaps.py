@@ -0,0 +1,30 @@
+"""Colormaps shared by the renderers."""
+
+import matplotlib.colors as colors
+import numpy as np
+
+
+def truncate_colormap(cmap, minval=0.25, maxval=0.75, n=100):
+    """Truncate a matplotlib colormap.
+
+    Parameters
+    ----------
+    cmap : matplotlib.colors.LinearSegmentedColormap
+        Original colormap
+    minval : float
+        Minimum value of the truncated colormap
+    maxval : float
+        Maximum value of the truncated colormap
+    n : int
+        Number of RGB quantization levels of the truncated colormap
+
+    Returns
+    -------
+    matplotlib.colors.LinearSegmentedColormap
+        truncated colormap
+    """
+    new_cmap = colors.LinearSegmentedColormap.from_list(
+        'trunc({n},{a:.2f},{b:.2f})'
+        .format(n=cmap.name, a=minval, b=maxval),
+        cmap(np.linspace(minval, maxval, n)))
+    return new_cmap
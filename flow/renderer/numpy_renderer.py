@@ -0,0 +1,506 @@
+"""Contains the headless numpy renderer class."""
+
+import matplotlib.cm as cm
+import numpy as np
+import cv2
+import imutils
+import os
+from os.path import expanduser
+import time
+
+from flow.renderer.colormaps import truncate_colormap
+from flow.renderer.sights import extract_sights
+HOME = expanduser("~")
+
+# background color of the frame (matches the pyglet clear color)
+BACKGROUND_COLOR = 32
+# color of the lanes in the network
+LANE_COLOR = 224
+# size of the rendered vehicle triangles (meter)
+VEHICLE_SIZE = 5
+
+
+class NumpyRenderer(object):
+    """Headless numpy renderer class.
+
+    Provide a drop-in replacement for the pyglet renderer that rasterizes
+    frames in software, and as such does not require a display or a GPU. The
+    road network is rasterized once into a cached background frame, and every
+    call to render() copies this background and draws all vehicles of a given
+    type at once using vectorized numpy operations.
+
+    The frames produced by this renderer follow the same conventions as the
+    ones from the pyglet renderer (shape, BGR channel ordering and vehicle
+    colors), so that both can be used interchangeably for pixel-based
+    learning.
+
+    Attributes
+    ----------
+    data : list
+        A list of rendering data to be saved when save_render is set to
+        True.
+    mode : str
+
+        * "gray": static grayscale rendering, which is good for training
+        * "dgray": dynamic grayscale rendering
+        * "rgb": static RGB rendering
+        * "drgb": dynamic RGB rendering, which is good for visualization
+
+    save_render : bool
+        Specify whether to save rendering data to disk
+    path : str
+        Specify where to store the rendering data
+    sight_radius : int
+        Set the radius of observation for RL vehicles (meter)
+    show_radius : bool
+        Specify whether to render the radius of RL observation
+    time : int
+        Rendering time that increments by one with every render() call
+    lane_polys : list of np.ndarray
+        A list of road network polygons, in pixel coordinates
+    width : int
+        Width of the frame
+    height : int
+        Height of the frame
+    x_shift : float
+        The shift substracted to the input x coordinate
+    x_scale : float
+        The scale multiplied to the input x coordinate
+    y_shift : float
+        The shift substracted to the input y coordinate
+    y_scale : float
+        The scale multiplied to the input y coordinate
+    network : numpy.array
+        The cached background frame, containing only the road network
+    frame : numpy.array
+        An array of size height x width x 3 containing the last rendered
+        frame, in BGR order
+    pxpm : int
+        Specify rendering resolution (pixel / meter)
+    """
+
+    def __init__(self, network, mode,
+                 save_render=False,
+                 path=HOME+"/flow_rendering",
+                 sight_radius=50,
+                 show_radius=False,
+                 pxpm=2,
+                 alpha=1.0):
+        """Initialize the numpy renderer.
+
+        Parameters
+        ----------
+        network : list of list
+            A list of road network polygons. Each polygon is expressed as
+            a list of x and y coordinates, e.g., [x1, y1, x2, y2, ...]
+        mode : str
+
+            * "gray": static grayscale rendering, which is good for training
+            * "dgray": dynamic grayscale rendering
+            * "rgb": static RGB rendering
+            * "drgb": dynamic RGB rendering, which is good for visualization
+
+        save_render : bool
+            Specify whether to save rendering data to disk
+        path : str
+            Specify where to store the rendering data
+        sight_radius : int
+            Set the radius of observation for RL vehicles (meter)
+        show_radius : bool
+            Specify whether to render the radius of RL observation
+        pxpm : int
+            Specify rendering resolution (pixel / meter)
+        alpha : int
+            Specify opacity of the alpha channel.
+            1.0 is fully opaque; 0.0 is fully transparent.
+        """
+        self.mode = mode
+        if self.mode not in ["rgb", "drgb", "gray", "dgray"]:
+            raise ValueError("Mode %s is not supported!" % self.mode)
+        self.save_render = save_render
+        self.path = path + '/' + time.strftime("%Y-%m-%d-%H%M%S")
+        if self.save_render:
+            if not os.path.exists(path):
+                os.mkdir(path)
+            os.mkdir(self.path)
+            self.data = [network]
+        self.sight_radius = sight_radius
+        self.pxpm = pxpm  # Pixel per meter
+        self.show_radius = show_radius
+        self.alpha = alpha
+        self.time = 0
+
+        lane_polys_flat = [pt for poly in network for pt in poly]
+
+        polys_x = np.asarray(lane_polys_flat[::2])
+        width = int(polys_x.max() - polys_x.min())
+        shift = polys_x.min() - 2
+        scale = (width - 4) / width
+        self.width = (width + 2*self.sight_radius) * self.pxpm
+        self.x_shift = shift - self.sight_radius
+        self.x_scale = scale
+
+        polys_y = np.asarray(lane_polys_flat[1::2])
+        height = int(polys_y.max() - polys_y.min())
+        shift = polys_y.min() - 2
+        scale = (height - 4) / height
+        self.height = (height + 2*self.sight_radius) * self.pxpm
+        self.y_shift = shift - self.sight_radius
+        self.y_scale = scale
+
+        self.lane_polys = [
+            self._to_pixels(np.reshape(np.asarray(poly, dtype=float), (-1, 2)))
+            for poly in network]
+
+        # colors of the vehicles, as a colormap for the dynamic modes and as a
+        # single [r, g, b] color for the static modes
+        if self.mode == "drgb":
+            self.human_cmap = truncate_colormap(cm.Greens, 0.2, 0.8)
+            self.machine_cmap = truncate_colormap(cm.Blues, 0.2, 0.8)
+        elif self.mode == "dgray":
+            self.human_cmap = truncate_colormap(cm.binary, 0.55, 0.95)
+            self.machine_cmap = truncate_colormap(cm.binary, 0.05, 0.45)
+        elif self.mode == "rgb":
+            self.human_color = np.array([0, 225, 0])
+            self.machine_color = np.array([0, 150, 200])
+        else:
+            self.human_color = np.array([100, 100, 100])
+            self.machine_color = np.array([150, 150, 150])
+
+        # rasterize the road network once into the background frame
+        self.network = np.full((self.height, self.width, 3), BACKGROUND_COLOR,
+                               dtype=np.uint8)
+        for lane_poly in self.lane_polys:
+            rows, cols = self._polyline_pixels(lane_poly)
+            self._blend(self.network, rows, cols,
+                        np.full((len(rows), 3), LANE_COLOR))
+        self.frame = self.network.copy()
+        # preallocated buffer of the local observations of the vehicles
+        self._sights = np.empty(0, dtype=np.uint8)
+
+    def render(self,
+               human_orientations,
+               machine_orientations,
+               human_dynamics,
+               machine_dynamics,
+               human_logs,
+               machine_logs):
+        """Update the rendering frame.
+
+        Parameters
+        ----------
+        human_orientations : list
+            A list contains orientations of all human vehicles
+            An orientation is a list contains [x, y, angle].
+        machine_orientations : list
+            A list contains orientations of all RL vehicles
+            An orientation is a list contains [x, y, angle].
+        human_dynamics : list
+            A list contains the speed of all human vehicles normalized by
+            max speed, i.e., speed/max_speed
+            This is used to dynamically color human vehicles based on its
+            velocity.
+        machine_dynamics : list
+            A list contains the speed of all RL vehicles normalized by
+            max speed, i.e., speed/max_speed
+            This is used to dynamically color RL vehicles based on its
+            velocity.
+        human_logs : list
+            A list contains the timestep (ms), timedelta (ms), and id of
+            all human vehicles
+        machine_logs : list
+            A list contains the timestep (ms), timedelta (ms), and id of
+            all RL vehicles
+        """
+        self.time += 1
+
+        self.frame = self.network.copy()
+        self._add_vehicle_polys(
+            human_orientations,
+            self._get_colors(human_dynamics, is_machine=False),
+            0
+        )
+        self._add_vehicle_polys(
+            machine_orientations,
+            self._get_colors(machine_dynamics, is_machine=True),
+            self.sight_radius if self.show_radius else 0
+        )
+
+        if self.save_render:
+            cv2.imwrite("%s/frame_%06d.png" %
+                        (self.path, self.time), self.frame)
+            # the elements of every row are immutable, so a shallow copy of
+            # each row is enough to freeze the rendering data
+            self.data.append([[list(row) for row in rows] for rows in [
+                human_orientations, machine_orientations]] +
+                [list(human_dynamics), list(machine_dynamics)] +
+                [[list(row) for row in rows] for rows in [
+                    human_logs, machine_logs]])
+        if "gray" in self.mode:
+            return self.frame[:, :, 0]
+        else:
+            return self.frame
+
+    def close(self):
+        """Terminate the renderer."""
+        print('Closing renderer...')
+        save_path = ''
+        if self.save_render:
+            save_path = '%s/data_%06d.npy' % (self.path, self.time)
+            data = np.empty(len(self.data), dtype=object)
+            for i, data_i in enumerate(self.data):
+                data[i] = data_i
+            np.save(save_path, data)
+        print('Goodbye!')
+        return save_path
+
+    def get_sight(self, orientation, veh_id):
+        """Return the local observation of a vehicle.
+
+        Parameters
+        ----------
+        orientation : list
+            An orientation is a list contains [x, y, angle]
+        veh_id : str
+            The vehicle to observe for
+        """
+        x, y, ang = orientation
+        x = (x-self.x_shift)*self.x_scale*self.pxpm
+        y = (y-self.y_shift)*self.y_scale*self.pxpm
+        x_med = x
+        y_med = self.height - y
+        sight_radius = self.sight_radius * self.pxpm
+        x_min = int(x_med - sight_radius)
+        y_min = int(y_med - sight_radius)
+        x_max = int(x_med + sight_radius)
+        y_max = int(y_med + sight_radius)
+        fixed_sight = self.frame[y_min:y_max, x_min:x_max]
+        height, width = fixed_sight.shape[0:2]
+        mask = np.zeros((height, width), np.uint8)
+        cv2.circle(mask, (int(sight_radius), int(sight_radius)),
+                   int(sight_radius), (255, 255, 255), thickness=-1)
+        rotated_sight = cv2.bitwise_and(fixed_sight, fixed_sight, mask=mask)
+        rotated_sight = imutils.rotate(rotated_sight, ang)
+
+        if self.save_render:
+            cv2.imwrite("%s/sight_%s_%06d.png" %
+                        (self.path, veh_id, self.time),
+                        rotated_sight)
+        if "gray" in self.mode:
+            return rotated_sight[:, :, 0]
+        else:
+            return rotated_sight
+
+    def get_sights(self, orientations, veh_ids):
+        """Return the local observations of several vehicles.
+
+        All sights are cropped and rotated from the current frame at once,
+        into an array that is reused by subsequent calls.
+
+        Parameters
+        ----------
+        orientations : list
+            A list of orientations
+            An orientation is a list contains [x, y, angle].
+        veh_ids : list of str
+            The vehicles to observe for
+
+        Returns
+        -------
+        np.ndarray
+            An array of size n_vehicles x height x width x channel, where
+            channel = 3 when rendering in rgb mode and the last dimension is
+            dropped when rendering in gray mode
+        """
+        orientations = np.asarray(orientations, dtype=float).reshape(-1, 3)
+        centers = self._to_pixels(orientations[:, :2])
+        radius = int(self.sight_radius * self.pxpm)
+        # all channels are equal in the gray modes
+        frame = self.frame[:, :, 0] if "gray" in self.mode else self.frame
+        shape = (len(orientations), 2*radius, 2*radius) + frame.shape[2:]
+        if self._sights.shape != shape:
+            self._sights = np.empty(shape, dtype=np.uint8)
+        sights = extract_sights(frame, centers, orientations[:, 2], radius,
+                                out=self._sights)
+
+        if self.save_render:
+            for veh_id, sight in zip(veh_ids, sights):
+                cv2.imwrite("%s/sight_%s_%06d.png" %
+                            (self.path, veh_id, self.time),
+                            sight)
+        return sights
+
+    def _get_colors(self, dynamics, is_machine):
+        """Return the [r, g, b] colors of a set of vehicles.
+
+        Parameters
+        ----------
+        dynamics : list
+            A list contains the normalized speed of the vehicles
+        is_machine : bool
+            whether the vehicles are RL vehicles
+
+        Returns
+        -------
+        np.ndarray
+            an array of shape (len(dynamics), 3) of colors
+        """
+        if self.mode in ["drgb", "dgray"]:
+            cmap = self.machine_cmap if is_machine else self.human_cmap
+            return (255 * cmap(np.asarray(dynamics, dtype=float))[:, :3]) \
+                .astype(np.uint8)
+        else:
+            color = self.machine_color if is_machine else self.human_color
+            return np.tile(color, (len(dynamics), 1))
+
+    def _add_vehicle_polys(self, orientations, colors, sight_radius):
+        """Render vehicle polygons.
+
+        Parameters
+        ----------
+        orientations : list
+            A list of orientations
+            An orientation is a list contains [x, y, angle].
+        colors : np.ndarray
+            An array of [r, g, b] colors corresponding to the vehicle
+            orientations
+        sight_radius : int
+            Set the radius of observation for RL vehicles (meter)
+        """
+        if len(orientations) == 0:
+            return
+        orientations = np.asarray(orientations, dtype=float)
+        centers = self._to_pixels(orientations[:, :2])
+        self._add_triangles(centers, orientations[:, 2], VEHICLE_SIZE, colors)
+        self._add_circles(centers, sight_radius, colors)
+
+    def _add_triangles(self, centers, angles, size, colors):
+        """Render vehicles as filled triangles.
+
+        Parameters
+        ----------
+        centers : np.ndarray
+            The (n, 2) center coordinates of the vehicles, in pixels
+        angles : np.ndarray
+            The angles of the vehicles
+        size : int
+            The size of the rendered triangles
+        colors : np.ndarray
+            The (n, 3) [r, g, b] colors of the vehicles
+        """
+        ang = np.radians(angles)
+        s = size * self.pxpm
+        # rows are counted from the top of the frame, so vertical offsets are
+        # flipped with respect to the network coordinates
+        back = centers - s * np.stack(
+            [self.x_scale * np.sin(ang), -self.y_scale * np.cos(ang)], axis=1)
+        side = 0.25 * s * np.stack(
+            [self.x_scale * np.cos(ang), self.y_scale * np.sin(ang)], axis=1)
+        # (n, 3, 2) vertices of the triangles
+        vertices = np.stack([centers, back + side, back - side], axis=1)
+
+        # test the centers of all pixels in a square around each vehicle
+        radius = int(np.ceil(s * max(self.x_scale, self.y_scale))) + 1
+        offsets = np.arange(-radius, radius + 1)
+        cols = np.floor(centers[:, 0]).astype(int)[:, None, None] \
+            + offsets[None, None, :]
+        rows = np.floor(centers[:, 1]).astype(int)[:, None, None] \
+            + offsets[None, :, None]
+        px = cols + 0.5
+        py = rows + 0.5
+
+        # a pixel is inside a triangle if it is on the same side of all edges
+        edge_sides = []
+        for i in range(3):
+            (x0, y0), (x1, y1) = vertices[:, i].T, vertices[:, (i + 1) % 3].T
+            edge_sides.append(
+                (x1 - x0)[:, None, None] * (py - y0[:, None, None]) -
+                (y1 - y0)[:, None, None] * (px - x0[:, None, None]))
+        edge_sides = np.stack(edge_sides)
+        inside = np.all(edge_sides >= 0, axis=0) \
+            | np.all(edge_sides <= 0, axis=0)
+
+        veh, _, _ = np.nonzero(inside)
+        rows = np.broadcast_to(rows, inside.shape)[inside]
+        cols = np.broadcast_to(cols, inside.shape)[inside]
+        valid = self._in_frame(rows, cols)
+        self._blend(self.frame, rows[valid], cols[valid], colors[veh[valid]])
+
+    def _add_circles(self, centers, radius, colors):
+        """Render the observation radius of a set of vehicles.
+
+        Parameters
+        ----------
+        centers : np.ndarray
+            The (n, 2) center coordinates of the vehicles, in pixels
+        radius : float
+            The radius of observation
+        colors : np.ndarray
+            The (n, 3) [r, g, b] colors of the vehicles
+        """
+        if radius == 0:
+            return
+        radius = radius * self.pxpm
+        num_points = max(int(2 * np.pi * radius), 1) * 2
+        angles = np.linspace(0, 2 * np.pi, num_points, endpoint=False)
+        x = radius * self.x_scale * np.cos(angles)[None, :] \
+            + centers[:, 0:1]
+        y = radius * self.y_scale * np.sin(angles)[None, :] \
+            + centers[:, 1:2]
+        rows = np.floor(y).astype(int).ravel()
+        cols = np.floor(x).astype(int).ravel()
+        valid = self._in_frame(rows, cols)
+        self._blend(self.frame, rows[valid], cols[valid],
+                    np.repeat(colors, num_points, axis=0)[valid])
+
+    def _polyline_pixels(self, poly):
+        """Return the pixels covered by a polyline.
+
+        Parameters
+        ----------
+        poly : np.ndarray
+            The (n, 2) vertices of the polyline, in pixels
+
+        Returns
+        -------
+        np.ndarray
+            row of every pixel in the image
+        np.ndarray
+            column of every pixel in the image
+        """
+        if len(poly) == 1:
+            points = poly
+        else:
+            start, end = poly[:-1], poly[1:]
+            # sample each segment with at least two points per pixel
+            num = np.ceil(2 * np.abs(end - start).max(axis=1)).astype(int) + 1
+            seg = np.repeat(np.arange(len(start)), num)
+            t = np.arange(num.sum()) - np.repeat(np.cumsum(num) - num, num)
+            t = t / np.repeat(np.maximum(num - 1, 1), num)
+            points = start[seg] + t[:, None] * (end - start)[seg]
+        rows = np.floor(points[:, 1]).astype(int)
+        cols = np.floor(points[:, 0]).astype(int)
+        valid = self._in_frame(rows, cols)
+        return rows[valid], cols[valid]
+
+    def _to_pixels(self, points):
+        """Convert (n, 2) network coordinates to pixel coordinates.
+
+        The returned coordinates are (column, row) pairs, where rows are
+        counted from the top of the frame.
+        """
+        return np.stack([
+            (points[:, 0] - self.x_shift) * self.x_scale * self.pxpm,
+            self.height - (points[:, 1] - self.y_shift)
+            * self.y_scale * self.pxpm], axis=1)
+
+    def _in_frame(self, rows, cols):
+        """Return a mask of the pixels that fall inside of the frame."""
+        return (rows >= 0) & (rows < self.height) \
+            & (cols >= 0) & (cols < self.width)
+
+    def _blend(self, frame, rows, cols, colors):
+        """Alpha-blend [r, g, b] colors into the BGR pixels of a frame."""
+        frame[rows, cols] = (
+            self.alpha * np.asarray(colors, dtype=float)[:, ::-1] +
+            (1 - self.alpha) * frame[rows, cols]).astype(np.uint8)
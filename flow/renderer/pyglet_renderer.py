@@ -2,7 +2,6 @@
 
 import pyglet
 import matplotlib.cm as cm
-import matplotlib.colors as colors
 import numpy as np
 import cv2
 import imutils
@@ -11,6 +10,9 @@ from os.path import expanduser
 import time
 import copy
 import warnings
+
+from flow.renderer.colormaps import truncate_colormap
+from flow.renderer.sights import extract_sights
 HOME = expanduser("~")
 
 
@@ -125,6 +127,8 @@ class PygletRenderer(object):
         pyglet.gl.glBlendFunc(
             pyglet.gl.GL_SRC_ALPHA, pyglet.gl.GL_ONE_MINUS_SRC_ALPHA)
         self.time = 0
+        # preallocated buffer of the local observations of the vehicles
+        self._sights = np.empty(0, dtype=np.uint8)
 
         self.lane_polys = copy.deepcopy(network)
         lane_polys_flat = [pt for poly in network for pt in poly]
@@ -232,8 +236,8 @@ class PygletRenderer(object):
         self.lane_batch.draw()
         self.vehicle_batch = pyglet.graphics.Batch()
         if "drgb" in self.mode:
-            human_cmap = self._truncate_colormap(cm.Greens, 0.2, 0.8)
-            machine_cmap = self._truncate_colormap(cm.Blues, 0.2, 0.8)
+            human_cmap = truncate_colormap(cm.Greens, 0.2, 0.8)
+            machine_cmap = truncate_colormap(cm.Blues, 0.2, 0.8)
             human_conditions = [
                 (255*np.array(human_cmap(d)[:3]+(self.alpha,)))
                 .astype(np.uint8).tolist()
@@ -244,8 +248,8 @@ class PygletRenderer(object):
                 for d in machine_dynamics]
 
         elif "dgray" in self.mode:
-            human_cmap = self._truncate_colormap(cm.binary, 0.55, 0.95)
-            machine_cmap = self._truncate_colormap(cm.binary, 0.05, 0.45)
+            human_cmap = truncate_colormap(cm.binary, 0.55, 0.95)
+            machine_cmap = truncate_colormap(cm.binary, 0.05, 0.45)
             human_conditions = [
                 (255*np.array(human_cmap(d)[:3]+(self.alpha,)))
                 .astype(np.uint8).tolist()
@@ -351,6 +355,48 @@ class PygletRenderer(object):
         else:
             return rotated_sight
 
+    def get_sights(self, orientations, veh_ids):
+        """Return the local observations of several vehicles.
+
+        All sights are cropped and rotated from the current frame at once,
+        into an array that is reused by subsequent calls.
+
+        Parameters
+        ----------
+        orientations : list
+            A list of orientations
+            An orientation is a list contains [x, y, angle].
+        veh_ids : list of str
+            The vehicles to observe for
+
+        Returns
+        -------
+        np.ndarray
+            An array of size n_vehicles x height x width x channel, where
+            channel = 3 when rendering in rgb mode and the last dimension is
+            dropped when rendering in gray mode
+        """
+        orientations = np.asarray(orientations, dtype=float).reshape(-1, 3)
+        centers = np.stack([
+            (orientations[:, 0]-self.x_shift)*self.x_scale*self.pxpm,
+            self.height -
+            (orientations[:, 1]-self.y_shift)*self.y_scale*self.pxpm], axis=1)
+        radius = int(self.sight_radius * self.pxpm)
+        # all channels are equal in the gray modes
+        frame = self.frame[:, :, 0] if "gray" in self.mode else self.frame
+        shape = (len(orientations), 2*radius, 2*radius) + frame.shape[2:]
+        if self._sights.shape != shape:
+            self._sights = np.empty(shape, dtype=np.uint8)
+        sights = extract_sights(frame, centers, orientations[:, 2], radius,
+                                out=self._sights)
+
+        if self.save_render:
+            for veh_id, sight in zip(veh_ids, sights):
+                cv2.imwrite("%s/sight_%s_%06d.png" %
+                            (self.path, veh_id, self.time),
+                            sight)
+        return sights
+
     def _add_lane_polys(self):
         """Render road network polygons."""
         for lane_poly, lane_color in zip(self.lane_polys, self.lane_colors):
@@ -458,29 +504,3 @@ class PygletRenderer(object):
         self.vehicle_batch.add_indexed(
             pxpm, pyglet.gl.GL_LINE_LOOP, group, index,
             ("v2f", vertex_list), ("c4B", vertex_color))
-
-    @staticmethod
-    def _truncate_colormap(cmap, minval=0.25, maxval=0.75, n=100):
-        """Truncate a matplotlib colormap.
-
-        Parameters
-        ----------
-        cmap : matplotlib.colors.LinearSegmentedColormap
-            Original colormap
-        minval : float
-            Minimum value of the truncated colormap
-        maxval : float
-            Maximum value of the truncated colormap
-        n : int
-            Number of RGB quantization levels of the truncated colormap
-
-        Returns
-        -------
-        matplotlib.colors.LinearSegmentedColormap
-            truncated colormap
-        """
-        new_cmap = colors.LinearSegmentedColormap.from_list(
-            'trunc({n},{a:.2f},{b:.2f})'
-            .format(n=cmap.name, a=minval, b=maxval),
-            cmap(np.linspace(minval, maxval, n)))
-        return new_cmap
@@ -1,11 +1,12 @@
 """Contains the Flow/Aimsun API manager."""
 import socket
 import logging
-import struct
+import numpy as np
 
 import flow.utils.aimsun.constants as ac
+import flow.utils.aimsun.protocol as protocol
 import flow.utils.aimsun.struct as aimsun_struct
-from flow.core.kernel.vehicle.aimsun import INFOS_ATTR_BY_INDEX
+from flow.utils.aimsun.protocol import INFOS_ATTR_BY_INDEX
 
 
 def create_client(port, print_status=False):
@@ -74,85 +75,45 @@ class FlowAimsunAPI(object):
         self.port = port
         self.s = create_client(port, print_status=True)
 
-    def _send_command(self, command_type, in_format, values, out_format):
-        """Send an arbitrary command via the connection.
+    def _send_commands(self, commands):
+        """Send a batch of commands via the connection.
+
+        All commands are encoded in a single frame (see
+        flow.utils.aimsun.protocol), and the results of all commands are
+        received in a single frame as well. This requires one round-trip with
+        the server per batch, instead of several round-trips per command.
+
+        Parameters
+        ----------
+        commands : list of (flow.utils.aimsun.constants.*, tuple)
+            the commands the client would like Aimsun to execute, and the
+            values of their arguments
 
-        Commands are sent in two stages. First, the client sends the command
-        type (e.g. ac.REMOVE_VEHICLE) and waits for a conformation message from
-        the server. Once the confirmation is received, the client send a
-        encoded binary packet that the server will be prepared to decode, and
-        will then receive some return value (either the value the client was
-        requesting or a 0 signifying that the command has been executed. This
-        value is then returned by this method.
+        Returns
+        -------
+        list of list of Any
+            the values returned by the Aimsun server for every command
+        """
+        protocol.send_commands(self.s, commands)
+        return protocol.recv_results(self.s, commands)
+
+    def _send_command(self, command_type, values=()):
+        """Send an arbitrary command via the connection.
 
         Parameters
         ----------
         command_type : flow.utils.aimsun.constants.*
             the command the client would like Aimsun to execute
-        in_format : str or None
-            format of the input structure
-        values : tuple of Any or None
-            commands to be encoded and issued to the server
-        out_format : str or None
-            format of the output structure
+        values : tuple of Any
+            values of the arguments of the command. The format of the
+            arguments is specified in flow.utils.aimsun.protocol
 
         Returns
         -------
-        Any
-            the final message received from the Aimsun server
-        """
-        # send the command type to the server
-        self.s.send(str(command_type).encode())
-
-        # wait for a response
-        unpacker = struct.Struct(format='i')
-        data = None
-        while data is None:
-            data = self.s.recv(unpacker.size)
-
-        # send the command values
-        if in_format is not None:
-            if in_format == 'str':
-                self.s.send(str.encode(values[0]))
-            else:
-                packer = struct.Struct(format=in_format)
-                packed_data = packer.pack(*values)
-                self.s.send(packed_data)
-        else:
-            # if no command is needed, just send a status response
-            self.s.send(str.encode('1'))
-
-        # collect the return values
-        if out_format is not None:
-            if out_format == 'str':
-                done = False
-                unpacked_data = ''
-                while not done:
-                    # get the next bit of data
-                    data = None
-                    while data is None or data == b'':
-                        data = self.s.recv(256)
-
-                    # concatenate the results
-                    unpacked_data += data.decode('utf-8')
-
-                    # ask for a status check (just by sending any command)
-                    self.s.send(str.encode('1'))
-
-                    # check if done
-                    unpacker = struct.Struct(format='i')
-                    data = None
-                    while data is None:
-                        data = self.s.recv(unpacker.size)
-                    done = unpacker.unpack(data)[0] == 0
-            else:
-                unpacker = struct.Struct(format=out_format)
-                data = None
-                while data is None:
-                    data = self.s.recv(unpacker.size)
-                unpacked_data = unpacker.unpack(data)
-
-            return unpacked_data
+        list of Any
+            the values returned by the Aimsun server
+        """
+        return self._send_commands([(command_type, values)])[0]
 
     def simulation_step(self):
         """Advance the simulation by one step.
@@ -160,8 +121,7 @@ class FlowAimsunAPI(object):
         Since the connection is lost when this happens, this method also waits
         for and reconnects to the server.
         """
-        self._send_command(ac.SIMULATION_STEP,
-                           in_format=None, values=None, out_format=None)
+        self._send_command(ac.SIMULATION_STEP)
 
         # reconnect to the server
         self.s = create_client(self.port)
@@ -173,8 +133,7 @@ class FlowAimsunAPI(object):
         """
         # inform the simulation that it should terminate the simulation and the
         # server connection
-        self._send_command(ac.SIMULATION_TERMINATE,
-                           in_format=None, values=None, out_format=None)
+        self._send_command(ac.SIMULATION_TERMINATE)
 
         # terminate the connection
         self.s.close()
@@ -192,10 +151,22 @@ class FlowAimsunAPI(object):
         int
             name of the edge in Aimsun
         """
-        return self._send_command(ac.GET_EDGE_NAME,
-                                  in_format='str',
-                                  values=(edge,),
-                                  out_format='i')[0]
+        return self.get_edge_names([edge])[0]
+
+    def get_edge_names(self, edges):
+        """Get the names of several edges in Aimsun.
+
+        Parameters
+        ----------
+        edges : list of str
+            names of the edges in Flow
+
+        Returns
+        -------
+        list of int
+            names of the edges in Aimsun
+        """
+        return self._send_command(ac.GET_EDGE_NAME, (edges,))[0]
 
     def add_vehicle(self, edge, lane, type_id, pos, speed, next_section):
         """Add a vehicle to the network.
@@ -222,22 +193,33 @@ class FlowAimsunAPI(object):
         int
             name of the new vehicle in Aimsun
         """
-        # if type_id is a string, retrieve the id of the type
-        if isinstance(type_id, str):
-            type_id = self._send_command(ac.VEH_GET_TYPE_ID,
-                                         in_format='str',
-                                         values=(type_id,),
-                                         out_format='i')[0]
+        return self.add_vehicles(
+            [edge], [lane], [type_id], [pos], [speed], [next_section])[0]
+
+    def add_vehicles(self, edges, lanes, type_ids, positions, speeds,
+                     next_sections):
+        """Add several vehicles to the network.
+
+        See add_vehicle for a description of the parameters, each of which
+        contains one element per vehicle.
+
+        Returns
+        -------
+        list of int
+            names of the new vehicles in Aimsun
+        """
+        # if some type ids are strings, retrieve the ids of the types
+        type_names = [t for t in type_ids if isinstance(t, str)]
+        if type_names:
+            aimsun_types = dict(
+                zip(type_names, self.get_vehicle_type_ids(type_names)))
+            type_ids = [aimsun_types.get(t, t) for t in type_ids]
         # TODO maybe put back the type conversion dict
         # to avoid useless API calls
 
-        veh_id, = self._send_command(
+        return self._send_command(
             ac.ADD_VEHICLE,
-            in_format='i i i f f i',
-            values=(edge, lane, type_id, pos, speed, next_section),
-            out_format='i')
-
-        return veh_id
+            (edges, lanes, type_ids, positions, speeds, next_sections))[0]
 
     def remove_vehicle(self, veh_id):
         """Remove a vehicle from the network.
@@ -247,10 +229,17 @@ class FlowAimsunAPI(object):
         veh_id : int
             name of the vehicle in Aimsun
         """
-        self._send_command(ac.REMOVE_VEHICLE,
-                           in_format='i',
-                           values=(veh_id,),
-                           out_format='i')
+        self.remove_vehicles([veh_id])
+
+    def remove_vehicles(self, veh_ids):
+        """Remove several vehicles from the network.
+
+        Parameters
+        ----------
+        veh_ids : list of int
+            names of the vehicles in Aimsun
+        """
+        self._send_command(ac.REMOVE_VEHICLE, (veh_ids,))
 
     def set_speed(self, veh_id, speed):
         """Set the speed of a specific vehicle.
@@ -262,10 +251,19 @@ class FlowAimsunAPI(object):
         speed : float
             target speed
         """
-        self._send_command(ac.VEH_SET_SPEED,
-                           in_format='i f',
-                           values=(veh_id, speed),
-                           out_format='i')
+        self.set_speeds([veh_id], [speed])
+
+    def set_speeds(self, veh_ids, speeds):
+        """Set the speeds of several vehicles.
+
+        Parameters
+        ----------
+        veh_ids : list of int
+            names of the vehicles in Aimsun
+        speeds : list of float
+            target speeds
+        """
+        self._send_command(ac.VEH_SET_SPEED, (veh_ids, speeds))
 
     def apply_lane_change(self, veh_id, direction):
         """Set the lane change action of a specific vehicle.
@@ -282,10 +280,20 @@ class FlowAimsunAPI(object):
         float
             status (should be 0)
         """
-        return self._send_command(ac.VEH_SET_LANE,
-                                  in_format='i i',
-                                  values=(veh_id, direction),
-                                  out_format='i')
+        self.apply_lane_changes([veh_id], [direction])
+        return 0
+
+    def apply_lane_changes(self, veh_ids, directions):
+        """Set the lane change actions of several vehicles.
+
+        Parameters
+        ----------
+        veh_ids : list of int
+            names of the vehicles in Aimsun
+        directions : list of int
+            target directions
+        """
+        self._send_command(ac.VEH_SET_LANE, (veh_ids, directions))
 
     def set_route(self, veh_id, route):
         """Set the route of a specific vehicle.
@@ -302,8 +310,8 @@ class FlowAimsunAPI(object):
         float
             status (should be 0)
         """
-        return self._send_command(ac.VEH_SET_ROUTE,
-                                  values=(veh_id, route))
+        self._send_command(ac.VEH_SET_ROUTE, (veh_id, route))
+        return 0
 
     def set_color(self, veh_id, color):
         """Set the color of a specific vehicle.
@@ -316,36 +324,15 @@ class FlowAimsunAPI(object):
             red, green, blue values
         """
         r, g, b = color
-        return self._send_command(ac.VEH_SET_COLOR,
-                                  in_format='i i i i',
-                                  values=(veh_id, r, g, b),
-                                  out_format='i')
+        self._send_command(ac.VEH_SET_COLOR, ([veh_id], [r], [g], [b]))
 
     def get_entered_ids(self):
         """Return the ids of all vehicles that entered the network."""
-        veh_ids = self._send_command(ac.VEH_GET_ENTERED_IDS,
-                                     in_format=None,
-                                     values=None,
-                                     out_format='str')
-
-        if veh_ids == '-1':
-            return []
-        else:
-            veh_ids = veh_ids.split(':')
-            return [int(v) for v in veh_ids]
+        return self._send_command(ac.VEH_GET_ENTERED_IDS)[0]
 
     def get_exited_ids(self):
         """Return the ids of all vehicles that exited the network."""
-        veh_ids = self._send_command(ac.VEH_GET_EXITED_IDS,
-                                     in_format=None,
-                                     values=None,
-                                     out_format='str')
-
-        if veh_ids == '-1':
-            return []
-        else:
-            veh_ids = veh_ids.split(':')
-            return [int(v) for v in veh_ids]
+        return self._send_command(ac.VEH_GET_EXITED_IDS)[0]
 
     def get_vehicle_type_id(self, flow_id):
         """Get the Aimsun type number of a Flow vehicle types.
@@ -360,10 +347,22 @@ class FlowAimsunAPI(object):
         int
             Aimsun-specific vehicle type
         """
-        return self._send_command(ac.VEH_GET_TYPE_ID,
-                                  in_format='str',
-                                  values=(flow_id,),
-                                  out_format='i')[0]
+        return self.get_vehicle_type_ids([flow_id])[0]
+
+    def get_vehicle_type_ids(self, flow_ids):
+        """Get the Aimsun type numbers of several Flow vehicle types.
+
+        Parameters
+        ----------
+        flow_ids : list of str
+            Flow-specific vehicle types
+
+        Returns
+        -------
+        list of int
+            Aimsun-specific vehicle types
+        """
+        return self._send_command(ac.VEH_GET_TYPE_ID, (flow_ids,))[0]
 
     def get_vehicle_type_name(self, veh_id):
         """Get the Aimsun type name of an Aimsun vehicle.
@@ -378,10 +377,22 @@ class FlowAimsunAPI(object):
         str
             Aimsun-specific vehicle type name
         """
-        return self._send_command(ac.VEH_GET_TYPE_NAME,
-                                  in_format='i',
-                                  values=(veh_id,),
-                                  out_format='str')
+        return self.get_vehicles_type_name([veh_id])[0]
+
+    def get_vehicles_type_name(self, veh_ids):
+        """Get the Aimsun type names of several Aimsun vehicles.
+
+        Parameters
+        ----------
+        veh_ids : list of int
+            ids of the vehicles in Aimsun
+
+        Returns
+        -------
+        list of str
+            Aimsun-specific vehicle type names
+        """
+        return self._send_command(ac.VEH_GET_TYPE_NAME, (veh_ids,))[0]
 
     def get_vehicle_length(self, veh_id):
         """Get the length of an Aimsun vehicle.
@@ -396,10 +407,22 @@ class FlowAimsunAPI(object):
         float
             length of the vehicle in Aimsun
         """
-        return self._send_command(ac.VEH_GET_LENGTH,
-                                  in_format='i',
-                                  values=(veh_id,),
-                                  out_format='f')[0]
+        return self.get_vehicles_length([veh_id])[0]
+
+    def get_vehicles_length(self, veh_ids):
+        """Get the lengths of several Aimsun vehicles.
+
+        Parameters
+        ----------
+        veh_ids : list of int
+            ids of the vehicles in Aimsun
+
+        Returns
+        -------
+        list of float
+            lengths of the vehicles in Aimsun
+        """
+        return self._send_command(ac.VEH_GET_LENGTH, (veh_ids,))[0]
 
     def get_vehicle_static_info(self, veh_id):
         """Return the static information of the specified vehicle.
@@ -414,40 +437,55 @@ class FlowAimsunAPI(object):
         flow.utils.aimsun.struct.StaticInfVeh
             static info object
         """
-        static_info = aimsun_struct.StaticInfVeh()
-
-        (static_info.report,
-         static_info.idVeh,
-         static_info.type,
-         static_info.length,
-         static_info.width,
-         static_info.maxDesiredSpeed,
-         static_info.maxAcceleration,
-         static_info.normalDeceleration,
-         static_info.maxDeceleration,
-         static_info.speedAcceptance,
-         static_info.minDistanceVeh,
-         static_info.giveWayTime,
-         static_info.guidanceAcceptance,
-         static_info.enrouted,
-         static_info.equipped,
-         static_info.tracked,
-         static_info.keepfastLane,
-         static_info.headwayMin,
-         static_info.sensitivityFactor,
-         static_info.reactionTime,
-         static_info.reactionTimeAtStop,
-         static_info.reactionTimeAtTrafficLight,
-         static_info.centroidOrigin,
-         static_info.centroidDest,
-         static_info.idsectionExit,
-         static_info.idLine) = self._send_command(
-            ac.VEH_GET_STATIC,
-            in_format='i',
-            values=(veh_id,),
-            out_format='i i i f f f f f f f f f f i i i ? f f f f f i i i i')
-
-        return static_info
+        return self.get_vehicles_static_info([veh_id])[0]
+
+    def get_vehicles_static_info(self, veh_ids):
+        """Return the static information of several vehicles.
+
+        Parameters
+        ----------
+        veh_ids : list of int
+            names of the vehicles in Aimsun
+
+        Returns
+        -------
+        list of flow.utils.aimsun.struct.StaticInfVeh
+            static info objects
+        """
+        fields = self._send_command(ac.VEH_GET_STATIC, (veh_ids,))
+
+        ret = []
+        for values in zip(*fields):
+            static_info = aimsun_struct.StaticInfVeh()
+            (static_info.report,
+             static_info.idVeh,
+             static_info.type,
+             static_info.length,
+             static_info.width,
+             static_info.maxDesiredSpeed,
+             static_info.maxAcceleration,
+             static_info.normalDeceleration,
+             static_info.maxDeceleration,
+             static_info.speedAcceptance,
+             static_info.minDistanceVeh,
+             static_info.giveWayTime,
+             static_info.guidanceAcceptance,
+             static_info.enrouted,
+             static_info.equipped,
+             static_info.tracked,
+             static_info.keepfastLane,
+             static_info.headwayMin,
+             static_info.sensitivityFactor,
+             static_info.reactionTime,
+             static_info.reactionTimeAtStop,
+             static_info.reactionTimeAtTrafficLight,
+             static_info.centroidOrigin,
+             static_info.centroidDest,
+             static_info.idsectionExit,
+             static_info.idLine) = values
+            ret.append(static_info)
+
+        return ret
 
     def get_vehicle_tracking_info(self, veh_id, info_bitmap, tracked=True):
         """Return the tracking information of the specified vehicle.
@@ -468,41 +506,102 @@ class FlowAimsunAPI(object):
         flow.utils.aimsun.struct.InfVeh
             tracking info object
         """
-        # build the output format from the bitmap
-        out_format = ''
-        for i in range(len(info_bitmap)):
-            if info_bitmap[i] == '1':
-                if i <= 12:
-                    out_format += 'f '
-                else:
-                    out_format += 'i '
-        if out_format == '':
-            return
-        else:
-            out_format = out_format[:-1]
-
-        # append tracked boolean and vehicle id to the bitmap
-        # so that the command only has one parameter
-        info_bitmap += "1" if tracked else "0"
-        val = str(veh_id) + ":" + info_bitmap
+        return self.get_vehicles_tracking_info(
+            [veh_id], info_bitmap, [tracked])[0]
+
+    def get_vehicles_tracking_info(self, veh_ids, info_bitmap, tracked):
+        """Return the tracking information of several vehicles.
+
+        Parameters
+        ----------
+        veh_ids : list of int
+            names of the vehicles in Aimsun
+        info_bitmap : str
+            bitmap representing the tracking info to be returned
+            (cf function make_bitmap_for_tracking in vehicle/aimsun.py)
+        tracked : list of bool
+            whether each vehicle is tracked in Aimsun.
+
+        Returns
+        -------
+        list of flow.utils.aimsun.struct.InfVeh
+            tracking info objects. If the bitmap is empty, a list of None is
+            returned instead.
+        """
+        if '1' not in info_bitmap:
+            return [None] * len(veh_ids)
 
         # retrieve the vehicle tracking info specified by the bitmap
-        info = self._send_command(
-            ac.VEH_GET_TRACKING,
-            in_format='str',
-            values=(val,),
-            out_format=out_format)
-
-        # place these tracking info into a struct
-        ret = aimsun_struct.InfVeh()
-        count = 0
-        for map_index in range(len(INFOS_ATTR_BY_INDEX)):
-            if info_bitmap[map_index] == '1':
-                setattr(ret, INFOS_ATTR_BY_INDEX[map_index], info[count])
-                count += 1
+        fields = self._send_command(
+            ac.VEH_GET_TRACKING, (info_bitmap, veh_ids, tracked))
+
+        # place these tracking info into structs
+        attrs = [INFOS_ATTR_BY_INDEX[i] for i in range(len(INFOS_ATTR_BY_INDEX))
+                 if info_bitmap[i] == '1']
+        ret = []
+        for values in zip(*fields):
+            info = aimsun_struct.InfVeh()
+            for attr, value in zip(attrs, values):
+                setattr(info, attr, value)
+            ret.append(info)
 
         return ret
 
+    def get_tracked_state(self, veh_ids, info_bitmap, leader_bitmap):
+        """Return the tracking information and leaders of several vehicles.
+
+        This collects, in a single command, all the information needed to
+        update the state of the tracked vehicles, including the information
+        needed to compute their headways.
+
+        Parameters
+        ----------
+        veh_ids : list of int
+            names of the vehicles in Aimsun
+        info_bitmap : str
+            bitmap representing the tracking info to be returned for the
+            vehicles (cf function make_bitmap_for_tracking in
+            vehicle/aimsun.py)
+        leader_bitmap : str
+            bitmap representing the tracking info to be returned for the
+            leaders of the vehicles
+
+        Returns
+        -------
+        dict of str: np.ndarray
+            tracking info of the vehicles, for every attribute in the bitmap
+        np.ndarray
+            names of the leaders (negative if there is no leader)
+        np.ndarray
+            next section of every vehicle (-1 if not in a section)
+        dict of str: np.ndarray
+            tracking info (not tracked) of the leaders, for every attribute in
+            the leader bitmap
+        np.ndarray
+            lengths of the leaders
+        """
+        fields = self._send_command(
+            ac.VEH_GET_TRACKED_STATE, (info_bitmap, leader_bitmap, veh_ids))
+
+        num_infos = info_bitmap.count('1')
+        infos = self._to_arrays(info_bitmap, fields[:num_infos])
+        leaders = np.array(fields[num_infos], dtype=int)
+        next_sections = np.array(fields[num_infos + 1], dtype=int)
+        leader_infos = self._to_arrays(leader_bitmap, fields[num_infos + 2:-1])
+        leader_lengths = np.array(fields[-1], dtype=float)
+
+        return infos, leaders, next_sections, leader_infos, leader_lengths
+
+    @staticmethod
+    def _to_arrays(info_bitmap, fields):
+        """Map the tracking info attributes of a bitmap to arrays."""
+        attrs = [INFOS_ATTR_BY_INDEX[i] for i in range(len(INFOS_ATTR_BY_INDEX))
+                 if info_bitmap[i] == '1']
+        dtypes = [protocol.TRACKING_FORMAT[i] for i in range(len(info_bitmap))
+                  if info_bitmap[i] == '1']
+        return {attr: np.array(values, dtype=float if dtype == 'f' else int)
+                for attr, dtype, values in zip(attrs, dtypes, fields)}
+
     def get_vehicle_leader(self, veh_id):
         """Return the leader of a specific vehicle.
 
@@ -516,10 +615,22 @@ class FlowAimsunAPI(object):
         int
             name of the leader
         """
-        return self._send_command(ac.VEH_GET_LEADER,
-                                  in_format='i',
-                                  values=(veh_id,),
-                                  out_format='i')[0]
+        return self.get_vehicles_leader([veh_id])[0]
+
+    def get_vehicles_leader(self, veh_ids):
+        """Return the leaders of several vehicles.
+
+        Parameters
+        ----------
+        veh_ids : list of int
+            names of the vehicles in Aimsun
+
+        Returns
+        -------
+        list of int
+            names of the leaders
+        """
+        return self._send_command(ac.VEH_GET_LEADER, (veh_ids,))[0]
 
     def get_vehicle_follower(self, veh_id):
         """Return the follower of a specific vehicle.
@@ -534,10 +645,22 @@ class FlowAimsunAPI(object):
         int
             name of the follower
         """
-        return self._send_command(ac.VEH_GET_FOLLOWER,
-                                  in_format='i',
-                                  values=(veh_id,),
-                                  out_format='i')[0]
+        return self.get_vehicles_follower([veh_id])[0]
+
+    def get_vehicles_follower(self, veh_ids):
+        """Return the followers of several vehicles.
+
+        Parameters
+        ----------
+        veh_ids : list of int
+            names of the vehicles in Aimsun
+
+        Returns
+        -------
+        list of int
+            names of the followers
+        """
+        return self._send_command(ac.VEH_GET_FOLLOWER, (veh_ids,))[0]
 
     def get_next_section(self, veh_id, section):
         """Return the headway of a specific vehicle.
@@ -554,10 +677,25 @@ class FlowAimsunAPI(object):
         int
             next section
         """
-        return self._send_command(ac.VEH_GET_NEXT_SECTION,
-                                  in_format='i i',
-                                  values=(veh_id, section),
-                                  out_format='i')[0]
+        return self.get_next_sections([veh_id], [section])[0]
+
+    def get_next_sections(self, veh_ids, sections):
+        """Return the next sections of several vehicles.
+
+        Parameters
+        ----------
+        veh_ids : list of int
+            names of the vehicles in Aimsun
+        sections : list of int
+            names of the sections the vehicles reside on
+
+        Returns
+        -------
+        list of int
+            next sections
+        """
+        return self._send_command(
+            ac.VEH_GET_NEXT_SECTION, (veh_ids, sections))[0]
 
     def get_route(self, veh_id):
         """Return the route of a specific vehicle.
@@ -572,21 +710,11 @@ class FlowAimsunAPI(object):
         list of int
             list of edge names in Aimsun
         """
-        return self._send_command(ac.VEH_GET_ROUTE,
-                                  values=[veh_id])
+        return self._send_command(ac.VEH_GET_ROUTE, (veh_id,))[0]
 
     def get_traffic_light_ids(self):
         """Return the ids of all traffic lights in the network."""
-        tl_ids = self._send_command(ac.TL_GET_IDS,
-                                    in_format=None,
-                                    values=None,
-                                    out_format='str')
-
-        if tl_ids == '-1':
-            return []
-        else:
-            tl_ids = tl_ids.split(':')
-            return [int(t) for t in tl_ids]
+        return self._send_command(ac.TL_GET_IDS)[0]
 
     def get_traffic_light_state(self, tl_id):
         """Get the traffic light state of a specific set of traffic light(s).
@@ -601,10 +729,22 @@ class FlowAimsunAPI(object):
         str
             traffic light state of each light on that node
         """
-        res, = self._send_command(ac.TL_GET_STATE, values=(tl_id,),
-                                  in_format='i',
-                                  out_format='i')
-        return res
+        return self.get_traffic_light_states([tl_id])[0]
+
+    def get_traffic_light_states(self, tl_ids):
+        """Get the states of several traffic lights.
+
+        Parameters
+        ----------
+        tl_ids : list of int
+            names of the traffic light nodes in Aimsun
+
+        Returns
+        -------
+        list of int
+            traffic light state of every node
+        """
+        return self._send_command(ac.TL_GET_STATE, (tl_ids,))[0]
 
     def set_traffic_light_state(self, tl_id, link_index, state):
         """Set the state of the specified traffic light(s).
@@ -618,10 +758,15 @@ class FlowAimsunAPI(object):
         state : str
             TODO
         """
-        self._send_command(ac.TL_SET_STATE,
-                           in_format='i i i',
-                           values=(tl_id, link_index, state),
-                           out_format=None)
+        self.set_traffic_light_states([tl_id], [link_index], [state])
+
+    def set_traffic_light_states(self, tl_ids, link_indices, states):
+        """Set the states of several traffic lights.
+
+        See set_traffic_light_state for a description of the parameters, each
+        of which contains one element per traffic light.
+        """
+        self._send_command(ac.TL_SET_STATE, (tl_ids, link_indices, states))
 
     def set_vehicle_tracked(self, veh_id):
         """Set a vehicle as tracked in Aimsun.
@@ -633,10 +778,17 @@ class FlowAimsunAPI(object):
         veh_id : int
             name of the vehicle in Aimsun
         """
-        self._send_command(ac.VEH_SET_TRACKED,
-                           in_format='i',
-                           values=(veh_id,),
-                           out_format=None)
+        self.set_vehicles_tracked([veh_id])
+
+    def set_vehicles_tracked(self, veh_ids):
+        """Set several vehicles as tracked in Aimsun.
+
+        Parameters
+        ----------
+        veh_ids : list of int
+            names of the vehicles in Aimsun
+        """
+        self._send_command(ac.VEH_SET_TRACKED, (veh_ids,))
 
     def set_vehicle_no_tracked(self, veh_id):
         """Set a tracked vehicle as untracked in Aimsun.
@@ -646,7 +798,14 @@ class FlowAimsunAPI(object):
         veh_id : int
             name of the vehicle in Aimsun
         """
-        self._send_command(ac.VEH_SET_NO_TRACKED,
-                           in_format='i',
-                           values=(veh_id,),
-                           out_format=None)
+        self.set_vehicles_no_tracked([veh_id])
+
+    def set_vehicles_no_tracked(self, veh_ids):
+        """Set several tracked vehicles as untracked in Aimsun.
+
+        Parameters
+        ----------
+        veh_ids : list of int
+            names of the vehicles in Aimsun
+        """
+        self._send_command(ac.VEH_SET_NO_TRACKED, (veh_ids,))
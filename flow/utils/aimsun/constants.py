@@ -105,3 +105,7 @@ TL_SET_STATE = 0x1B
 
 #: get traffic light state
 TL_GET_STATE = 0x1C
+
+#: get the tracking info, leader and next section of several vehicles, as well
+#: as the tracking info and length of their leaders
+VEH_GET_TRACKED_STATE = 0x1D
@@ -0,0 +1,457 @@
+"""Framed binary protocol used between Flow and the Aimsun server.
+
+This is the second version of the protocol used by FlowAimsunAPI. In the
+first version, every command is sent in several round-trips: the command type
+is sent and acknowledged, then its values are sent and the result is received
+(in segments of 256 characters for strings, each of which is acknowledged).
+
+In this version, a batch of commands is sent in a single length-prefixed
+frame, and the results of all commands are returned in a single frame as
+well. The arguments of every command are packed as arrays (e.g. the ids and
+speeds of all vehicles whose speeds are set), so that a command can be applied
+to any number of vehicles at once.
+
+A frame is composed of:
+
+* a header, containing FRAME_MAGIC and the length of the body of the frame
+* the number of items in the frame
+* for every item, a code and the length of its payload, followed by the
+  payload. The code of a command is one of the constants in
+  flow.utils.aimsun.constants, and the code of a result is a status (0 if the
+  command succeeded, or UNKNOWN_COMMAND).
+
+The payload of an item is a sequence of fields, whose types are specified by
+a format (see COMMAND_FORMATS). The field types are:
+
+* 'i', 'f' and '?': integers, floats and booleans
+* 's': strings
+* 'i[]', 'f[]', '?[]' and 's[]': arrays of any of the above
+
+Since the server runs on the python 2.7 interpreter shipped with Aimsun, this
+module must remain compatible with both python 2 and python 3.
+"""
+# the standard struct module, and not flow.utils.aimsun.struct, is imported
+# by the python 2 interpreter of the server
+from __future__ import absolute_import
+
+import struct
+
+import flow.utils.aimsun.constants as ac
+
+#: marks the beginning of a frame. Messages from the first version of the
+#: protocol start with the (ascii) digits of a command type instead
+FRAME_MAGIC = b'FA2\x00'
+
+#: header of a frame: magic and length of the body of the frame
+FRAME_HEADER = struct.Struct('<4sI')
+
+#: number of items in a frame
+COUNT = struct.Struct('<I')
+
+#: header of an item: code and length of the payload of the item
+ITEM_HEADER = struct.Struct('<iI')
+
+#: status of a command that succeeded
+OK = 0
+
+#: status of a command that is unknown to the server
+UNKNOWN_COMMAND = -1001
+
+#: names of the fields of the tracking information of a vehicle, in order
+INFOS_ATTR_BY_INDEX = [
+    'CurrentPos', 'distance2End', 'xCurrentPos', 'yCurrentPos', 'zCurrentPos',
+    'xCurrentPosBack', 'yCurrentPosBack', 'zCurrentPosBack', 'CurrentSpeed',
+    'TotalDistance', 'SectionEntranceT', 'CurrentStopTime', 'stopped',
+    'idSection', 'segment', 'numberLane', 'idJunction', 'idSectionFrom',
+    'idLaneFrom', 'idSectionTo', 'idLaneTo'
+]
+
+#: types of the fields of the tracking information of a vehicle (see
+#: INFOS_ATTR_BY_INDEX)
+TRACKING_FORMAT = ('f',) * 13 + ('i',) * 8
+
+#: types of the fields of the static information of a vehicle
+STATIC_FORMAT = ('i', 'i', 'i', 'f', 'f', 'f', 'f', 'f', 'f', 'f', 'f', 'f',
+                 'f', 'i', 'i', 'i', '?', 'f', 'f', 'f', 'f', 'f', 'i', 'i',
+                 'i', 'i')
+
+#: formats of the arguments and results of every command. The results of
+#: ac.VEH_GET_TRACKING and ac.VEH_GET_TRACKED_STATE depend on their bitmap
+#: arguments (see result_format).
+COMMAND_FORMATS = {
+    ac.SIMULATION_STEP: ((), ()),
+    ac.SIMULATION_TERMINATE: ((), ()),
+    ac.GET_EDGE_NAME: (('s[]',), ('i[]',)),
+    ac.ADD_VEHICLE: (('i[]', 'i[]', 'i[]', 'f[]', 'f[]', 'i[]'), ('i[]',)),
+    ac.REMOVE_VEHICLE: (('i[]',), ()),
+    ac.VEH_SET_SPEED: (('i[]', 'f[]'), ()),
+    ac.VEH_SET_LANE: (('i[]', 'i[]'), ()),
+    ac.VEH_SET_ROUTE: (('i', 'i[]'), ()),
+    ac.VEH_SET_COLOR: (('i[]', 'i[]', 'i[]', 'i[]'), ()),
+    ac.VEH_GET_ENTERED_IDS: ((), ('i[]',)),
+    ac.VEH_GET_EXITED_IDS: ((), ('i[]',)),
+    ac.VEH_GET_TYPE_ID: (('s[]',), ('i[]',)),
+    ac.VEH_GET_STATIC: (('i[]',), tuple(f + '[]' for f in STATIC_FORMAT)),
+    ac.VEH_GET_TRACKING: (('s', 'i[]', '?[]'), None),
+    ac.VEH_GET_TRACKED_STATE: (('s', 's', 'i[]'), None),
+    ac.VEH_GET_LEADER: (('i[]',), ('i[]',)),
+    ac.VEH_GET_FOLLOWER: (('i[]',), ('i[]',)),
+    ac.VEH_GET_NEXT_SECTION: (('i[]', 'i[]'), ('i[]',)),
+    ac.VEH_GET_ROUTE: (('i',), ('i[]',)),
+    ac.VEH_GET_TYPE_NAME: (('i[]',), ('s[]',)),
+    ac.VEH_GET_LENGTH: (('i[]',), ('f[]',)),
+    ac.VEH_SET_TRACKED: (('i[]',), ()),
+    ac.VEH_SET_NO_TRACKED: (('i[]',), ()),
+    ac.TL_GET_IDS: ((), ('i[]',)),
+    ac.TL_SET_STATE: (('i[]', 'i[]', 'i[]'), ()),
+    ac.TL_GET_STATE: (('i[]',), ('i[]',)),
+}
+
+
+def tracking_format(info_bitmap):
+    """Return the format of the results of ac.VEH_GET_TRACKING.
+
+    Parameters
+    ----------
+    info_bitmap : str
+        bitmap representing the tracking info to be returned (cf. function
+        make_bitmap_for_tracking in flow/core/kernel/vehicle/aimsun.py)
+
+    Returns
+    -------
+    tuple of str
+        one array field for every tracking info in the bitmap
+    """
+    return tuple(TRACKING_FORMAT[i] + '[]'
+                 for i, bit in enumerate(info_bitmap) if bit == '1')
+
+
+def result_format(command_type, values):
+    """Return the format of the results of a command.
+
+    Parameters
+    ----------
+    command_type : int
+        one of the constants in flow.utils.aimsun.constants
+    values : tuple of Any
+        arguments of the command
+
+    Returns
+    -------
+    tuple of str
+        format of the results
+    """
+    if command_type == ac.VEH_GET_TRACKING:
+        return tracking_format(values[0])
+    if command_type == ac.VEH_GET_TRACKED_STATE:
+        # tracking info, leader and next section of the vehicles, followed by
+        # the tracking info and length of their leaders
+        return tracking_format(values[0]) + ('i[]', 'i[]') + \
+            tracking_format(values[1]) + ('f[]',)
+    return COMMAND_FORMATS[command_type][1]
+
+
+def _to_bytes(value):
+    """Encode a string to utf-8 bytes."""
+    if isinstance(value, bytes):
+        return value
+    return value.encode('utf-8')
+
+
+def _to_str(value):
+    """Decode utf-8 bytes to the native string type of the interpreter."""
+    if str is bytes:
+        return value
+    return value.decode('utf-8')
+
+
+def pack_fields(fields, values):
+    """Pack a sequence of fields into a payload.
+
+    Arrays of numbers are packed with a single call to struct.pack.
+
+    Parameters
+    ----------
+    fields : tuple of str
+        types of the fields
+    values : tuple of Any
+        values of the fields
+
+    Returns
+    -------
+    bytes
+        packed payload
+    """
+    chunks = []
+    for field, value in zip(fields, values):
+        code = field[0]
+        if not field.endswith('[]'):
+            if code == 's':
+                value = _to_bytes(value)
+                chunks.append(COUNT.pack(len(value)))
+                chunks.append(value)
+            else:
+                chunks.append(struct.pack('<' + code, value))
+        elif code == 's':
+            value = [_to_bytes(v) for v in value]
+            chunks.append(COUNT.pack(len(value)))
+            chunks.append(struct.pack('<%dI' % len(value),
+                                      *[len(v) for v in value]))
+            chunks.extend(value)
+        else:
+            chunks.append(COUNT.pack(len(value)))
+            chunks.append(struct.pack('<%d%s' % (len(value), code), *value))
+    return b''.join(chunks)
+
+
+def unpack_fields(fields, payload):
+    """Unpack a sequence of fields from a payload.
+
+    Parameters
+    ----------
+    fields : tuple of str
+        types of the fields
+    payload : bytes
+        packed payload
+
+    Returns
+    -------
+    list of Any
+        values of the fields. Arrays are returned as lists.
+    """
+    values = []
+    offset = 0
+    for field in fields:
+        code = field[0]
+        if not field.endswith('[]'):
+            if code == 's':
+                size, = COUNT.unpack_from(payload, offset)
+                offset += COUNT.size
+                values.append(_to_str(payload[offset:offset + size]))
+                offset += size
+            else:
+                values.append(
+                    struct.unpack_from('<' + code, payload, offset)[0])
+                offset += struct.calcsize('<' + code)
+            continue
+
+        num, = COUNT.unpack_from(payload, offset)
+        offset += COUNT.size
+        if code == 's':
+            sizes = struct.unpack_from('<%dI' % num, payload, offset)
+            offset += 4 * num
+            value = []
+            for size in sizes:
+                value.append(_to_str(payload[offset:offset + size]))
+                offset += size
+        else:
+            fmt = '<%d%s' % (num, code)
+            value = list(struct.unpack_from(fmt, payload, offset))
+            offset += struct.calcsize(fmt)
+        values.append(value)
+    return values
+
+
+def encode_frame(items):
+    """Encode a sequence of items into a frame.
+
+    Parameters
+    ----------
+    items : list of (int, bytes)
+        code and payload of every item
+
+    Returns
+    -------
+    bytes
+        the frame, including its header
+    """
+    chunks = [COUNT.pack(len(items))]
+    for code, payload in items:
+        chunks.append(ITEM_HEADER.pack(code, len(payload)))
+        chunks.append(payload)
+    body = b''.join(chunks)
+    return FRAME_HEADER.pack(FRAME_MAGIC, len(body)) + body
+
+
+def decode_frame(body):
+    """Decode the body of a frame into a sequence of items.
+
+    Parameters
+    ----------
+    body : bytes
+        body of the frame, excluding its header
+
+    Returns
+    -------
+    list of (int, bytes)
+        code and payload of every item
+    """
+    num_items, = COUNT.unpack_from(body, 0)
+    offset = COUNT.size
+    items = []
+    for _ in range(num_items):
+        code, size = ITEM_HEADER.unpack_from(body, offset)
+        offset += ITEM_HEADER.size
+        items.append((code, body[offset:offset + size]))
+        offset += size
+    return items
+
+
+def recv_exact(conn, size, data=b''):
+    """Receive exactly a given number of bytes from a socket.
+
+    Parameters
+    ----------
+    conn : socket.socket
+        socket connection
+    size : int
+        number of bytes to receive
+    data : bytes, optional
+        bytes that were already received
+
+    Returns
+    -------
+    bytes
+        the received bytes
+
+    Raises
+    ------
+    socket.error
+        if the connection is closed before all bytes are received
+    """
+    chunks = [data]
+    received = len(data)
+    while received < size:
+        chunk = conn.recv(min(size - received, 65536))
+        if not chunk:
+            raise IOError('Connection closed while receiving a frame.')
+        chunks.append(chunk)
+        received += len(chunk)
+    return b''.join(chunks)
+
+
+def recv_frame(conn, data=b''):
+    """Receive a frame from a socket.
+
+    Parameters
+    ----------
+    conn : socket.socket
+        socket connection
+    data : bytes, optional
+        the first bytes of the frame, if they were already received
+
+    Returns
+    -------
+    list of (int, bytes)
+        code and payload of every item in the frame
+    """
+    header = recv_exact(conn, FRAME_HEADER.size, data[:FRAME_HEADER.size])
+    magic, size = FRAME_HEADER.unpack(header)
+    if magic != FRAME_MAGIC:
+        raise ValueError('Invalid frame header: {}'.format(header))
+    body = recv_exact(conn, size, data[FRAME_HEADER.size:])
+    return decode_frame(body)
+
+
+def send_commands(conn, commands):
+    """Send a batch of commands in a single frame.
+
+    Parameters
+    ----------
+    conn : socket.socket
+        socket connection
+    commands : list of (int, tuple)
+        type and arguments of every command
+    """
+    conn.sendall(encode_frame([
+        (command_type, pack_fields(COMMAND_FORMATS[command_type][0], values))
+        for command_type, values in commands]))
+
+
+def columns(rows, num_fields):
+    """Transpose a list of records into one list per field.
+
+    Parameters
+    ----------
+    rows : list of tuple
+        one record per element of a batch
+    num_fields : int
+        number of fields in every record
+
+    Returns
+    -------
+    list of list
+        the values of every field
+    """
+    if len(rows) == 0:
+        return [[] for _ in range(num_fields)]
+    return [list(column) for column in zip(*rows)]
+
+
+def recv_results(conn, commands):
+    """Receive the results of a batch of commands.
+
+    Parameters
+    ----------
+    conn : socket.socket
+        socket connection
+    commands : list of (int, tuple)
+        type and arguments of every command, as sent to the server
+
+    Returns
+    -------
+    list of list of Any
+        results of every command
+
+    Raises
+    ------
+    ValueError
+        if the server does not support one of the commands
+    """
+    results = []
+    items = recv_frame(conn)
+    for (command_type, values), (status, payload) in zip(commands, items):
+        if status != OK:
+            raise ValueError('Command {} failed with status {}.'.format(
+                command_type, status))
+        results.append(
+            unpack_fields(result_format(command_type, values), payload))
+    return results
+
+
+def serve_frame(conn, handlers, data=b''):
+    """Execute a batch of commands received from a client.
+
+    This is used by the Aimsun server (and the dummy server used for testing)
+    to handle the frames sent by the client.
+
+    Parameters
+    ----------
+    conn : socket.socket
+        socket connection
+    handlers : dict of int: function
+        the function executing every command type. Each function is called
+        with the arguments of a command, and returns a tuple of results that
+        matches the result format of the command.
+    data : bytes, optional
+        the first bytes of the frame, if they were already received
+
+    Returns
+    -------
+    list of int
+        types of the commands that were executed
+    """
+    results = []
+    command_types = []
+    for command_type, payload in recv_frame(conn, data):
+        if command_type not in handlers or \
+                command_type not in COMMAND_FORMATS:
+            results.append((UNKNOWN_COMMAND, b''))
+            continue
+        values = unpack_fields(COMMAND_FORMATS[command_type][0], payload)
+        output = handlers[command_type](*values)
+        results.append((OK, pack_fields(
+            result_format(command_type, values), output)))
+        command_types.append(command_type)
+    conn.sendall(encode_frame(results))
+    return command_types
@@ -8,6 +8,7 @@ sys.path.append(os.path.join(config.AIMSUN_NEXT_PATH,
                              'programming/Aimsun Next API/AAPIPython/Micro'))
 
 import flow.utils.aimsun.constants as ac
+import flow.utils.aimsun.protocol as protocol
 import AAPI as aimsun_api
 from AAPI import *
 from PyANGKernel import *
@@ -100,6 +101,265 @@ def retrieve_message(conn, out_format):
     return unpacked_data
 
 
+def get_edge_id(edge):
+    """Return the id in Aimsun of an edge in Flow."""
+    model = GKSystem.getSystem().getActiveModel()
+    edge_aimsun = model.getCatalog().findByName(
+        edge, model.getType('GKSection'))
+    if edge_aimsun:
+        return edge_aimsun.getId()
+    return int(edge)
+
+
+def get_type_id(type_id):
+    """Return the internal position in Aimsun of a vehicle type in Flow."""
+    model = GKSystem.getSystem().getActiveModel()
+    type_vehicle = model.getType("GKVehicle")
+    vehicle = model.getCatalog().findByName(type_id, type_vehicle)
+    aimsun_type = vehicle.getId()
+    return AKIVehGetVehTypeInternalPosition(aimsun_type)
+
+
+def get_type_name(veh_id):
+    """Return the name of the type of a vehicle."""
+    static_info = aimsun_api.AKIVehGetStaticInf(veh_id)
+    typename = aimsun_api.AKIVehGetVehTypeName(static_info.type)
+    anyNonAsciiChar = aimsun_api.boolp()
+    return str(aimsun_api.AKIConvertToAsciiString(
+        typename, True, anyNonAsciiChar))
+
+
+def get_static_info(veh_id):
+    """Return the static information of a vehicle as a tuple."""
+    static_info = aimsun_api.AKIVehGetStaticInf(veh_id)
+    return (static_info.report,
+            static_info.idVeh,
+            static_info.type,
+            static_info.length,
+            static_info.width,
+            static_info.maxDesiredSpeed,
+            static_info.maxAcceleration,
+            static_info.normalDeceleration,
+            static_info.maxDeceleration,
+            static_info.speedAcceptance,
+            static_info.minDistanceVeh,
+            static_info.giveWayTime,
+            static_info.guidanceAcceptance,
+            static_info.enrouted,
+            static_info.equipped,
+            static_info.tracked,
+            static_info.keepfastLane,
+            static_info.headwayMin,
+            static_info.sensitivityFactor,
+            static_info.reactionTime,
+            static_info.reactionTimeAtStop,
+            static_info.reactionTimeAtTrafficLight,
+            static_info.centroidOrigin,
+            static_info.centroidDest,
+            static_info.idsectionExit,
+            static_info.idLine)
+
+
+def get_tracking_info(veh_id, tracked):
+    """Return the tracking information of a vehicle as a tuple.
+
+    The order of the elements matches the indices of the tracking bitmap.
+    """
+    if tracked:
+        tracking_info = aimsun_api.AKIVehTrackedGetInf(veh_id)
+    else:
+        tracking_info = aimsun_api.AKIVehGetInf(veh_id)
+
+    return (
+        # tracking_info.report,
+        # tracking_info.idVeh,
+        # tracking_info.type,
+        tracking_info.CurrentPos,
+        tracking_info.distance2End,
+        tracking_info.xCurrentPos,
+        tracking_info.yCurrentPos,
+        tracking_info.zCurrentPos,
+        tracking_info.xCurrentPosBack,
+        tracking_info.yCurrentPosBack,
+        tracking_info.zCurrentPosBack,
+        tracking_info.CurrentSpeed,
+        # tracking_info.PreviousSpeed,
+        tracking_info.TotalDistance,
+        # tracking_info.SystemGenerationT,
+        # tracking_info.SystemEntranceT,
+        tracking_info.SectionEntranceT,
+        tracking_info.CurrentStopTime,
+        tracking_info.stopped,
+        tracking_info.idSection,
+        tracking_info.segment,
+        tracking_info.numberLane,
+        tracking_info.idJunction,
+        tracking_info.idSectionFrom,
+        tracking_info.idLaneFrom,
+        tracking_info.idSectionTo,
+        tracking_info.idLaneTo)
+
+
+def get_traffic_light_ids():
+    """Return the ids of all meterings in the network."""
+    num_meters = aimsun_api.ECIGetNumberMeterings()
+    return [ECIGetMeteringProperties(i).Id for i in range(1, num_meters + 1)]
+
+
+def set_traffic_light_state(meter_aimsun_id, state):
+    """Set the state of a metering."""
+    time = AKIGetCurrentSimulationTime()  # simulation time
+    sim_step = AKIGetSimulationStepTime()
+    identity = 0
+    ECIChangeStateMeteringById(
+        meter_aimsun_id, state, time, sim_step, identity)
+
+
+def pop_entered_ids():
+    """Return and clear the vehicles that entered since the last call."""
+    global entered_vehicles
+    veh_ids, entered_vehicles = entered_vehicles, []
+    return veh_ids
+
+
+def pop_exited_ids():
+    """Return and clear the vehicles that exited since the last call."""
+    global exited_vehicles
+    veh_ids, exited_vehicles = exited_vehicles, []
+    return veh_ids
+
+
+def _add_vehicles(edges, lanes, type_ids, positions, speeds, next_sections):
+    # 1 if tracked, 0 otherwise
+    tracking = 1
+    return ([aimsun_api.AKIPutVehTrafficFlow(
+        edge, lane+1, type_id, pos, speed, next_section, tracking)
+        for edge, lane, type_id, pos, speed, next_section in zip(
+            edges, lanes, type_ids, positions, speeds, next_sections)],)
+
+
+def _remove_vehicles(veh_ids):
+    for veh_id in veh_ids:
+        aimsun_api.AKIVehTrackedRemove(veh_id)
+    return ()
+
+
+def _set_speeds(veh_ids, speeds):
+    for veh_id, speed in zip(veh_ids, speeds):
+        # aimsun_api.AKIVehTrackedForceSpeed(veh_id, speed * 3.6)
+        aimsun_api.AKIVehTrackedModifySpeed(veh_id, speed * 3.6)
+    return ()
+
+
+def _set_lanes(veh_ids, target_lanes):
+    for veh_id, target_lane in zip(veh_ids, target_lanes):
+        aimsun_api.AKIVehTrackedModifyLane(veh_id, target_lane)
+    return ()
+
+
+def _set_colors(veh_ids, r, g, b):
+    # TODO
+    return ()
+
+
+def _set_tracked(veh_ids):
+    for veh_id in veh_ids:
+        aimsun_api.AKIVehSetAsTracked(veh_id)
+    return ()
+
+
+def _set_no_tracked(veh_ids):
+    for veh_id in veh_ids:
+        aimsun_api.AKIVehSetAsNoTracked(veh_id)
+    return ()
+
+
+def _get_tracking_infos(info_bitmap, veh_ids, tracked):
+    indices = [i for i, bit in enumerate(info_bitmap) if bit == '1']
+    rows = []
+    for veh_id, veh_tracked in zip(veh_ids, tracked):
+        data = get_tracking_info(veh_id, veh_tracked)
+        rows.append([data[i] for i in indices])
+    return protocol.columns(rows, len(indices))
+
+
+def _get_tracked_state(info_bitmap, leader_bitmap, veh_ids):
+    indices = [i for i, bit in enumerate(info_bitmap) if bit == '1']
+    leader_indices = [i for i, bit in enumerate(leader_bitmap) if bit == '1']
+    rows = []
+    for veh_id in veh_ids:
+        data = get_tracking_info(veh_id, True)
+
+        # index 13 is idSection
+        if data[13] != -1:
+            next_section = AKIVehInfPathGetNextSection(veh_id, data[13])
+        else:
+            next_section = -1
+
+        leader = aimsun_api.AKIVehGetLeaderId(veh_id)
+        if leader >= 0:
+            leader_data = get_tracking_info(leader, False)
+            leader_length = aimsun_api.AKIVehGetStaticInf(leader).length
+        else:
+            leader_data = (0,) * len(protocol.TRACKING_FORMAT)
+            leader_length = 0
+
+        rows.append([data[i] for i in indices] + [leader, next_section] +
+                    [leader_data[i] for i in leader_indices] + [leader_length])
+    return protocol.columns(rows, len(indices) + len(leader_indices) + 3)
+
+
+def _set_traffic_light_states(tl_ids, link_indices, states):
+    for meter_aimsun_id, state in zip(tl_ids, states):
+        set_traffic_light_state(meter_aimsun_id, state)
+    return ()
+
+
+# functions executing the commands of the framed protocol (see
+# flow/utils/aimsun/protocol.py). Every function receives the arguments of a
+# command as arrays, and applies the command to all their elements.
+HANDLERS = {
+    ac.SIMULATION_STEP: lambda: (),
+    ac.SIMULATION_TERMINATE: lambda: (),
+    ac.GET_EDGE_NAME: lambda edges: ([get_edge_id(e) for e in edges],),
+    ac.ADD_VEHICLE: _add_vehicles,
+    ac.REMOVE_VEHICLE: _remove_vehicles,
+    ac.VEH_SET_SPEED: _set_speeds,
+    ac.VEH_SET_LANE: _set_lanes,
+    ac.VEH_SET_COLOR: _set_colors,
+    ac.VEH_SET_TRACKED: _set_tracked,
+    ac.VEH_SET_NO_TRACKED: _set_no_tracked,
+    ac.VEH_GET_ENTERED_IDS: lambda: (pop_entered_ids(),),
+    ac.VEH_GET_EXITED_IDS: lambda: (pop_exited_ids(),),
+    ac.VEH_GET_TYPE_ID: lambda types: ([get_type_id(t) for t in types],),
+    ac.VEH_GET_TYPE_NAME: lambda veh_ids: (
+        [get_type_name(v) for v in veh_ids],),
+    ac.VEH_GET_LENGTH: lambda veh_ids: (
+        [aimsun_api.AKIVehGetStaticInf(v).length for v in veh_ids],),
+    ac.VEH_GET_STATIC: lambda veh_ids: protocol.columns(
+        [get_static_info(v) for v in veh_ids],
+        len(protocol.STATIC_FORMAT)),
+    ac.VEH_GET_TRACKING: _get_tracking_infos,
+    ac.VEH_GET_TRACKED_STATE: _get_tracked_state,
+    ac.VEH_GET_LEADER: lambda veh_ids: (
+        [aimsun_api.AKIVehGetLeaderId(v) for v in veh_ids],),
+    ac.VEH_GET_FOLLOWER: lambda veh_ids: (
+        [aimsun_api.AKIVehGetFollowerId(v) for v in veh_ids],),
+    ac.VEH_GET_NEXT_SECTION: lambda veh_ids, sections: (
+        [AKIVehInfPathGetNextSection(v, s)
+         for v, s in zip(veh_ids, sections)],),
+    # TODO: routes are not supported by the server yet, as in the first
+    # version of the protocol
+    ac.VEH_SET_ROUTE: lambda veh_id, route: (),
+    ac.VEH_GET_ROUTE: lambda veh_id: ([],),
+    ac.TL_GET_IDS: lambda: (get_traffic_light_ids(),),
+    ac.TL_SET_STATE: _set_traffic_light_states,
+    ac.TL_GET_STATE: lambda tl_ids: (
+        # TODO double check lane_id
+        [ECIGetCurrentStateofMeteringById(t, 1) for t in tl_ids],),
+}
+
+
 def threaded_client(conn):
     """Create a threaded process.
 
@@ -124,6 +384,14 @@ def threaded_client(conn):
             if data == '':
                 continue
 
+            # messages of the framed protocol contain a batch of commands,
+            # whereas other messages start with the type of a single command
+            if data[:1] == protocol.FRAME_MAGIC[:1]:
+                command_types = protocol.serve_frame(conn, HANDLERS, data)
+                done = ac.SIMULATION_STEP in command_types or \
+                    ac.SIMULATION_TERMINATE in command_types
+                continue
+
             # convert to integer
             data = int(data)
 
@@ -233,13 +501,7 @@ def threaded_client(conn):
                 while type_id is None:
                     type_id = conn.recv(2048)
 
-                # convert the edge name to an edge name in Aimsun
-                model = GKSystem.getSystem().getActiveModel()
-                type_vehicle = model.getType("GKVehicle")
-                vehicle = model.getCatalog().findByName(
-                    type_id, type_vehicle)
-                aimsun_type = vehicle.getId()
-                aimsun_type_pos = AKIVehGetVehTypeInternalPosition(aimsun_type)
+                aimsun_type_pos = get_type_id(type_id)
 
                 send_message(conn, in_format='i', values=(aimsun_type_pos,))
 
@@ -248,12 +510,7 @@ def threaded_client(conn):
                 send_message(conn, in_format='i', values=(0,))
                 veh_id, = retrieve_message(conn, 'i')
 
-                static_info = aimsun_api.AKIVehGetStaticInf(veh_id)
-                typename = aimsun_api.AKIVehGetVehTypeName(static_info.type)
-
-                anyNonAsciiChar = aimsun_api.boolp()
-                output = str(aimsun_api.AKIConvertToAsciiString(
-                    typename, True, anyNonAsciiChar))
+                output = get_type_name(veh_id)
 
                 send_message(conn, in_format='str', values=(output,))
 
@@ -270,33 +527,7 @@ def threaded_client(conn):
                 send_message(conn, in_format='i', values=(0,))
                 veh_id, = retrieve_message(conn, 'i')
 
-                static_info = aimsun_api.AKIVehGetStaticInf(veh_id)
-                output = (static_info.report,
-                          static_info.idVeh,
-                          static_info.type,
-                          static_info.length,
-                          static_info.width,
-                          static_info.maxDesiredSpeed,
-                          static_info.maxAcceleration,
-                          static_info.normalDeceleration,
-                          static_info.maxDeceleration,
-                          static_info.speedAcceptance,
-                          static_info.minDistanceVeh,
-                          static_info.giveWayTime,
-                          static_info.guidanceAcceptance,
-                          static_info.enrouted,
-                          static_info.equipped,
-                          static_info.tracked,
-                          static_info.keepfastLane,
-                          static_info.headwayMin,
-                          static_info.sensitivityFactor,
-                          static_info.reactionTime,
-                          static_info.reactionTimeAtStop,
-                          static_info.reactionTimeAtTrafficLight,
-                          static_info.centroidOrigin,
-                          static_info.centroidDest,
-                          static_info.idsectionExit,
-                          static_info.idLine)
+                output = get_static_info(veh_id)
 
                 send_message(conn,
                              in_format='i i i f f f f f f f f f f i i i ? '
@@ -330,40 +561,8 @@ def threaded_client(conn):
                 veh_id = int(s)
 
                 # retrieve the tracking info of the vehicle
-                if tracked == '1':
-                    tracking_info = aimsun_api.AKIVehTrackedGetInf(veh_id)
-                else:
-                    tracking_info = aimsun_api.AKIVehGetInf(veh_id)
-
-                data = (
-                          # tracking_info.report,
-                          # tracking_info.idVeh,
-                          # tracking_info.type,
-                          tracking_info.CurrentPos,
-                          tracking_info.distance2End,
-                          tracking_info.xCurrentPos,
-                          tracking_info.yCurrentPos,
-                          tracking_info.zCurrentPos,
-                          tracking_info.xCurrentPosBack,
-                          tracking_info.yCurrentPosBack,
-                          tracking_info.zCurrentPosBack,
-                          tracking_info.CurrentSpeed,
-                          # tracking_info.PreviousSpeed,
-                          tracking_info.TotalDistance,
-                          # tracking_info.SystemGenerationT,
-                          # tracking_info.SystemEntranceT,
-                          tracking_info.SectionEntranceT,
-                          tracking_info.CurrentStopTime,
-                          tracking_info.stopped,
-                          tracking_info.idSection,
-                          tracking_info.segment,
-                          tracking_info.numberLane,
-                          tracking_info.idJunction,
-                          tracking_info.idSectionFrom,
-                          tracking_info.idLaneFrom,
-                          tracking_info.idSectionTo,
-                          tracking_info.idLaneTo)
-                
+                data = get_tracking_info(veh_id, tracked == '1')
+
                 # form the output and output format according to the bitmap
                 output = []
                 in_format = ''
@@ -414,26 +613,17 @@ def threaded_client(conn):
                 while data is None:
                     data = conn.recv(256)
 
-                num_meters = aimsun_api.ECIGetNumberMeterings()
-                if num_meters == 0:
+                meter_ids = get_traffic_light_ids()
+                if len(meter_ids) == 0:
                     output = '-1'
                 else:
-                    meter_ids = []
-                    for i in range(1, num_meters + 1):
-                        struct_metering = ECIGetMeteringProperties(i)
-                        meter_id = struct_metering.Id
-                        meter_ids.append(meter_id)
                     output = ':'.join([str(e) for e in meter_ids])
                 send_message(conn, in_format='str', values=(output,))
 
             elif data == ac.TL_SET_STATE:
                 send_message(conn, in_format='i', values=(0,))
                 meter_aimsun_id, state = retrieve_message(conn, 'i i')
-                time = AKIGetCurrentSimulationTime()  # simulation time
-                sim_step = AKIGetSimulationStepTime()
-                identity = 0
-                ECIChangeStateMeteringById(
-                    meter_aimsun_id, state, time, sim_step, identity)
+                set_traffic_light_state(meter_aimsun_id, state)
                 send_message(conn, in_format='i', values=(0,))
 
             elif data == ac.TL_GET_STATE:
@@ -452,16 +642,8 @@ def threaded_client(conn):
                 while edge is None:
                     edge = conn.recv(2048)
 
-                model = GKSystem.getSystem().getActiveModel()
-                edge_aimsun = model.getCatalog().findByName(
-                    edge, model.getType('GKSection'))
-
-                if edge_aimsun:
-                    send_message(conn, in_format='i',
-                             values=(edge_aimsun.getId(),))
-                else:
-                    send_message(conn, in_format='i',
-                            values=(int(edge),))
+                send_message(conn, in_format='i',
+                             values=(get_edge_id(edge),))
 
             # in case the message is unknown, return -1001
             else:
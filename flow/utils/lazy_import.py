@@ -0,0 +1,48 @@
+"""Utility methods for the lazy import of the classes of a package.
+
+The ``__init__`` files of the larger Flow packages (e.g. flow.envs) only list
+the module that contains every public class, and the module is imported the
+first time the class is accessed. This avoids importing every environment,
+network, controller, and their dependencies when only one of them is used.
+"""
+
+import importlib
+import sys
+
+
+def lazy_module(name, attributes):
+    """Return the ``__getattr__`` and ``__dir__`` methods of a lazy package.
+
+    Parameters
+    ----------
+    name : str
+        name of the package, i.e. the ``__name__`` of its ``__init__`` file
+    attributes : dict of str
+        dictionary mapping the name of every lazily imported attribute to the
+        name of the module it is defined in
+
+    Returns
+    -------
+    function
+        module-level ``__getattr__`` method (see PEP 562), which imports the
+        requested attribute and stores it in the package
+    function
+        module-level ``__dir__`` method, which includes the attributes that
+        have not been imported yet
+    """
+    def __getattr__(attr):
+        try:
+            module = attributes[attr]
+        except KeyError:
+            raise AttributeError(
+                'module {!r} has no attribute {!r}'.format(name, attr))
+
+        value = getattr(importlib.import_module(module), attr)
+        # later accesses do not go through __getattr__
+        setattr(sys.modules[name], attr, value)
+        return value
+
+    def __dir__():
+        return sorted(set(vars(sys.modules[name])) | set(attributes))
+
+    return __getattr__, __dir__
@@ -3,12 +3,27 @@ Evaluation utility methods for testing the performance of controllers.
 
 This file contains a method to perform the evaluation on all benchmarks in
 flow/benchmarks, as well as method for importing neural network controllers
-from rllib.
+from rllib. The rollouts of an evaluation can be distributed over several
+processes, for instance:
+
+    >>> from functools import partial
+    >>> load_actions = partial(
+    >>>     get_compute_action_rllib, '/path/to/results', 200, 'PPO')
+    >>> evaluate_policy('merge0', load_actions=load_actions, num_cpus=8,
+    >>>                 ci_width=10)
 """
 
-from flow.core.experiment import Experiment
+import collections
+from copy import deepcopy
+import itertools
+import multiprocessing
+import multiprocessing.util
+import os
+import random
+
 from flow.core.params import InitialConfig
 from flow.core.params import TrafficLightParams
+from flow.core.util import RunningStats
 from flow.utils.rllib import get_flow_params, get_rllib_config
 from flow.utils.registry import make_create_env
 from flow.utils.exceptions import FatalFlowError
@@ -26,8 +41,11 @@ from flow.benchmarks.merge1 import flow_params as merge1
 from flow.benchmarks.merge2 import flow_params as merge2
 
 import ray
-from ray.rllib.agent import get_agent_class
-from ray.tune.registry import get_registry, register_env
+try:
+    from ray.rllib.agents.agent import get_agent_class
+except ImportError:
+    from ray.rllib.agents.registry import get_agent_class
+from ray.tune.registry import register_env
 import numpy as np
 
 # number of simulations to execute when computing performance scores
@@ -49,44 +67,233 @@ AVAILABLE_BENCHMARKS = {
 }
 
 
-def evaluate_policy(benchmark, _get_actions, _get_states=None):
+def evaluate_policy(benchmark,
+                    _get_actions=None,
+                    _get_states=None,
+                    num_runs=NUM_RUNS,
+                    num_cpus=1,
+                    seed=0,
+                    load_actions=None,
+                    ci_width=None,
+                    confidence=0.95,
+                    min_runs=2):
     """Evaluate the performance of a controller on a predefined benchmark.
 
+    The rollouts are distributed over a pool of `num_cpus` processes. Every
+    process creates its own environment and policy once, and then performs
+    the rollouts it is assigned. The rollout i is seeded with seed + i, so
+    that the returns do not depend on the number of processes. To that end,
+    the simulator is restarted at the beginning of every rollout, with a seed
+    drawn from the seeded random number generator (i.e. restart_instance is
+    always set to True).
+
+    The returns are reported as they become available, along with a
+    confidence interval of their mean. If `ci_width` is specified, the
+    evaluation stops once the width of this interval is below `ci_width`.
+
     Parameters
     ----------
     benchmark : str
         name of the benchmark, must be printed as it is in the
         benchmarks folder; otherwise a FatalFlowError will be raised
-    _get_actions : method
-        the mapping from states to actions for the RL agent(s)
+    _get_actions : method, optional
+        the mapping from states to actions for the RL agent(s). Must be
+        picklable (e.g. defined at the top level of a module) if num_cpus is
+        greater than one.
     _get_states : method, optional
         a mapping from the environment object in Flow to some state, which
         overrides the _get_states method of the environment. Note that the
         same cannot be done for the actions.
+    num_runs : int, optional
+        maximum number of rollouts
+    num_cpus : int, optional
+        number of processes performing rollouts
+    seed : int, optional
+        seed of the first rollout
+    load_actions : method, optional
+        a method without arguments returning the mapping from states to
+        actions, which is called once in every process. This is used instead
+        of _get_actions for policies that are expensive to load, or cannot be
+        pickled (see get_compute_action_rllib).
+    ci_width : float, optional
+        width of the confidence interval of the mean return below which the
+        evaluation is stopped. If not specified, all num_runs rollouts are
+        performed.
+    confidence : float, optional
+        confidence level of the reported interval
+    min_runs : int, optional
+        minimum number of rollouts performed before stopping early
 
     Returns
     -------
     float
-        mean of the evaluation return of the benchmark from NUM_RUNS number
-        of simulations
+        mean of the evaluation return of the benchmark from the performed
+        simulations
     float
-        standard deviation of the evaluation return of the benchmark from
-        NUM_RUNS number of simulations
+        standard deviation of the evaluation return of the benchmark from the
+        performed simulations
 
     Raises
     ------
     flow.utils.exceptions.FatalFlowError
         If the specified benchmark is not available.
+    ValueError
+        If neither _get_actions nor load_actions is specified.
     """
     if benchmark not in AVAILABLE_BENCHMARKS.keys():
         raise FatalFlowError(
             "benchmark {} is not available. Check spelling?".format(benchmark))
+    if _get_actions is None and load_actions is None:
+        raise ValueError("Either _get_actions or load_actions must be "
+                         "specified.")
+
+    init_args = (benchmark, _get_actions, _get_states, load_actions)
+    seeds = range(seed, seed + num_runs)
+    stats = RunningStats()
+    returns = []
+
+    if num_cpus > 1:
+        pool = multiprocessing.Pool(num_cpus, initializer=_init_worker,
+                                    initargs=init_args)
+        results = _run_parallel(pool, seeds, num_cpus)
+    else:
+        pool = None
+        _init_worker(*init_args)
+        results = map(_run_rollout, seeds)
+
+    try:
+        for i, ret in enumerate(results):
+            returns.append(ret)
+            stats.push(ret)
+            lower, upper = stats.confidence_interval(confidence)
+            print("Round {0}, return: {1}, mean: {2}, {3:.0%} CI: "
+                  "[{4}, {5}]".format(
+                      i, ret, stats.mean, confidence, lower, upper))
+
+            if ci_width is not None and stats.count >= min_runs \
+                    and upper - lower <= ci_width:
+                break
+    finally:
+        if pool is not None:
+            # wait for the rollouts in progress, and let the processes close
+            # their environment
+            pool.close()
+            pool.join()
+        else:
+            _terminate_worker()
+
+    return np.mean(returns), np.std(returns)
+
+
+def _run_parallel(pool, seeds, num_cpus):
+    """Perform rollouts in a pool of processes.
+
+    At most num_cpus rollouts are submitted at a time, so that no further
+    rollout is started once the caller stops consuming the results.
+
+    Yields
+    ------
+    float
+        the return of every rollout, in the order of the seeds. This ensures
+        that the evaluation stops after the same rollouts for any number of
+        processes.
+    """
+    seeds = iter(seeds)
+    pending = collections.deque(
+        pool.apply_async(_run_rollout, (seed,))
+        for seed in itertools.islice(seeds, num_cpus))
+    while pending:
+        ret = pending.popleft().get()
+        for seed in itertools.islice(seeds, 1):
+            pending.append(pool.apply_async(_run_rollout, (seed,)))
+        yield ret
+
+
+# environment and policy of the current process, created by _init_worker
+_worker = {}
+
+
+def _init_worker(benchmark, _get_actions, _get_states, load_actions):
+    """Create the environment and policy used by the current process.
+
+    See evaluate_policy for a description of the parameters.
+    """
+    if load_actions is not None:
+        _get_actions = load_actions()
+    _worker["env"] = _create_env(benchmark, _get_states)
+    _worker["get_actions"] = _get_actions
+
+    # close the environment when the process exits (in a pool)
+    multiprocessing.util.Finalize(None, _terminate_worker, exitpriority=10)
+
+
+def _terminate_worker():
+    """Close the environment of the current process."""
+    env = _worker.pop("env", None)
+    if env is not None:
+        env.terminate()
+    _worker.clear()
+
+
+def _run_rollout(seed):
+    """Perform a rollout in the environment of the current process.
+
+    Parameters
+    ----------
+    seed : int
+        seed of the python and numpy random number generators, which are
+        used to seed the simulator when it is restarted at the beginning of
+        the rollout (see _create_env)
+
+    Returns
+    -------
+    float
+        the return of the rollout
+    """
+    env = _worker["env"]
+    get_actions = _worker["get_actions"]
+
+    random.seed(seed)
+    np.random.seed(seed)
+
+    ret = 0
+    state = env.reset()
+    for _ in range(env.env_params.horizon):
+        state, reward, done, _ = env.step(get_actions(state))
+        ret += reward
+        if done:
+            break
+
+    return ret
 
+
+def _create_env(benchmark, _get_states=None):
+    """Create the environment of a benchmark.
+
+    The network is named after the process that creates it, so that the
+    network files of parallel processes do not collide. The simulator is
+    restarted at every reset, so that every rollout is seeded by its own
+    seed, regardless of the rollouts previously performed by the process.
+
+    Parameters
+    ----------
+    benchmark : str
+        name of the benchmark
+    _get_states : method, optional
+        a mapping from the environment object in Flow to some state, which
+        overrides the _get_states method of the environment
+
+    Returns
+    -------
+    flow.envs.Env
+        the environment
+    """
     # get the flow params from the benchmark
     flow_params = AVAILABLE_BENCHMARKS[benchmark]
 
     exp_tag = flow_params["exp_tag"]
-    sim_params = flow_params["sim"]
+    sim_params = deepcopy(flow_params["sim"])
+    sim_params.restart_instance = True
     vehicles = flow_params["veh"]
     env_params = flow_params["env"]
     env_params.evaluate = True  # Set to true to get evaluation returns
@@ -95,14 +302,18 @@ def evaluate_policy(benchmark, _get_actions, _get_states=None):
     traffic_lights = flow_params.get("tls", TrafficLightParams())
 
     # import the environment and network classes
-    module = __import__("flow.envs", fromlist=[flow_params["env_name"]])
-    env_class = getattr(module, flow_params["env_name"])
-    module = __import__("flow.networks", fromlist=[flow_params["network"]])
-    network_class = getattr(module, flow_params["network"])
+    env_class = flow_params["env_name"]
+    if isinstance(env_class, str):
+        module = __import__("flow.envs", fromlist=[env_class])
+        env_class = getattr(module, env_class)
+    network_class = flow_params["network"]
+    if isinstance(network_class, str):
+        module = __import__("flow.networks", fromlist=[network_class])
+        network_class = getattr(module, network_class)
 
     # recreate the network and environment
     network = network_class(
-        name=exp_tag,
+        name="{}_{}".format(exp_tag, os.getpid()),
         vehicles=vehicles,
         net_params=net_params,
         initial_config=initial_config,
@@ -118,67 +329,18 @@ def evaluate_policy(benchmark, _get_actions, _get_states=None):
 
         env_class = _env_class
 
-    env = env_class(
+    return env_class(
         env_params=env_params, sim_params=sim_params, network=network)
 
-    flow_params = dict(
-        # name of the experiment
-        exp_tag=exp_tag,
-
-        # name of the flow environment the experiment is running on
-        env_name=env_class,
-
-        # name of the network class the experiment is running on
-        network=network_class,
-
-        # simulator that is used by the experiment
-        simulator='traci',
-
-        # sumo-related parameters (see flow.core.params.SumoParams)
-        sim=sim_params,
-
-        # environment related parameters (see flow.core.params.EnvParams)
-        env=env_params,
-
-        # network-related parameters (see flow.core.params.NetParams and the
-        # network's documentation or ADDITIONAL_NET_PARAMS component)
-        net=net_params,
-
-        # vehicles to be placed in the network at the start of a rollout (see
-        # flow.core.params.VehicleParams)
-        veh=vehicles,
-
-        # parameters specifying the positioning of vehicles upon initialization/
-        # reset (see flow.core.params.InitialConfig)
-        initial=initial_config,
-
-        # traffic lights to be introduced to specific nodes (see
-        # flow.core.params.TrafficLightParams)
-        tls=traffic_lights,
-    )
-
-    # number of time steps
-    flow_params['env'].horizon = env.env_params.horizon
-
-    # create a Experiment object. Note that the state may not be that which is
-    # specified by the environment.
-    exp = Experiment(flow_params)
-    exp.env = env
-
-    exp = Experiment(flow_params)
-    exp.env = env
-
-    # run the experiment and return the reward
-    res = exp.run(
-        num_runs=NUM_RUNS,
-        rl_actions=_get_actions)
-
-    return np.mean(res["returns"]), np.std(res["returns"])
-
 
 def get_compute_action_rllib(path_to_dir, checkpoint_num, alg):
     """Collect the compute_action method from RLlib's serialized files.
 
+    The policy is evaluated in the calling process. In order to evaluate it
+    in several processes with evaluate_policy, pass this method (with its
+    arguments bound, e.g. with functools.partial) as the load_actions
+    argument, so that every process restores its own copy of the agent.
+
     Parameters
     ----------
     path_to_dir : str
@@ -199,9 +361,11 @@ def get_compute_action_rllib(path_to_dir, checkpoint_num, alg):
     result_dir = path_to_dir if path_to_dir[-1] != '/' else path_to_dir[:-1]
     config = get_rllib_config(result_dir)
 
-    # run on only one cpu for rendering purposes
-    ray.init(num_cpus=1)
-    config["num_workers"] = 1
+    # run on only one cpu, the rollouts being parallelized by
+    # evaluate_policy instead
+    if not ray.is_initialized():
+        ray.init(num_cpus=1)
+    config["num_workers"] = 0
 
     # create and register a gym+rllib env
     flow_params = get_flow_params(config)
@@ -211,10 +375,11 @@ def get_compute_action_rllib(path_to_dir, checkpoint_num, alg):
 
     # recreate the agent
     agent_cls = get_agent_class(alg)
-    agent = agent_cls(env=env_name, registry=get_registry(), config=config)
+    agent = agent_cls(env=env_name, config=config)
 
     # restore the trained parameters into the policy
-    checkpoint = result_dir + '/checkpoint-{}'.format(checkpoint_num)
-    agent._restore(checkpoint)
+    checkpoint = result_dir + '/checkpoint_{}'.format(checkpoint_num)
+    checkpoint = checkpoint + '/checkpoint-{}'.format(checkpoint_num)
+    agent.restore(checkpoint)
 
     return agent.compute_action
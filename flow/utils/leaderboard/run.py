@@ -1,10 +1,13 @@
 """Runner for flow/utils/leaderboard/evaluate.py/evaluate_policy."""
 
+import multiprocessing
+
 from solution import BENCHMARK, get_actions, get_states
 from evaluate import evaluate_policy
 
-# Evaluate the solution
+# Evaluate the solution, with one rollout per available cpu at a time
 mean, stdev = evaluate_policy(
-    benchmark=BENCHMARK, _get_actions=get_actions, _get_states=get_states)
+    benchmark=BENCHMARK, _get_actions=get_actions, _get_states=get_states,
+    num_cpus=multiprocessing.cpu_count())
 # Print results
 print(mean, stdev)
@@ -3,8 +3,6 @@
 import gym
 from gym.envs.registration import register
 
-from copy import deepcopy
-
 import flow.envs
 from flow.core.params import InitialConfig
 from flow.core.params import TrafficLightParams
@@ -68,9 +66,7 @@ def make_create_env(params, version=0, render=None):
         base_env_name = params["env_name"].__name__
 
     # deal with multiple environments being created under the same name
-    all_envs = gym.envs.registry.all()
-    env_ids = [env_spec.id for env_spec in all_envs]
-    while "{}-v{}".format(base_env_name, version) in env_ids:
+    while "{}-v{}".format(base_env_name, version) in _registered_envs():
         version += 1
     env_name = "{}-v{}".format(base_env_name, version)
 
@@ -88,8 +84,8 @@ def make_create_env(params, version=0, render=None):
     traffic_lights = params.get("tls", TrafficLightParams())
 
     def create_env(*_):
-        sim_params = deepcopy(params['sim'])
-        vehicles = deepcopy(params['veh'])
+        sim_params = params['sim'].copy()
+        vehicles = params['veh'].copy()
 
         network = network_class(
             name=exp_tag,
@@ -104,11 +100,8 @@ def make_create_env(params, version=0, render=None):
 
         # check if the environment is a single or multiagent environment, and
         # get the right address accordingly
-        single_agent_envs = [env for env in dir(flow.envs)
-                             if not env.startswith('__')]
-
         if isinstance(params["env_name"], str):
-            if params['env_name'] in single_agent_envs:
+            if params['env_name'] in flow.envs.__all__:
                 env_loc = 'flow.envs'
             else:
                 env_loc = 'flow.envs.multiagent'
@@ -116,22 +109,36 @@ def make_create_env(params, version=0, render=None):
         else:
             entry_point = params["env_name"].__module__ + ':' + params["env_name"].__name__
 
-        # register the environment with OpenAI gym
-        register(
-            id=env_name,
-            entry_point=entry_point,
-            kwargs={
-                "env_params": env_params,
-                "sim_params": sim_params,
-                "network": network,
-                "simulator": params['simulator']
-            })
+        kwargs = {
+            "env_params": env_params,
+            "sim_params": sim_params,
+            "network": network,
+            "simulator": params['simulator']
+        }
+
+        # register the environment with OpenAI gym. The environment is only
+        # registered by the first call in a process, and the parameters of
+        # the new network are passed when it is created.
+        if env_name not in _registered_envs():
+            register(id=env_name, entry_point=entry_point, kwargs=kwargs)
 
-        return gym.envs.make(env_name)
+        return gym.envs.make(env_name, **kwargs)
 
     return create_env, env_name
 
 
+def _registered_envs():
+    """Return the environment specifications registered with OpenAI gym.
+
+    Returns
+    -------
+    dict
+        dictionary of environment specifications, indexed by environment ID
+    """
+    # newer versions of gym store the specifications in the registry itself
+    return getattr(gym.envs.registry, 'env_specs', gym.envs.registry)
+
+
 def env_constructor(params, version=0, render=None):
     """Return a constructor from make_create_env."""
     create_env, env_name = make_create_env(params, version, render)
@@ -1 +1,24 @@
-"""Empty init file to ensure documentation for visualizers is created."""
+"""Empty init file to ensure documentation for visualizers is created.
+
+The visualizers (and their dependencies, e.g. matplotlib or ray) are imported
+when they are first accessed (see flow/utils/lazy_import.py).
+"""
+import importlib
+
+_VISUALIZERS = [
+    'capacity_diagram_generator',
+    'plot_ray_results',
+    'time_space_diagram',
+    'visualizer_rllib',
+]
+
+
+def __getattr__(name):
+    if name in _VISUALIZERS:
+        return importlib.import_module('{}.{}'.format(__name__, name))
+    raise AttributeError(
+        'module {!r} has no attribute {!r}'.format(__name__, name))
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_VISUALIZERS))
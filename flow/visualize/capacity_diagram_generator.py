@@ -9,6 +9,10 @@ e.g.
     1500, 1134
     ...
 
+The csv file may also contain the results of a flow.core.sweep.Sweep, with
+the column names as header, in which case the inflows and outflows are read
+from the columns specified by --inflow_col and --outflow_col.
+
 And then uses this data to generate a capacity diagram, with the x-axis being
 the inflow rates and the y-axis is the outflow rate.
 
@@ -24,13 +28,17 @@ import numpy as np
 import argparse
 
 
-def import_data_from_csv(fp):
+def import_data_from_csv(fp, inflow_col='inflow', outflow_col='outflow_rate'):
     r"""Import inflow/outflow data from the predefined csv file.
 
     Parameters
     ----------
     fp : string
         file path
+    inflow_col : str, optional
+        name of the inflow column, if the file has a header
+    outflow_col : str, optional
+        name of the outflow column, if the file has a header
 
     Returns
     -------
@@ -42,9 +50,15 @@ def import_data_from_csv(fp):
     outflows = []
     with open(fp, 'rt') as csvfile:
         spamreader = csv.reader(csvfile)
-        for row in spamreader:
-            inflows.append(float(row[0]))
-            outflows.append(float(row[1]))
+        inflow_index, outflow_index = 0, 1
+        for i, row in enumerate(spamreader):
+            if i == 0 and inflow_col in row:
+                # the first row is a header
+                inflow_index = row.index(inflow_col)
+                outflow_index = row.index(outflow_col)
+                continue
+            inflows.append(float(row[inflow_index]))
+            outflows.append(float(row[outflow_index]))
 
     return {'inflows': inflows, 'outflows': outflows}
 
@@ -87,6 +101,12 @@ def create_parser():
         epilog="python capacity_diagram_generator.py </path/to/file>.csv")
 
     parser.add_argument('file', type=str, help='path to the csv file.')
+    parser.add_argument(
+        '--inflow_col', type=str, default='inflow',
+        help='name of the inflow column, if the csv file has a header.')
+    parser.add_argument(
+        '--outflow_col', type=str, default='outflow_rate',
+        help='name of the outflow column, if the csv file has a header.')
 
     return parser
 
@@ -97,7 +117,7 @@ if __name__ == '__main__':
     args = parser.parse_args()
 
     # import the csv file
-    data = import_data_from_csv(args.file)
+    data = import_data_from_csv(args.file, args.inflow_col, args.outflow_col)
 
     # compute the mean and std of the outflows for all unique inflows
     unique_inflows, mean_outflows, std_outflows = get_capacity_data(data)
@@ -6,16 +6,24 @@ as well as the column(s) to be plotted.
 
 If no column is specified, all existing columns will be printed.
 
+Several runs can be plotted at once by passing glob patterns, and the plot
+can follow files that are still being written with the --refresh option.
+
 Example usage
 -----
 ::
     python plot_ray_results.py </path/to/file>.csv mean_reward max_reward
+    python plot_ray_results.py "~/ray_results/exp/*/progress.csv" mean_reward
+        --refresh 10
 """
 
 import csv
 import argparse
+import glob
+import io
+import os
 import matplotlib.pyplot as plt
-from collections import defaultdict
+import numpy as np
 
 
 EXAMPLE_USAGE = 'plot_ray_results.py ' + \
@@ -23,43 +31,232 @@ EXAMPLE_USAGE = 'plot_ray_results.py ' + \
     'evaluation/return-average training/return-average'
 
 
-def plot_progress(filepath, columns):
-    """Plot ray results from a csv file.
+class ProgressReader(object):
+    """Incremental reader of a progress file.
+
+    The reader remembers the byte offset up to which the file was parsed, so
+    that every call to read only parses the rows appended since the previous
+    call. Only complete rows are parsed: a row that is still being written is
+    left for the next call. The values of the requested columns are stored in
+    numpy arrays whose capacity is doubled whenever they are full.
+
+    Attributes
+    ----------
+    filepath : str
+        path to the csv file
+    columns : list of str
+        names of the columns to read
+    header : list of str or None
+        names of all the columns of the file, or None if the header has not
+        been read yet
+    num_rows : int
+        number of rows read so far
+    """
+
+    def __init__(self, filepath, columns):
+        """Instantiate the reader.
+
+        Parameters
+        ----------
+        filepath : str
+            path to the csv file
+        columns : list of str
+            names of the columns to read
+        """
+        self.filepath = filepath
+        self.columns = list(columns)
+        self._reset()
+
+    def _reset(self):
+        """Forget all the rows read so far."""
+        self.header = None
+        self.num_rows = 0
+        self._offset = 0
+        self._indices = None
+        self._data = {col: np.empty(0) for col in self.columns}
+
+    def values(self, col):
+        """Return the values of a column read so far.
+
+        The returned array is a view of the internal buffer, and is only
+        valid until the next call to read.
+        """
+        return self._data[col][:self.num_rows]
+
+    def read(self):
+        """Parse the rows appended to the file since the last call.
 
-    Plot the values contained in the csv file at <filepath> for each column
+        Returns
+        -------
+        int
+            number of new rows
+
+        Raises
+        ------
+        KeyError
+            if one of the columns is not in the header of the file
+        ValueError
+            if one of the columns contains values that are not convertible to
+            floats
+        """
+        with open(self.filepath, 'rb') as f:
+            f.seek(0, os.SEEK_END)
+            if f.tell() < self._offset:
+                # the file was truncated or replaced, start over
+                self._reset()
+            f.seek(self._offset)
+            chunk = f.read()
+
+        end = self._complete_rows_end(chunk)
+        if end == 0:
+            return 0
+
+        reader = csv.reader(io.StringIO(chunk[:end].decode()))
+        header, indices = self.header, self._indices
+        if header is None:
+            header = next(reader)
+            for col in self.columns:
+                if col not in header:
+                    raise KeyError(col)
+            indices = [header.index(col) for col in self.columns]
+
+        rows = list(reader)
+        new_values = {}
+        for col, index in zip(self.columns, indices):
+            try:
+                new_values[col] = [float(row[index]) for row in rows]
+            except ValueError:
+                raise ValueError(
+                    'column "{}" contains values that are not convertible '
+                    'to floats'.format(col))
+
+        self._reserve(self.num_rows + len(rows))
+        for col, values in new_values.items():
+            self._data[col][self.num_rows:self.num_rows + len(rows)] = values
+        self.num_rows += len(rows)
+        self.header, self._indices = header, indices
+        self._offset += end
+
+        return len(rows)
+
+    @staticmethod
+    def _complete_rows_end(chunk):
+        """Return the number of bytes of a chunk made of complete rows.
+
+        A row is complete if it ends with a newline that is not inside a
+        quoted field, i.e. that is preceded by an even number of quotes.
+        """
+        end = chunk.rfind(b'\n') + 1
+        # quoted fields (dictionaries of metrics) may contain newlines
+        while end > 0 and chunk.count(b'"', 0, end) % 2:
+            end = chunk.rfind(b'\n', 0, end - 1) + 1
+        return end
+
+    def _reserve(self, num_rows):
+        """Grow the buffers so that they can hold num_rows rows."""
+        capacity = len(self._data[self.columns[0]]) if self.columns else 0
+        if num_rows <= capacity:
+            return
+        capacity = max(num_rows, 2 * capacity)
+        for col in self.columns:
+            data = np.empty(capacity)
+            data[:self.num_rows] = self._data[col][:self.num_rows]
+            self._data[col] = data
+
+
+def expand_paths(patterns):
+    """Return the files matching a list of paths or glob patterns.
+
+    Patterns that do not match any file are returned as is, so that trying to
+    read them raises an error.
+    """
+    paths = []
+    for pattern in patterns:
+        matches = sorted(glob.glob(os.path.expanduser(pattern)))
+        for path in matches or [pattern]:
+            if path not in paths:
+                paths.append(path)
+    return paths
+
+
+def plot_progress(filepath, columns, refresh=None):
+    """Plot ray results from one or several csv files.
+
+    Plot the values contained in the csv file(s) at <filepath> for each column
     in the list of string columns.
+
+    Parameters
+    ----------
+    filepath : str or list of str
+        path to the csv file, or glob pattern(s) matching several files
+    columns : list of str
+        names of the columns to plot. If empty, the names of all the columns
+        of the (first) file are printed instead.
+    refresh : float, optional
+        if specified, the files are followed and the plot refreshed every
+        refresh seconds, until the figure is closed. Only the rows appended
+        to the files since the previous refresh are parsed.
     """
-    data = defaultdict(list)
+    patterns = [filepath] if isinstance(filepath, str) else list(filepath)
+    paths = expand_paths(patterns)
 
-    with open(filepath) as f:
-        # if columns list is empty, print a list of all columns and return
-        if not columns:
+    # if columns list is empty, print a list of all columns and return
+    if not columns:
+        with open(paths[0]) as f:
             reader = csv.reader(f)
             print('Columns are: ' + ', '.join(next(reader)))
-            return
-
-        try:
-            reader = csv.DictReader(f)
-            for row in reader:
-                for col in columns:
-                    data[col].append(float(row[col]))
-        except KeyError:
-            print('Error: {} was called with an unknown column name "{}".\n'
-                  'Run "python {} {}" to get a list of all the existing '
-                  'columns'.format(__file__, col, __file__, filepath))
-            raise
-        except ValueError:
-            print('Error: {} was called with an invalid column name "{}".\n'
-                  'This column contains values that are not convertible to '
-                  'floats.'.format(__file__, col))
-            raise
+        return
 
     plt.ion()
-    for col_name, values in data.items():
-        plt.plot(values, label=col_name)
-    plt.legend()
+    fig, ax = plt.subplots()
+    readers = {}
+    lines = {}
+
+    def update():
+        for path in expand_paths(patterns):
+            if path not in readers:
+                readers[path] = ProgressReader(path, columns)
+            reader = readers[path]
+            try:
+                reader.read()
+            except KeyError as e:
+                print('Error: {} was called with an unknown column name "{}".'
+                      '\nRun "python {} {}" to get a list of all the existing '
+                      'columns'.format(__file__, e.args[0], __file__, path))
+                raise
+            except ValueError as e:
+                print('Error: {} was called with an invalid column name.\n'
+                      'The {}.'.format(__file__, e))
+                raise
+
+            for col in columns:
+                if (path, col) not in lines:
+                    label = col if len(patterns) == 1 and len(readers) == 1 \
+                        else '{}: {}'.format(_run_name(path), col)
+                    lines[path, col], = ax.plot([], [], label=label)
+                lines[path, col].set_data(
+                    np.arange(reader.num_rows), reader.values(col))
+        ax.relim()
+        ax.autoscale_view()
+
+    update()
+    ax.legend()
     plt.show()
 
+    if refresh is not None:
+        while plt.fignum_exists(fig.number):
+            num_lines = len(lines)
+            update()
+            if len(lines) != num_lines:
+                ax.legend()
+            fig.canvas.draw_idle()
+            plt.pause(refresh)
+
+
+def _run_name(path):
+    """Return the name of the run that produced a progress file."""
+    return os.path.basename(os.path.dirname(os.path.abspath(path))) or path
+
 
 def create_parser():
     """Parse visualization options user can specify in command line.
@@ -74,9 +271,19 @@ def create_parser():
         description='[Flow] Plots progress.csv file generated by ray.',
         epilog='Example usage:\n\t' + EXAMPLE_USAGE)
 
-    parser.add_argument('file', type=str, help='Path to the csv file.')
+    parser.add_argument(
+        'file', type=str,
+        help='Path to the csv file, or (quoted) glob pattern matching the '
+             'csv files of several runs.')
     parser.add_argument(
         'columns', type=str, nargs='*', help='Names of the columns to plot.')
+    parser.add_argument(
+        '--runs', type=str, nargs='+', default=[],
+        help='Paths or glob patterns of the csv files of additional runs.')
+    parser.add_argument(
+        '--refresh', type=float, default=None,
+        help='Follow the csv files and refresh the plot every REFRESH '
+             'seconds, until the figure is closed.')
 
     return parser
 
@@ -84,4 +291,4 @@ def create_parser():
 if __name__ == '__main__':
     parser = create_parser()
     args = parser.parse_args()
-    plot_progress(args.file, args.columns)
+    plot_progress([args.file] + args.runs, args.columns, args.refresh)
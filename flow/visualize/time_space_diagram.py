@@ -8,6 +8,13 @@ color representing the speed of te vehicles.
 If the number of simulation steps is too dense, you can plot every nth step in
 the plot by setting the input `--steps=n`.
 
+For long simulations with many vehicles, drawing every segment separately is
+slow and memory intensive. The `--raster` flag instead accumulates the speeds
+of the segments into a (time x space) image, in which every pixel is assigned
+the mean (or minimum, see `--raster_agg`) speed of the segments crossing it.
+In the case of I210, the images of the lanes are computed in `--num_cpus`
+parallel processes.
+
 Note: This script assumes that the provided network has only one lane on the
 each edge, or one lane on the main highway in the case of MergeNetwork.
 
@@ -21,6 +28,7 @@ from flow.networks import RingNetwork, FigureEightNetwork, MergeNetwork, I210Sub
 
 import argparse
 from collections import defaultdict
+import multiprocessing
 try:
     from matplotlib import pyplot as plt
 except ImportError:
@@ -43,6 +51,17 @@ ACCEPTABLE_NETWORKS = [
     HighwayNetwork
 ]
 
+# aggregation functions available to compute the speed of a raster pixel
+RASTER_AGGREGATIONS = ['mean', 'min']
+
+# colormap used to plot the speeds
+cdict = {
+    'red': ((0, 0, 0), (0.2, 1, 1), (0.6, 1, 1), (1, 0, 0)),
+    'green': ((0, 0, 0), (0.2, 0, 0), (0.6, 1, 1), (1, 1, 1)),
+    'blue': ((0, 0, 0), (0.2, 0, 0), (0.6, 0, 0), (1, 0, 0))
+}
+my_cmap = colors.LinearSegmentedColormap('my_colormap', cdict, 1024)
+
 
 def import_data_from_trajectory(fp, params=dict()):
     r"""Import and preprocess data from the Flow trajectory (.csv) file.
@@ -371,7 +390,7 @@ def _get_abs_pos(df, params):
     else:
         edgestarts = defaultdict(float)
 
-    ret = df.apply(lambda x: x['relative_position'] + edgestarts[x['edge_id']], axis=1)
+    ret = df['relative_position'] + df['edge_id'].map(edgestarts)
 
     if params['network'] == FigureEightNetwork:
         # reorganize data for space-time plot
@@ -385,10 +404,162 @@ def _get_abs_pos(df, params):
     return ret
 
 
-def plot_tsd(ax, df, segs, args, lane=None, ghost_edges=None, ghost_bounds=None):
+def rasterize_segments(segs, speeds, shape, bounds, agg='mean', chunk_size=1000000):
+    """Accumulate speed-colored segments into a (time x space) image.
+
+    Every segment is sampled twice per pixel along its longest dimension, and
+    the speed of every pixel is aggregated over all the samples falling into
+    it. The segments are processed in chunks to bound the memory usage.
+
+    Parameters
+    ----------
+    segs : np.ndarray
+        3d array (n_segments x 2 x 2) of segments, as returned by
+        get_time_space_data
+    speeds : array_like
+        speed associated with every segment
+    shape : (int, int)
+        number of pixels along the time and space axes
+    bounds : (float, float, float, float)
+        minimum time, maximum time, minimum position, and maximum position
+        covered by the image
+    agg : str, optional
+        aggregation of the speeds in every pixel, one of RASTER_AGGREGATIONS
+    chunk_size : int, optional
+        maximum number of segments processed at once
+
+    Returns
+    -------
+    np.ndarray
+        2d array (shape[1] x shape[0]) of speeds, where the first axis is the
+        position (from bottom to top) and the second axis is the time. Pixels
+        that are not crossed by any segment are set to NaN.
+
+    Raises
+    ------
+    ValueError
+        if the aggregation is not supported
+    """
+    if agg not in RASTER_AGGREGATIONS:
+        raise ValueError('Aggregation must be one of: ' + ', '.join(RASTER_AGGREGATIONS))
+
+    width, height = shape
+    xmin, xmax, ymin, ymax = bounds
+    segs = np.asarray(segs, dtype=float).reshape((-1, 2, 2))
+    speeds = np.asarray(speeds, dtype=float)
+
+    # pixel coordinates of the ends of the segments
+    x_scale = width / max(xmax - xmin, 1e-6)
+    y_scale = height / max(ymax - ymin, 1e-6)
+
+    if agg == 'mean':
+        sums = np.zeros(width * height)
+        counts = np.zeros(width * height)
+    else:
+        out = np.full(width * height, np.inf)
+
+    for start in range(0, len(segs), chunk_size):
+        chunk = segs[start:start + chunk_size]
+        x0 = (chunk[:, 0, 0] - xmin) * x_scale
+        y0 = (chunk[:, 0, 1] - ymin) * y_scale
+        dx = (chunk[:, 1, 0] - xmin) * x_scale - x0
+        dy = (chunk[:, 1, 1] - ymin) * y_scale - y0
+
+        # sample every segment twice per pixel it crosses, so that no pixel is
+        # skipped due to round-off errors
+        num_samples = np.ceil(2 * np.maximum(np.abs(dx), np.abs(dy))).astype(int) + 1
+        index = np.repeat(np.arange(len(chunk)), num_samples)
+        offsets = np.arange(len(index)) - np.repeat(np.cumsum(num_samples) - num_samples, num_samples)
+        frac = offsets / np.maximum(num_samples - 1, 1)[index]
+
+        cols = np.clip((x0[index] + frac * dx[index]).astype(int), 0, width - 1)
+        rows = np.clip((y0[index] + frac * dy[index]).astype(int), 0, height - 1)
+        pixels = rows * width + cols
+        values = speeds[start:start + chunk_size][index]
+
+        if agg == 'mean':
+            sums += np.bincount(pixels, weights=values, minlength=width * height)
+            counts += np.bincount(pixels, minlength=width * height)
+        else:
+            np.minimum.at(out, pixels, values)
+
+    if agg == 'mean':
+        with np.errstate(invalid='ignore', divide='ignore'):
+            out = sums / counts
+    else:
+        out[np.isinf(out)] = np.nan
+
+    return out.reshape((height, width))
+
+
+def get_bounds(df):
+    """Return the time and space bounds of the segments of the trajectory data.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        cleaned dataframe of the trajectory data
+
+    Returns
+    -------
+    (float, float, float, float)
+        minimum time, maximum time, minimum position, and maximum position
+    """
+    return (df['time_step'].min(), df['next_time'].max(),
+            min(df['distance'].min(), df['next_pos'].min()),
+            max(df['distance'].max(), df['next_pos'].max()))
+
+
+def _rasterize(args):
+    """Call rasterize_segments with a tuple of arguments (used by Pool.map)."""
+    return rasterize_segments(*args)
+
+
+def rasterize_tsd(segs, data, shape, agg='mean', num_cpus=1):
+    """Compute the raster images of the time-space diagram.
+
+    Parameters
+    ----------
+    segs : np.ndarray (or dict < str, np.ndarray >)
+        segments returned by get_time_space_data
+    data : pd.DataFrame
+        trajectory dataframe returned by get_time_space_data
+    shape : (int, int)
+        number of pixels along the time and space axes
+    agg : str, optional
+        aggregation of the speeds in every pixel, one of RASTER_AGGREGATIONS
+    num_cpus : int, optional
+        number of processes used to compute the images of different lanes
+
+    Returns
+    -------
+    np.ndarray (or dict < str, np.ndarray >)
+        image of the segments (see rasterize_segments), or of the segments of
+        every lane if the segments are keyed on lane numbers
+    """
+    if not isinstance(segs, dict):
+        return rasterize_segments(segs, data['speed'].values, shape, get_bounds(data), agg)
+
+    lanes = sorted(segs)
+    tasks = []
+    for lane in lanes:
+        df = data[data['lane_id'] == lane]
+        tasks.append((segs[lane], df['speed'].values, shape, get_bounds(df), agg))
+
+    if num_cpus > 1 and len(tasks) > 1:
+        with multiprocessing.Pool(min(num_cpus, len(tasks))) as pool:
+            images = pool.map(_rasterize, tasks)
+    else:
+        images = [_rasterize(task) for task in tasks]
+
+    return dict(zip(lanes, images))
+
+
+def plot_tsd(ax, df, segs, args, lane=None, ghost_edges=None, ghost_bounds=None, image=None):
     """Plot the time-space diagram.
 
-    Take the pre-processed segments and other meta-data, then plot all the line segments.
+    Take the pre-processed segments and other meta-data, then plot all the line segments,
+    or the raster image of the segments if one is provided.
 
     Parameters
     ----------
@@ -406,6 +577,10 @@ def plot_tsd(ax, df, segs, args, lane=None, ghost_edges=None, ghost_bounds=None)
         ghost edge names to be greyed out, default None
     ghost_bounds : tuple
         lower and upper bounds of domain, excluding ghost edges, default None
+    image : np.ndarray, optional
+        raster image of the segments, as returned by rasterize_segments with
+        the bounds returned by get_bounds(df). If provided, the image is plotted instead of the
+        segments.
 
     Returns
     -------
@@ -421,10 +596,14 @@ def plot_tsd(ax, df, segs, args, lane=None, ghost_edges=None, ghost_bounds=None)
     ax.set_xlim(xmin - xbuffer, xmax + xbuffer)
     ax.set_ylim(ymin - ybuffer, ymax + ybuffer)
 
-    lc = LineCollection(segs, cmap=my_cmap, norm=norm)
-    lc.set_array(df['speed'].values)
-    lc.set_linewidth(1)
-    ax.add_collection(lc)
+    if image is None:
+        lc = LineCollection(segs, cmap=my_cmap, norm=norm)
+        lc.set_array(df['speed'].values)
+        lc.set_linewidth(1)
+        ax.add_collection(lc)
+    else:
+        lc = ax.imshow(image, cmap=my_cmap, norm=norm, origin='lower', aspect='auto',
+                       interpolation='nearest', extent=get_bounds(df))
     ax.autoscale()
 
     rects = []
@@ -485,6 +664,14 @@ if __name__ == '__main__':
                         help='The minimum speed in the color range.')
     parser.add_argument('--start', type=float, default=0,
                         help='initial time (in sec) in the plot.')
+    parser.add_argument('--raster', action='store_true',
+                        help='plot the segments as a raster image instead of individual lines.')
+    parser.add_argument('--raster_shape', type=int, nargs=2, default=[1600, 900],
+                        help='number of pixels of the raster image along the time and space axes.')
+    parser.add_argument('--raster_agg', type=str, default='mean', choices=RASTER_AGGREGATIONS,
+                        help='aggregation of the speeds of the segments crossing a pixel.')
+    parser.add_argument('--num_cpus', type=int, default=1,
+                        help='number of processes used to compute the raster images of the lanes.')
 
     args = parser.parse_args()
 
@@ -495,28 +682,26 @@ if __name__ == '__main__':
         module = __import__("examples.exp_configs.non_rl", fromlist=[args.flow_params])
         flow_params = getattr(module, args.flow_params).flow_params
 
-    # some plotting parameters
-    cdict = {
-        'red': ((0, 0, 0), (0.2, 1, 1), (0.6, 1, 1), (1, 0, 0)),
-        'green': ((0, 0, 0), (0.2, 0, 0), (0.6, 1, 1), (1, 1, 1)),
-        'blue': ((0, 0, 0), (0.2, 0, 0), (0.6, 0, 0), (1, 0, 0))
-    }
-    my_cmap = colors.LinearSegmentedColormap('my_colormap', cdict, 1024)
-
     # Read trajectory csv into pandas dataframe
     traj_df = import_data_from_trajectory(args.trajectory_path, flow_params)
 
     # Convert df data into segments for plotting
     segs, traj_df = get_time_space_data(traj_df, flow_params)
 
+    # compute the raster images of the segments, if requested
+    images = None
+    if args.raster:
+        images = rasterize_tsd(segs, traj_df, args.raster_shape, args.raster_agg, args.num_cpus)
+
     if flow_params['network'] == I210SubNetwork:
         nlanes = traj_df['lane_id'].nunique()
         fig = plt.figure(figsize=(16, 9*nlanes))
 
-        for lane, df in traj_df.groupby('lane_id'):
-            ax = plt.subplot(nlanes, 1, lane+1)
+        for i, (lane, df) in enumerate(traj_df.groupby('lane_id')):
+            ax = plt.subplot(nlanes, 1, i+1)
 
-            plot_tsd(ax, df, segs[lane], args, int(lane+1), ghost_edges={'ghost0', '119257908#3'})
+            plot_tsd(ax, df, segs[lane], args, int(lane+1), ghost_edges={'ghost0', '119257908#3'},
+                     image=images[lane] if images is not None else None)
         plt.tight_layout()
     else:
         # perform plotting operation
@@ -524,9 +709,9 @@ if __name__ == '__main__':
         ax = plt.axes()
 
         if flow_params['network'] == HighwayNetwork:
-            plot_tsd(ax, traj_df, segs, args, ghost_bounds=(500, 2300))
+            plot_tsd(ax, traj_df, segs, args, ghost_bounds=(500, 2300), image=images)
         else:
-            plot_tsd(ax, traj_df, segs, args)
+            plot_tsd(ax, traj_df, segs, args, image=images)
 
     ###########################################################################
     #                       Note: For MergeNetwork only                       #
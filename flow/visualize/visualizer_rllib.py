@@ -13,11 +13,13 @@ parser : ArgumentParser
 """
 
 import argparse
+from collections import defaultdict
 import gym
+import multiprocessing
+import multiprocessing.util
 import numpy as np
 import os
 import sys
-import time
 
 import ray
 try:
@@ -26,7 +28,6 @@ except ImportError:
     from ray.rllib.agents.registry import get_agent_class
 from ray.tune.registry import register_env
 
-from flow.core.util import emission_to_csv
 from flow.utils.registry import make_create_env
 from flow.utils.rllib import get_flow_params
 from flow.utils.rllib import get_rllib_config
@@ -49,6 +50,55 @@ def visualizer_rllib(args):
     This function takes args (see function create_parser below for
     more detailed information on what information can be fed to this
     visualizer), and renders the experiment associated with it.
+
+    If args.num_cpus is greater than one, the rollouts are instead performed
+    without rendering in a pool of processes, each of which restores its own
+    copy of the agent.
+    """
+    if args.num_cpus > 1:
+        ctx = multiprocessing.get_context('spawn')
+        with ctx.Pool(min(args.num_cpus, args.num_rollouts),
+                      initializer=_init_worker, initargs=(args,)) as pool:
+            results = pool.map(_run_worker_rollout, range(args.num_rollouts))
+        policies = sorted(results[0]['return']) \
+            if isinstance(results[0]['return'], dict) else None
+    else:
+        agent, env, rollout_params = _load_agent(args)
+        policies = rollout_params['policies']
+        results = []
+        for i in range(args.num_rollouts):
+            results.append(_rollout(agent, env, run_id=i, **rollout_params))
+
+        # terminate the environment
+        env.unwrapped.terminate()
+
+    _print_summary(results, policies)
+
+    if args.gen_emission:
+        dir_path = os.path.dirname(os.path.realpath(__file__))
+        print("\nGenerated emission files in {0}/test_time_rollout/".format(
+            dir_path))
+
+
+def _load_agent(args, headless=False):
+    """Restore the agent and create the environment of an experiment.
+
+    Parameters
+    ----------
+    args : argparse.Namespace
+        parsed arguments (see create_parser)
+    headless : bool, optional
+        whether to disable any rendering. The network is then named after the
+        current process, so that several processes can simulate it at once.
+
+    Returns
+    -------
+    ray.rllib.agents.Agent
+        the agent, with the parameters of the checkpoint
+    gym.Env
+        the environment
+    dict
+        keyword arguments of _rollout
     """
     result_dir = args.result_dir if args.result_dir[-1] != '/' \
         else args.result_dir[:-1]
@@ -106,36 +156,32 @@ def visualizer_rllib(args):
     sim_params.emission_path = emission_path if args.gen_emission else None
 
     # pick your rendering mode
-    if args.render_mode == 'sumo_web3d':
+    render_mode = 'no_render' if headless else args.render_mode
+    if render_mode == 'sumo_web3d':
         sim_params.num_clients = 2
         sim_params.render = False
-    elif args.render_mode == 'drgb':
+    elif render_mode == 'drgb':
         sim_params.render = 'drgb'
         sim_params.pxpm = 4
-    elif args.render_mode == 'sumo_gui':
+    elif render_mode == 'sumo_gui':
         sim_params.render = False  # will be set to True below
-    elif args.render_mode == 'no_render':
+    elif render_mode == 'no_render':
         sim_params.render = False
-    if args.save_render:
-        if args.render_mode != 'sumo_gui':
+    if args.save_render and not headless:
+        if render_mode != 'sumo_gui':
             sim_params.render = 'drgb'
             sim_params.pxpm = 4
         sim_params.save_render = True
 
+    # processes running in parallel must not share their network files
+    if headless:
+        flow_params['exp_tag'] = '{}_{}'.format(
+            flow_params['exp_tag'], os.getpid())
+
     # Create and register a gym+rllib env
     create_env, env_name = make_create_env(params=flow_params, version=0)
     register_env(env_name, create_env)
 
-    # check if the environment is a single or multiagent environment, and
-    # get the right address accordingly
-    # single_agent_envs = [env for env in dir(flow.envs)
-    #                      if not env.startswith('__')]
-
-    # if flow_params['env_name'] in single_agent_envs:
-    #     env_loc = 'flow.envs'
-    # else:
-    #     env_loc = 'flow.envs.multiagent'
-
     # Start the environment with the gui turned on and a path for the
     # emission file
     env_params = flow_params['env']
@@ -160,117 +206,243 @@ def visualizer_rllib(args):
     else:
         env = gym.make(env_name)
 
-    if args.render_mode == 'sumo_gui':
+    if render_mode == 'sumo_gui':
         env.sim_params.render = True  # set to True after initializing agent and env
 
+    rollout_params = {
+        'horizon': env_params.horizon,
+        'policies': None,
+        'policy_map_fn': None,
+        'lstm_cell_size': None,
+    }
     if multiagent:
-        rets = {}
         # map the agent id to its policy
-        policy_map_fn = config['multiagent']['policy_mapping_fn']
-        for key in config['multiagent']['policies'].keys():
-            rets[key] = []
-    else:
-        rets = []
-
+        rollout_params['policies'] = sorted(config['multiagent']['policies'])
+        rollout_params['policy_map_fn'] = \
+            config['multiagent']['policy_mapping_fn']
     if config['model']['use_lstm']:
-        use_lstm = True
-        if multiagent:
-            state_init = {}
-            # map the agent id to its policy
-            policy_map_fn = config['multiagent']['policy_mapping_fn']
-            size = config['model']['lstm_cell_size']
-            for key in config['multiagent']['policies'].keys():
-                state_init[key] = [np.zeros(size, np.float32),
-                                   np.zeros(size, np.float32)]
-        else:
-            state_init = [
-                np.zeros(config['model']['lstm_cell_size'], np.float32),
-                np.zeros(config['model']['lstm_cell_size'], np.float32)
-            ]
-    else:
-        use_lstm = False
+        rollout_params['lstm_cell_size'] = config['model']['lstm_cell_size']
 
     # if restart_instance, don't restart here because env.reset will restart later
     if not sim_params.restart_instance:
         env.restart_simulation(sim_params=sim_params, render=sim_params.render)
 
-    # Simulate and collect metrics
-    final_outflows = []
-    final_inflows = []
-    mean_speed = []
-    std_speed = []
-    for i in range(args.num_rollouts):
-        vel = []
-        state = env.reset()
-        if multiagent:
-            ret = {key: [0] for key in rets.keys()}
-        else:
-            ret = 0
-        for _ in range(env_params.horizon):
-            vehicles = env.unwrapped.k.vehicle
-            speeds = vehicles.get_speed(vehicles.get_ids())
+    return agent, env, rollout_params
+
+
+def compute_actions(agent, observations, policy_map_fn, rnn_states=None):
+    """Compute the actions of all agents in a multi-agent environment.
+
+    The observations of the agents that share a policy are stacked, so that
+    the actions of every policy are computed in a single forward pass. The
+    observations are preprocessed and filtered, and the actions clipped, in
+    the same way as agent.compute_action.
+
+    Parameters
+    ----------
+    agent : ray.rllib.agents.Agent
+        the agent holding the policies
+    observations : dict
+        observation of every agent, keyed by agent id
+    policy_map_fn : function
+        maps the id of an agent to the id of its policy
+    rnn_states : dict, optional
+        recurrent state of every agent, keyed by agent id, for policies with
+        recurrent models. The states are updated in place.
+
+    Returns
+    -------
+    dict
+        action of every agent, keyed by agent id
+    """
+    agent_ids = defaultdict(list)
+    for agent_id in observations.keys():
+        agent_ids[policy_map_fn(agent_id)].append(agent_id)
+
+    worker = agent.workers.local_worker()
+    actions = {}
+    for policy_id, ids in agent_ids.items():
+        policy = agent.get_policy(policy_id)
+        preprocessor = worker.preprocessors[policy_id]
+        obs_filter = worker.filters[policy_id]
+        obs_batch = np.stack([
+            obs_filter(preprocessor.transform(observations[agent_id]),
+                       update=False)
+            for agent_id in ids])
+
+        state_batches = None
+        if rnn_states is not None:
+            state_batches = [
+                np.stack([rnn_states[agent_id][i] for agent_id in ids])
+                for i in range(len(rnn_states[ids[0]]))]
+
+        batch_actions, state_out, _ = policy.compute_actions(
+            obs_batch, state_batches=state_batches)
+
+        if agent.config.get('clip_actions') and \
+                isinstance(policy.action_space, gym.spaces.Box):
+            batch_actions = np.clip(batch_actions, policy.action_space.low,
+                                    policy.action_space.high)
+
+        for i, agent_id in enumerate(ids):
+            actions[agent_id] = batch_actions[i]
+            if rnn_states is not None:
+                rnn_states[agent_id] = [state[i] for state in state_out]
+
+    return actions
+
+
+def _rollout(agent, env, horizon, policies, policy_map_fn, lstm_cell_size,
+             run_id=0):
+    """Perform a rollout and collect its metrics.
+
+    Parameters
+    ----------
+    agent : ray.rllib.agents.Agent
+        the agent computing the actions
+    env : gym.Env
+        the environment
+    horizon : int
+        maximum number of steps of the rollout
+    policies : list of str or None
+        ids of the policies of a multi-agent environment, or None for single
+        agent environments
+    policy_map_fn : function or None
+        maps the id of an agent to the id of its policy (multi-agent only)
+    lstm_cell_size : int or None
+        size of the cells of recurrent models, or None if the model is not
+        recurrent
+    run_id : int, optional
+        rollout number, used to name the emission file (if any)
+
+    Returns
+    -------
+    dict
+        the return (per policy for multi-agent environments), the outflow and
+        inflow (in veh/hr) in the last 500 seconds, and the mean and standard
+        deviation of the speeds (in m/s) of the rollout
+    """
+    multiagent = policies is not None
 
-            # only include non-empty speeds
-            if speeds:
-                vel.append(np.mean(speeds))
+    def init_rnn_state():
+        return [np.zeros(lstm_cell_size, np.float32),
+                np.zeros(lstm_cell_size, np.float32)]
 
-            if multiagent:
-                action = {}
-                for agent_id in state.keys():
-                    if use_lstm:
-                        action[agent_id], state_init[agent_id], logits = \
-                            agent.compute_action(
-                            state[agent_id], state=state_init[agent_id],
-                            policy_id=policy_map_fn(agent_id))
-                    else:
-                        action[agent_id] = agent.compute_action(
-                            state[agent_id], policy_id=policy_map_fn(agent_id))
-            else:
-                action = agent.compute_action(state)
-            state, reward, done, _ = env.step(action)
-            if multiagent:
-                for actor, rew in reward.items():
-                    ret[policy_map_fn(actor)][0] += rew
-            else:
-                ret += reward
-            if multiagent and done['__all__']:
-                break
-            if not multiagent and done:
-                break
+    vel = []
+    state = env.reset()
+    if multiagent:
+        ret = {key: 0 for key in policies}
+        rnn_states = {} if lstm_cell_size else None
+    else:
+        ret = 0
+        rnn_state = init_rnn_state() if lstm_cell_size else None
+
+    for _ in range(horizon):
+        vehicles = env.unwrapped.k.vehicle
+        speeds = vehicles.get_speed(vehicles.get_ids())
+
+        # only include non-empty speeds
+        if speeds:
+            vel.append(np.mean(speeds))
 
         if multiagent:
-            for key in rets.keys():
-                rets[key].append(ret[key])
-        else:
-            rets.append(ret)
-        outflow = vehicles.get_outflow_rate(500)
-        final_outflows.append(outflow)
-        inflow = vehicles.get_inflow_rate(500)
-        final_inflows.append(inflow)
-        if np.all(np.array(final_inflows) > 1e-5):
-            throughput_efficiency = [x / y for x, y in
-                                     zip(final_outflows, final_inflows)]
+            if rnn_states is not None:
+                for agent_id in state.keys():
+                    if agent_id not in rnn_states:
+                        rnn_states[agent_id] = init_rnn_state()
+            action = compute_actions(
+                agent, state, policy_map_fn, rnn_states=rnn_states)
+        elif rnn_state is not None:
+            action, rnn_state, _ = agent.compute_action(
+                state, state=rnn_state)
         else:
-            throughput_efficiency = [0] * len(final_inflows)
-        mean_speed.append(np.mean(vel))
-        std_speed.append(np.std(vel))
+            action = agent.compute_action(state)
+        state, reward, done, _ = env.step(action)
         if multiagent:
-            for agent_id, rew in rets.items():
-                print('Round {}, Return: {} for agent {}'.format(
-                    i, ret, agent_id))
+            for actor, rew in reward.items():
+                ret[policy_map_fn(actor)] += rew
         else:
-            print('Round {}, Return: {}'.format(i, ret))
+            ret += reward
+        if multiagent and done['__all__']:
+            break
+        if not multiagent and done:
+            break
+
+    # save the emission data of the rollout, if requested
+    if env.unwrapped.simulator == 'traci':
+        env.unwrapped.k.simulation.save_emission(run_id=run_id)
+
+    vehicles = env.unwrapped.k.vehicle
+    result = {
+        'return': ret,
+        'outflow': vehicles.get_outflow_rate(500),
+        'inflow': vehicles.get_inflow_rate(500),
+        'mean_speed': np.mean(vel),
+        'std_speed': np.std(vel),
+    }
+
+    if multiagent:
+        for policy_id in policies:
+            print('Round {}, Return: {} for agent {}'.format(
+                run_id, ret[policy_id], policy_id))
+    else:
+        print('Round {}, Return: {}'.format(run_id, ret))
+
+    return result
+
+
+# agent and environment of the current process, created by _init_worker
+_worker = {}
+
+
+def _init_worker(args):
+    """Restore the agent and create the environment of a worker process."""
+    ray.init(num_cpus=1)
+    agent, env, rollout_params = _load_agent(args, headless=True)
+    _worker.update(agent=agent, env=env, rollout_params=rollout_params)
+
+    # close the environment when the process exits
+    multiprocessing.util.Finalize(
+        None, env.unwrapped.terminate, exitpriority=10)
+
+
+def _run_worker_rollout(run_id):
+    """Perform a rollout in the environment of the current process."""
+    return _rollout(_worker['agent'], _worker['env'], run_id=run_id,
+                    **_worker['rollout_params'])
+
+
+def _print_summary(results, policies=None):
+    """Print the mean and standard deviation of the rollout metrics.
+
+    Parameters
+    ----------
+    results : list of dict
+        metrics of every rollout, as returned by _rollout
+    policies : list of str, optional
+        ids of the policies of a multi-agent environment
+    """
+    final_outflows = np.array([res['outflow'] for res in results])
+    final_inflows = np.array([res['inflow'] for res in results])
+    mean_speed = np.array([res['mean_speed'] for res in results])
+    std_speed = np.array([res['std_speed'] for res in results])
+    if np.all(final_inflows > 1e-5):
+        throughput_efficiency = final_outflows / final_inflows
+    else:
+        throughput_efficiency = np.zeros(len(final_inflows))
 
     print('==== Summary of results ====')
     print("Return:")
     print(mean_speed)
-    if multiagent:
-        for agent_id, rew in rets.items():
-            print('For agent', agent_id)
+    if policies is not None:
+        for policy_id in policies:
+            rew = [res['return'][policy_id] for res in results]
+            print('For agent', policy_id)
             print(rew)
             print('Average, std return: {}, {} for agent {}'.format(
-                np.mean(rew), np.std(rew), agent_id))
+                np.mean(rew), np.std(rew), policy_id))
     else:
+        rets = [res['return'] for res in results]
         print(rets)
         print('Average, std: {}, {}'.format(
             np.mean(rets), np.std(rets)))
@@ -300,29 +472,6 @@ def visualizer_rllib(args):
     print('Average, std: {}, {}'.format(np.mean(throughput_efficiency),
                                         np.std(throughput_efficiency)))
 
-    # terminate the environment
-    env.unwrapped.terminate()
-
-    # if prompted, convert the emission file into a csv file
-    if args.gen_emission:
-        time.sleep(0.1)
-
-        dir_path = os.path.dirname(os.path.realpath(__file__))
-        emission_filename = '{0}-emission.xml'.format(env.network.name)
-
-        emission_path = \
-            '{0}/test_time_rollout/{1}'.format(dir_path, emission_filename)
-
-        # convert the emission file into a csv file
-        emission_to_csv(emission_path)
-
-        # print the location of the emission csv file
-        emission_path_csv = emission_path[:-4] + ".csv"
-        print("\nGenerated emission file at " + emission_path_csv)
-
-        # delete the .xml version of the emission file
-        os.remove(emission_path)
-
 
 def create_parser():
     """Create the parser to capture CLI arguments."""
@@ -376,6 +525,14 @@ def create_parser():
         '--horizon',
         type=int,
         help='Specifies the horizon.')
+    parser.add_argument(
+        '--num_cpus',
+        type=int,
+        default=1,
+        help='Number of processes performing the rollouts. If greater than '
+             'one, the rollouts are performed in parallel without rendering, '
+             'and the emission file of every rollout (if requested) is saved '
+             'separately.')
     return parser
 
 
@@ -0,0 +1,135 @@
+"""Benchmark the generation time of traffic light grids of increasing size.
+
+For every grid size, this measures the time and peak memory needed to
+generate the nodes and edges of the network and write them to xml files,
+either by building the complete xml trees in memory (makexml/printxml) or by
+streaming the elements to the files (writexml). With the --netconvert flag,
+the complete generation of the network through the TraCI network kernel
+(including the call to netconvert) is timed as well.
+
+Usage
+    python scripts/benchmark_network_generation.py --sizes 10 30 50
+"""
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+from copy import deepcopy
+
+from lxml import etree
+
+from flow.core.params import NetParams, VehicleParams, SumoParams
+from flow.core.params import TrafficLightParams
+from flow.core.util import makexml, printxml, writexml
+from flow.networks import TrafficLightGridNetwork
+from flow.networks.traffic_light_grid import ADDITIONAL_NET_PARAMS
+
+E = etree.Element
+
+NODES_NSL = 'http://sumo.dlr.de/xsd/nodes_file.xsd'
+EDGES_NSL = 'http://sumo.dlr.de/xsd/edges_file.xsd'
+
+
+def create_parser():
+    """Create the parser to capture CLI arguments."""
+    parser = argparse.ArgumentParser(
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        description='Benchmark the generation of traffic light grids.')
+    parser.add_argument(
+        '--sizes', type=int, nargs='+', default=[5, 10, 20, 30, 50],
+        help='number of rows (and columns) of the grids')
+    parser.add_argument(
+        '--netconvert', action='store_true',
+        help='also time the complete generation of the network, including '
+             'the call to netconvert')
+    return parser
+
+
+def make_network(size):
+    """Create a square traffic light grid network."""
+    additional_net_params = deepcopy(ADDITIONAL_NET_PARAMS)
+    additional_net_params['grid_array'].update(
+        row_num=size, col_num=size,
+        inner_length=300, short_length=300, long_length=100)
+    return TrafficLightGridNetwork(
+        name='grid{}'.format(size),
+        vehicles=VehicleParams(),
+        net_params=NetParams(additional_params=additional_net_params),
+        traffic_lights=TrafficLightParams())
+
+
+def _str_attrib(attributes):
+    return {key: str(value) for key, value in attributes.items()}
+
+
+def write_tree(network, path):
+    """Write the nodes and edges by building the xml trees in memory."""
+    nodes = list(network.nodes)
+    edges = list(network.edges)
+
+    x = makexml('nodes', NODES_NSL)
+    for node in nodes:
+        x.append(E('node', **_str_attrib(node)))
+    printxml(x, os.path.join(path, 'tree.nod.xml'))
+
+    x = makexml('edges', EDGES_NSL)
+    for edge in edges:
+        x.append(E('edge', **_str_attrib(edge)))
+    printxml(x, os.path.join(path, 'tree.edg.xml'))
+
+
+def write_stream(network, path):
+    """Write the nodes and edges by streaming them to the files."""
+    writexml(os.path.join(path, 'stream.nod.xml'), 'nodes', NODES_NSL,
+             (E('node', **_str_attrib(node)) for node in network.nodes))
+    writexml(os.path.join(path, 'stream.edg.xml'), 'edges', EDGES_NSL,
+             (E('edge', **_str_attrib(edge)) for edge in network.edges))
+
+
+def measure(fn, *args):
+    """Return the run time (in s) and peak memory (in MB) of a function.
+
+    Only the memory allocated by python objects is traced, which excludes
+    the memory allocated by lxml for the xml trees themselves.
+    """
+    tracemalloc.start()
+    t = time.time()
+    fn(*args)
+    run_time = time.time() - t
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return run_time, peak / 1e6
+
+
+def generate_net(network):
+    """Generate the network with the TraCI network kernel."""
+    from flow.core.kernel.network import TraCIKernelNetwork
+    kernel = TraCIKernelNetwork(None, SumoParams())
+    kernel.generate_network(network)
+
+
+def main(args):
+    """Run the benchmark."""
+    flags = create_parser().parse_args(args)
+
+    print('{:>6} {:>8} {:>10} {:>10} {:>10} {:>10} {:>10}'.format(
+        'size', 'edges', 'tree (s)', 'tree (MB)', 'stream (s)',
+        'stream (MB)', 'full (s)'))
+    with tempfile.TemporaryDirectory() as path:
+        for size in flags.sizes:
+            network = make_network(size)
+            num_edges = len(network.edges)
+            tree_time, tree_mem = measure(write_tree, network, path)
+            stream_time, stream_mem = measure(write_stream, network, path)
+            full_time = measure(generate_net, network)[0] \
+                if flags.netconvert else float('nan')
+
+            print('{:>6} {:>8} {:>10.3f} {:>10.1f} {:>10.3f} {:>10.1f} '
+                  '{:>10.3f}'.format(size, num_edges, tree_time, tree_mem,
+                                     stream_time, stream_mem, full_time))
+
+
+if __name__ == '__main__':
+    import sys
+    main(sys.argv[1:])
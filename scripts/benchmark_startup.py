@@ -0,0 +1,101 @@
+"""Benchmark the startup time of Flow processes.
+
+Every measurement is run in a new python interpreter (as is the case for the
+workers spawned by RLlib), and includes:
+
+* import: the time needed to import flow.envs, flow.networks and
+  flow.controllers
+* env: the time needed to import the ring experiment and create its
+  environment through flow.utils.registry.make_create_env (including the start
+  of the sumo instance)
+
+The median over all repetitions is compared to a time budget, and the script
+exits with a non-zero status if the budget is exceeded.
+
+Usage
+    python scripts/benchmark_startup.py --repeat 5 --budget 3
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+import numpy as np
+
+# code run in a new interpreter for every measurement
+MEASURE = """
+import json
+import time
+
+t = time.time()
+import flow.envs
+import flow.networks
+import flow.controllers
+import_time = time.time() - t
+
+from examples.exp_configs.non_rl.ring import flow_params
+from flow.utils.registry import make_create_env
+
+flow_params['sim'].render = False
+create_env, _ = make_create_env(flow_params)
+env = create_env()
+env_time = time.time() - t
+env.terminate()
+
+print(json.dumps({'import': import_time, 'env': env_time}))
+"""
+
+PROJECT_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def create_parser():
+    """Create the parser to capture CLI arguments."""
+    parser = argparse.ArgumentParser(
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        description='Benchmark the startup time of Flow processes.')
+    parser.add_argument(
+        '--repeat', type=int, default=5,
+        help='number of new interpreters to measure')
+    parser.add_argument(
+        '--budget', type=float, default=None,
+        help='maximum median time (in s) needed to import Flow and create '
+             'the first environment')
+    return parser
+
+
+def measure():
+    """Return the import and environment creation times of a new process."""
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(
+        filter(None, [PROJECT_PATH, env.get('PYTHONPATH')]))
+    output = subprocess.check_output(
+        [sys.executable, '-c', MEASURE], cwd=PROJECT_PATH, env=env,
+        stderr=subprocess.DEVNULL)
+    # the last line contains the measurements, after the output of sumo
+    return json.loads(output.decode().strip().splitlines()[-1])
+
+
+def main(args):
+    """Run the benchmark."""
+    flags = create_parser().parse_args(args)
+
+    results = [measure() for _ in range(flags.repeat)]
+    import_time = np.median([res['import'] for res in results])
+    env_time = np.median([res['env'] for res in results])
+
+    print('import (s): {:.3f}'.format(import_time))
+    print('import + first env (s): {:.3f}'.format(env_time))
+
+    if flags.budget is not None:
+        if env_time > flags.budget:
+            print('Startup time exceeds the budget of {:.3f}s'.format(
+                flags.budget))
+            return 1
+        print('Startup time is within the budget of {:.3f}s'.format(
+            flags.budget))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
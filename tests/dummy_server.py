@@ -11,6 +11,7 @@ import os
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 import flow.utils.aimsun.constants as ac  # noqa
+import flow.utils.aimsun.protocol as protocol  # noqa
 
 PORT = 9999
 entered_vehicles = [1, 2, 3, 4, 5]
@@ -96,6 +97,65 @@ def retrieve_message(conn, out_format):
     return unpacked_data
 
 
+def pop_entered_ids():
+    """Return and clear the dummy entered vehicles."""
+    global entered_vehicles
+    veh_ids, entered_vehicles = entered_vehicles, []
+    return veh_ids
+
+
+def pop_exited_ids():
+    """Return and clear the dummy exited vehicles."""
+    global exited_vehicles
+    veh_ids, exited_vehicles = exited_vehicles, []
+    return veh_ids
+
+
+def pop_tl_ids():
+    """Return and clear the dummy traffic light ids."""
+    global tl_ids
+    ids, tl_ids = tl_ids, []
+    return ids
+
+
+def get_tracking_infos(info_bitmap, veh_ids, tracked):
+    """Return dummy tracking info for a batch of vehicles."""
+    data = (4, 5, 6, 7, 8, 9, 10, 11, 12, 14, 17, 18, 19, 20, 21, 22, 23, 24,
+            25, 26, 27)
+    output = [d for d, bit in zip(data, info_bitmap) if bit == '1']
+    return protocol.columns([output] * len(veh_ids), len(output))
+
+
+def get_tracked_state(info_bitmap, leader_bitmap, veh_ids):
+    """Return dummy tracking info and leaders for a batch of vehicles.
+
+    The leader of every vehicle is the next vehicle in the batch, and the
+    last vehicle has no leader.
+    """
+    info = get_tracking_infos(info_bitmap, veh_ids, [])
+    leaders = list(veh_ids[1:]) + [-2] * min(len(veh_ids), 1)
+    next_sections = [20] * len(veh_ids)
+    leader_info = get_tracking_infos(leader_bitmap, veh_ids, [])
+    leader_lengths = [5.0] * len(veh_ids)
+    return info + [leaders, next_sections] + leader_info + [leader_lengths]
+
+
+# dummy functions executing the commands of the framed protocol
+HANDLERS = {
+    ac.VEH_GET_ENTERED_IDS: lambda: (pop_entered_ids(),),
+    ac.VEH_GET_EXITED_IDS: lambda: (pop_exited_ids(),),
+    ac.VEH_GET_STATIC: lambda veh_ids: protocol.columns(
+        [(1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 12, 13, 14, 15, 16, False, 18,
+          19, 20, 21, 22, 23, 24, 25, 26)] * len(veh_ids),
+        len(protocol.STATIC_FORMAT)),
+    ac.VEH_GET_TRACKING: get_tracking_infos,
+    ac.VEH_GET_TRACKED_STATE: get_tracked_state,
+    ac.VEH_GET_LEADER: lambda veh_ids: ([v + 1 for v in veh_ids],),
+    ac.VEH_GET_FOLLOWER: lambda veh_ids: ([v - 1 for v in veh_ids],),
+    ac.TL_GET_IDS: lambda: (pop_tl_ids(),),
+}
+
+
 def threaded_client(conn):
     """Create a dummy threaded process.
 
@@ -119,6 +179,11 @@ def threaded_client(conn):
             if data == '':
                 continue
 
+            # batch of commands sent with the framed protocol
+            if data[:1] == protocol.FRAME_MAGIC[:1]:
+                protocol.serve_frame(conn, HANDLERS, data)
+                continue
+
             # convert to integer
             data = int(data)
 
@@ -2,6 +2,7 @@
 import flow.config as config
 import flow.utils.aimsun.constants
 from flow.utils.aimsun.api import FlowAimsunAPI
+import flow.utils.aimsun.protocol as protocol
 from flow.utils.aimsun.struct import InfVeh
 import unittest
 import os
@@ -64,6 +65,52 @@ class TestStruct(unittest.TestCase):
             self.assertIn(val, obj.__dict__.keys())
 
 
+class TestProtocol(unittest.TestCase):
+    """Tests for the framed protocol in flow/utils/aimsun/protocol.py."""
+
+    def test_pack_fields(self):
+        """Verify that fields are recovered after being packed."""
+        fields = ('i', 'f', '?', 's', 'i[]', 'f[]', '?[]', 's[]')
+        values = [1, 0.5, True, 'abc', [1, 2, 3], [0.25], [True, False],
+                  ['a', '', 'bcd']]
+        self.assertListEqual(
+            protocol.unpack_fields(fields, protocol.pack_fields(fields, values)),
+            values)
+
+        # empty arrays
+        fields = ('i[]', 's[]')
+        self.assertListEqual(
+            protocol.unpack_fields(
+                fields, protocol.pack_fields(fields, [[], []])),
+            [[], []])
+
+    def test_frame(self):
+        """Verify that frames are decoded into the items they contain."""
+        items = [(1, b'abc'), (-1001, b''), (3, b'de')]
+        frame = protocol.encode_frame(items)
+        magic, size = protocol.FRAME_HEADER.unpack_from(frame, 0)
+        self.assertEqual(magic, protocol.FRAME_MAGIC)
+        self.assertEqual(size, len(frame) - protocol.FRAME_HEADER.size)
+        self.assertListEqual(
+            protocol.decode_frame(frame[protocol.FRAME_HEADER.size:]), items)
+
+    def test_command_formats(self):
+        """Verify the formats of the results of the commands."""
+        self.assertEqual(len(protocol.TRACKING_FORMAT), 21)
+        self.assertTupleEqual(
+            protocol.result_format(
+                flow.utils.aimsun.constants.VEH_GET_TRACKING,
+                ('1' + '0' * 12 + '1', [1], [True])),
+            ('f[]', 'i[]'))
+        self.assertEqual(
+            len(protocol.result_format(
+                flow.utils.aimsun.constants.VEH_GET_STATIC, ([1],))),
+            26)
+        self.assertListEqual(protocol.columns([], 2), [[], []])
+        self.assertListEqual(
+            protocol.columns([(1, 2), (3, 4)], 2), [[1, 3], [2, 4]])
+
+
 class TestDummyAPI(unittest.TestCase):
     """Tests the functionality of FlowAimsunAPI.
 
@@ -165,6 +212,43 @@ class TestDummyAPI(unittest.TestCase):
         tl_ids = self.kernel_api.get_traffic_light_ids()
         self.assertEqual(len(tl_ids), 0)
 
+    def test_bulk_methods(self):
+        # several vehicles are handled in a single command
+        infos = self.kernel_api.get_vehicles_tracking_info(
+            [1, 2, 3], info_bitmap='1' + '0' * 12 + '1' + '0' * 7,
+            tracked=[True, True, False])
+        self.assertEqual(len(infos), 3)
+        for info in infos:
+            self.assertEqual(info.CurrentPos, 4)
+            self.assertEqual(info.idSection, 20)
+
+        static_infos = self.kernel_api.get_vehicles_static_info([1, 2])
+        self.assertListEqual([s.idLine for s in static_infos], [26, 26])
+        self.assertListEqual(self.kernel_api.get_vehicles_static_info([]), [])
+
+        # several commands are sent in a single frame
+        leaders, followers = self.kernel_api._send_commands([
+            (flow.utils.aimsun.constants.VEH_GET_LEADER, ([1, 2],)),
+            (flow.utils.aimsun.constants.VEH_GET_FOLLOWER, ([1, 2],)),
+        ])
+        self.assertListEqual(leaders, [[2, 3]])
+        self.assertListEqual(followers, [[0, 1]])
+
+        # tracking info and leaders of all tracked vehicles
+        infos, leaders, next_sections, leader_infos, leader_lengths = \
+            self.kernel_api.get_tracked_state(
+                [1, 2, 3], info_bitmap='1' * 21,
+                leader_bitmap='1' + '0' * 12 + '1' + '0' * 7)
+        np.testing.assert_array_equal(infos['CurrentSpeed'], [12, 12, 12])
+        np.testing.assert_array_equal(infos['idLaneTo'], [27, 27, 27])
+        np.testing.assert_array_equal(leaders, [2, 3, -2])
+        np.testing.assert_array_equal(next_sections, [20, 20, 20])
+        self.assertListEqual(sorted(leader_infos), ['CurrentPos', 'idSection'])
+        np.testing.assert_array_equal(leader_lengths, [5, 5, 5])
+
+        # unknown commands are reported to the client
+        self.assertRaises(ValueError, self.kernel_api.get_route, 1)
+
 
 if __name__ == '__main__':
     unittest.main()
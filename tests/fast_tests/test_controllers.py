@@ -5,7 +5,8 @@ from flow.core.params import EnvParams, InitialConfig, NetParams
 from flow.core.params import VehicleParams
 from flow.core.params import SumoCarFollowingParams
 
-from flow.controllers.routing_controllers import ContinuousRouter
+from flow.controllers.routing_controllers import ContinuousRouter, \
+    MinicityRouter
 from flow.controllers.car_following_models import IDMController, \
     OVMController, BCMController, LinearOVM, CFMController, LACController, \
     GippsController, BandoFTLController
@@ -988,5 +989,118 @@ class TestBandoFTLController(unittest.TestCase):
         np.testing.assert_array_almost_equal(requested_accel, expected_accel)
 
 
+class TestRoutingTriggers(unittest.TestCase):
+    """
+    Tests that routers are only called when the state they depend on changes.
+    """
+
+    def test_is_triggered(self):
+        # edge-triggered routers
+        router = ContinuousRouter("test_0", {})
+        self.assertTrue(router.is_triggered("top", 0, []))
+        # the route of the vehicle is received from the simulator
+        self.assertTrue(router.is_triggered("top", 0, ["top", "left"]))
+        self.assertFalse(router.is_triggered("top", 0, ["top", "left"]))
+        # lane changes do not trigger the router
+        self.assertFalse(router.is_triggered("top", 1, ["top", "left"]))
+        # edge transitions do
+        self.assertTrue(router.is_triggered("left", 1, ["top", "left"]))
+        self.assertFalse(router.is_triggered("left", 1, ["top", "left"]))
+
+        # lane-triggered routers
+        router = MinicityRouter("test_0", {})
+        self.assertTrue(router.is_triggered("top", 0, ["top"]))
+        self.assertFalse(router.is_triggered("top", 0, ["top"]))
+        self.assertTrue(router.is_triggered("top", 1, ["top"]))
+
+        # routers restricted to some edges
+        router = ContinuousRouter("test_0", {})
+        router.trigger_edges = {"left"}
+        self.assertFalse(router.is_triggered("top", 0, ["top", "left"]))
+        self.assertTrue(router.is_triggered("left", 0, ["top", "left"]))
+
+    def test_routing_ids(self):
+        vehicles = VehicleParams()
+        vehicles.add(
+            "test",
+            acceleration_controller=(IDMController, {}),
+            routing_controller=(ContinuousRouter, {}),
+            num_vehicles=5)
+        vehicles.add("test_no_router", num_vehicles=5)
+
+        env, _, _ = ring_road_exp_setup(vehicles=vehicles)
+        env.reset()
+        env.k.vehicle.update(reset=False)
+
+        # all routers are triggered the first time, and then only once the
+        # state of their vehicle changes
+        routing_ids = env.k.vehicle.get_routing_ids()
+        self.assertCountEqual(routing_ids,
+                              ["test_{}".format(i) for i in range(5)])
+        self.assertListEqual(env.k.vehicle.get_routing_ids(), [])
+
+        # routers are triggered again when a vehicle enters a new edge
+        edges = {veh_id: env.k.vehicle.get_edge(veh_id)
+                 for veh_id in routing_ids}
+        for _ in range(50):
+            env.k.simulation.simulation_step()
+            env.k.vehicle.update(reset=False)
+            moved = [veh_id for veh_id in routing_ids
+                     if env.k.vehicle.get_edge(veh_id) != edges[veh_id]]
+            if moved:
+                break
+        self.assertTrue(moved)
+        self.assertCountEqual(env.k.vehicle.get_routing_ids(), moved)
+        self.assertListEqual(env.k.vehicle.get_routing_ids(), [])
+
+        # only the vehicles whose state changed during an update are checked
+        router = env.k.vehicle.get_routing_controller("test_0")
+        router.trigger_state = ("foo", None)
+        self.assertListEqual(env.k.vehicle.get_routing_ids(), [])
+
+        env.terminate()
+
+
+class TestMinicityRouter(unittest.TestCase):
+    """
+    Tests that the minicity router only routes vehicles to edges that can be
+    reached through the junction ahead of them.
+    """
+
+    def setUp(self):
+        self.env, _, _ = ring_road_exp_setup()
+        self.env.reset()
+
+    def tearDown(self):
+        self.env.terminate()
+        self.env = None
+
+    def test_choose_route(self):
+        veh_id = self.env.k.vehicle.get_ids()[0]
+        edge = self.env.k.vehicle.get_edge(veh_id)
+        lane = self.env.k.vehicle.get_lane(veh_id)
+
+        # make the current edge the last edge of the route of the vehicle
+        self.env.k.vehicle.choose_routes([veh_id], [[edge]])
+        self.env.k.simulation.simulation_step()
+        self.env.k.vehicle.update(reset=False)
+        self.assertEqual(self.env.k.vehicle.get_route(veh_id), (edge,))
+
+        router = MinicityRouter(veh_id, {})
+        next_edges = self.env.k.network.get_next_edges(edge, lane)
+        self.assertListEqual(router.choose_route(self.env),
+                             [edge, next_edges[0]])
+
+        # connections that lead to no edge are never chosen
+        self.env.k.network._next_edges[edge, lane] = [None] + next_edges
+        for _ in range(10):
+            self.assertListEqual(router.choose_route(self.env),
+                                 [edge, next_edges[0]])
+
+        # vehicles are not rerouted if no edge can be reached
+        self.env.k.network._next_edges[edge, lane] = [None]
+        self.assertIsNone(router.choose_route(self.env))
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -313,6 +313,45 @@ class TestWarmUpSteps(unittest.TestCase):
         self.assertEqual(t2 - t1, warmup_step)
 
 
+class TestWarmupCache(unittest.TestCase):
+    """Tests that warmed-up states are cached and restored when using
+    flow.core.params.EnvParams.warmup_cache_size"""
+
+    def test_it_works(self):
+        env_params = EnvParams(
+            warmup_steps=20, warmup_cache_size=1, warmup_refresh=1,
+            additional_params=ADDITIONAL_ENV_PARAMS)
+        env, _, _ = ring_road_exp_setup(env_params=env_params)
+
+        # the first reset simulates the warmup steps and stores the state
+        obs1 = env.reset()
+        self.assertEqual(len(env.warmup_cache), 1)
+        pos1 = env.k.vehicle.get_position(env.k.vehicle.get_ids())
+        for _ in range(5):
+            env.step(None)
+
+        # the second reset restores the state
+        obs2 = env.reset()
+        np.testing.assert_array_almost_equal(obs1, obs2)
+        self.assertEqual(env.time_counter, 20)
+        self.assertListEqual(
+            env.k.vehicle.get_position(env.k.vehicle.get_ids()), pos1)
+
+        # the restored vehicles are still followed by the kernel
+        env.step(None)
+        self.assertEqual(env.time_counter, 21)
+        self.assertNotEqual(
+            env.k.vehicle.get_position(env.k.vehicle.get_ids()), pos1)
+        self.assertEqual(
+            sorted(env.k.vehicle.get_ids()),
+            sorted(env.k.kernel_api.vehicle.getIDList()))
+
+        # the state is refreshed after one use
+        env.reset()
+        self.assertEqual(env.time_counter, 20)
+        env.terminate()
+
+
 class TestSimsPerStep(unittest.TestCase):
     """Ensures that the appropriate number of simultaions are run at any given
     steps when using flow.core.params.EnvParams.sims_per_step"""
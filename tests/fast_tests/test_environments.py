@@ -6,11 +6,16 @@ from scipy.optimize import fsolve
 from copy import deepcopy
 from flow.core.params import VehicleParams
 from flow.core.params import NetParams, EnvParams, SumoParams, InFlows
-from flow.controllers import IDMController, RLController
+from flow.core.params import InitialConfig, TrafficLightParams
+from flow.controllers import IDMController, RLController, ContinuousRouter, \
+    GridRouter
 from flow.networks import RingNetwork, MergeNetwork, BottleneckNetwork
+from flow.networks import MultiRingNetwork, TrafficLightGridNetwork
 from flow.networks import HighwayRampsNetwork
 from flow.networks.ring import ADDITIONAL_NET_PARAMS as RING_PARAMS
 from flow.networks.merge import ADDITIONAL_NET_PARAMS as MERGE_PARAMS
+from flow.networks.multi_ring import ADDITIONAL_NET_PARAMS as \
+    MULTI_RING_PARAMS
 from flow.networks.highway_ramps import ADDITIONAL_NET_PARAMS as \
     HIGHWAY_PARAMS
 from flow.envs import LaneChangeAccelEnv, LaneChangeAccelPOEnv, AccelEnv, \
@@ -21,6 +26,8 @@ from flow.envs.multiagent import MultiAgentHighwayPOEnv
 from flow.envs.multiagent import MultiAgentAccelPOEnv
 from flow.envs.multiagent import MultiAgentWaveAttenuationPOEnv
 from flow.envs.multiagent import MultiAgentMergePOEnv
+from flow.envs.multiagent import MultiWaveAttenuationPOEnv
+from flow.envs.multiagent import MultiTrafficLightGridPOEnv
 
 os.environ["TEST_FLAG"] = "True"
 
@@ -432,6 +439,43 @@ class TestWaveAttenuationEnv(unittest.TestCase):
         env.reset()
         self.assertEqual(env.k.network.non_internal_length(), 256)
 
+    def test_reset_warmup_cache(self):
+        """
+        Tests that the warmed-up states are only restored on a ring of the
+        same length as the one they were generated on.
+        """
+        env_params = deepcopy(self.env_params)
+        env_params.warmup_steps = 10
+        env_params.warmup_cache_size = 1
+
+        # create the environment
+        env = WaveAttenuationEnv(
+            sim_params=self.sim_params,
+            network=self.network,
+            env_params=env_params
+        )
+
+        # the first state is generated on a 230 m ring
+        env.env_params.additional_params["ring_length"] = [230, 230]
+        obs1 = env.reset()
+        self.assertEqual(len(env.warmup_cache), 1)
+
+        # the state is not restored on a 260 m ring
+        env.env_params.additional_params["ring_length"] = [260, 260]
+        obs2 = env.reset()
+        self.assertEqual(env.k.network.non_internal_length(), 260)
+        self.assertEqual(env.time_counter, 10)
+        self.assertLessEqual(
+            max(env.k.vehicle.get_x_by_id(veh_id)
+                for veh_id in env.k.vehicle.get_ids()), 260)
+        self.assertFalse(np.allclose(obs1, obs2))
+
+        # the state generated on the 260 m ring is restored on that ring
+        obs3 = env.reset()
+        self.assertEqual(env.k.network.non_internal_length(), 260)
+        np.testing.assert_array_almost_equal(obs2, obs3)
+        env.terminate()
+
     def test_v_eq_max_function(self):
         """
         Tests that the v_eq_max_function returns appropriate values.
@@ -691,6 +735,25 @@ class TestMergePOEnv(unittest.TestCase):
             )
         )
 
+    def test_removed_rl_vehicles(self):
+        """Ensures that the slots of removed RL vehicles are emptied."""
+        env = MergePOEnv(
+            sim_params=self.sim_params,
+            network=self.network,
+            env_params=self.env_params
+        )
+        env.reset()
+        env.step(None)
+        self.assertListEqual(env.rl_slots.get_ids(), ["rl_0"])
+
+        # vehicles removed by the environment are not reported as arrived
+        env.k.vehicle.remove("rl_0")
+        env.step(None)
+        self.assertNotIn("rl_0", env.k.vehicle.get_arrived_ids())
+        self.assertListEqual(env.rl_slots.get_ids(), [])
+
+        env.terminate()
+
 
 class TestTestEnv(unittest.TestCase):
 
@@ -877,6 +940,71 @@ class TestBottleneckAccelEnv(unittest.TestCase):
             expected_max=1)
         )
 
+    def test_get_state(self):
+        """Tests the slot layout of the observations."""
+        vehicles = VehicleParams()
+        vehicles.add(veh_id="human", num_vehicles=10)
+        vehicles.add(veh_id="rl", acceleration_controller=(RLController, {}),
+                     num_vehicles=3)
+
+        for scaling in [1, 2]:
+            network = BottleneckNetwork(
+                name="bay_bridge_toll",
+                vehicles=vehicles,
+                net_params=NetParams(
+                    additional_params={"scaling": scaling,
+                                       "speed_limit": 23}))
+            env = BottleneckAccelEnv(
+                self.env.env_params, self.sim_params, network)
+            env.reset()
+
+            num_lanes = 4 * scaling
+            num_edges = len(env.k.network.get_edge_list())
+            obs = env.get_state()
+            self.assertEqual(obs.shape, env.observation_space.shape)
+
+            # check that every RL vehicle is placed in its own slot
+            for i, veh_id in enumerate(env.rl_id_list):
+                self.assertAlmostEqual(
+                    obs[4 * i], env.k.vehicle.get_x_by_id(veh_id) / 1000)
+                self.assertAlmostEqual(
+                    obs[4 * i + 2], env.k.vehicle.get_lane(veh_id) / 4)
+                start = 4 * 3 + 4 * num_lanes * i
+                lane_headways = env.k.vehicle.get_lane_headways(veh_id)
+                np.testing.assert_array_almost_equal(
+                    obs[start:start + len(lane_headways)],
+                    np.array(lane_headways) / 1000)
+                # lanes outside the current edge have the default headway
+                np.testing.assert_array_almost_equal(
+                    obs[start + len(lane_headways):start + num_lanes], 1)
+                # the follower speed is never negative
+                self.assertTrue(np.all(
+                    obs[start + 3 * num_lanes:start + 4 * num_lanes] >= 0))
+
+            # check the edge data
+            edge_obs = obs[-2 * num_edges:].reshape(num_edges, 2)
+            self.assertAlmostEqual(sum(edge_obs[:, 1] * [
+                env.k.network.edge_length(edge)
+                for edge in env.k.network.get_edge_list()]),
+                len(env.k.vehicle.get_ids()))
+
+            # check that the slot of a missing vehicle is padded with zeros,
+            # while the other vehicles keep their slots
+            env.k.vehicle.remove(env.rl_id_list[1])
+            new_obs = env.get_state()
+            self.assertEqual(new_obs.shape, obs.shape)
+            np.testing.assert_array_equal(new_obs[4:8], 0)
+            np.testing.assert_array_equal(
+                new_obs[4 * 3 + 4 * num_lanes:4 * 3 + 8 * num_lanes], 0)
+            np.testing.assert_array_almost_equal(new_obs[:4], obs[:4])
+            np.testing.assert_array_almost_equal(new_obs[8:12], obs[8:12])
+
+            # check that the returned observation is not a view of the buffer
+            new_obs[:] = -1
+            self.assertTrue(np.all(env.get_state()[:4] >= 0))
+
+            env.terminate()
+
 
 class TestBottleneckDesiredVelocityEnv(unittest.TestCase):
 
@@ -1028,6 +1156,18 @@ class TestMultiAgentAccelPOEnv(unittest.TestCase):
             )
         )
 
+    def test_dense_state(self):
+        """Tests that the dense and per-agent outputs are equal."""
+        self.assertTrue(
+            check_dense_outputs(
+                env_class=MultiAgentAccelPOEnv,
+                sim_params=self.sim_params,
+                network=self.network,
+                env_params=self.env_params,
+                expected_state=accel_po_state
+            )
+        )
+
 
 class TestMultiAgentWaveAttenuationPOEnv(unittest.TestCase):
     """Tests the MultiAgentWaveAttenuationPOEnv environment in
@@ -1136,6 +1276,18 @@ class TestMultiAgentWaveAttenuationPOEnv(unittest.TestCase):
         env.reset()
         self.assertEqual(env.k.network.non_internal_length(), 256)
 
+    def test_dense_state(self):
+        """Tests that the dense and per-agent outputs are equal."""
+        self.assertTrue(
+            check_dense_outputs(
+                env_class=MultiAgentWaveAttenuationPOEnv,
+                sim_params=self.sim_params,
+                network=self.network,
+                env_params=self.env_params,
+                expected_state=wave_attenuation_po_state
+            )
+        )
+
 
 class TestMultiAgentMergePOEnv(unittest.TestCase):
     """Tests the MultiAgentMergePOEnv environment in
@@ -1218,6 +1370,19 @@ class TestMultiAgentMergePOEnv(unittest.TestCase):
             )
         )
 
+    def test_dense_state(self):
+        """Tests that the dense and per-agent outputs are equal."""
+        self.assertTrue(
+            check_dense_outputs(
+                env_class=MultiAgentMergePOEnv,
+                sim_params=self.sim_params,
+                network=self.network,
+                env_params=self.env_params,
+                expected_state=lambda env, rl_id:
+                    accel_po_state(env, rl_id)[1:]
+            )
+        )
+
 
 class TestMultiAgentHighwayPOEnv(unittest.TestCase):
 
@@ -1325,6 +1490,133 @@ class TestMultiAgentHighwayPOEnv(unittest.TestCase):
             )
         )
 
+    def test_dense_state(self):
+        """Tests that the dense and per-agent outputs are equal."""
+        self.assertTrue(
+            check_dense_outputs(
+                env_class=MultiAgentHighwayPOEnv,
+                sim_params=self.sim_params,
+                network=self.network,
+                env_params=self.env_params
+            )
+        )
+
+
+class TestMultiWaveAttenuationPOEnv(unittest.TestCase):
+    """Tests the MultiWaveAttenuationPOEnv environment in
+       flow/envs/multiagent/ring/wave_attenuation.py"""
+
+    def setUp(self):
+        vehicles = VehicleParams()
+        for i in range(2):
+            vehicles.add("human_{}".format(i),
+                         acceleration_controller=(IDMController, {}),
+                         routing_controller=(ContinuousRouter, {}),
+                         num_vehicles=5)
+            vehicles.add("rl_{}".format(i),
+                         acceleration_controller=(RLController, {}),
+                         routing_controller=(ContinuousRouter, {}),
+                         num_vehicles=1)
+
+        self.sim_params = SumoParams()
+        net_params = MULTI_RING_PARAMS.copy()
+        net_params["num_rings"] = 2
+        self.network = MultiRingNetwork(
+            name="test_multi_ring",
+            vehicles=vehicles,
+            net_params=NetParams(additional_params=net_params),
+            initial_config=InitialConfig(bunching=20.0, spacing='custom'),
+        )
+        self.env_params = EnvParams(
+            additional_params={
+                'max_accel': 1,
+                'max_decel': 1,
+                'ring_length': [230, 230],
+                'target_velocity': 4
+            }
+        )
+
+    def tearDown(self):
+        self.sim_params = None
+        self.network = None
+        self.env_params = None
+
+    def test_dense_state(self):
+        """Tests that the dense and per-agent outputs are equal."""
+        self.assertTrue(
+            check_dense_outputs(
+                env_class=MultiWaveAttenuationPOEnv,
+                sim_params=self.sim_params,
+                network=self.network,
+                env_params=self.env_params,
+                expected_state=wave_attenuation_po_state
+            )
+        )
+
+
+class TestMultiTrafficLightGridPOEnv(unittest.TestCase):
+    """Tests the MultiTrafficLightGridPOEnv environment in
+       flow/envs/multiagent/traffic_light_grid.py"""
+
+    def setUp(self):
+        vehicles = VehicleParams()
+        vehicles.add("idm", acceleration_controller=(IDMController, {}),
+                     routing_controller=(GridRouter, {}),
+                     num_vehicles=16)
+
+        self.sim_params = SumoParams(sim_step=1)
+        self.network = TrafficLightGridNetwork(
+            name="test_grid",
+            vehicles=vehicles,
+            net_params=NetParams(additional_params={
+                "speed_limit": 35,
+                "grid_array": {
+                    "short_length": 100,
+                    "inner_length": 300,
+                    "long_length": 100,
+                    "row_num": 2,
+                    "col_num": 2,
+                    "cars_left": 2,
+                    "cars_right": 2,
+                    "cars_top": 2,
+                    "cars_bot": 2
+                },
+                "horizontal_lanes": 1,
+                "vertical_lanes": 1
+            }),
+            initial_config=InitialConfig(
+                spacing="custom", additional_params={"enter_speed": 30}),
+            traffic_lights=TrafficLightParams(baseline=False),
+        )
+        self.env_params = EnvParams(
+            additional_params={
+                "target_velocity": 50,
+                "switch_time": 3.0,
+                "num_observed": 2,
+                "discrete": False,
+                "tl_type": "controlled",
+                "num_local_edges": 4,
+                "num_local_lights": 4,
+            },
+            horizon=100
+        )
+
+    def tearDown(self):
+        self.sim_params = None
+        self.network = None
+        self.env_params = None
+
+    def test_dense_state(self):
+        """Tests that the dense and per-agent outputs are equal."""
+        self.assertTrue(
+            check_dense_outputs(
+                env_class=MultiTrafficLightGridPOEnv,
+                sim_params=self.sim_params,
+                network=self.network,
+                env_params=self.env_params
+            )
+        )
+
 
 ###############################################################################
 #                              Utility methods                                #
@@ -1438,6 +1730,120 @@ def test_observed(env_class,
 
     return test_mask
 
+
+def check_dense_outputs(env_class,
+                        sim_params,
+                        network,
+                        env_params,
+                        expected_state=None,
+                        num_steps=5):
+    """Test that the dense and per-agent outputs of a multiagent env match.
+
+    The observations of get_dense_state and the rewards of
+    compute_dense_reward are compared to those of get_state and
+    compute_reward after a few steps with random actions.
+
+    Parameters
+    ----------
+    env_class : flow.envs.multiagent.MultiEnv class
+        blank
+    sim_params : flow.core.params.SumoParams
+        sumo-specific parameters
+    network : flow.networks.Network
+        network that works for the environment
+    env_params : flow.core.params.EnvParams
+        environment-specific parameters
+    expected_state : callable, optional
+        returns the expected observation of an agent, given the environment
+        and the id of the agent
+    num_steps : int, optional
+        number of steps performed before comparing the outputs
+
+    Returns
+    -------
+    bool
+        True if the test passed, False otherwise
+    """
+    env = env_class(sim_params=sim_params,
+                    network=network,
+                    env_params=env_params)
+    env.reset()
+    for _ in range(num_steps):
+        env.step({agent_id: env.action_space.sample()[0]
+                  for agent_id in env.get_state()})
+
+    agent_ids, obs = env.get_dense_state()
+    state = env.get_state()
+    rl_actions = {agent_id: env.action_space.sample()[0]
+                  for agent_id in agent_ids}
+    reward = env.compute_reward(rl_actions, fail=False)
+    dense_reward = env.compute_dense_reward(
+        list(reward.keys()), rl_actions, fail=False)
+
+    test_mask = len(agent_ids) > 0 \
+        and obs.shape == (len(agent_ids), env.observation_space.shape[0]) \
+        and sorted(state.keys()) == sorted(agent_ids) \
+        and all(np.allclose(state[agent_id], row)
+                for agent_id, row in zip(agent_ids, obs)) \
+        and np.allclose(list(reward.values()), dense_reward)
+    if expected_state is not None:
+        test_mask = test_mask and all(
+            np.allclose(expected_state(env, agent_id), state[agent_id])
+            for agent_id in agent_ids)
+    env.terminate()
+
+    return test_mask
+
+
+def accel_po_state(env, rl_id):
+    """Return the observation of an agent of MultiAgentAccelPOEnv."""
+    max_speed = env.k.network.max_speed()
+    max_length = env.k.network.length()
+
+    this_pos = env.k.vehicle.get_x_by_id(rl_id)
+    this_speed = env.k.vehicle.get_speed(rl_id)
+    lead_id = env.k.vehicle.get_leader(rl_id)
+    follower = env.k.vehicle.get_follower(rl_id)
+
+    if lead_id in ["", None]:
+        lead_speed = max_speed
+        lead_head = max_length
+    else:
+        lead_speed = env.k.vehicle.get_speed(lead_id)
+        lead_head = env.k.vehicle.get_x_by_id(lead_id) \
+            - env.k.vehicle.get_x_by_id(rl_id) \
+            - env.k.vehicle.get_length(rl_id)
+
+    if follower in ["", None]:
+        follow_speed = 0
+        follow_head = max_length
+    else:
+        follow_speed = env.k.vehicle.get_speed(follower)
+        follow_head = env.k.vehicle.get_headway(follower)
+
+    return np.array([
+        this_pos / max_length,
+        this_speed / max_speed,
+        (lead_speed - this_speed) / max_speed,
+        lead_head / max_length,
+        (this_speed - follow_speed) / max_speed,
+        follow_head / max_length
+    ])
+
+
+def wave_attenuation_po_state(env, rl_id):
+    """Return the observation of an agent of the wave attenuation envs."""
+    lead_id = env.k.vehicle.get_leader(rl_id) or rl_id
+    max_speed = 15.
+    max_length = env.env_params.additional_params['ring_length'][1]
+
+    return np.array([
+        env.k.vehicle.get_speed(rl_id) / max_speed,
+        (env.k.vehicle.get_speed(lead_id) - env.k.vehicle.get_speed(rl_id))
+        / max_speed,
+        env.k.vehicle.get_headway(rl_id) / max_length
+    ])
+
 ###############################################################################
 #                                End of utils                                 #
 ###############################################################################
@@ -2,8 +2,11 @@ import unittest
 import os
 import time
 import csv
+import tempfile
 
 from flow.core.experiment import Experiment
+from flow.core.sweep import Sweep, GridSampler, RandomSampler, SweepResults
+from flow.core.sweep import AdaptiveSampler
 from flow.core.params import VehicleParams
 from flow.controllers import IDMController, RLController, ContinuousRouter
 from flow.core.params import SumoCarFollowingParams
@@ -210,5 +213,200 @@ class TestConvertToCSV(unittest.TestCase):
             exp.env.network.name)))
 
 
+def make_ring_params(length, seed=None):
+    """Return the flow_params of a short rollout on a ring of some length."""
+    vehicles = VehicleParams()
+    vehicles.add(
+        veh_id="idm",
+        acceleration_controller=(IDMController, {}),
+        routing_controller=(ContinuousRouter, {}),
+        num_vehicles=5)
+
+    return dict(
+        exp_tag="RingSweepTest",
+        env_name=AccelEnv,
+        network=RingNetwork,
+        simulator='traci',
+        sim=SumoParams(render=False),
+        env=EnvParams(
+            horizon=10,
+            additional_params={
+                "target_velocity": 8,
+                "max_accel": 1,
+                "max_decel": 1,
+                "sort_vehicles": False,
+            }),
+        net=NetParams(additional_params={
+            "length": length,
+            "lanes": 1,
+            "speed_limit": 30,
+            "resolution": 40
+        }),
+        veh=vehicles,
+        initial=InitialConfig(),
+        tls=TrafficLightParams(),
+    )
+
+
+class TestSweep(unittest.TestCase):
+    """Tests the parameter sweep class and its samplers."""
+
+    def test_samplers(self):
+        sampler = GridSampler({'length': [200, 300], 'lanes': [1, 2]},
+                              num_trials=2)
+        points = sampler.propose(SweepResults())
+        self.assertEqual(len(points), 8)
+        self.assertIn({'length': 300, 'lanes': 1, 'seed': 1}, points)
+        self.assertListEqual(sampler.propose(SweepResults()), [])
+
+        sampler = RandomSampler({'length': (200, 300), 'lanes': [1, 2]},
+                                num_samples=5, seed=0)
+        points = sampler.propose(SweepResults())
+        self.assertEqual(len(points), 5)
+        for point in points:
+            self.assertTrue(200 <= point['length'] < 300)
+            self.assertIn(point['lanes'], [1, 2])
+
+    def test_adaptive_sampler(self):
+        # step function with noise above the step
+        def outflow(inflow, seed):
+            noise = np.random.RandomState(int(inflow) + 10000 * seed).normal()
+            return 1000 + 50 * noise if inflow >= 1500 else 500
+
+        sampler = AdaptiveSampler('inflow', 400, 2900, min_spacing=100,
+                                  ci_width=100, num_points=6, num_trials=2,
+                                  max_trials=10, batch_size=4)
+        results = SweepResults()
+        points = sampler.propose(results)
+        self.assertEqual(len(points), 12)
+        while points:
+            self.assertLessEqual(len(points), 12)
+            for point in points:
+                results.add(dict(
+                    point, outflow_rate=outflow(point['inflow'], point['seed'])))
+            points = sampler.propose(results)
+
+        stats = sampler.get_stats(results)
+        inflows = sorted(400 + 100 * index for index in stats)
+        counts = {400 + 100 * index: stats[index].count for index in stats}
+
+        # the step is located at the resolution of the grid
+        self.assertIn(1400, inflows)
+        self.assertIn(1500, inflows)
+        # no values are added in the flat regions
+        self.assertNotIn(1100, inflows)
+        self.assertNotIn(2600, inflows)
+        # extra trials are only performed at the noisy values
+        self.assertEqual(counts[400], 2)
+        self.assertGreater(counts[2900], 2)
+        for index, stat in stats.items():
+            lower, upper = stat.confidence_interval()
+            self.assertTrue(upper - lower <= 100 or stat.count == 10)
+
+        # new values could never be proposed if their trials do not fit in a
+        # round
+        self.assertRaises(ValueError, AdaptiveSampler, 'inflow', 400, 2900,
+                          min_spacing=100, num_trials=3, batch_size=2)
+
+    def test_sweep(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            results_path = os.path.join(tmp_dir, 'results.csv')
+            sweep = Sweep(
+                make_ring_params,
+                GridSampler({'length': [230, 260]}, num_trials=2),
+                metrics={'num_vehicles': lambda env: env.k.vehicle.num_vehicles},
+                cache_dir=tmp_dir)
+            results = sweep.run(results_path)
+
+            self.assertEqual(results.num_rows, 4)
+            np.testing.assert_array_equal(
+                results.column('length'), [230, 230, 260, 260])
+            np.testing.assert_array_equal(
+                results.column('num_vehicles'), [5, 5, 5, 5])
+            self.assertEqual(len(os.listdir(tmp_dir)), 5)
+
+            # the results are written to a csv file
+            saved = SweepResults.load_csv(results_path)
+            self.assertListEqual(saved.rows(), results.rows())
+
+            # points are loaded from the cache when the sweep is run again
+            sweep.sampler = GridSampler({'length': [230, 260]}, num_trials=2)
+            sweep.make_flow_params = None
+            self.assertListEqual(sweep.run().rows(), results.rows())
+
+    def test_shared_flow_params(self):
+        # the flow_params returned by the factory are not modified
+        flow_params = make_ring_params(length=230)
+
+        def make_flow_params(length, seed):
+            return flow_params
+
+        Sweep(make_flow_params, GridSampler({'length': [230]}, num_trials=2)).run()
+        self.assertEqual(flow_params['exp_tag'], 'RingSweepTest')
+        self.assertIsNone(flow_params['sim'].seed)
+
+    def test_parallel_sweep(self):
+        sampler = GridSampler({'length': [230, 260]}, num_trials=2)
+        results = Sweep(make_ring_params, sampler).run()
+        sampler = GridSampler({'length': [230, 260]}, num_trials=2)
+        parallel_results = Sweep(make_ring_params, sampler, num_cpus=2).run()
+        self.assertListEqual(parallel_results.rows(), results.rows())
+
+
+class TestAsyncPipeline(unittest.TestCase):
+    """Tests that the asynchronous pipeline does not change the results."""
+
+    def run_experiment(self, dir_path, async_pipeline):
+        flow_params = make_ring_params(230)
+        flow_params['sim'] = SumoParams(
+            render=False, seed=0, emission_path=dir_path,
+            async_pipeline=async_pipeline)
+        flow_params['env'].horizon = 50
+
+        exp = Experiment(flow_params, custom_callables={
+            'speed': lambda env: np.mean(
+                env.k.vehicle.get_speed(env.k.vehicle.get_ids())),
+            'time_counter': lambda env: env.time_counter,
+            'time': lambda env: env.k.simulation.time,
+            'steps': lambda env:
+                env.k.simulation.time / env.k.simulation.sim_step,
+        })
+        self.assertEqual(exp.env.k.pipeline.enabled, async_pipeline)
+        info_dict = exp.run(num_runs=1)
+
+        with open(os.path.join(dir_path, '{}-0_emission.csv'.format(
+                exp.env.network.name))) as f:
+            emission = f.read()
+        return info_dict, emission
+
+    def test_async_pipeline(self):
+        with tempfile.TemporaryDirectory() as dir_path:
+            info_dict, emission = self.run_experiment(dir_path, False)
+            async_info_dict, async_emission = self.run_experiment(
+                dir_path, True)
+
+        self.assertEqual(async_emission, emission)
+        self.assertEqual(async_info_dict['time_counter'],
+                         info_dict['time_counter'])
+        self.assertEqual(async_info_dict['speed'], info_dict['speed'])
+        self.assertEqual(async_info_dict['time'], info_dict['time'])
+        self.assertEqual(async_info_dict['steps'], info_dict['steps'])
+
+    def test_unrecorded_attribute(self):
+        flow_params = make_ring_params(230)
+        flow_params['sim'] = SumoParams(render=False, async_pipeline=True)
+        flow_params['env'].horizon = 5
+
+        # the traffic lights and the simulator are not recorded in the
+        # snapshots of the environment
+        for callable_ in [lambda env: env.k.traffic_light.get_ids(),
+                          lambda env: env.k.simulation.kernel_api,
+                          lambda env: env.state]:
+            exp = Experiment(flow_params, custom_callables={'x': callable_})
+            with self.assertRaises(AttributeError):
+                exp.run(num_runs=1)
+            exp.env.terminate()
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,101 @@
+import multiprocessing
+import unittest
+
+import numpy as np
+
+from flow.controllers import ContinuousRouter, RLController
+from flow.core.params import SumoParams, EnvParams, NetParams, InitialConfig
+from flow.core.params import VehicleParams, TrafficLightParams
+from flow.core.params import SumoCarFollowingParams
+from flow.envs import AccelEnv
+from flow.networks import RingNetwork
+from flow.utils.leaderboard import evaluate
+from flow.utils.leaderboard.evaluate import AVAILABLE_BENCHMARKS
+
+
+def make_ring_benchmark():
+    """Return the flow_params of a short benchmark on a ring road."""
+    vehicles = VehicleParams()
+    # the human-driven vehicles are controlled by sumo, and are thus
+    # affected by the seed of the simulator
+    vehicles.add(
+        veh_id="human",
+        routing_controller=(ContinuousRouter, {}),
+        car_following_params=SumoCarFollowingParams(sigma=1),
+        num_vehicles=4)
+    vehicles.add(
+        veh_id="rl",
+        acceleration_controller=(RLController, {}),
+        routing_controller=(ContinuousRouter, {}),
+        num_vehicles=1)
+
+    return dict(
+        exp_tag="RingBenchmarkTest",
+        env_name=AccelEnv,
+        network=RingNetwork,
+        simulator='traci',
+        sim=SumoParams(render=False),
+        env=EnvParams(
+            horizon=20,
+            additional_params={
+                "target_velocity": 8,
+                "max_accel": 1,
+                "max_decel": 1,
+                "sort_vehicles": False,
+            }),
+        net=NetParams(additional_params={
+            "length": 230,
+            "lanes": 1,
+            "speed_limit": 30,
+            "resolution": 40
+        }),
+        veh=vehicles,
+        initial=InitialConfig(),
+        tls=TrafficLightParams(),
+    )
+
+
+def random_actions(state):
+    """Return random accelerations, drawn from the seeded numpy generator."""
+    return np.random.uniform(-1, 1, size=1)
+
+
+class TestEvaluatePolicy(unittest.TestCase):
+    """Tests the distribution of the rollouts of an evaluation."""
+
+    def setUp(self):
+        AVAILABLE_BENCHMARKS["ring_test"] = make_ring_benchmark()
+
+    def tearDown(self):
+        del AVAILABLE_BENCHMARKS["ring_test"]
+
+    def test_parallel_rollouts(self):
+        init_args = ("ring_test", random_actions, None, None)
+        seeds = range(4)
+
+        # serial rollouts
+        evaluate._init_worker(*init_args)
+        try:
+            returns = [evaluate._run_rollout(seed) for seed in seeds]
+        finally:
+            evaluate._terminate_worker()
+
+        # parallel rollouts, where every process performs several rollouts
+        pool = multiprocessing.Pool(2, initializer=evaluate._init_worker,
+                                    initargs=init_args)
+        try:
+            parallel_returns = list(evaluate._run_parallel(pool, seeds, 2))
+        finally:
+            pool.close()
+            pool.join()
+
+        # every rollout only depends on its seed
+        np.testing.assert_array_almost_equal(parallel_returns, returns)
+        self.assertGreater(len(set(returns)), 1)
+
+        # the benchmark is not modified
+        self.assertFalse(AVAILABLE_BENCHMARKS["ring_test"]["sim"].restart_instance)
+
+
+if __name__ == '__main__':
+    unittest.main()
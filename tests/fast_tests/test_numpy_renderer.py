@@ -0,0 +1,130 @@
+from flow.renderer.numpy_renderer import NumpyRenderer as Renderer
+from flow.core.params import SumoParams
+from tests.setup_scripts import ring_road_exp_setup
+import numpy as np
+import os
+import unittest
+
+
+class TestNumpyRenderer(unittest.TestCase):
+    """Tests numpy_renderer"""
+
+    def setUp(self):
+        path = os.path.dirname(os.path.abspath(__file__))[:-11]
+        self.data = np.load(
+            '{}/data/renderer_data/replay.npy'.format(path),
+            allow_pickle=True
+        )
+        # Default renderer parameters
+        self.network = self.data[0]
+        self.save_render = False
+        self.sight_radius = 25
+        self.pxpm = 3
+        self.show_radius = True
+        self.alpha = 0.9
+
+    def get_renderer(self, mode, **kwargs):
+        params = dict(
+            save_render=self.save_render,
+            sight_radius=self.sight_radius,
+            pxpm=self.pxpm,
+            show_radius=self.show_radius,
+            alpha=self.alpha)
+        params.update(kwargs)
+        return Renderer(self.network, mode=mode, **params)
+
+    def test_render(self):
+        for mode, shape in [('drgb', (378, 378, 3)), ('rgb', (378, 378, 3)),
+                            ('dgray', (378, 378)), ('gray', (378, 378))]:
+            renderer = self.get_renderer(mode)
+            frame = renderer.render(*self.data[100])
+            self.assertEqual(renderer.mode, mode)
+            self.assertEqual(frame.shape, shape)
+
+            # the background only contains the road network, and vehicles are
+            # drawn on top of it
+            self.assertEqual(renderer.network[0, 0].tolist(), [32, 32, 32])
+            self.assertTrue(np.any(renderer.network != 32))
+            self.assertTrue(np.any(renderer.frame != renderer.network))
+            renderer.close()
+
+    def test_render_vehicle(self):
+        renderer = self.get_renderer('rgb', show_radius=False, alpha=1)
+
+        # a vehicle in the middle of the network facing north
+        x = renderer.x_shift + renderer.width / 2 / renderer.pxpm
+        y = renderer.y_shift + renderer.height / 2 / renderer.pxpm
+        frame = renderer.render([[x, y, 0]], [], [0], [], [], [])
+        changed = np.any(frame != renderer.network, axis=2)
+        rows, cols = np.nonzero(changed)
+        center_col, center_row = renderer._to_pixels(np.array([[x, y]]))[0]
+        size = 5 * renderer.pxpm
+
+        # only the triangle behind the front of the vehicle is colored, in
+        # BGR order
+        self.assertTrue(np.all(frame[changed] == [0, 225, 0]))
+        self.assertGreaterEqual(rows.min(), center_row - 1)
+        self.assertLessEqual(rows.max(), center_row + size + 1)
+        self.assertGreaterEqual(cols.min(), center_col - 0.25 * size - 1)
+        self.assertLessEqual(cols.max(), center_col + 0.25 * size + 1)
+
+        # the frame is reset at every step
+        frame = renderer.render([], [], [], [], [], [])
+        np.testing.assert_array_equal(frame, renderer.network)
+
+    def test_get_sight(self):
+        renderer = self.get_renderer('drgb')
+        renderer.render(*self.data[101])
+        orientation = self.data[101][0][0]
+        id = self.data[101][4][0][-1]
+        sight = renderer.get_sight(orientation, id)
+        self.assertEqual(sight.shape, (150, 150, 3))
+
+    def test_get_sights(self):
+        for mode in ['drgb', 'gray']:
+            renderer = self.get_renderer(mode)
+            renderer.render(*self.data[101])
+            orientations = self.data[101][0] + self.data[101][1]
+            ids = [log[-1] for log in self.data[101][4] + self.data[101][5]]
+
+            # the batched sights match the ones of individual vehicles, up to
+            # the pixels at the boundary of the observation radius
+            sights = renderer.get_sights(orientations, ids)
+            expected = np.stack([renderer.get_sight(orientation, veh_id)
+                                 for orientation, veh_id in zip(orientations,
+                                                                ids)])
+            self.assertEqual(sights.shape, expected.shape)
+            self.assertLess(np.mean(sights != expected), 0.05)
+
+            # the sights are stored in a preallocated buffer
+            self.assertIs(renderer.get_sights(orientations, ids), sights)
+            self.assertEqual(renderer.get_sights([], []).shape[0], 0)
+
+    def test_save_renderer(self):
+        renderer = self.get_renderer(
+            'drgb', save_render=True, path='/tmp')
+        renderer.render(*self.data[101])
+
+        save_path = renderer.close()
+        saved_data = np.load(save_path, allow_pickle=True)
+
+        self.assertEqual(self.data[0], saved_data[0])
+        self.assertEqual(self.data[101], saved_data[1])
+
+    def test_env(self):
+        """Tests that environments can render frames without a display."""
+        env, _, _ = ring_road_exp_setup(
+            sim_params=SumoParams(render='gray', render_backend='numpy'))
+        self.assertIsInstance(env.renderer, Renderer)
+        self.assertEqual(env.frame.ndim, 2)
+        self.assertEqual(len(env.frame_buffer), 5)
+        self.assertEqual(len(env.sights), env.k.vehicle.num_rl_vehicles)
+        env.terminate()
+
+        with self.assertRaises(Exception):
+            ring_road_exp_setup(
+                sim_params=SumoParams(render='gray', render_backend='foo'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -7,7 +7,17 @@ from flow.core.params import VehicleParams
 from flow.core.rewards import average_velocity, min_delay
 from flow.core.rewards import desired_velocity, boolean_action_penalty
 from flow.core.rewards import penalize_near_standstill, penalize_standstill
-from flow.core.rewards import energy_consumption
+from flow.core.rewards import energy_consumption, miles_per_megajoule
+from flow.core.rewards import miles_per_gallon
+from flow.core.rewards import desired_velocity_array, average_velocity_array
+from flow.core.rewards import penalize_standstill_array
+from flow.core.rewards import penalize_near_standstill_array
+from flow.core.rewards import punish_rl_lane_changes_array
+from flow.core.rewards import time_headway_penalty_array
+from flow.core.rewards import energy_consumption_array, power_demand
+from flow.core.rewards import miles_per_megajoule_array
+from flow.core.rewards import miles_per_gallon_array
+from flow.core.rewards import VehicleColumns, RewardSpec, RewardTerm
 
 os.environ["TEST_FLAG"] = "True"
 
@@ -191,6 +201,115 @@ class TestRewards(unittest.TestCase):
         self.assertEqual(boolean_action_penalty(actions, gain=1), 2)
         self.assertEqual(boolean_action_penalty(actions, gain=2), 4)
 
+    def test_array_rewards(self):
+        """Test the array-native versions of the reward functions."""
+        speed = np.array([0., 1., 5., 10.])
+        accel = np.array([0., -1., 2., 0.])
+
+        # check the velocity-based rewards
+        self.assertEqual(desired_velocity_array(speed, 10, fail=True), 0)
+        self.assertEqual(desired_velocity_array([], 10), 0)
+        self.assertEqual(desired_velocity_array([-1001, 10], 10), 0)
+        self.assertAlmostEqual(desired_velocity_array(speed, 10),
+                               1 - np.sqrt(100 + 81 + 25) / 20)
+        self.assertEqual(average_velocity_array(speed, fail=True), 0)
+        self.assertEqual(average_velocity_array([]), 0)
+        self.assertEqual(average_velocity_array(speed), 4)
+        self.assertEqual(penalize_standstill_array(speed, gain=2), -2)
+        self.assertEqual(
+            penalize_near_standstill_array(speed, thresh=2, gain=1), -2)
+        self.assertEqual(
+            punish_rl_lane_changes_array([3, 5, 5], 5, penalty=2), -4)
+
+        # only the vehicles with a leader and a positive speed are penalized
+        np.testing.assert_array_almost_equal(
+            time_headway_penalty_array(
+                speed, [5, 0.5, 10, 20], ["a", "b", "c", None]),
+            [0, -0.5, 0, 0])
+
+        # check the power model against its per-vehicle expression
+        expected = [1200 * s * abs(a) + 1200 * 9.81 * 0.005 * s
+                    + 0.5 * 1.225 * 2.6 * 0.3 * s ** 3
+                    for s, a in zip(speed, accel)]
+        np.testing.assert_array_almost_equal(
+            power_demand(speed, accel), expected)
+        self.assertAlmostEqual(energy_consumption_array(speed, accel, gain=1),
+                               -sum(expected))
+
+        # check that a positive grade increases the power demand
+        self.assertTrue(np.all(power_demand(speed[1:], accel[1:], 0.1) >
+                               power_demand(speed[1:], accel[1:])))
+
+        # check that stopped and missing vehicles are excluded from averages
+        self.assertAlmostEqual(
+            miles_per_megajoule_array(speed, accel, gain=1),
+            np.mean(speed[1:] / expected[1:]) / 1609.0 * 10**6)
+        self.assertEqual(miles_per_megajoule_array([0., -1001.], [0., 0.]), 0)
+        self.assertAlmostEqual(
+            miles_per_gallon_array([10, -1001, 5], [0.5, 0.5, 0.], gain=1),
+            20 / 1609.0)
+
+    def test_reward_spec(self):
+        """Test the composable reward specification."""
+        vehicles = VehicleParams()
+        vehicles.add("test", num_vehicles=10)
+
+        # the fuel consumption is read by the miles_per_gallon reward
+        env_params = EnvParams(additional_params={
+            "target_velocity": 10, "max_accel": 1, "max_decel": 1,
+            "sort_vehicles": False}, vehicle_fields=['fuel_consumption'])
+
+        env, _, _ = ring_road_exp_setup(vehicles=vehicles,
+                                        env_params=env_params)
+        env.k.vehicle.test_set_speed("test_0", 1)
+
+        # check that the columns match the kernel getters
+        columns = VehicleColumns(env)
+        self.assertListEqual(list(columns.speed),
+                             env.k.vehicle.get_speed(env.k.vehicle.get_ids()))
+        self.assertEqual(columns.accel[0], 1 / env.sim_step)
+
+        spec = RewardSpec([
+            RewardTerm('desired_velocity', target_velocity=10),
+            RewardTerm('energy_consumption', weight=2),
+            RewardTerm('penalize_near_standstill', thresh=2, gain=0.5),
+            'miles_per_megajoule',
+        ])
+
+        # check that each term matches the env-based reward functions
+        values = spec.compute(env)
+        self.assertAlmostEqual(values['desired_velocity'],
+                               desired_velocity(env))
+        self.assertAlmostEqual(values['energy_consumption'],
+                               2 * energy_consumption(env))
+        self.assertAlmostEqual(values['penalize_near_standstill'],
+                               penalize_near_standstill(env, thresh=2,
+                                                        gain=0.5))
+        self.assertAlmostEqual(values['miles_per_megajoule'],
+                               miles_per_megajoule(env))
+        self.assertAlmostEqual(spec(env), sum(values.values()))
+
+        # check that failures only zero out the terms that specify it
+        values = spec.compute(env, fail=True)
+        self.assertEqual(values['desired_velocity'], 0)
+        self.assertAlmostEqual(values['energy_consumption'],
+                               2 * energy_consumption(env))
+
+        # check the reward over a subset of vehicles
+        self.assertAlmostEqual(
+            spec.compute(env, veh_ids=['test_0'])['miles_per_megajoule'],
+            miles_per_megajoule(env, veh_ids='test_0'))
+        self.assertAlmostEqual(
+            miles_per_gallon_array(columns.speed, columns.fuel),
+            miles_per_gallon(env))
+
+        # check that custom terms require their columns and unique names
+        self.assertRaises(ValueError, RewardTerm, np.mean)
+        self.assertRaises(ValueError, RewardSpec,
+                          ['average_velocity', 'average_velocity'])
+        spec = RewardSpec([RewardTerm(np.max, columns=['speed'])])
+        self.assertEqual(spec(env), 1)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -12,6 +12,7 @@ from flow.core.params import SumoCarFollowingParams
 from flow.networks.ring import RingNetwork, ADDITIONAL_NET_PARAMS
 from flow.envs import TestEnv
 from flow.networks import Network
+from flow.core.kernel.network.routing import AliasSampler
 
 from flow.controllers.routing_controllers import ContinuousRouter
 from flow.controllers.car_following_models import IDMController
@@ -64,6 +65,20 @@ class TestGetX(unittest.TestCase):
         pos = 4.72
         self.assertAlmostEqual(self.env.k.network.get_x(edge, pos), -1001)
 
+    def test_get_x_vectorized(self):
+        # the positions of several edges are computed at once, including
+        # internal links that are generalized by a single element
+        edges = ["bottom", ":bottom", "", ":bottom_0"]
+        pos = [4.72, 0.1, 4.72, 1]
+        np.testing.assert_array_almost_equal(
+            self.env.k.network.get_x(edges, pos), [5, 0.1, -1001, 0])
+        self.assertEqual(
+            [self.env.k.network.get_x(edge, pos_i)
+             for edge, pos_i in zip(edges, pos)], [5, 0.1, -1001, 0])
+
+        # the start position of every edge is resolved once
+        self.assertEqual(len(self.env.k.network._edge_codes), 4)
+
 
 class TestGetEdge(unittest.TestCase):
     """
@@ -92,6 +107,16 @@ class TestGetEdge(unittest.TestCase):
         self.assertTupleEqual(
             self.env.k.network.get_edge(x2), (":bottom", 0.1))
 
+    def test_get_edges(self):
+        # the vectorized lookup used to generate starting positions matches
+        # get_edge
+        x = np.linspace(0, self.env.k.network.length(), 100, endpoint=False)
+        _, edges = self.env.k.network._edgestarts_arrays()
+        idx, pos = self.env.k.network._get_edges(x)
+        for x_i, edge_i, pos_i in zip(x, edges[idx], pos):
+            self.assertTupleEqual(
+                self.env.k.network.get_edge(x_i), (edge_i, pos_i))
+
 
 class TestEvenStartPos(unittest.TestCase):
     """
@@ -885,6 +910,48 @@ class TestNextPrevEdge(unittest.TestCase):
         self.assertTrue(len(prev_edge) == 0)
 
 
+class TestRouting(unittest.TestCase):
+    """
+    Tests the route tables, samplers and shortest routes used to choose the
+    routes of vehicles.
+    """
+
+    def test_alias_sampler(self):
+        np.random.seed(0)
+        sampler = AliasSampler([1, 2, 0, 5])
+        samples = [sampler.sample() for _ in range(20000)]
+        freq = np.bincount(samples, minlength=4) / len(samples)
+        np.testing.assert_array_almost_equal(
+            freq, [0.125, 0.25, 0, 0.625], decimal=2)
+
+        # a single uniform sample is drawn, as is the case for np.random.choice
+        np.random.seed(0)
+        AliasSampler([1]).sample()
+        state = np.random.random_sample()
+        np.random.seed(0)
+        np.random.choice([0], size=1, p=[1])
+        self.assertEqual(state, np.random.random_sample())
+
+        self.assertRaises(ValueError, AliasSampler, [])
+        self.assertRaises(ValueError, AliasSampler, [0, 0])
+
+    def test_network_routing(self):
+        env, _, _ = figure_eight_exp_setup()
+
+        # internal edges are skipped
+        self.assertListEqual(env.k.network.get_next_edges("bottom", 0),
+                             ["top"])
+
+        # the route tables match the routes of the network
+        table = env.k.network.get_route_table("bottom")
+        self.assertListEqual(table.routes,
+                             [env.k.network.rts["bottom"][0][0]])
+        self.assertEqual(table.sample(), 0)
+        self.assertIs(env.k.network.get_route_table("bottom"), table)
+
+        env.terminate()
+
+
 class TestDefaultRoutes(unittest.TestCase):
 
     def test_default_routes(self):
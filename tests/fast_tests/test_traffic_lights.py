@@ -1,5 +1,6 @@
 import unittest
 import os
+import numpy as np
 
 from tests.setup_scripts import ring_road_exp_setup, traffic_light_grid_mxn_exp_setup
 from flow.core.params import VehicleParams
@@ -137,6 +138,39 @@ class TestSetState(unittest.TestCase):
 
         self.assertEqual(state[1], "R")
 
+    def test_unchanged_states(self):
+        # reset the environment
+        self.env.reset()
+
+        # count the states sent to sumo
+        sent = []
+        trafficlight = self.env.k.traffic_light.kernel_api.trafficlight
+        set_state = trafficlight.setRedYellowGreenState
+
+        def counted_set_state(tlsID, state):
+            sent.append((tlsID, state))
+            set_state(tlsID=tlsID, state=state)
+
+        trafficlight.setRedYellowGreenState = counted_set_state
+
+        # new states are always sent
+        self.env.k.traffic_light.set_state(node_id="top", state="rY")
+        self.env.step([])
+        self.assertListEqual(sent, [("top", "rY")])
+
+        # unchanged states are not sent, whether the state was observed in
+        # the last step or set in the current step
+        self.env.k.traffic_light.set_states(["top"], ["rY"])
+        self.env.k.traffic_light.set_state(node_id="top", state="Gr")
+        self.env.k.traffic_light.set_state(node_id="top", state="Gr")
+        self.env.step([])
+        self.assertListEqual(sent, [("top", "rY"), ("top", "Gr")])
+        self.assertEqual(self.env.k.traffic_light.get_state("top"), "Gr")
+
+        # the states of all lights are available as a matrix
+        np.testing.assert_array_equal(
+            self.env.k.traffic_light.get_states(), [["G", "r"]])
+
 
 class TestPOEnv(unittest.TestCase):
     """
@@ -2,7 +2,11 @@ import unittest
 import csv
 import os
 import json
+import subprocess
+import sys
 import collections
+from copy import deepcopy
+import numpy as np
 
 from flow.envs import AccelEnv
 from flow.networks import FigureEightNetwork
@@ -10,12 +14,19 @@ from flow.core.params import VehicleParams
 from flow.core.params import TrafficLightParams
 from flow.controllers import IDMController, ContinuousRouter, RLController
 from flow.core.params import SumoParams, EnvParams, NetParams, InitialConfig, \
-    InFlows, SumoCarFollowingParams
-from flow.core.util import emission_to_csv
+    InFlows, SumoCarFollowingParams, AimsunParams
+from flow.core.kernel.network import AimsunKernelNetwork
+from flow.core.util import emission_to_csv, stack_padded, RingBuffer, \
+    writexml, makexml, printxml, LazyList, SlotManager, RunningStats, \
+    WarmupCache, AsyncPipeline
 from flow.envs import MergePOEnv
 from flow.networks import MergeNetwork
+from flow.networks import TrafficLightGridNetwork
+from flow.networks.traffic_light_grid import ADDITIONAL_NET_PARAMS
+from lxml import etree
 from flow.utils.registry import make_create_env
 from flow.utils.rllib import FlowParamsEncoder, get_flow_params
+from flow.config import PROJECT_PATH
 
 os.environ["TEST_FLAG"] = "True"
 
@@ -59,6 +70,190 @@ class TestEmissionToCSV(unittest.TestCase):
         self.assertEqual(len(dict1), 104)
 
 
+class TestStackPadded(unittest.TestCase):
+    """Tests the stack_padded method in flow/core/util.py."""
+
+    def test_stack_padded(self):
+        rows = [[1, 2, 3], [], [4]]
+        np.testing.assert_array_equal(
+            stack_padded(rows, 4, -1),
+            [[1, 2, 3, -1], [-1, -1, -1, -1], [4, -1, -1, -1]])
+
+        # rows that are longer than the width are truncated
+        np.testing.assert_array_equal(
+            stack_padded([[1, 2, 3]], 2), [[1, 2]])
+
+        # an empty list of rows returns an empty matrix of the correct width
+        self.assertEqual(stack_padded([], 3).shape, (0, 3))
+
+
+class TestRingBuffer(unittest.TestCase):
+    """Tests the RingBuffer class in flow/core/util.py."""
+
+    def test_ring_buffer(self):
+        buffer = RingBuffer(3)
+        self.assertEqual(len(buffer), 0)
+
+        frame = np.zeros((2, 2))
+        for i in range(5):
+            frame[:] = i
+            buffer.append(frame)
+
+        # only the last three arrays are kept, and they are copied
+        self.assertEqual(len(buffer), 3)
+        np.testing.assert_array_equal(buffer.get()[:, 0, 0], [2, 3, 4])
+        self.assertEqual(buffer[0][0, 0], 2)
+        self.assertEqual(buffer[-1][0, 0], 4)
+        self.assertRaises(IndexError, buffer.__getitem__, 3)
+
+
+class TestSlotManager(unittest.TestCase):
+    """Tests the SlotManager class in flow/core/util.py."""
+
+    def test_slots(self):
+        slots = SlotManager(2)
+        slots.update(["a", "b", "c"], [])
+        self.assertListEqual(list(slots.ids), ["a", "b"])
+        self.assertListEqual(slots.get_queue(), ["c"])
+
+        # vehicles keep their slots, and the first queued vehicle takes the
+        # slot of the next vehicle that leaves
+        slots.update(["d"], ["a", "e"])
+        self.assertListEqual(list(slots.ids), ["c", "b"])
+        self.assertListEqual(slots.get_queue(), ["d"])
+        self.assertEqual(slots.get_slot("b"), 1)
+        self.assertIsNone(slots.get_slot("d"))
+
+        # empty slots are padded with None
+        slots.update([], ["d", "c"])
+        self.assertListEqual(list(slots.ids), [None, "b"])
+        self.assertListEqual(slots.get_ids(), ["b"])
+        self.assertEqual(len(slots), 1)
+
+        # synchronize with the complete list of vehicles
+        slots.sync(["f", "g"])
+        self.assertListEqual(list(slots.ids), ["f", "g"])
+        self.assertNotIn("b", slots)
+
+        # vehicles that left without an arrival event are removed
+        slots.update(["h", "i"], [])
+        slots.remove_missing(["g", "i", "j"])
+        self.assertListEqual(list(slots.ids), ["i", "g"])
+        self.assertListEqual(slots.get_queue(), [])
+
+    def test_reclaim_slots(self):
+        slots = SlotManager(3, reclaim_slots=True)
+        slots.reset(["a", "b", "c"])
+        slots.update([], ["a", "b"])
+        slots.update(["b", "a"], [])
+        self.assertListEqual(list(slots.ids), ["a", "b", "c"])
+
+        # without reclaiming, the empty slot with the lowest index is used
+        slots = SlotManager(3)
+        slots.reset(["a", "b", "c"])
+        slots.update([], ["a", "b"])
+        slots.update(["b", "a"], [])
+        self.assertListEqual(list(slots.ids), ["b", "a", "c"])
+
+
+class TestRunningStats(unittest.TestCase):
+    """Tests the RunningStats class in flow/core/util.py."""
+
+    def test_running_stats(self):
+        stats = RunningStats()
+        self.assertEqual(stats.confidence_interval(), (-np.inf, np.inf))
+
+        samples = [1., 4., 2., 8., 5.]
+        for sample in samples:
+            stats.push(sample)
+
+        self.assertEqual(stats.count, 5)
+        self.assertAlmostEqual(stats.mean, np.mean(samples))
+        self.assertAlmostEqual(stats.std(), np.std(samples))
+        self.assertAlmostEqual(stats.std(ddof=1), np.std(samples, ddof=1))
+
+        # 95% interval with a t-distribution with 4 degrees of freedom
+        lower, upper = stats.confidence_interval(0.95)
+        half_width = 2.776445 * np.std(samples, ddof=1) / np.sqrt(5)
+        self.assertAlmostEqual(lower, np.mean(samples) - half_width, places=4)
+        self.assertAlmostEqual(upper, np.mean(samples) + half_width, places=4)
+
+
+class TestWriteXML(unittest.TestCase):
+    """Tests the writexml function and LazyList class in flow/core/util.py."""
+
+    def test_writexml(self):
+        """Check that streamed files match the ones built in memory."""
+        def elements():
+            for i in range(3):
+                yield etree.Element('node', id=str(i), x='0', y=str(i))
+
+        nsl = 'http://sumo.dlr.de/xsd/nodes_file.xsd'
+        writexml('/tmp/test_stream.nod.xml', 'nodes', nsl, elements())
+        x = makexml('nodes', nsl)
+        for element in elements():
+            x.append(element)
+        printxml(x, '/tmp/test_tree.nod.xml')
+
+        streamed = etree.parse('/tmp/test_stream.nod.xml').getroot()
+        expected = etree.parse('/tmp/test_tree.nod.xml').getroot()
+        self.assertEqual(streamed.tag, expected.tag)
+        self.assertDictEqual(dict(streamed.attrib), dict(expected.attrib))
+        self.assertListEqual([dict(e.attrib) for e in streamed],
+                             [dict(e.attrib) for e in expected])
+
+        os.remove('/tmp/test_stream.nod.xml')
+        os.remove('/tmp/test_tree.nod.xml')
+
+    def test_lazy_list(self):
+        """Check that generator-based networks are lazily generated."""
+        lazy = LazyList(range, 3)
+        self.assertListEqual(list(lazy), [0, 1, 2])
+        self.assertListEqual(list(lazy), [0, 1, 2])
+        self.assertEqual(len(lazy), 3)
+        self.assertEqual(lazy[-1], 2)
+
+        additional_net_params = deepcopy(ADDITIONAL_NET_PARAMS)
+        additional_net_params['grid_array'].update(
+            inner_length=300, short_length=300, long_length=100)
+        network = TrafficLightGridNetwork(
+            name='grid',
+            vehicles=VehicleParams(),
+            net_params=NetParams(additional_params=additional_net_params))
+        self.assertIsInstance(network.nodes, LazyList)
+        self.assertIsInstance(network.edges, LazyList)
+        # 3x2 inner nodes, and 4 outer nodes per row and column
+        self.assertEqual(len(network.nodes), 6 + 4 * 5)
+        self.assertEqual(len(list(network.edges)), len(network.edges))
+
+    def test_aimsun_network_data(self):
+        """Check that lazily generated networks can be passed to Aimsun."""
+        additional_net_params = deepcopy(ADDITIONAL_NET_PARAMS)
+        additional_net_params['grid_array'].update(
+            inner_length=300, short_length=300, long_length=100)
+        network = TrafficLightGridNetwork(
+            name='grid',
+            vehicles=VehicleParams(),
+            net_params=NetParams(additional_params=additional_net_params))
+        num_edges = len(network.edges)
+
+        # the network data is json-serializable
+        kernel = AimsunKernelNetwork(None, AimsunParams())
+        output = kernel._network_data(network)
+        self.assertIsInstance(network.edges, list)
+        self.assertIsInstance(network.nodes, list)
+        self.assertEqual(len(json.loads(json.dumps(output))['edges']),
+                         num_edges)
+
+        # the attributes of the types are merged into the edges
+        edges = kernel._merge_types(network)
+        self.assertEqual(len(edges), num_edges)
+        for edge in network.edges:
+            self.assertIn('numLanes', edge)
+            self.assertEqual(edges[edge['id']]['numLanes'], edge['numLanes'])
+            self.assertNotIn('id', edges[edge['id']])
+
+
 class TestRegistry(unittest.TestCase):
     """Tests the methods located in flow/utils/registry.py"""
 
@@ -150,6 +345,41 @@ class TestRegistry(unittest.TestCase):
         self.assertEqual(env.network.__class__.__name__,
                          flow_params["network"].__name__)
 
+        # the environment can be created several times in the same process
+        env2 = create_env()
+        self.assertIsNot(env2.network, env.network)
+        env.terminate()
+        env2.terminate()
+
+        # the next experiment uses the next available version number
+        _, env_name = make_create_env(params=flow_params, version=v)
+        self.assertEqual(env_name,
+                         '{}-v{}'.format(flow_params["env_name"].__name__,
+                                         v + 1))
+
+
+class TestLazyImport(unittest.TestCase):
+    """Tests the lazy import of the classes in flow/envs, flow/networks and
+    flow/controllers."""
+
+    def test_lazy_import(self):
+        # the modules are only imported once a class is accessed (checked in
+        # a new interpreter, as the modules are already imported here)
+        code = "import sys; import flow.envs, flow.networks, " \
+               "flow.controllers; print('flow.envs.base' in sys.modules); " \
+               "flow.envs.AccelEnv; print('flow.envs.base' in sys.modules)"
+        output = subprocess.check_output(
+            [sys.executable, '-c', code], cwd=PROJECT_PATH)
+        self.assertEqual(output.decode().split(), ['False', 'True'])
+
+        # the classes and deprecated aliases are still available
+        import flow.envs
+        for name in flow.envs.__all__:
+            self.assertIn(name, dir(flow.envs))
+            self.assertTrue(hasattr(flow.envs, name))
+        self.assertIs(flow.envs.AccelEnv, AccelEnv)
+        self.assertRaises(AttributeError, getattr, flow.envs, 'Foo')
+
 
 class TestRllib(unittest.TestCase):
     """Tests the methods located in flow/utils/rllib.py"""
@@ -323,5 +553,75 @@ class TestRllib(unittest.TestCase):
                                      flow_params["veh"].__dict__))
 
 
+class TestWarmupCache(unittest.TestCase):
+
+    def test_warmup_cache(self):
+        cache = WarmupCache('ring', num_states=2, refresh_after=2)
+        self.assertTrue(os.path.isdir(cache.path))
+        self.assertEqual(cache.filename(1),
+                         os.path.join(cache.path, 'ring_1.xml'))
+
+        # fill both slots
+        self.assertIsNone(cache.choose()[1])
+        cache.store(0, 0)
+        cache.store(1, 1)
+        self.assertEqual(len(cache), 2)
+
+        # every state is used twice before it has to be generated again
+        uses = [0, 0]
+        for _ in range(20):
+            index, state = cache.choose()
+            if state is None:
+                self.assertEqual(uses[index], 2)
+                uses[index] = 0
+                cache.store(index, index)
+            else:
+                self.assertEqual(state, index)
+                uses[index] += 1
+
+        # a state of another configuration is generated again
+        cache = WarmupCache('ring', num_states=1)
+        cache.store(0, 0, key='230')
+        self.assertEqual(cache.choose('230'), (0, 0))
+        self.assertEqual(cache.choose('260'), (0, None))
+        cache.store(0, 1, key='260')
+        self.assertEqual(cache.choose('260'), (0, 1))
+
+        path = cache.path
+        cache.close()
+        self.assertEqual(len(cache), 0)
+        self.assertFalse(os.path.exists(path))
+
+
+class TestAsyncPipeline(unittest.TestCase):
+
+    def test_order(self):
+        for enabled in [False, True]:
+            pipeline = AsyncPipeline(enabled=enabled, max_pending=2)
+            results = []
+            for i in range(10):
+                pipeline.submit(results.append, i)
+            pipeline.flush()
+            self.assertListEqual(results, list(range(10)))
+            pipeline.close()
+
+    def test_error(self):
+        pipeline = AsyncPipeline()
+        results = []
+        pipeline.submit(results.append, 0)
+        pipeline.submit(int, 'a')
+        pipeline.submit(results.append, 1)
+
+        # the error is raised in the main thread, and the consumers submitted
+        # after the failing one are not run
+        self.assertRaises(ValueError, pipeline.flush)
+        self.assertListEqual(results, [0])
+
+        # the pipeline can be used after the error was raised
+        pipeline.submit(results.append, 2)
+        pipeline.close()
+        self.assertListEqual(results, [0, 2])
+
+
 if __name__ == '__main__':
     unittest.main()
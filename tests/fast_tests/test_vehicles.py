@@ -9,6 +9,9 @@ from flow.controllers.car_following_models import IDMController, \
     SimCarFollowingController
 from flow.controllers.lane_change_controllers import StaticLaneChanger
 from flow.controllers.rlcontroller import RLController
+from flow.core.kernel.vehicle.base import BASE_FIELDS
+from flow.utils.exceptions import FatalFlowError
+import traci.constants as tc
 
 from tests.setup_scripts import ring_road_exp_setup, highway_exp_setup
 
@@ -600,5 +603,135 @@ class TestObservedIDs(unittest.TestCase):
         self.assertCountEqual(env.k.vehicle.get_observed_ids(), ["test_1"])
 
 
+class TestCopy(unittest.TestCase):
+    """Tests the copies of the vehicle parameters and vehicle kernel."""
+
+    def test_vehicle_params_copy(self):
+        vehicles = VehicleParams()
+        vehicles.add("test", num_vehicles=2)
+        vehicles_copy = vehicles.copy()
+
+        # vehicles added to the copy are not added to the original object
+        vehicles_copy.add(
+            "test_rl",
+            num_vehicles=1,
+            acceleration_controller=(RLController, {}))
+        self.assertListEqual(vehicles.ids, ["test_0", "test_1"])
+        self.assertListEqual(vehicles_copy.ids,
+                             ["test_0", "test_1", "test_rl_0"])
+        self.assertEqual(vehicles.num_rl_vehicles, 0)
+        self.assertEqual(vehicles_copy.num_rl_vehicles, 1)
+        self.assertNotIn("test_rl", vehicles.type_parameters)
+        self.assertEqual(len(vehicles.initial), 1)
+        self.assertEqual(vehicles_copy.get_type("test_rl_0"), "test_rl")
+        self.assertRaises(KeyError, vehicles.get_type, "test_rl_0")
+
+        # the parameters of the types are shared
+        self.assertIs(
+            vehicles.type_parameters["test"]["car_following_params"],
+            vehicles_copy.type_parameters["test"]["car_following_params"])
+
+    def test_snapshot(self):
+        vehicles = VehicleParams()
+        vehicles.add("test", num_vehicles=5)
+        vehicles.add(
+            "test_rl",
+            num_vehicles=1,
+            acceleration_controller=(RLController, {}))
+
+        env, _, _ = ring_road_exp_setup(vehicles=vehicles)
+        snapshot = env.initial_vehicles
+
+        # the attributes of the kernel are available from the snapshot
+        self.assertEqual(snapshot.num_vehicles, 6)
+        self.assertEqual(snapshot.num_rl_vehicles, 1)
+        self.assertRaises(AttributeError, getattr, snapshot, "foo")
+
+        # changes to the kernel do not modify the snapshot
+        env.reset()
+        env.k.vehicle.remove("test_rl_0")
+        self.assertEqual(env.k.vehicle.num_rl_vehicles, 0)
+        self.assertEqual(snapshot.num_rl_vehicles, 1)
+
+        # the restored kernels do not share their state with the snapshot
+        kernel = snapshot.restore(env.k)
+        self.assertIsInstance(kernel, type(env.k.vehicle))
+        self.assertIs(kernel.master_kernel, env.k)
+        self.assertIsNone(kernel.kernel_api)
+        self.assertEqual(kernel.num_rl_vehicles, 1)
+        self.assertEqual(kernel.get_type("test_rl_0"), "test_rl")
+        kernel.num_rl_vehicles = 0
+        kernel.type_parameters.clear()
+        self.assertEqual(snapshot.num_rl_vehicles, 1)
+        self.assertIn("test_rl", snapshot.type_parameters)
+        self.assertEqual(snapshot.restore().num_rl_vehicles, 1)
+
+        env.terminate()
+
+
+class TestSubscribedFields(unittest.TestCase):
+    """Tests the fields of the vehicles collected from sumo."""
+
+    def test_base_fields(self):
+        vehicles = VehicleParams()
+        vehicles.add(
+            "test",
+            acceleration_controller=(SimCarFollowingController, {}),
+            num_vehicles=3)
+        env, _, _ = ring_road_exp_setup(vehicles=vehicles)
+        env.step(None)
+
+        # only the base fields are subscribed to, as the env does not read
+        # any other fields and the vehicles have no controllers
+        self.assertSetEqual(env.k.vehicle.subscribed_fields, set(BASE_FIELDS))
+        veh_id = env.k.vehicle.get_ids()[0]
+        self.assertSetEqual(
+            set(env.k.kernel_api.vehicle.getSubscriptionResults(veh_id)),
+            {tc.VAR_LANE_INDEX, tc.VAR_LANEPOSITION, tc.VAR_ROAD_ID,
+             tc.VAR_SPEED})
+        self.assertGreaterEqual(env.k.vehicle.get_speed(veh_id), 0)
+
+        # reading the other fields raises an error
+        self.assertRaises(FatalFlowError, env.k.vehicle.get_headway, veh_id)
+        self.assertRaises(FatalFlowError, env.k.vehicle.get_route, veh_id)
+        self.assertRaises(
+            FatalFlowError, env.k.vehicle.get_2d_position, veh_id)
+
+        # the fields needed by the emission files are added to those of the
+        # environment
+        env.env_params.vehicle_fields = ['fuel_consumption']
+        self.assertSetEqual(env.get_vehicle_fields(), {'fuel_consumption'})
+        env.sim_params.emission_path = './data'
+        self.assertSetEqual(
+            env.get_vehicle_fields(),
+            {'fuel_consumption', 'leader', '2d_position', 'distance'})
+
+        # invalid fields are not accepted
+        self.assertRaises(
+            ValueError, env.k.vehicle.set_subscribed_fields, ['foo'])
+
+        env.terminate()
+
+    def test_controller_fields(self):
+        # the vehicles have an acceleration and a routing controller
+        env, _, _ = ring_road_exp_setup()
+        env.step(None)
+
+        self.assertSetEqual(env.k.vehicle.subscribed_fields,
+                            set(BASE_FIELDS) | {'leader', 'route'})
+        veh_id = env.k.vehicle.get_ids()[0]
+        self.assertIn(
+            tc.VAR_EDGES,
+            env.k.kernel_api.vehicle.getSubscriptionResults(veh_id))
+        self.assertEqual(env.k.vehicle.get_leader(veh_id), veh_id)
+        self.assertRaises(FatalFlowError, env.k.vehicle.get_distance, veh_id)
+
+        # all fields are collected if the environment does not declare them
+        env.k.vehicle.set_subscribed_fields(None)
+        self.assertEqual(env.k.vehicle.get_distance(veh_id), -1001)
+
+        env.terminate()
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -6,10 +6,13 @@ import flow.visualize.plot_ray_results as prr
 
 import os
 import unittest
+import gym
 import ray
 import numpy as np
 import contextlib
+import tempfile
 from io import StringIO
+from types import SimpleNamespace
 
 os.environ['TEST_FLAG'] = 'True'
 
@@ -53,6 +56,100 @@ class TestVisualizerRLlib(unittest.TestCase):
         visualizer_rllib(pass_args)
 
 
+class StubPolicy(object):
+    """Linear policy whose recurrent state is added to its actions."""
+
+    def __init__(self, weights, action_space):
+        self.weights = np.asarray(weights)
+        self.action_space = action_space
+
+    def compute_actions(self, obs_batch, state_batches=None):
+        actions = np.asarray(obs_batch).dot(self.weights)
+        if not state_batches:
+            return actions, [], {}
+        state_batches = [np.asarray(state) for state in state_batches]
+        actions = actions + state_batches[0]
+        return actions, [state + 1 for state in state_batches], {}
+
+
+class StubAgent(object):
+    """Agent computing the actions of one agent at a time, as RLlib does."""
+
+    def __init__(self, policies):
+        self.config = {'clip_actions': True}
+        self.policies = policies
+        worker = SimpleNamespace(
+            preprocessors={key: SimpleNamespace(transform=lambda obs: 2 * obs)
+                           for key in policies},
+            filters={key: lambda obs, update: obs - 1 for key in policies})
+        self.workers = SimpleNamespace(local_worker=lambda: worker)
+
+    def get_policy(self, policy_id):
+        return self.policies[policy_id]
+
+    def compute_action(self, observation, state=None, policy_id=None):
+        worker = self.workers.local_worker()
+        obs = worker.filters[policy_id](
+            worker.preprocessors[policy_id].transform(observation),
+            update=False)
+        policy = self.get_policy(policy_id)
+        state_batches = [[s] for s in state] if state is not None else None
+        actions, state_out, info = policy.compute_actions(
+            [obs], state_batches=state_batches)
+        action = np.clip(actions[0], policy.action_space.low,
+                         policy.action_space.high)
+        if state is None:
+            return action
+        return action, [s[0] for s in state_out], info
+
+
+class TestComputeActions(unittest.TestCase):
+    """Tests the batched computation of the actions of multiple agents."""
+
+    def setUp(self):
+        space = gym.spaces.Box(low=-1, high=1, shape=(2,), dtype=np.float32)
+        self.agent = StubAgent({
+            'av': StubPolicy([[0.5, -0.2], [0.1, 0.3], [-0.4, 0.2]], space),
+            'adversary': StubPolicy([[-0.3, 0.1], [0.2, 0.2], [0.6, -0.5]],
+                                    space),
+        })
+        rng = np.random.RandomState(0)
+        self.observations = {'agent_{}'.format(i): rng.uniform(-1, 1, 3)
+                             for i in range(5)}
+
+    def policy_map_fn(self, agent_id):
+        return 'av' if agent_id in ['agent_0', 'agent_2', 'agent_3'] \
+            else 'adversary'
+
+    def test_compute_actions(self):
+        actions = vs_rllib.compute_actions(
+            self.agent, self.observations, self.policy_map_fn)
+        self.assertCountEqual(actions, self.observations)
+        for agent_id, obs in self.observations.items():
+            np.testing.assert_array_almost_equal(
+                actions[agent_id], self.agent.compute_action(
+                    obs, policy_id=self.policy_map_fn(agent_id)))
+
+    def test_compute_actions_rnn(self):
+        rnn_states = {agent_id: [np.full(2, 0.1 * i), np.zeros(2)]
+                      for i, agent_id in enumerate(self.observations)}
+        expected_states = {}
+        for _ in range(2):
+            actions = vs_rllib.compute_actions(
+                self.agent, self.observations, self.policy_map_fn,
+                rnn_states=rnn_states)
+            for agent_id, obs in self.observations.items():
+                state = expected_states.get(agent_id, [
+                    np.full(2, 0.1 * int(agent_id[-1])), np.zeros(2)])
+                action, expected_states[agent_id], _ = \
+                    self.agent.compute_action(
+                        obs, state=state,
+                        policy_id=self.policy_map_fn(agent_id))
+                np.testing.assert_array_almost_equal(actions[agent_id], action)
+                np.testing.assert_array_almost_equal(
+                    rnn_states[agent_id], expected_states[agent_id])
+
+
 class TestPlotters(unittest.TestCase):
 
     def test_capacity_diagram_generator(self):
@@ -312,6 +409,33 @@ class TestPlotters(unittest.TestCase):
 
         np.testing.assert_array_almost_equal(segs, expected_segs)
 
+    def test_time_space_diagram_raster(self):
+        # a horizontal and a vertical segment with different speeds, crossing
+        # in the pixel (5, 5)
+        segs = np.array([[[0., 5.5], [10., 5.5]], [[5.5, 0.], [5.5, 10.]]])
+
+        image = tsd.rasterize_segments(segs, [1., 3.], (10, 10), (0, 10, 0, 10))
+        self.assertEqual(image.shape, (10, 10))
+        np.testing.assert_array_almost_equal(image[5, :5], 1)
+        np.testing.assert_array_almost_equal(image[:5, 5], 3)
+        self.assertAlmostEqual(image[5, 5], 2)
+        self.assertTrue(np.isnan(image[0, 0]))
+
+        image = tsd.rasterize_segments(segs, [1., 3.], (10, 10), (0, 10, 0, 10), agg='min')
+        self.assertAlmostEqual(image[5, 5], 1)
+
+        # the image does not depend on the number of processed segments
+        dir_path = os.path.dirname(os.path.realpath(__file__))
+        flow_params = tsd.get_flow_params(
+            os.path.join(dir_path, 'test_files/ring_230.json'))
+        emission_data = tsd.import_data_from_trajectory(
+            os.path.join(dir_path, 'test_files/ring_230_emission.csv'), flow_params)
+        segs, data = tsd.get_time_space_data(emission_data, flow_params)
+        bounds = tsd.get_bounds(data)
+        np.testing.assert_array_almost_equal(
+            tsd.rasterize_segments(segs, data['speed'].values, (50, 40), bounds),
+            tsd.rasterize_segments(segs, data['speed'].values, (50, 40), bounds, chunk_size=7))
+
     def test_plot_ray_results(self):
         dir_path = os.path.dirname(os.path.realpath(__file__))
         file_path = os.path.join(dir_path, 'test_files/progress.csv')
@@ -378,6 +502,38 @@ class TestPlotters(unittest.TestCase):
         for column in column_names:
             self.assertTrue(column in output)
 
+    def test_progress_reader(self):
+        dir_path = os.path.dirname(os.path.realpath(__file__))
+        with open(os.path.join(dir_path, 'test_files/progress.csv'), 'rb') as f:
+            data = f.read()
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            file_path = os.path.join(tmp_dir, 'progress.csv')
+            open(file_path, 'wb').close()
+            reader = prr.ProgressReader(file_path, ['episode_reward_mean'])
+
+            # append the file in chunks that end in the middle of rows
+            for i in range(0, len(data), 1000):
+                with open(file_path, 'ab') as f:
+                    f.write(data[i:i + 1000])
+                num_rows = reader.num_rows
+                self.assertEqual(reader.read(), reader.num_rows - num_rows)
+
+            # nothing is read if the file did not change
+            self.assertEqual(reader.read(), 0)
+
+            expected = prr.ProgressReader(
+                os.path.join(dir_path, 'test_files/progress.csv'),
+                ['episode_reward_mean'])
+            self.assertEqual(expected.read(), 43)
+            np.testing.assert_array_equal(
+                reader.values('episode_reward_mean'),
+                expected.values('episode_reward_mean'))
+
+            # test with the runs matched by a glob pattern
+            prr.plot_progress(os.path.join(tmp_dir, '*.csv'),
+                              ['episode_reward_mean'])
+
 
 if __name__ == '__main__':
     ray.init(num_cpus=1)